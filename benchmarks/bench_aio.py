@@ -0,0 +1,117 @@
+"""
+Benchmark: concurrent leaderboard requests, threads vs AsyncMusicDB.
+
+Fires --requests get_most_rated_songs calls at once, first from a thread
+pool of --threads threads sharing a MusicDB of as many connections (one
+thread and one connection per in-flight request), then as coroutines on an
+AsyncMusicDB of --pool-size connections. Reports throughput, latency
+percentiles and the connections each approach opened.
+
+Usage:
+    python benchmarks/bench_import.py --rows 1000000
+    python benchmarks/bench_aio.py --requests 1000 --threads 100 --pool-size 8
+
+Run against a loaded database; the result cache is off unless
+--result-cache is given.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure music_db.py (project root) is importable when running from benchmarks/
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db_aio import AsyncMusicDB
+from bench_import import DB_CONFIG
+
+TOP_N = 10
+
+
+def year_ranges(requests):
+    """Spread the requests over a handful of leaderboards."""
+    ranges = [(year, year) for year in range(2018, 2024)] + [(2018, 2023)]
+    return [ranges[i % len(ranges)] for i in range(requests)]
+
+
+def report(name, elapsed, latencies, stats):
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"  {name:<8} {len(latencies) / elapsed:9.1f} req/s  "
+        f"p50 {p50 * 1000:8.1f} ms  p99 {p99 * 1000:8.1f} ms  "
+        f"mean {statistics.mean(latencies) * 1000:8.1f} ms  "
+        f"connections {stats['created']}"
+    )
+
+
+def run_threads(ranges, threads, result_cache):
+    """One thread and one pooled connection per in-flight request."""
+    latencies = []
+
+    with MusicDB(pool_size=threads, result_cache=result_cache, **DB_CONFIG) as db:
+
+        def request(years):
+            start = time.perf_counter()
+            db.get_most_rated_songs(years, TOP_N)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(request, ranges))
+        elapsed = time.perf_counter() - start
+        stats = db.stats()
+    return elapsed, latencies, stats
+
+
+async def run_async(ranges, pool_size, result_cache):
+    """All requests in flight as coroutines over pool_size connections."""
+    latencies = []
+
+    async with AsyncMusicDB(
+        pool_size=pool_size, result_cache=result_cache, **DB_CONFIG
+    ) as adb:
+
+        async def request(years):
+            start = time.perf_counter()
+            await adb.get_most_rated_songs(years, TOP_N)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request(years) for years in ranges))
+        elapsed = time.perf_counter() - start
+        stats = adb.stats()
+    return elapsed, latencies, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=DEFAULT_POOL_SIZE)
+    parser.add_argument("--result-cache", action="store_true")
+    args = parser.parse_args()
+
+    ranges = year_ranges(args.requests)
+    print(
+        f"{args.requests} concurrent get_most_rated_songs requests"
+        f"{' (result cache on)' if args.result_cache else ''}"
+    )
+    report("threads", *run_threads(ranges, args.threads, args.result_cache or None))
+    report(
+        "asyncio",
+        *asyncio.run(run_async(ranges, args.pool_size, args.result_cache or None)),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: get_* queries in MySQL vs the NumPy ColumnarEngine.
+
+Loads the database into a ColumnarEngine, reports the load time and the
+memory of its arrays, then times every query both ways and checks that the
+results are equal. Populate the database first, e.g. with
+python benchmarks/bench_date_ranges.py --populate 50000000.
+
+Usage:
+    python benchmarks/bench_columnar.py --repeat 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import mysql.connector
+import numpy as np
+
+# Ensure music_db.py (project root) is importable when running from benchmarks/
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db_columnar import ColumnarEngine
+from bench_import import DB_CONFIG
+
+YEARS = (2016, 2018)
+
+# name -> (SQL function, arguments after the connection)
+QUERIES = {
+    "most_prolific_individual_artists": (
+        get_most_prolific_individual_artists,
+        (10, YEARS),
+    ),
+    "most_prolific_individual_artists_between": (
+        get_most_prolific_individual_artists_between,
+        (10, "2016-03-01", "2018-02-28"),
+    ),
+    "artists_last_single_in_year": (get_artists_last_single_in_year, (2018,)),
+    "top_song_genres": (get_top_song_genres, (10,)),
+    "album_and_single_artists": (get_album_and_single_artists, ()),
+    "most_rated_songs": (get_most_rated_songs, (YEARS, 10)),
+    "most_rated_songs_between": (
+        get_most_rated_songs_between,
+        ("2016-03-01", "2018-02-28", 10),
+    ),
+    "most_engaged_users": (get_most_engaged_users, (YEARS, 10)),
+    "most_engaged_users_between": (
+        get_most_engaged_users_between,
+        ("2016-03-01", "2018-02-28", 10),
+    ),
+}
+
+
+def median_ms(fn, repeat):
+    """Median wall-clock time of fn(), in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def array_bytes(engine):
+    """Bytes held by the NumPy arrays of the engine"""
+    total = 0
+    for value in vars(engine).values():
+        if isinstance(value, np.ndarray):
+            total += value.nbytes
+        elif hasattr(value, "__dict__"):
+            total += array_bytes(value)
+        elif isinstance(value, dict):
+            total += sum(v.nbytes for v in value.values() if isinstance(v, np.ndarray))
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    mydb = mysql.connector.connect(**DB_CONFIG)
+
+    start = time.perf_counter()
+    engine = ColumnarEngine(mydb)
+    elapsed = time.perf_counter() - start
+    print(
+        f"loaded {engine.ratings.days.size:,} ratings, {len(engine.songs):,} songs "
+        f"in {elapsed:.1f} s ({array_bytes(engine) / 2**20:,.0f} MiB of arrays)"
+    )
+
+    print(f"\n{'query':<42} {'MySQL ms':>10} {'NumPy ms':>10} {'speedup':>8}")
+    for name, (query, params) in QUERIES.items():
+        method = getattr(engine, query.__name__)
+        if method(*params) != query(mydb, *params):
+            print(f"WARNING: {name} results differ")
+        sql_ms = median_ms(lambda: query(mydb, *params), args.repeat)
+        # The first call fills the per-year counts; time the warm path
+        numpy_ms = median_ms(lambda: method(*params), args.repeat)
+        print(f"{name:<42} {sql_ms:10.2f} {numpy_ms:10.3f} {sql_ms / numpy_ms:7.0f}x")
+
+    # End the read transaction of the queries, which refresh() refuses
+    mydb.rollback()
+    start = time.perf_counter()
+    engine.refresh(mydb)
+    print(f"\nempty refresh: {(time.perf_counter() - start) * 1000:.1f} ms")
+    mydb.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Benchmark: YEAR(column) BETWEEN filters vs half-open date ranges.
+
+For each of the four year-range queries this prints the EXPLAIN plan of the
+old YEAR()-based statement and of the new range statement, then times both.
+Run it against a database with the indexes of
+db_files/migrations/001_date_range_indexes.sql.
+
+Usage:
+    python benchmarks/bench_date_ranges.py --populate 10000000
+    python benchmarks/bench_date_ranges.py --repeat 20
+
+--populate clears the database and imports a synthetic dataset with that many
+ratings first (see bench_import.py; needs local_infile and wide id columns).
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import mysql.connector
+
+# Ensure music_db.py (project root) is importable when running from benchmarks/
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db import _year_bounds
+from bench_import import DB_CONFIG, make_dataset
+
+YEARS = (2016, 2018)
+
+# (name, old statement, new statement, old params, new params)
+QUERIES = [
+    (
+        "get_most_prolific_individual_artists",
+        """
+        SELECT a.artist_name, COUNT(*) as num_singles
+        FROM Songs s JOIN Artists a ON s.artist_id = a.artist_id
+        WHERE s.album_id IS NULL AND YEAR(s.release_date) BETWEEN %s AND %s
+        GROUP BY a.artist_id, a.artist_name
+        ORDER BY num_singles DESC, a.artist_name ASC LIMIT 10
+        """,
+        """
+        SELECT a.artist_name, COUNT(*) as num_singles
+        FROM Songs s JOIN Artists a ON s.artist_id = a.artist_id
+        WHERE s.album_id IS NULL
+          AND s.release_date >= %s AND s.release_date < %s
+        GROUP BY a.artist_id, a.artist_name
+        ORDER BY num_singles DESC, a.artist_name ASC LIMIT 10
+        """,
+        YEARS,
+        _year_bounds(*YEARS),
+    ),
+    (
+        "get_artists_last_single_in_year",
+        """
+        SELECT a.artist_name FROM Artists a
+        WHERE EXISTS (
+            SELECT 1 FROM Songs s WHERE s.artist_id = a.artist_id
+              AND s.album_id IS NULL AND YEAR(s.release_date) = %s)
+        AND NOT EXISTS (
+            SELECT 1 FROM Songs s2 WHERE s2.artist_id = a.artist_id
+              AND s2.album_id IS NULL AND YEAR(s2.release_date) > %s)
+        """,
+        """
+        SELECT a.artist_name FROM Artists a
+        WHERE EXISTS (
+            SELECT 1 FROM Songs s WHERE s.artist_id = a.artist_id
+              AND s.album_id IS NULL
+              AND s.release_date >= %s AND s.release_date < %s)
+        AND NOT EXISTS (
+            SELECT 1 FROM Songs s2 WHERE s2.artist_id = a.artist_id
+              AND s2.album_id IS NULL AND s2.release_date >= %s)
+        """,
+        (YEARS[1], YEARS[1]),
+        _year_bounds(YEARS[1], YEARS[1]) + _year_bounds(YEARS[1], YEARS[1])[1:],
+    ),
+    (
+        "get_most_rated_songs",
+        """
+        SELECT s.song_title, a.artist_name, COUNT(*) as num_ratings
+        FROM Ratings r JOIN Songs s ON r.song_id = s.song_id
+        JOIN Artists a ON s.artist_id = a.artist_id
+        WHERE YEAR(r.rating_date) BETWEEN %s AND %s
+        GROUP BY s.song_id, s.song_title, a.artist_name
+        ORDER BY num_ratings DESC, s.song_title ASC LIMIT 10
+        """,
+        """
+        SELECT s.song_title, a.artist_name, COUNT(*) as num_ratings
+        FROM Ratings r JOIN Songs s ON r.song_id = s.song_id
+        JOIN Artists a ON s.artist_id = a.artist_id
+        WHERE r.rating_date >= %s AND r.rating_date < %s
+        GROUP BY s.song_id, s.song_title, a.artist_name
+        ORDER BY num_ratings DESC, s.song_title ASC LIMIT 10
+        """,
+        YEARS,
+        _year_bounds(*YEARS),
+    ),
+    (
+        "get_most_engaged_users",
+        """
+        SELECT u.user_name, COUNT(*) as num_ratings
+        FROM Ratings r JOIN Users u ON r.user_id = u.user_id
+        WHERE YEAR(r.rating_date) BETWEEN %s AND %s
+        GROUP BY u.user_id, u.user_name
+        ORDER BY num_ratings DESC, u.user_name ASC LIMIT 10
+        """,
+        """
+        SELECT u.user_name, COUNT(*) as num_ratings
+        FROM Ratings r JOIN Users u ON r.user_id = u.user_id
+        WHERE r.rating_date >= %s AND r.rating_date < %s
+        GROUP BY u.user_id, u.user_name
+        ORDER BY num_ratings DESC, u.user_name ASC LIMIT 10
+        """,
+        YEARS,
+        _year_bounds(*YEARS),
+    ),
+]
+
+
+def explain(cursor, sql, params):
+    """Print the EXPLAIN plan of a statement"""
+    cursor.execute("EXPLAIN FORMAT=TREE " + sql, params)
+    for (plan,) in cursor.fetchall():
+        print("    " + plan.replace("\n", "\n    "))
+
+
+def time_statement(cursor, sql, params, repeat):
+    """Median wall-clock time of a statement, in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--populate", type=int, default=0, metavar="RATINGS")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    mydb = mysql.connector.connect(**DB_CONFIG)
+    if args.populate:
+        singles, users, ratings = make_dataset(args.populate)
+        clear_database(mydb)
+        import_single_songs(mydb, singles)
+        import_users(mydb, users)
+        import_song_ratings(mydb, ratings)
+
+    cursor = mydb.cursor()
+    cursor.execute("ANALYZE TABLE Songs, Ratings")
+    cursor.fetchall()
+
+    for name, old_sql, new_sql, old_params, new_params in QUERIES:
+        print(f"\n{name}")
+        print("  before (YEAR() BETWEEN):")
+        explain(cursor, old_sql, old_params)
+        print("  after (date range):")
+        explain(cursor, new_sql, new_params)
+
+        before = time_statement(cursor, old_sql, old_params, args.repeat)
+        after = time_statement(cursor, new_sql, new_params, args.repeat)
+        print(
+            f"  median: before {before:9.2f} ms, after {after:9.2f} ms "
+            f"({before / after:5.1f}x)"
+        )
+
+    cursor.close()
+    mydb.close()
+
+
+if __name__ == "__main__":
+    main()
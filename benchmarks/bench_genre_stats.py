@@ -0,0 +1,159 @@
+"""
+Benchmark: get_top_song_genres over SongGenres vs over GenreStats.
+
+The old query counts the songs of every genre in SongGenres on every call;
+the new one reads at most n rows of GenreStats along its rank index. The
+script also reports how long populating SongGenres took, which includes the
+cost of the GenreStats triggers on the write path.
+
+Usage:
+    python benchmarks/bench_genre_stats.py --populate 5000000
+    python benchmarks/bench_genre_stats.py --repeat 50
+
+--populate clears the database and generates that many singles server-side,
+each with one or two of --genres genres (needs wide id columns).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import mysql.connector
+
+# Ensure music_db.py (project root) is importable when running from benchmarks/
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from bench_date_ranges import explain, time_statement
+from bench_import import DB_CONFIG
+
+NUM_ARTISTS = 1000
+BATCH = 100000
+TOP_N = 10
+
+OLD_SQL = """
+    SELECT g.genre_name, COUNT(DISTINCT sg.song_id) as num_songs
+    FROM Genres g
+    JOIN SongGenres sg ON g.genre_id = sg.genre_id
+    GROUP BY g.genre_id, g.genre_name
+    ORDER BY num_songs DESC, g.genre_name ASC
+    LIMIT %s
+"""
+
+NEW_SQL = """
+    SELECT genre_name, num_songs
+    FROM GenreStats
+    WHERE num_songs > 0
+    ORDER BY num_songs DESC, genre_name ASC
+    LIMIT %s
+"""
+
+
+def populate(mydb, num_songs, num_genres):
+    """
+    Generate num_songs singles with INSERT ... SELECT over a recursive CTE.
+    Returns the seconds spent filling Songs and SongGenres.
+    """
+    clear_database(mydb)
+    cursor = mydb.cursor()
+    cursor.execute("SET SESSION cte_max_recursion_depth = %s", (BATCH,))
+    cursor.executemany(
+        "INSERT INTO Artists (artist_name) VALUES (%s)",
+        [(f"Artist {i}",) for i in range(NUM_ARTISTS)],
+    )
+    cursor.executemany(
+        "INSERT INTO Genres (genre_name) VALUES (%s)",
+        [(f"Genre {i:03d}",) for i in range(num_genres)],
+    )
+    cursor.execute("SELECT MIN(artist_id) FROM Artists")
+    first_artist = cursor.fetchone()[0]
+    cursor.execute("SELECT MIN(genre_id) FROM Genres")
+    first_genre = cursor.fetchone()[0]
+    mydb.commit()
+
+    start = time.perf_counter()
+    for offset in range(0, num_songs, BATCH):
+        size = min(BATCH, num_songs - offset)
+        cursor.execute("SELECT COALESCE(MAX(song_id), 0) FROM Songs")
+        last_song = cursor.fetchone()[0]
+        cursor.execute(
+            """
+            INSERT INTO Songs (song_title, artist_id, album_id, release_date)
+            WITH RECURSIVE seq (n) AS (
+                SELECT 0 UNION ALL SELECT n + 1 FROM seq WHERE n + 1 < %s
+            )
+            SELECT CONCAT('Song ', %s + n), %s + (%s + n) %% %s, NULL,
+                   DATE '2000-01-01' + INTERVAL (%s + n) %% 7300 DAY
+            FROM seq
+        """,
+            (size, offset, first_artist, offset, NUM_ARTISTS, offset),
+        )
+        # Every song gets a skewed primary genre and half of them a second
+        # one; the triggers update GenreStats for each row
+        cursor.execute(
+            """
+            INSERT IGNORE INTO SongGenres (song_id, genre_id)
+            SELECT song_id, %s + FLOOR(POW(RAND(song_id), 2) * %s)
+            FROM Songs WHERE song_id > %s
+            UNION ALL
+            SELECT song_id, %s + song_id %% %s
+            FROM Songs WHERE song_id > %s AND song_id %% 2 = 0
+        """,
+            (first_genre, num_genres, last_song, first_genre, num_genres, last_song),
+        )
+        mydb.commit()
+        print(f"\r  {offset + size}/{num_songs} songs", end="", flush=True)
+    print()
+    cursor.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--populate", type=int, default=0, metavar="SONGS")
+    parser.add_argument("--genres", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    mydb = mysql.connector.connect(**DB_CONFIG)
+    if args.populate:
+        elapsed = populate(mydb, args.populate, args.genres)
+        print(
+            f"populated {args.populate} songs in {elapsed:.1f} s "
+            f"({elapsed / args.populate * 1e6:.1f} us per song, triggers included)"
+        )
+
+    cursor = mydb.cursor()
+    cursor.execute("ANALYZE TABLE SongGenres, GenreStats")
+    cursor.fetchall()
+
+    cursor.execute(OLD_SQL, (TOP_N,))
+    old_rows = cursor.fetchall()
+    cursor.execute(NEW_SQL, (TOP_N,))
+    new_rows = cursor.fetchall()
+    if old_rows != new_rows:
+        print("WARNING: results differ; run music_db_rollups.py check genre_stats")
+
+    print("\nget_top_song_genres")
+    print("  before (COUNT over SongGenres):")
+    explain(cursor, OLD_SQL, (TOP_N,))
+    print("  after (GenreStats):")
+    explain(cursor, NEW_SQL, (TOP_N,))
+
+    before = time_statement(cursor, OLD_SQL, (TOP_N,), args.repeat)
+    after = time_statement(cursor, NEW_SQL, (TOP_N,), args.repeat)
+    print(
+        f"  median: before {before:9.2f} ms, after {after:9.3f} ms "
+        f"({before / after:7.1f}x)"
+    )
+
+    cursor.close()
+    mydb.close()
+
+
+if __name__ == "__main__":
+    main()
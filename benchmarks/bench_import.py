@@ -0,0 +1,147 @@
+"""
+Benchmark: tuple loaders (load_*) vs LOAD DATA LOCAL INFILE imports (import_*).
+
+Every path starts from an empty database. For each kind of input the script
+times the tuple loader, the import from the same tuples (written to a
+temporary buffer file) and the import from a file written beforehand.
+
+Usage:
+    python benchmarks/bench_import.py --rows 1000000
+
+--rows is the number of ratings; the catalog is sized so that every rating is
+a distinct (user, song) pair. The server must have local_infile enabled.
+Databases created from an older schema.sql have SMALLINT ids, which cap every
+table at 32,767 rows; widen them with music_db_migrate.py first.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import mysql.connector
+
+# Ensure music_db.py (project root) is importable when running from benchmarks/
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+
+# Database configuration - UPDATE THESE VALUES
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "root",  # Change this to your MySQL password
+    "database": "musicdb",  # Change this to your database name
+    "allow_local_infile": True,
+}
+
+GENRES = ["Pop", "Rock", "Jazz", "Hip Hop", "Soul", "Funk", "Metal", "Folk"]
+
+
+def make_dataset(num_ratings):
+    """Build singles, users and ratings so that all ratings are valid pairs"""
+    side = max(1, int(num_ratings**0.5))
+    num_songs = side
+    num_users = -(-num_ratings // side)
+
+    singles = [
+        (
+            f"Song {i}",
+            (GENRES[i % len(GENRES)], GENRES[(i * 7 + 3) % len(GENRES)]),
+            f"Artist {i % max(1, num_songs // 10)}",
+            f"{1990 + i % 30}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+        )
+        for i in range(num_songs)
+    ]
+    # Both genres of a song must differ, like real input
+    singles = [
+        (title, tuple(dict.fromkeys(genres)), artist, date)
+        for title, genres, artist, date in singles
+    ]
+    users = [f"user_{u}" for u in range(num_users)]
+    ratings = []
+    for r in range(num_ratings):
+        user = users[r // num_songs]
+        title, _, artist, _ = singles[r % num_songs]
+        ratings.append(
+            (user, (artist, title), 1 + r % 5, f"{2015 + r % 7}-{1 + r % 12:02d}-15")
+        )
+    return singles, users, ratings
+
+
+def timed(label, fn, rows, results):
+    """Run fn and record its wall-clock time"""
+    start = time.perf_counter()
+    rejected = fn()
+    elapsed = time.perf_counter() - start
+    results.append((label, rows, elapsed, len(rejected)))
+    print(f"  {label:<40} {elapsed:9.2f}s  {rows / elapsed:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    singles, users, ratings = make_dataset(args.rows)
+    print(
+        f"Dataset: {len(singles):,} singles, {len(users):,} users, "
+        f"{len(ratings):,} ratings"
+    )
+
+    tmpdir = tempfile.mkdtemp()
+    files = {
+        "singles": os.path.join(tmpdir, "singles.csv"),
+        "users": os.path.join(tmpdir, "users.csv"),
+        "ratings": os.path.join(tmpdir, "ratings.csv"),
+    }
+    write_import_file(files["singles"], "singles", singles)
+    write_import_file(files["users"], "users", users)
+    write_import_file(files["ratings"], "ratings", ratings)
+
+    mydb = mysql.connector.connect(**DB_CONFIG)
+    results = []
+
+    paths = {
+        "load_*": (
+            lambda: load_single_songs(mydb, singles),
+            lambda: load_users(mydb, users),
+            lambda: load_song_ratings(mydb, ratings),
+        ),
+        "import_* (tuples)": (
+            lambda: import_single_songs(mydb, singles),
+            lambda: import_users(mydb, users),
+            lambda: import_song_ratings(mydb, ratings),
+        ),
+        "import_* (file)": (
+            lambda: import_single_songs(mydb, files["singles"]),
+            lambda: import_users(mydb, files["users"]),
+            lambda: import_song_ratings(mydb, files["ratings"]),
+        ),
+    }
+
+    for path, (load_singles, load_user_names, load_ratings) in paths.items():
+        print(f"\n{path}")
+        clear_database(mydb)
+        timed(f"{path} singles", load_singles, len(singles), results)
+        timed(f"{path} users", load_user_names, len(users), results)
+        timed(f"{path} ratings", load_ratings, len(ratings), results)
+
+    mydb.close()
+    for path in files.values():
+        os.remove(path)
+    os.rmdir(tmpdir)
+
+    print("\nSpeedup over load_*:")
+    baseline = {label.split(" ")[-1]: elapsed for label, _, elapsed, _ in results[:3]}
+    for label, _, elapsed, _ in results[3:]:
+        kind = label.split(" ")[-1]
+        print(f"  {label:<40} {baseline[kind] / elapsed:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: parallel_load_single_songs/parallel_load_albums from 1 to 16 workers.
+
+Every run starts from an empty database and loads the same singles and
+albums; the serial load_* functions are timed first as the baseline.
+
+Usage:
+    python benchmarks/bench_parallel.py --singles 200000 --albums 20000
+    python benchmarks/bench_parallel.py --workers 1 2 4 8 16
+
+The catalog needs more rows than SMALLINT ids allow; widen old databases
+with music_db_migrate.py first.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import mysql.connector
+
+# Ensure music_db.py (project root) is importable when running from benchmarks/
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db_parallel import parallel_load_albums, parallel_load_single_songs
+from bench_import import DB_CONFIG, GENRES
+
+SONGS_PER_ARTIST = 10
+TRACKS_PER_ALBUM = 10
+
+
+def make_catalog(num_singles, num_albums):
+    """Singles and albums spread over many artists, with a few duplicates"""
+    singles = [
+        (
+            f"Song {i}",
+            (GENRES[i % len(GENRES)],),
+            f"Artist {i // SONGS_PER_ARTIST}",
+            f"{1990 + i % 30}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+        )
+        for i in range(num_singles)
+    ]
+    # Every 100th single repeats an earlier one and is rejected
+    singles += singles[::100]
+    albums = [
+        (
+            f"Album {i}",
+            GENRES[i % len(GENRES)],
+            f"Album Artist {i // 2}",
+            f"{1990 + i % 30}-06-01",
+            [f"Track {i}.{t}" for t in range(TRACKS_PER_ALBUM)],
+        )
+        for i in range(num_albums)
+    ]
+    return singles, albums
+
+
+def timed(label, fn, rows, baseline=None):
+    """Run fn on an empty database and print its throughput"""
+    mydb = mysql.connector.connect(**DB_CONFIG)
+    clear_database(mydb)
+    mydb.close()
+
+    start = time.perf_counter()
+    rejected = fn()
+    elapsed = time.perf_counter() - start
+    speedup = f"{baseline / elapsed:6.2f}x" if baseline else ""
+    print(
+        f"  {label:<28} {elapsed:9.2f}s  {rows / elapsed:12,.0f} rows/s  "
+        f"{len(rejected):6} rejects  {speedup}"
+    )
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--singles", type=int, default=200_000)
+    parser.add_argument("--albums", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    singles, albums = make_catalog(args.singles, args.albums)
+    print(f"Dataset: {len(singles):,} singles, {len(albums):,} albums")
+
+    mydb = mysql.connector.connect(**DB_CONFIG)
+    for name, rows, serial, parallel in (
+        ("singles", singles, load_single_songs, parallel_load_single_songs),
+        ("albums", albums, load_albums, parallel_load_albums),
+    ):
+        print(f"\n{name}")
+        baseline = timed(
+            "serial",
+            lambda: serial(mydb, rows, chunk_size=args.chunk_size),
+            len(rows),
+        )
+        for workers in args.workers:
+            timed(
+                f"{workers} workers",
+                lambda: parallel(
+                    DB_CONFIG, rows, workers=workers, chunk_size=args.chunk_size
+                ),
+                len(rows),
+                baseline,
+            )
+    mydb.close()
+
+
+if __name__ == "__main__":
+    main()
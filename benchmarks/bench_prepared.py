@@ -0,0 +1,158 @@
+"""
+Benchmark: text protocol vs per-connection prepared statements.
+
+load_song_ratings and the leaderboard queries are run on a connection
+without and with enable_prepared_statements(). Every function gets its
+time (seconds for the load, the median per call in ms for queries) and, on
+MySQL, the statements the server parsed: every text statement, and every
+COM_STMT_PREPARE, but not the COM_STMT_EXECUTEs of prepared statements.
+The session counters used for this are read around each measurement.
+
+Usage:
+    python benchmarks/bench_prepared.py --ratings 200000 --chunk-size 1000
+    python benchmarks/bench_prepared.py --backend sqlite-memory --repeat 50
+
+On SQLite, sqlite3 already caches compiled statements per connection; both
+modes run for comparison, without parse counts.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Ensure music_db.py (project root) is importable when running from benchmarks/
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db_workload import Workload
+from bench_sqlite import BACKENDS, connect, median_ms
+
+YEARS = (2016, 2020)
+
+# name -> (function, arguments after the connection)
+LEADERBOARDS = {
+    "get_most_rated_songs": (get_most_rated_songs, (YEARS, 10)),
+    "get_most_rated_songs_between": (
+        get_most_rated_songs_between,
+        ("2016-03-01", "2020-02-28", 10),
+    ),
+    "get_most_engaged_users": (get_most_engaged_users, (YEARS, 10)),
+    "get_most_engaged_users_between": (
+        get_most_engaged_users_between,
+        ("2016-03-01", "2020-02-28", 10),
+    ),
+    "get_top_song_genres": (get_top_song_genres, (10,)),
+    "get_most_prolific_individual_artists": (
+        get_most_prolific_individual_artists,
+        (10, YEARS),
+    ),
+}
+
+MODES = ["text", "prepared"]
+
+STATUS_SQL = """
+    SHOW SESSION STATUS
+    WHERE Variable_name IN ('Questions', 'Com_stmt_execute', 'Com_stmt_prepare')
+"""
+
+
+def parsed_statements(mydb):
+    """
+    Statements the server has parsed in this session, or None on SQLite.
+    Questions counts text statements and COM_STMT_EXECUTEs, not prepares.
+    """
+    if not hasattr(mydb, "connection_id"):
+        return None
+    cursor = mydb.cursor()
+    cursor.execute(STATUS_SQL)
+    status = {name: int(value) for name, value in cursor.fetchall()}
+    cursor.close()
+    return status["Questions"] - status["Com_stmt_execute"] + status["Com_stmt_prepare"]
+
+
+def measure(mydb, fn):
+    """Run fn() and return its result and the statements parsed meanwhile"""
+    before = parsed_statements(mydb)
+    result = fn()
+    after = parsed_statements(mydb)
+    # The SHOW STATUS of the second reading is counted as well
+    parsed = None if before is None else after - before - 1
+    return result, parsed
+
+
+def run_mode(mydb, workload, prepared, chunk_size, repeat):
+    """Rows of (function, time, parsed statements) and the query results"""
+    if prepared:
+        enable_prepared_statements(mydb)
+    else:
+        disable_prepared_statements(mydb)
+    clear_database(mydb)
+    load_single_songs(mydb, workload.singles(), chunk_size)
+    load_albums(mydb, workload.albums(), chunk_size)
+    load_users(mydb, workload.users(), chunk_size)
+
+    rows = []
+    ratings = list(workload.ratings())
+    start = time.perf_counter()
+    _, parsed = measure(mydb, lambda: load_song_ratings(mydb, ratings, chunk_size))
+    rows.append(("load_song_ratings", time.perf_counter() - start, "s", parsed))
+
+    results = {}
+    for name, (query, params) in LEADERBOARDS.items():
+        results[name], parsed = measure(mydb, lambda: query(mydb, *params))
+        elapsed = median_ms(lambda: query(mydb, *params), repeat)
+        rows.append((name, elapsed, "ms", parsed))
+    return rows, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--ratings", type=int, default=200_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=BACKENDS, default="mysql")
+    parser.add_argument("--directory", default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    workload = Workload(args.ratings, seed=args.seed)
+    mydb = connect(args.backend, args.directory)
+    try:
+        runs = {}
+        for mode in MODES:
+            print(f"running {mode}...")
+            runs[mode] = run_mode(
+                mydb, workload, mode == "prepared", args.chunk_size, args.repeat
+            )
+    finally:
+        disable_prepared_statements(mydb)
+        mydb.close()
+
+    (text, text_results), (prepared, prepared_results) = runs["text"], runs["prepared"]
+    for name in LEADERBOARDS:
+        if text_results[name] != prepared_results[name]:
+            print(f"WARNING: {name} differs between text and prepared statements")
+
+    print(
+        f"\n{'function':<38}{'text':>12}{'prepared':>12}{'speedup':>9}"
+        f"{'parsed text':>13}{'parsed prep':>13}"
+    )
+    for (name, before, unit, parsed_before), (_, after, _, parsed_after) in zip(
+        text, prepared
+    ):
+        parsed = ""
+        if parsed_before is not None:
+            parsed = f"{parsed_before:13,}{parsed_after:13,}"
+        print(
+            f"{name:<38}{before:10.3f}{unit:>2}{after:10.3f}{unit:>2}"
+            f"{before / after:8.2f}x{parsed}"
+        )
+
+
+if __name__ == "__main__":
+    main()
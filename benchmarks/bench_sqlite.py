@@ -0,0 +1,184 @@
+"""
+Benchmark: every music_db function on MySQL and on SQLite (in-memory, on-disk, WAL).
+
+Each backend starts from an empty database, loads the same catalog with the
+load_* functions, times every query, rollup rebuild and check, then loads it
+again from the empty database with the import_* functions. Query results are
+compared with the first backend's.
+
+Usage:
+    python benchmarks/bench_sqlite.py --rows 200000
+    python benchmarks/bench_sqlite.py --backends sqlite-memory sqlite-wal
+
+--rows is the number of ratings (see bench_import.py). On-disk databases are
+written to --directory. MySQL needs local_infile enabled for import_*.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import mysql.connector
+
+# Ensure music_db.py (project root) is importable when running from benchmarks/
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+import music_db_sqlite
+from bench_import import DB_CONFIG, make_dataset
+
+BACKENDS = ["mysql", "sqlite-memory", "sqlite-disk", "sqlite-wal"]
+
+YEARS = (2016, 2018)
+
+# name -> (function, arguments after the connection)
+QUERIES = {
+    "get_most_prolific_individual_artists": (
+        get_most_prolific_individual_artists,
+        (10, YEARS),
+    ),
+    "get_most_prolific_individual_artists_between": (
+        get_most_prolific_individual_artists_between,
+        (10, "2016-03-01", "2018-02-28"),
+    ),
+    "get_artists_last_single_in_year": (get_artists_last_single_in_year, (2018,)),
+    "get_top_song_genres": (get_top_song_genres, (10,)),
+    "get_album_and_single_artists": (get_album_and_single_artists, ()),
+    "get_most_rated_songs": (get_most_rated_songs, (YEARS, 10)),
+    "get_most_rated_songs_between": (
+        get_most_rated_songs_between,
+        ("2016-03-01", "2018-02-28", 10),
+    ),
+    "get_most_engaged_users": (get_most_engaged_users, (YEARS, 10)),
+    "get_most_engaged_users_between": (
+        get_most_engaged_users_between,
+        ("2016-03-01", "2018-02-28", 10),
+    ),
+    "check_song_rating_counts": (check_song_rating_counts, ()),
+    "check_genre_stats": (check_genre_stats, ()),
+    "check_artist_singles": (check_artist_singles, ()),
+}
+
+REBUILDS = [rebuild_song_rating_counts, rebuild_genre_stats, rebuild_artist_singles]
+
+
+def make_albums(num_albums):
+    """Albums of their own artists, so that some artists have both kinds"""
+    return [
+        (
+            f"Album {i}",
+            "Pop",
+            f"Artist {i}",
+            f"{1990 + i % 30}-06-01",
+            [f"Album {i} Track {t}" for t in range(10)],
+        )
+        for i in range(num_albums)
+    ]
+
+
+def connect(backend, directory):
+    """Open the backend's database; SQLite files are created anew"""
+    if backend == "mysql":
+        return mysql.connector.connect(**DB_CONFIG)
+    if backend == "sqlite-memory":
+        return music_db_sqlite.connect(":memory:")
+    path = os.path.join(directory, f"{backend}.sqlite")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    journal_mode = "WAL" if backend == "sqlite-wal" else "DELETE"
+    return music_db_sqlite.connect(path, journal_mode=journal_mode)
+
+
+def median_ms(fn, repeat):
+    """Median wall-clock time of fn(), in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def seconds(fn):
+    """Wall-clock time of fn(), in seconds"""
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_backend(mydb, dataset, repeat):
+    """Times (seconds for loads and rebuilds, ms for queries) and query results"""
+    singles, albums, users, ratings = dataset
+    times = {}
+    results = {}
+
+    clear_database(mydb)
+    times["load_single_songs"] = seconds(lambda: load_single_songs(mydb, singles))
+    times["load_albums"] = seconds(lambda: load_albums(mydb, albums))
+    times["load_users"] = seconds(lambda: load_users(mydb, users))
+    times["load_song_ratings"] = seconds(lambda: load_song_ratings(mydb, ratings))
+
+    for name, (query, params) in QUERIES.items():
+        results[name] = query(mydb, *params)
+        times[name] = median_ms(lambda: query(mydb, *params), repeat)
+    for rebuild in REBUILDS:
+        times[rebuild.__name__] = seconds(lambda: rebuild(mydb))
+
+    times["clear_database"] = seconds(lambda: clear_database(mydb))
+    times["import_single_songs"] = seconds(lambda: import_single_songs(mydb, singles))
+    times["import_albums"] = seconds(lambda: import_albums(mydb, albums))
+    times["import_users"] = seconds(lambda: import_users(mydb, users))
+    times["import_song_ratings"] = seconds(lambda: import_song_ratings(mydb, ratings))
+    return times, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--albums", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    parser.add_argument("--directory", default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    singles, users, ratings = make_dataset(args.rows)
+    dataset = (singles, make_albums(args.albums), users, ratings)
+    print(
+        f"Dataset: {len(singles):,} singles, {args.albums:,} albums, "
+        f"{len(users):,} users, {len(ratings):,} ratings"
+    )
+
+    all_times = {}
+    reference = None
+    for backend in args.backends:
+        print(f"running {backend}...")
+        mydb = connect(backend, args.directory)
+        try:
+            times, results = run_backend(mydb, dataset, args.repeat)
+        finally:
+            mydb.close()
+        all_times[backend] = times
+        if reference is None:
+            reference = (backend, results)
+        for name, result in results.items():
+            if result != reference[1][name]:
+                print(f"WARNING: {name} differs between {reference[0]} and {backend}")
+
+    backends = list(all_times)
+    header = f"\n{'function':<46}" + "".join(f"{b:>15}" for b in backends)
+    print(header)
+    for name in all_times[backends[0]]:
+        unit = "ms" if name in QUERIES else "s"
+        cells = "".join(f"{all_times[b][name]:13.2f}{unit:>2}" for b in backends)
+        print(f"{name:<46}{cells}")
+
+
+if __name__ == "__main__":
+    main()
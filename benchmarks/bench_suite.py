@@ -0,0 +1,347 @@
+"""
+Benchmark suite: the 11 public music_db functions at several data scales.
+
+For every scale (number of ratings; the catalog and users grow with its
+square root, see bench_import.make_dataset) the database is emptied, loaded
+with the four loaders, queried with the six get_* functions and emptied
+again with clear_database. Every function gets:
+
+    seconds, throughput   rows/s for loaders and clear_database, calls/s
+                          for queries
+    p50/p95/p99 latency   per committed chunk for loaders (--chunk-size),
+                          per call for queries (--repeat calls)
+    round trips           statements and commits sent, per call
+    peak memory           peak Python allocations during the call, traced
+                          with tracemalloc in one extra call for queries and
+                          during the (slower) timed call for loaders; turn
+                          it off with --no-memory
+
+Results are written as JSON. --compare flags the functions whose p50 latency
+or round trips grew past --threshold against a stored run (latencies also
+by more than --min-ms), and exits with status 1 if any did.
+
+Usage:
+    python benchmarks/bench_suite.py --scales 1000 10000 100000 --output base.json
+    python benchmarks/bench_suite.py --scales 1000 10000 100000 --compare base.json
+    python benchmarks/bench_suite.py --backend mysql --scales 1000000 10000000
+    python benchmarks/bench_suite.py --current new.json --compare base.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# Ensure music_db.py (project root) is importable when running from benchmarks/
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from bench_import import make_dataset
+from bench_sqlite import BACKENDS, connect, make_albums
+
+YEARS = (2016, 2018)
+
+# name -> (function, arguments after the connection)
+QUERIES = {
+    "get_most_prolific_individual_artists": (
+        get_most_prolific_individual_artists,
+        (10, YEARS),
+    ),
+    "get_artists_last_single_in_year": (get_artists_last_single_in_year, (2018,)),
+    "get_top_song_genres": (get_top_song_genres, (10,)),
+    "get_album_and_single_artists": (get_album_and_single_artists, ()),
+    "get_most_rated_songs": (get_most_rated_songs, (YEARS, 10)),
+    "get_most_engaged_users": (get_most_engaged_users, (YEARS, 10)),
+}
+
+LOADERS = {
+    "load_single_songs": (load_single_songs, "singles"),
+    "load_albums": (load_albums, "albums"),
+    "load_users": (load_users, "users"),
+    "load_song_ratings": (load_song_ratings, "ratings"),
+}
+
+# Relative growth of p50 latency or round trips reported as a regression
+DEFAULT_THRESHOLD = 0.10
+
+# Smaller p50 growth, in milliseconds, is timer noise and never reported
+DEFAULT_MIN_MS = 0.05
+
+
+class CountingConnection:
+    """Connection proxy counting the statements and commits it sends"""
+
+    def __init__(self, mydb):
+        self._mydb = mydb
+        self.round_trips = 0
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self, self._mydb.cursor(*args, **kwargs))
+
+    def commit(self):
+        self.round_trips += 1
+        self._mydb.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._mydb, name)
+
+
+class CountingCursor:
+    """Cursor proxy counting execute and executemany calls"""
+
+    def __init__(self, connection, cursor):
+        self._connection = connection
+        self._cursor = cursor
+
+    def execute(self, *args, **kwargs):
+        self._connection.round_trips += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._connection.round_trips += 1
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def percentiles(samples):
+    """p50, p95 and p99 of a list of seconds, in milliseconds"""
+    if len(samples) == 1:
+        return {p: samples[0] * 1000 for p in ("p50_ms", "p95_ms", "p99_ms")}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
+
+
+def measure(mydb, fn, memory):
+    """
+    Run fn(mydb); return its result, seconds, round trips and, if memory,
+    the peak bytes it allocated.
+    """
+    before = mydb.round_trips
+    if memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = fn(mydb)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return result, elapsed, mydb.round_trips - before, peak
+
+
+def bench_loader(mydb, loader, rows, chunk_size, memory):
+    """Load rows, timing every committed chunk through on_rejects"""
+    marks = []
+
+    def load(mydb):
+        marks.append(time.perf_counter())
+        return loader(
+            mydb,
+            rows,
+            chunk_size=chunk_size,
+            on_rejects=lambda rejects: marks.append(time.perf_counter()),
+        )
+
+    rejected, elapsed, round_trips, peak = measure(mydb, load, memory)
+    chunks = [b - a for a, b in zip(marks, marks[1:])] or [elapsed]
+    return {
+        "rows": len(rows),
+        "rejected": len(rejected),
+        "seconds": elapsed,
+        "throughput": len(rows) / elapsed,
+        "unit": "rows/s",
+        "calls": len(chunks),
+        **percentiles(chunks),
+        "round_trips": round_trips,
+        "peak_bytes": peak,
+    }
+
+
+def bench_query(mydb, query, params, repeat, memory):
+    """Call a query repeat times after a warm-up call that traces memory"""
+    call = lambda mydb: query(mydb, *params)
+    peak = measure(mydb, call, memory)[3]
+    samples = []
+    round_trips = 0
+    for _ in range(repeat):
+        _, elapsed, trips, _ = measure(mydb, call, False)
+        samples.append(elapsed)
+        round_trips += trips
+    return {
+        "seconds": sum(samples),
+        "throughput": repeat / sum(samples),
+        "unit": "calls/s",
+        "calls": repeat,
+        **percentiles(samples),
+        "round_trips": round_trips / repeat,
+        "peak_bytes": peak,
+    }
+
+
+def bench_clear(mydb, rows, memory):
+    """Time clear_database on a loaded database"""
+    _, elapsed, round_trips, peak = measure(mydb, clear_database, memory)
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "throughput": rows / elapsed,
+        "unit": "rows/s",
+        "calls": 1,
+        **percentiles([elapsed]),
+        "round_trips": round_trips,
+        "peak_bytes": peak,
+    }
+
+
+def run_scale(mydb, scale, args):
+    """Results of every function for one data scale"""
+    singles, users, ratings = make_dataset(scale)
+    data = {
+        "singles": singles,
+        "albums": make_albums(max(1, scale // 100)),
+        "users": users,
+        "ratings": ratings,
+    }
+    clear_database(mydb)
+
+    results = {}
+    for name, (loader, kind) in LOADERS.items():
+        results[name] = bench_loader(
+            mydb, loader, data[kind], args.chunk_size, args.memory
+        )
+    for name, (query, params) in QUERIES.items():
+        results[name] = bench_query(mydb, query, params, args.repeat, args.memory)
+    loaded = sum(len(rows) for rows in data.values())
+    results["clear_database"] = bench_clear(mydb, loaded, args.memory)
+    return results
+
+
+def run(args):
+    """Run the suite and return its JSON document"""
+    mydb = CountingConnection(connect(args.backend, args.directory))
+    results = {}
+    try:
+        for scale in args.scales:
+            print(f"scale {scale:,}...", file=sys.stderr)
+            results[str(scale)] = run_scale(mydb, scale, args)
+    finally:
+        mydb.close()
+    return {
+        "meta": {
+            "backend": args.backend,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "chunk_size": args.chunk_size,
+            "memory": args.memory,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold, min_ms=DEFAULT_MIN_MS):
+    """
+    Regressions of current against baseline: (scale, function, metric,
+    baseline value, current value) for every p50 latency or round trip count
+    that grew by more than threshold, and for latencies by more than min_ms.
+    Scales or functions missing from either run are skipped.
+    """
+    regressions = []
+    for scale, functions in current["results"].items():
+        for name, result in functions.items():
+            base = baseline["results"].get(scale, {}).get(name)
+            if base is None:
+                continue
+            for metric in ("p50_ms", "round_trips"):
+                grown = result[metric] - base[metric]
+                if metric == "p50_ms" and grown <= min_ms:
+                    continue
+                if result[metric] > base[metric] * (1 + threshold):
+                    regressions.append(
+                        (scale, name, metric, base[metric], result[metric])
+                    )
+    return regressions
+
+
+def print_results(document):
+    """Print the results of a run as a table"""
+    print(
+        f"\n{'scale':>10} {'function':<38} {'throughput':>16} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'trips':>8} {'peak MiB':>9}"
+    )
+    for scale, functions in document["results"].items():
+        for name, r in functions.items():
+            peak = "" if r["peak_bytes"] is None else f"{r['peak_bytes'] / 2**20:9.1f}"
+            print(
+                f"{int(scale):>10,} {name:<38} "
+                f"{r['throughput']:>9,.0f} {r['unit']:<6} "
+                f"{r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f} "
+                f"{r['round_trips']:8.0f} {peak:>9}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite-memory")
+    parser.add_argument(
+        "--scales", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--no-memory", dest="memory", action="store_false")
+    parser.add_argument("--directory", default=tempfile.gettempdir())
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="stored JSON run")
+    parser.add_argument(
+        "--current", help="compare this stored JSON run instead of running"
+    )
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-ms", type=float, default=DEFAULT_MIN_MS)
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current, encoding="utf-8") as f:
+            document = json.load(f)
+    else:
+        document = run(args)
+        print_results(document)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, document, args.threshold, args.min_ms)
+        for scale, name, metric, before, after in regressions:
+            print(
+                f"REGRESSION scale {int(scale):,} {name} {metric}: "
+                f"{before:.3f} -> {after:.3f}"
+            )
+        if regressions:
+            sys.exit(1)
+        print(f"\nno regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
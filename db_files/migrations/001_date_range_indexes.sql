@@ -0,0 +1,15 @@
+-- Indexes for the date range filters of the get_* functions.
+-- The queries compare the date columns with half-open [start, end) bounds,
+-- which these indexes can serve as range scans.
+
+-- get_most_prolific_individual_artists: singles by release date, per artist
+CREATE INDEX idx_songs_album_date_artist ON Songs (album_id, release_date, artist_id);
+
+-- get_artists_last_single_in_year: singles of one artist by release date
+CREATE INDEX idx_songs_album_artist_date ON Songs (album_id, artist_id, release_date);
+
+-- get_most_rated_songs: ratings by date, grouped by song
+CREATE INDEX idx_ratings_date_song ON Ratings (rating_date, song_id);
+
+-- get_most_engaged_users: ratings by date, grouped by user
+CREATE INDEX idx_ratings_date_user ON Ratings (rating_date, user_id);
@@ -0,0 +1,17 @@
+-- Per-song, per-year rating counts read by get_most_rated_songs.
+-- The ratings loaders keep the table up to date; this migration creates it
+-- and fills it from the existing ratings. The id columns must already be
+-- wide (see music_db_migrate.py), since song_id has to match Songs.song_id.
+
+CREATE TABLE SongRatingCounts (
+    song_id INT UNSIGNED NOT NULL,
+    rating_year SMALLINT NOT NULL,
+    num_ratings INT UNSIGNED NOT NULL,
+    PRIMARY KEY (rating_year, song_id),
+    FOREIGN KEY (song_id) REFERENCES Songs(song_id)
+);
+
+INSERT INTO SongRatingCounts (song_id, rating_year, num_ratings)
+SELECT song_id, YEAR(rating_date), COUNT(*)
+FROM Ratings
+GROUP BY song_id, YEAR(rating_date);
@@ -0,0 +1,43 @@
+-- Per-genre song counts read by get_top_song_genres.
+-- Triggers on Genres and SongGenres keep the table current for every writer,
+-- not only the loaders. The triggers are created before the backfill, so
+-- writes made while this runs are counted; the backfill overwrites the
+-- counts with the ones it reads. Requires wide id columns (music_db_migrate.py).
+
+CREATE TABLE GenreStats (
+    genre_id INT UNSIGNED PRIMARY KEY,
+    genre_name VARCHAR(60) NOT NULL,
+    num_songs INT UNSIGNED NOT NULL DEFAULT 0,
+    INDEX idx_genre_stats_rank (num_songs DESC, genre_name),
+    FOREIGN KEY (genre_id) REFERENCES Genres(genre_id) ON DELETE CASCADE
+);
+
+CREATE TRIGGER trg_genres_insert AFTER INSERT ON Genres FOR EACH ROW
+    INSERT INTO GenreStats (genre_id, genre_name, num_songs)
+    VALUES (NEW.genre_id, NEW.genre_name, 0);
+
+CREATE TRIGGER trg_genres_update AFTER UPDATE ON Genres FOR EACH ROW
+    UPDATE GenreStats SET genre_name = NEW.genre_name
+    WHERE genre_id = NEW.genre_id;
+
+CREATE TRIGGER trg_song_genres_insert AFTER INSERT ON SongGenres FOR EACH ROW
+    UPDATE GenreStats SET num_songs = num_songs + 1
+    WHERE genre_id = NEW.genre_id;
+
+CREATE TRIGGER trg_song_genres_update AFTER UPDATE ON SongGenres FOR EACH ROW
+    UPDATE GenreStats
+    SET num_songs = num_songs + (genre_id = NEW.genre_id) - (genre_id = OLD.genre_id)
+    WHERE genre_id IN (OLD.genre_id, NEW.genre_id);
+
+CREATE TRIGGER trg_song_genres_delete AFTER DELETE ON SongGenres FOR EACH ROW
+    UPDATE GenreStats SET num_songs = num_songs - 1
+    WHERE genre_id = OLD.genre_id;
+
+INSERT INTO GenreStats (genre_id, genre_name, num_songs)
+SELECT * FROM (
+    SELECT g.genre_id, g.genre_name, COUNT(sg.song_id) AS counted
+    FROM Genres g
+    LEFT JOIN SongGenres sg ON sg.genre_id = g.genre_id
+    GROUP BY g.genre_id, g.genre_name
+) AS c
+ON DUPLICATE KEY UPDATE num_songs = c.counted;
@@ -0,0 +1,32 @@
+-- Per-artist singles timeline read by get_artists_last_single_in_year and
+-- get_most_prolific_individual_artists. The singles loaders keep both tables
+-- up to date; this migration creates them and fills them from the existing
+-- singles. Requires wide id columns (music_db_migrate.py).
+
+CREATE TABLE ArtistSinglesSummary (
+    artist_id INT UNSIGNED PRIMARY KEY,
+    last_single_date DATE NOT NULL,
+    last_single_year SMALLINT NOT NULL,
+    INDEX idx_artist_singles_last_year (last_single_year),
+    FOREIGN KEY (artist_id) REFERENCES Artists(artist_id)
+);
+
+CREATE TABLE ArtistSingleCounts (
+    artist_id INT UNSIGNED NOT NULL,
+    release_year SMALLINT NOT NULL,
+    num_singles INT UNSIGNED NOT NULL,
+    PRIMARY KEY (release_year, artist_id),
+    FOREIGN KEY (artist_id) REFERENCES Artists(artist_id)
+);
+
+INSERT INTO ArtistSingleCounts (artist_id, release_year, num_singles)
+SELECT artist_id, YEAR(release_date), COUNT(*)
+FROM Songs
+WHERE album_id IS NULL
+GROUP BY artist_id, YEAR(release_date);
+
+INSERT INTO ArtistSinglesSummary (artist_id, last_single_date, last_single_year)
+SELECT artist_id, MAX(release_date), YEAR(MAX(release_date))
+FROM Songs
+WHERE album_id IS NULL
+GROUP BY artist_id;
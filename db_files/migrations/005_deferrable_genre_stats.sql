@@ -0,0 +1,34 @@
+-- Lets a session skip the SongGenres triggers of 003_genre_stats.sql by
+-- setting @music_db_defer_genre_stats. The workers of the parallel loaders
+-- do, so concurrent chunks do not queue on the locks of the same GenreStats
+-- rows; the parent recounts the genres they wrote with rebuild_genre_stats.
+-- Writes made between the DROP and the CREATE of a trigger are not counted:
+-- on a database that is being written, run
+-- python music_db_rollups.py rebuild genre_stats afterwards.
+
+DROP TRIGGER IF EXISTS trg_song_genres_insert;
+DROP TRIGGER IF EXISTS trg_song_genres_update;
+DROP TRIGGER IF EXISTS trg_song_genres_delete;
+
+DELIMITER //
+
+CREATE TRIGGER trg_song_genres_insert AFTER INSERT ON SongGenres FOR EACH ROW
+IF @music_db_defer_genre_stats IS NULL THEN
+    UPDATE GenreStats SET num_songs = num_songs + 1
+    WHERE genre_id = NEW.genre_id;
+END IF//
+
+CREATE TRIGGER trg_song_genres_update AFTER UPDATE ON SongGenres FOR EACH ROW
+IF @music_db_defer_genre_stats IS NULL THEN
+    UPDATE GenreStats
+    SET num_songs = num_songs + (genre_id = NEW.genre_id) - (genre_id = OLD.genre_id)
+    WHERE genre_id IN (OLD.genre_id, NEW.genre_id);
+END IF//
+
+CREATE TRIGGER trg_song_genres_delete AFTER DELETE ON SongGenres FOR EACH ROW
+IF @music_db_defer_genre_stats IS NULL THEN
+    UPDATE GenreStats SET num_songs = num_songs - 1
+    WHERE genre_id = OLD.genre_id;
+END IF//
+
+DELIMITER ;
@@ -1,55 +1,126 @@
 CREATE TABLE Artists (
-    artist_id SMALLINT AUTO_INCREMENT PRIMARY KEY,
+    artist_id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
     artist_name VARCHAR(120) NOT NULL UNIQUE
 );
 
 CREATE TABLE Genres (
-    genre_id SMALLINT AUTO_INCREMENT PRIMARY KEY,
+    genre_id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
     genre_name VARCHAR(60) NOT NULL UNIQUE
 );
 
+CREATE TABLE GenreStats (
+    genre_id INT UNSIGNED PRIMARY KEY,
+    genre_name VARCHAR(60) NOT NULL,
+    num_songs INT UNSIGNED NOT NULL DEFAULT 0,
+    INDEX idx_genre_stats_rank (num_songs DESC, genre_name),
+    FOREIGN KEY (genre_id) REFERENCES Genres(genre_id) ON DELETE CASCADE
+);
+
 CREATE TABLE Users (
-    user_id SMALLINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
     user_name VARCHAR(255) NOT NULL UNIQUE
 );
 
 CREATE TABLE Albums (
-    album_id SMALLINT AUTO_INCREMENT PRIMARY KEY,
+    album_id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
     album_name VARCHAR(100) NOT NULL,
-    artist_id SMALLINT NOT NULL,
+    artist_id INT UNSIGNED NOT NULL,
     release_date DATE NOT NULL,
-    genre_id SMALLINT NOT NULL,
+    genre_id INT UNSIGNED NOT NULL,
     UNIQUE (album_name, artist_id),
     FOREIGN KEY (artist_id) REFERENCES Artists(artist_id),
     FOREIGN KEY (genre_id) REFERENCES Genres(genre_id)
 );
 
 CREATE TABLE Songs (
-    song_id SMALLINT AUTO_INCREMENT PRIMARY KEY,
+    song_id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
     song_title VARCHAR(100) NOT NULL,
-    artist_id SMALLINT NOT NULL,
-    album_id SMALLINT NULL,
+    artist_id INT UNSIGNED NOT NULL,
+    album_id INT UNSIGNED NULL,
     release_date DATE NOT NULL,
     UNIQUE (song_title, artist_id),
+    INDEX idx_songs_album_date_artist (album_id, release_date, artist_id),
+    INDEX idx_songs_album_artist_date (album_id, artist_id, release_date),
     FOREIGN KEY (artist_id) REFERENCES Artists(artist_id),
     FOREIGN KEY (album_id) REFERENCES Albums(album_id)
 );
 
+CREATE TABLE ArtistSinglesSummary (
+    artist_id INT UNSIGNED PRIMARY KEY,
+    last_single_date DATE NOT NULL,
+    last_single_year SMALLINT NOT NULL,
+    INDEX idx_artist_singles_last_year (last_single_year),
+    FOREIGN KEY (artist_id) REFERENCES Artists(artist_id)
+);
+
+CREATE TABLE ArtistSingleCounts (
+    artist_id INT UNSIGNED NOT NULL,
+    release_year SMALLINT NOT NULL,
+    num_singles INT UNSIGNED NOT NULL,
+    PRIMARY KEY (release_year, artist_id),
+    FOREIGN KEY (artist_id) REFERENCES Artists(artist_id)
+);
+
 CREATE TABLE SongGenres (
-    song_id SMALLINT NOT NULL,
-    genre_id SMALLINT NOT NULL,
+    song_id INT UNSIGNED NOT NULL,
+    genre_id INT UNSIGNED NOT NULL,
     UNIQUE (song_id, genre_id),
     FOREIGN KEY (song_id) REFERENCES Songs(song_id),
     FOREIGN KEY (genre_id) REFERENCES Genres(genre_id)
 );
 
+-- GenreStats follows Genres and SongGenres whoever writes them
+CREATE TRIGGER trg_genres_insert AFTER INSERT ON Genres FOR EACH ROW
+    INSERT INTO GenreStats (genre_id, genre_name, num_songs)
+    VALUES (NEW.genre_id, NEW.genre_name, 0);
+
+CREATE TRIGGER trg_genres_update AFTER UPDATE ON Genres FOR EACH ROW
+    UPDATE GenreStats SET genre_name = NEW.genre_name
+    WHERE genre_id = NEW.genre_id;
+
+-- A session that sets @music_db_defer_genre_stats (the workers of the
+-- parallel loaders) skips the SongGenres triggers, so it neither updates nor
+-- locks the GenreStats rows; it must rebuild_genre_stats the genres it wrote.
+DELIMITER //
+
+CREATE TRIGGER trg_song_genres_insert AFTER INSERT ON SongGenres FOR EACH ROW
+IF @music_db_defer_genre_stats IS NULL THEN
+    UPDATE GenreStats SET num_songs = num_songs + 1
+    WHERE genre_id = NEW.genre_id;
+END IF//
+
+CREATE TRIGGER trg_song_genres_update AFTER UPDATE ON SongGenres FOR EACH ROW
+IF @music_db_defer_genre_stats IS NULL THEN
+    UPDATE GenreStats
+    SET num_songs = num_songs + (genre_id = NEW.genre_id) - (genre_id = OLD.genre_id)
+    WHERE genre_id IN (OLD.genre_id, NEW.genre_id);
+END IF//
+
+CREATE TRIGGER trg_song_genres_delete AFTER DELETE ON SongGenres FOR EACH ROW
+IF @music_db_defer_genre_stats IS NULL THEN
+    UPDATE GenreStats SET num_songs = num_songs - 1
+    WHERE genre_id = OLD.genre_id;
+END IF//
+
+DELIMITER ;
+
 CREATE TABLE Ratings (
-    rating_id SMALLINT AUTO_INCREMENT PRIMARY KEY,
-    user_id SMALLINT NOT NULL,
-    song_id SMALLINT NOT NULL,
+    rating_id BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    user_id INT UNSIGNED NOT NULL,
+    song_id INT UNSIGNED NOT NULL,
     rating TINYINT NOT NULL,
     rating_date DATE NOT NULL,
     UNIQUE (user_id, song_id),
+    INDEX idx_ratings_date_song (rating_date, song_id),
+    INDEX idx_ratings_date_user (rating_date, user_id),
     FOREIGN KEY (user_id) REFERENCES Users(user_id),
     FOREIGN KEY (song_id) REFERENCES Songs(song_id)
+);
+
+CREATE TABLE SongRatingCounts (
+    song_id INT UNSIGNED NOT NULL,
+    rating_year SMALLINT NOT NULL,
+    num_ratings INT UNSIGNED NOT NULL,
+    PRIMARY KEY (rating_year, song_id),
+    FOREIGN KEY (song_id) REFERENCES Songs(song_id)
 );
\ No newline at end of file
@@ -0,0 +1,148 @@
+-- SQLite version of schema.sql, used by music_db_sqlite.py.
+--
+-- Same tables, keys and indexes. Names use the MUSIC collation, which
+-- music_db_sqlite registers on every connection as an approximation of
+-- MySQL's utf8mb4_0900_ai_ci (see its docstring for the differences). Dates are stored as 'YYYY-MM-DD' text. The statements
+-- are idempotent so that every new connection may run them.
+
+CREATE TABLE IF NOT EXISTS Artists (
+    artist_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    artist_name VARCHAR(120) NOT NULL UNIQUE COLLATE MUSIC
+);
+
+CREATE TABLE IF NOT EXISTS Genres (
+    genre_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    genre_name VARCHAR(60) NOT NULL UNIQUE COLLATE MUSIC
+);
+
+CREATE TABLE IF NOT EXISTS GenreStats (
+    genre_id INTEGER PRIMARY KEY,
+    genre_name VARCHAR(60) NOT NULL COLLATE MUSIC,
+    num_songs INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (genre_id) REFERENCES Genres(genre_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_genre_stats_rank
+    ON GenreStats (num_songs DESC, genre_name);
+
+CREATE TABLE IF NOT EXISTS Users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_name VARCHAR(255) NOT NULL UNIQUE COLLATE MUSIC
+);
+
+CREATE TABLE IF NOT EXISTS Albums (
+    album_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    album_name VARCHAR(100) NOT NULL COLLATE MUSIC,
+    artist_id INTEGER NOT NULL,
+    release_date DATE NOT NULL,
+    genre_id INTEGER NOT NULL,
+    UNIQUE (album_name, artist_id),
+    FOREIGN KEY (artist_id) REFERENCES Artists(artist_id),
+    FOREIGN KEY (genre_id) REFERENCES Genres(genre_id)
+);
+-- MySQL indexes foreign key columns implicitly
+CREATE INDEX IF NOT EXISTS idx_albums_artist ON Albums (artist_id);
+CREATE INDEX IF NOT EXISTS idx_albums_genre ON Albums (genre_id);
+
+CREATE TABLE IF NOT EXISTS Songs (
+    song_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    song_title VARCHAR(100) NOT NULL COLLATE MUSIC,
+    artist_id INTEGER NOT NULL,
+    album_id INTEGER NULL,
+    release_date DATE NOT NULL,
+    UNIQUE (song_title, artist_id),
+    FOREIGN KEY (artist_id) REFERENCES Artists(artist_id),
+    FOREIGN KEY (album_id) REFERENCES Albums(album_id)
+);
+CREATE INDEX IF NOT EXISTS idx_songs_album_date_artist
+    ON Songs (album_id, release_date, artist_id);
+CREATE INDEX IF NOT EXISTS idx_songs_album_artist_date
+    ON Songs (album_id, artist_id, release_date);
+CREATE INDEX IF NOT EXISTS idx_songs_artist ON Songs (artist_id);
+
+CREATE TABLE IF NOT EXISTS ArtistSinglesSummary (
+    artist_id INTEGER PRIMARY KEY,
+    last_single_date DATE NOT NULL,
+    last_single_year SMALLINT NOT NULL,
+    FOREIGN KEY (artist_id) REFERENCES Artists(artist_id)
+);
+CREATE INDEX IF NOT EXISTS idx_artist_singles_last_year
+    ON ArtistSinglesSummary (last_single_year);
+
+CREATE TABLE IF NOT EXISTS ArtistSingleCounts (
+    artist_id INTEGER NOT NULL,
+    release_year SMALLINT NOT NULL,
+    num_singles INTEGER NOT NULL,
+    PRIMARY KEY (release_year, artist_id),
+    FOREIGN KEY (artist_id) REFERENCES Artists(artist_id)
+);
+CREATE INDEX IF NOT EXISTS idx_artist_single_counts_artist
+    ON ArtistSingleCounts (artist_id);
+
+CREATE TABLE IF NOT EXISTS SongGenres (
+    song_id INTEGER NOT NULL,
+    genre_id INTEGER NOT NULL,
+    UNIQUE (song_id, genre_id),
+    FOREIGN KEY (song_id) REFERENCES Songs(song_id),
+    FOREIGN KEY (genre_id) REFERENCES Genres(genre_id)
+);
+CREATE INDEX IF NOT EXISTS idx_song_genres_genre ON SongGenres (genre_id);
+
+-- GenreStats follows Genres and SongGenres whoever writes them
+-- (user_variable reads the session variables SET @name = value assigns)
+CREATE TRIGGER IF NOT EXISTS trg_genres_insert AFTER INSERT ON Genres
+BEGIN
+    INSERT INTO GenreStats (genre_id, genre_name, num_songs)
+    VALUES (NEW.genre_id, NEW.genre_name, 0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_genres_update AFTER UPDATE ON Genres
+BEGIN
+    UPDATE GenreStats SET genre_name = NEW.genre_name
+    WHERE genre_id = NEW.genre_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_song_genres_insert AFTER INSERT ON SongGenres
+WHEN user_variable('music_db_defer_genre_stats') IS NULL
+BEGIN
+    UPDATE GenreStats SET num_songs = num_songs + 1
+    WHERE genre_id = NEW.genre_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_song_genres_update AFTER UPDATE ON SongGenres
+WHEN user_variable('music_db_defer_genre_stats') IS NULL
+BEGIN
+    UPDATE GenreStats
+    SET num_songs = num_songs + (genre_id = NEW.genre_id) - (genre_id = OLD.genre_id)
+    WHERE genre_id IN (OLD.genre_id, NEW.genre_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_song_genres_delete AFTER DELETE ON SongGenres
+WHEN user_variable('music_db_defer_genre_stats') IS NULL
+BEGIN
+    UPDATE GenreStats SET num_songs = num_songs - 1
+    WHERE genre_id = OLD.genre_id;
+END;
+
+CREATE TABLE IF NOT EXISTS Ratings (
+    rating_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    song_id INTEGER NOT NULL,
+    rating TINYINT NOT NULL,
+    rating_date DATE NOT NULL,
+    UNIQUE (user_id, song_id),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id),
+    FOREIGN KEY (song_id) REFERENCES Songs(song_id)
+);
+CREATE INDEX IF NOT EXISTS idx_ratings_date_song ON Ratings (rating_date, song_id);
+CREATE INDEX IF NOT EXISTS idx_ratings_date_user ON Ratings (rating_date, user_id);
+CREATE INDEX IF NOT EXISTS idx_ratings_song ON Ratings (song_id);
+
+CREATE TABLE IF NOT EXISTS SongRatingCounts (
+    song_id INTEGER NOT NULL,
+    rating_year SMALLINT NOT NULL,
+    num_ratings INTEGER NOT NULL,
+    PRIMARY KEY (rating_year, song_id),
+    FOREIGN KEY (song_id) REFERENCES Songs(song_id)
+);
+CREATE INDEX IF NOT EXISTS idx_song_rating_counts_song
+    ON SongRatingCounts (song_id);
@@ -1,154 +1,2986 @@
-from typing import Tuple, List, Set
+import csv
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+import weakref
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from datetime import MAXYEAR, MINYEAR, date, timedelta
+from functools import lru_cache, wraps
+from itertools import islice
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    Tuple,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Union,
+)
 
+# ---------------------------------------------------------------------------
+# Staging helpers
+#
+# The loaders stage their input in TEMPORARY tables and apply it with a fixed
+# number of set-based statements. MySQL only allows a temporary table to be
+# referenced once per statement, so the statements below use window functions
+# instead of self-joins to find duplicates inside a batch.
+# ---------------------------------------------------------------------------
 
-def clear_database(mydb):
+_SINGLES_STAGING = {
+    "_stage_singles": """
+        CREATE TEMPORARY TABLE _stage_singles (
+            seq INT NOT NULL PRIMARY KEY,
+            song_title VARCHAR(100) NOT NULL,
+            artist_name VARCHAR(120) NOT NULL,
+            release_date DATE NOT NULL,
+            artist_id INT UNSIGNED NULL,
+            rejected TINYINT NOT NULL DEFAULT 0,
+            INDEX (artist_name),
+            INDEX (artist_id, song_title)
+        )
+    """,
+    "_stage_single_genres": """
+        CREATE TEMPORARY TABLE _stage_single_genres (
+            seq INT NOT NULL,
+            pos INT NOT NULL,
+            genre_name VARCHAR(60) NOT NULL,
+            PRIMARY KEY (seq, pos),
+            INDEX (genre_name)
+        )
+    """,
+}
+
+_ALBUMS_STAGING = {
+    "_stage_albums": """
+        CREATE TEMPORARY TABLE _stage_albums (
+            seq INT NOT NULL PRIMARY KEY,
+            album_name VARCHAR(100) NOT NULL,
+            genre_name VARCHAR(60) NOT NULL,
+            artist_name VARCHAR(120) NOT NULL,
+            release_date DATE NOT NULL,
+            artist_id INT UNSIGNED NULL,
+            genre_id INT UNSIGNED NULL,
+            rejected TINYINT NOT NULL DEFAULT 0,
+            INDEX (artist_name),
+            INDEX (artist_id, album_name)
+        )
+    """,
+    "_stage_album_tracks": """
+        CREATE TEMPORARY TABLE _stage_album_tracks (
+            seq INT NOT NULL,
+            pos INT NOT NULL,
+            song_title VARCHAR(100) NOT NULL,
+            PRIMARY KEY (seq, pos)
+        )
+    """,
+}
+
+_USERS_STAGING = {
+    "_stage_users": """
+        CREATE TEMPORARY TABLE _stage_users (
+            seq INT NOT NULL PRIMARY KEY,
+            user_name VARCHAR(255) NOT NULL,
+            rejected TINYINT NOT NULL DEFAULT 0,
+            INDEX (user_name)
+        )
+    """,
+}
+
+_RATINGS_STAGING = {
+    "_stage_ratings": """
+        CREATE TEMPORARY TABLE _stage_ratings (
+            seq INT NOT NULL PRIMARY KEY,
+            user_name VARCHAR(255) NOT NULL,
+            artist_name VARCHAR(255) NOT NULL,
+            song_title VARCHAR(255) NOT NULL,
+            rating INT NOT NULL,
+            rating_date DATE NOT NULL,
+            user_id INT UNSIGNED NULL,
+            song_id INT UNSIGNED NULL,
+            reason CHAR(1) NULL,
+            INDEX (user_id, song_id)
+        )
+    """,
+}
+
+# Number of input rows a loader stages and commits at a time
+DEFAULT_CHUNK_SIZE = 10000
+
+# Bytes left for the statement text and protocol overhead in every packet
+_PACKET_HEADROOM = 64 * 1024
+
+# Number of values sent per WHERE ... IN (...) list, e.g. of staged seqs
+_SEQ_LIST_SIZE = 1000
+
+# Per-connection max_allowed_packet, see _max_allowed_packet()
+_max_allowed_packets = weakref.WeakKeyDictionary()
+
+
+def _create_staging(cursor, staging: dict):
+    """(Re)create the temporary staging tables described by `staging`."""
+    _drop_staging(cursor, staging)
+    for ddl in staging.values():
+        cursor.execute(ddl)
+
+
+def _drop_staging(cursor, staging: dict):
+    """Drop the temporary staging tables described by `staging`."""
+    cursor.execute("DROP TEMPORARY TABLE IF EXISTS " + ", ".join(staging))
+
+
+def _clear_staging(cursor, staging: dict):
+    """Empty the temporary staging tables described by `staging`."""
+    for table in staging:
+        cursor.execute(f"DELETE FROM {table}")
+
+
+def _chunks(rows: Iterable, chunk_size: int) -> Iterator[list]:
+    """Yield lists of at most chunk_size consecutive items of rows."""
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _load_in_chunks(
+    mydb,
+    pipeline: dict,
+    chunks: Iterable,
+    on_rejects: Optional[Callable[[Set], None]],
+    fill: Optional[Callable] = None,
+) -> Set:
+    """
+    Drive a loader pipeline over its input, one chunk at a time.
+
+    A pipeline describes one loader: its staging tables, fill(cursor, chunk,
+    cache, max_packet) writing a chunk of input to them, apply(cursor)
+    moving the staged rows into the real tables and returning the rejects,
+    remember(cursor, cache) copying the ids it resolved into the connection's
+    IdCache, the tables apply writes to, whose generation is bumped in the
+    connection's ResultCache, and optionally rank(cursor, leaderboards)
+    adding the applied rows to the connection's Leaderboards. fill can be
+    overridden, e.g. to copy rows from an import table.
+
+    Every chunk is staged, applied and committed on its own, so memory use and
+    transaction size do not depend on the size of the input. The rejects of
+    every chunk are passed to on_rejects as soon as the chunk is committed.
+    If a chunk fails, its uncommitted writes are rolled back before the
+    error propagates; the chunks committed before it stay. The staging
+    tables are dropped either way.
+
+    Returns:
+        Set: union of the rejects of all chunks
+    """
+    staging = pipeline["staging"]
+    fill = fill or pipeline["fill"]
+    cache = get_id_cache(mydb)
+    results = get_result_cache(mydb)
+    leaderboards = get_leaderboards(mydb) if "rank" in pipeline else None
+
+    cursor = mydb.cursor()
+    try:
+        max_packet = _max_allowed_packet(mydb, cursor)
+        _create_staging(cursor, staging)
+        rejected = set()
+
+        for chunk in chunks:
+            fill(cursor, chunk, cache, max_packet)
+            chunk_rejects = pipeline["apply"](cursor)
+            mydb.commit()
+
+            # Bumped after the commit, so no result read before it stays cached
+            if results is not None:
+                results.bump(pipeline["tables"])
+
+            # Only committed rows go into the cache
+            if cache is not None:
+                pipeline["remember"](cursor, cache)
+            if leaderboards is not None:
+                pipeline["rank"](cursor, leaderboards)
+            _clear_staging(cursor, staging)
+
+            rejected |= chunk_rejects
+            if on_rejects is not None:
+                on_rejects(chunk_rejects)
+    except BaseException:
+        # Never leave half a chunk for the caller's next commit
+        mydb.rollback()
+        raise
+    finally:
+        try:
+            _drop_staging(cursor, staging)
+            mydb.commit()
+        finally:
+            cursor.close()
+    return rejected
+
+
+def _max_allowed_packet(mydb, cursor) -> int:
+    """
+    Return the server's max_allowed_packet in bytes. The session value is
+    fixed when the connection opens, so it is read once per connection.
+    """
+    key = _underlying(mydb)
+    size = _max_allowed_packets.get(key)
+    if size is None:
+        cursor.execute("SELECT @@max_allowed_packet")
+        size = _max_allowed_packets[key] = int(cursor.fetchone()[0])
+    return size
+
+
+def _row_size(row: Sequence) -> int:
+    """
+    Upper bound of the bytes a row takes in a multi-row INSERT.
+    Every character may need escaping, plus quotes and a separator per value.
+    """
+    return sum(2 * len(str(value).encode("utf-8")) + 4 for value in row) + 4
+
+
+def _executemany_chunked(cursor, sql: str, rows: Iterable[Sequence], max_packet: int):
+    """
+    Run an INSERT ... VALUES statement for many rows with executemany.
+
+    mysql.connector turns executemany into a single multi-row INSERT, which
+    must fit in max_packet (the connection's max_allowed_packet), so the
+    rows are sent in chunks whose estimated size stays below that limit.
+    """
+    budget = max_packet - len(sql) - _PACKET_HEADROOM
+    chunk = []
+    chunk_size = 0
+    for row in rows:
+        size = _row_size(row)
+        if chunk and chunk_size + size > budget:
+            cursor.executemany(sql, chunk)
+            chunk = []
+            chunk_size = 0
+        chunk.append(row)
+        chunk_size += size
+    if chunk:
+        cursor.executemany(sql, chunk)
+
+
+def _resolve_staged_artists(cursor, table: str):
+    """
+    Fill the artist_id column of a staging table, creating missing artists.
+    New artists are inserted in order of first appearance in the batch.
+    Rows whose artist_id was already filled from the IdCache are left as is.
+    """
+    cursor.execute(
+        f"""
+        UPDATE {table}
+        SET artist_id = (
+            SELECT a.artist_id FROM Artists a
+            WHERE a.artist_name = {table}.artist_name
+        )
+        WHERE artist_id IS NULL
+    """
+    )
+    cursor.execute(
+        f"""
+        INSERT INTO Artists (artist_name)
+        SELECT artist_name
+        FROM (
+            SELECT artist_name, seq,
+                   ROW_NUMBER() OVER (PARTITION BY artist_name ORDER BY seq) AS rn
+            FROM {table}
+            WHERE artist_id IS NULL
+        ) AS st
+        WHERE st.rn = 1
+        ORDER BY st.seq
+    """
+    )
+    cursor.execute(
+        f"""
+        UPDATE {table}
+        SET artist_id = (
+            SELECT a.artist_id FROM Artists a
+            WHERE a.artist_name = {table}.artist_name
+        )
+        WHERE artist_id IS NULL
+    """
+    )
+
+
+def _mark_staged_rejects(
+    cursor, table: str, seqs: List[int], assignment: str = "rejected = 1"
+):
+    """Flag the given rows of a staging table as rejected."""
+    for i in range(0, len(seqs), _SEQ_LIST_SIZE):
+        chunk = seqs[i : i + _SEQ_LIST_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(
+            f"UPDATE {table} SET {assignment} WHERE seq IN ({placeholders})",
+            tuple(chunk),
+        )
+
+
+# ---------------------------------------------------------------------------
+# Dimension id cache
+#
+# An IdCache remembers artist, genre, user and song ids by name so that the
+# loaders do not have to look them up again on every call. It is opt-in and
+# attached to a connection with enable_id_cache(); the loaders fill it from
+# the rows they resolve and insert, and clear_database() empties it.
+# Rows written by other means are not seen by the cache: call clear() on it
+# after changing the dimension tables outside of this module.
+# ---------------------------------------------------------------------------
+
+# Default memory bound of an IdCache, in bytes
+DEFAULT_ID_CACHE_BYTES = 64 * 1024 * 1024
+
+# Approximate per-entry overhead of the LRU dict, in bytes
+_CACHE_ENTRY_OVERHEAD = 120
+
+_id_caches = weakref.WeakKeyDictionary()
+
+
+# Letters utf8mb4_0900_ai_ci sorts as a base letter, or two, with an accent
+# weight, which NFKD does not decompose
+_BASE_LETTERS = str.maketrans(
+    {"ø": "o", "ł": "l", "đ": "d", "ð": "d", "ħ": "h", "ŧ": "t", "æ": "ae", "œ": "oe"}
+)
+
+# Control characters the collation does not ignore
+_WEIGHTED_CONTROLS = "\t\n\x0b\x0c\r"
+
+
+def collation_key(name: str) -> str:
+    """
+    Approximation of the tables' utf8mb4_0900_ai_ci collation: case and
+    accents are ignored, so are format and most control characters, letters
+    such as ø, ł, đ and æ equal o, l, d and ae, and trailing spaces matter
+    (the collation is NO PAD).
+
+    It is not the collation. Letters of other scripts, expansions NFKD does
+    not know and characters without a Unicode 9 weight can compare
+    differently, and it says nothing about order (MySQL sorts punctuation
+    and symbols before digits and letters). Never decide with it whether two
+    names are the same row; the database decides that.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(
+        c
+        for c in decomposed
+        if not unicodedata.combining(c)
+        and unicodedata.category(c) != "Cf"
+        and (unicodedata.category(c) != "Cc" or c in _WEIGHTED_CONTROLS)
+    )
+    return stripped.casefold().translate(_BASE_LETTERS)
+
+
+class IdCache:
+    """
+    LRU cache of name -> id mappings, bounded by an estimate of its memory use.
+
+    kind is one of "artist", "genre", "user" (name is the artist, genre or
+    user name) or "song" (name is an (artist name, song title) pair). Names are
+    compared as given: another spelling of a cached name is a miss, which the
+    loaders resolve in the database, so only the database decides which
+    spellings are the same row.
+
+    Besides ids the cache holds negative entries for users and songs that are
+    known not to exist. They are dropped whenever a loader adds rows of that
+    kind, so a negative entry never outlives the row it stands for.
+    """
+
+    # Returned by get() for names known not to exist
+    MISSING = object()
+
+    def __init__(self, max_bytes: int = DEFAULT_ID_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._missing = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(kind: str, name) -> tuple:
+        if kind == "song":
+            return (kind, name[0], name[1])
+        return (kind, name)
+
+    def get(self, kind: str, name, default=None):
+        """Return the cached id, IdCache.MISSING, or default if the name is not cached."""
+        key = self._key(kind, name)
+        value = self._entries.get(key, default)
+        if value is default:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, kind: str, name, id_: int):
+        """Remember the id of a name."""
+        self._store(self._key(kind, name), id_)
+
+    def put_missing(self, kind: str, name):
+        """Remember that a name does not exist in the database."""
+        key = self._key(kind, name)
+        self._store(key, IdCache.MISSING)
+        self._missing.setdefault(kind, set()).add(key)
+
+    def forget_missing(self, kind: str):
+        """Drop all negative entries of a kind, e.g. after rows of that kind were added."""
+        for key in self._missing.pop(kind, ()):
+            if self._entries.get(key) is IdCache.MISSING:
+                self._remove(key)
+
+    def clear(self):
+        """Drop every entry."""
+        self._entries.clear()
+        self._missing.clear()
+        self.size_bytes = 0
+
+    def _store(self, key: tuple, value):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = value
+        self.size_bytes += self._entry_size(key)
+        while self.size_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, key: tuple):
+        value = self._entries.pop(key)
+        self.size_bytes -= self._entry_size(key)
+        if value is IdCache.MISSING:
+            self._missing.get(key[0], set()).discard(key)
+
+    @staticmethod
+    def _entry_size(key: tuple) -> int:
+        return _CACHE_ENTRY_OVERHEAD + sum(sys.getsizeof(part) for part in key)
+
+
+def enable_id_cache(mydb, cache: Optional[IdCache] = None) -> IdCache:
+    """
+    Attach an IdCache to a connection; the loaders then use and fill it.
+    The same cache can be shared by several connections to the same database.
+
+    Args:
+        mydb: database connection
+        cache: cache to attach, a new one if None
+
+    Returns:
+        IdCache: the attached cache
+    """
+    if cache is None:
+        cache = IdCache()
+    _id_caches[_underlying(mydb)] = cache
+    return cache
+
+
+def disable_id_cache(mydb):
+    """Detach the IdCache of a connection, if any."""
+    _id_caches.pop(_underlying(mydb), None)
+
+
+def get_id_cache(mydb) -> Optional[IdCache]:
+    """Return the IdCache attached to a connection, or None."""
+    return _id_caches.get(_underlying(mydb))
+
+
+def _cached_id(cache: Optional[IdCache], kind: str, name) -> Optional[int]:
+    """Id of a name from the cache, None on a miss or without a cache."""
+    if cache is None:
+        return None
+    value = cache.get(kind, name)
+    return None if value is IdCache.MISSING else value
+
+
+# ---------------------------------------------------------------------------
+# Result cache
+#
+# An optional per-connection cache of get_* results. Every result is stamped
+# with the generations of the tables its query reads; the loaders,
+# clear_database and the rollup rebuilds bump the generations of the tables
+# they write, which invalidates exactly the results that depended on them.
+# Writes from connections that do not share the cache are not seen, so share
+# one ResultCache between all connections of a process that write.
+# ---------------------------------------------------------------------------
+
+DEFAULT_RESULT_CACHE_ENTRIES = 1024
+
+# Per-connection result caches, see enable_result_cache()
+_result_caches = weakref.WeakKeyDictionary()
+
+
+class ResultCache:
+    """
+    LRU cache of get_* results, bounded by a number of entries and
+    invalidated by per-table generation counters.
+
+    Results are stored as immutable snapshots (tuples and frozensets of
+    tuples and strings) and every caller gets its own list or set built from
+    the snapshot, so callers cannot corrupt cached results.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_RESULT_CACHE_ENTRIES):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stamp(self, tables: Sequence[str]) -> tuple:
+        """Current generations of tables; take it before running the query."""
+        with self._lock:
+            return self._stamp(tables)
+
+    def get(self, key: tuple, tables: Sequence[str]):
+        """Return the snapshot cached under key, or None if missing or stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != self._stamp(tables):
+                del self._entries[key]
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: tuple, stamp: tuple, snapshot):
+        """
+        Cache a snapshot read when the tables had the generations in stamp.
+        Snapshots that are already stale are not stored.
+        """
+        with self._lock:
+            if stamp != self._stamp([table for table, _ in stamp[1:]]):
+                return
+            self._entries[key] = (stamp, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def bump(self, tables: Iterable[str]):
+        """Invalidate every result that read one of tables."""
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def clear(self):
+        """Drop every entry and invalidate results being computed."""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return the counters and the number of cached entries."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _stamp(self, tables: Sequence[str]) -> tuple:
+        return (self._epoch,) + tuple(
+            (table, self._generations.get(table, 0)) for table in tables
+        )
+
+
+def enable_result_cache(mydb, cache: Optional[ResultCache] = None) -> ResultCache:
+    """
+    Attach a ResultCache to a connection; the get_* functions then answer
+    repeated calls from it. The same cache can be shared by several
+    connections to the same database.
+
+    Args:
+        mydb: database connection
+        cache: cache to attach, a new one if None
+
+    Returns:
+        ResultCache: the attached cache
+    """
+    if cache is None:
+        cache = ResultCache()
+    _result_caches[_underlying(mydb)] = cache
+    return cache
+
+
+def disable_result_cache(mydb):
+    """Detach the ResultCache of a connection, if any."""
+    _result_caches.pop(_underlying(mydb), None)
+
+
+def get_result_cache(mydb) -> Optional[ResultCache]:
+    """Return the ResultCache attached to a connection, or None."""
+    return _result_caches.get(_underlying(mydb))
+
+
+def _freeze(result):
+    """Immutable snapshot of a get_* result (a list or a set)."""
+    return frozenset(result) if isinstance(result, set) else tuple(result)
+
+
+def _thaw(snapshot):
+    """A fresh list or set with the contents of a snapshot."""
+    return set(snapshot) if isinstance(snapshot, frozenset) else list(snapshot)
+
+
+def _cached_result(*tables: str):
+    """
+    Serve a get_* function from the connection's ResultCache, if any.
+    tables are the tables the function's query reads.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(mydb, *args, **kwargs):
+            cache = get_result_cache(mydb)
+            if cache is None:
+                return func(mydb, *args, **kwargs)
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                snapshot = cache.get(key, tables)
+            except TypeError:
+                # Unhashable arguments, e.g. a list as year range
+                return func(mydb, *args, **kwargs)
+            if snapshot is None:
+                stamp = cache.stamp(tables)
+                snapshot = _freeze(func(mydb, *args, **kwargs))
+                cache.put(key, stamp, snapshot)
+            return _thaw(snapshot)
+
+        return wrapper
+
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Tracing
+#
+# An optional per-connection Tracer. Every public function called with a
+# traced connection records a Span with one StatementEvent per execute,
+# executemany, commit and rollback it sends, and hands the finished span to
+# the tracer's hooks: any callable, LoggingHook or OpenTelemetryHook.
+# Untraced connections pay a dictionary lookup per public call and
+# nothing per statement.
+# ---------------------------------------------------------------------------
+
+# Per-connection tracers, see enable_tracing()
+_tracers = weakref.WeakKeyDictionary()
+
+# Lists of placeholders, e.g. in "seq IN (%s, %s, %s)"
+_PLACEHOLDER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+
+
+class StatementEvent:
+    """
+    One statement, commit or rollback of a Span.
+
+    kind is "execute", "executemany", "commit" or "rollback"; sql is the
+    normalized statement (None for commits and rollbacks); binds is the
+    number of bound values; start is the wall-clock time (time.time()) it
+    was sent; elapsed is in seconds, fetching its rows included; rows is the
+    number of rows affected, or fetched for statements returning rows, or
+    -1 if unknown.
+    """
+
+    __slots__ = ("kind", "sql", "binds", "start", "elapsed", "rows")
+
+    def __init__(self, kind: str, sql: Optional[str], binds: int):
+        self.kind = kind
+        self.sql = sql
+        self.binds = binds
+        self.start = time.time()
+        self.elapsed = 0.0
+        self.rows = -1
+
+    def __repr__(self) -> str:
+        return (
+            f"StatementEvent({self.kind!r}, {self.sql!r}, binds={self.binds}, "
+            f"elapsed={self.elapsed:.6f}, rows={self.rows})"
+        )
+
+
+class Span:
+    """
+    One call of a public function on a traced connection.
+
+    start is the wall-clock time (time.time()) of the call, elapsed its
+    duration in seconds, events its StatementEvents in order and error the
+    exception it raised, if any.
+    """
+
+    __slots__ = ("name", "start", "elapsed", "events", "error")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.time()
+        self.elapsed = 0.0
+        self.events: List[StatementEvent] = []
+        self.error: Optional[BaseException] = None
+
+    @property
+    def round_trips(self) -> int:
+        """Statements, commits and rollbacks sent during the call."""
+        return len(self.events)
+
+    def __repr__(self) -> str:
+        return (
+            f"Span({self.name!r}, elapsed={self.elapsed:.6f}, "
+            f"round_trips={self.round_trips}, error={self.error!r})"
+        )
+
+
+class Tracer:
+    """
+    Hands the finished Spans of traced connections to hooks, callables
+    taking the span. One tracer can be shared by several connections; its
+    hooks are then called from their threads.
+    """
+
+    def __init__(self, *hooks: Callable[[Span], None]):
+        self.hooks = list(hooks)
+
+    def add_hook(self, hook: Callable[[Span], None]):
+        """Call hook with every finished span."""
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[Span], None]):
+        """Stop calling hook."""
+        self.hooks.remove(hook)
+
+    def emit(self, span: Span):
+        """Call every hook with span."""
+        for hook in self.hooks:
+            hook(span)
+
+
+class LoggingHook:
+    """
+    Tracer hook logging a line per span and, if statements, a line per
+    statement event.
+    """
+
+    def __init__(self, logger=None, level: int = logging.DEBUG, statements=True):
+        self.logger = logger or logging.getLogger("music_db")
+        self.level = level
+        self.statements = statements
+
+    def __call__(self, span: Span):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        outcome = "" if span.error is None else f", failed: {span.error!r}"
+        self.logger.log(
+            self.level,
+            "%s: %.3f ms, %d round trips%s",
+            span.name,
+            span.elapsed * 1000,
+            span.round_trips,
+            outcome,
+        )
+        if not self.statements:
+            return
+        for event in span.events:
+            self.logger.log(
+                self.level,
+                "  %s: %.3f ms, %d binds, %d rows%s",
+                event.kind,
+                event.elapsed * 1000,
+                event.binds,
+                event.rows,
+                "" if event.sql is None else f": {event.sql}",
+            )
+
+
+class OpenTelemetryHook:
+    """
+    Tracer hook exporting every span as an OpenTelemetry span, with a span
+    event per statement event. tracer is an opentelemetry.trace.Tracer,
+    by default the global provider's "music_db" tracer.
+
+    Requires the opentelemetry-api package.
+    """
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+
+            tracer = trace.get_tracer("music_db")
+        self.tracer = tracer
+
+    def __call__(self, span: Span):
+        otel_span = self.tracer.start_span(
+            span.name,
+            start_time=_nanoseconds(span.start),
+            attributes={"music_db.round_trips": span.round_trips},
+        )
+        for event in span.events:
+            attributes = {
+                "music_db.binds": event.binds,
+                "music_db.rows": event.rows,
+                "music_db.elapsed_ms": event.elapsed * 1000,
+            }
+            if event.sql is not None:
+                attributes["db.statement"] = event.sql
+            otel_span.add_event(
+                event.kind, attributes=attributes, timestamp=_nanoseconds(event.start)
+            )
+        if span.error is not None:
+            from opentelemetry.trace import Status, StatusCode
+
+            otel_span.record_exception(span.error)
+            otel_span.set_status(Status(StatusCode.ERROR, repr(span.error)))
+        otel_span.end(end_time=_nanoseconds(span.start + span.elapsed))
+
+
+def _nanoseconds(seconds: float) -> int:
+    return int(seconds * 1_000_000_000)
+
+
+@lru_cache(maxsize=1024)
+def _normalize_sql(sql: str) -> str:
+    """sql on one line, with lists of placeholders folded into one."""
+    return _PLACEHOLDER_LIST.sub("%s, ...", " ".join(sql.split()))
+
+
+class _TracedCursor:
+    """Cursor proxy adding a StatementEvent to a Span per statement."""
+
+    def __init__(self, cursor, span: Span):
+        self._cursor = cursor
+        self._span = span
+        self._event: Optional[StatementEvent] = None
+
+    def _run(self, kind: str, binds: int, method, sql: str, *args, **kwargs):
+        event = StatementEvent(kind, _normalize_sql(sql), binds)
+        self._span.events.append(event)
+        self._event = event
+        start = time.perf_counter()
+        try:
+            return method(sql, *args, **kwargs)
+        finally:
+            event.elapsed = time.perf_counter() - start
+            # Statements returning rows count them as they are fetched
+            event.rows = 0 if self._cursor.description else self._cursor.rowcount
+
+    def execute(self, sql, *args, **kwargs):
+        params = args[0] if args else kwargs.get("params")
+        binds = len(params) if params else 0
+        return self._run("execute", binds, self._cursor.execute, sql, *args, **kwargs)
+
+    def executemany(self, sql, rows):
+        rows = list(rows)
+        binds = len(rows) * len(rows[0]) if rows else 0
+        return self._run("executemany", binds, self._cursor.executemany, sql, rows)
+
+    def _fetched(self, start: float, rows: int):
+        if self._event is not None:
+            self._event.elapsed += time.perf_counter() - start
+            self._event.rows += rows
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start, row is not None)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _TracedConnection:
+    """Connection proxy recording the statements of a Span."""
+
+    def __init__(self, mydb, span: Span):
+        self._mydb = mydb
+        self._span = span
+
+    def cursor(self, *args, **kwargs):
+        return _TracedCursor(self._mydb.cursor(*args, **kwargs), self._span)
+
+    def _run(self, kind: str, method):
+        event = StatementEvent(kind, None, 0)
+        self._span.events.append(event)
+        start = time.perf_counter()
+        try:
+            return method()
+        finally:
+            event.elapsed = time.perf_counter() - start
+
+    def commit(self):
+        return self._run("commit", self._mydb.commit)
+
+    def rollback(self):
+        return self._run("rollback", self._mydb.rollback)
+
+    def __getattr__(self, name):
+        return getattr(self._mydb, name)
+
+
+def enable_tracing(mydb, tracer: Optional[Tracer] = None) -> Tracer:
+    """
+    Attach a Tracer to a connection; every public function called with it
+    then records a Span. The same tracer can be shared by several
+    connections.
+
+    Args:
+        mydb: database connection
+        tracer: tracer to attach, a new one without hooks if None
+
+    Returns:
+        Tracer: the attached tracer
+    """
+    if tracer is None:
+        tracer = Tracer()
+    _tracers[_underlying(mydb)] = tracer
+    return tracer
+
+
+def disable_tracing(mydb):
+    """Detach the Tracer of a connection, if any."""
+    _tracers.pop(_underlying(mydb), None)
+
+
+def get_tracer(mydb) -> Optional[Tracer]:
+    """Return the Tracer attached to a connection, or None."""
+    return _tracers.get(_underlying(mydb))
+
+
+# ---------------------------------------------------------------------------
+# Prepared statements
+#
+# An optional per-connection StatementRegistry. Every public function called
+# with such a connection sends its statements as server-side prepared
+# statements: the registry keeps one cursor(prepared=True) per SQL string,
+# so each statement is parsed once per connection instead of on every
+# execute. DDL, LOAD DATA, executemany (already one multi-row INSERT per
+# chunk) and statements with placeholder lists, whose length changes from
+# call to call, keep using the text protocol.
+# ---------------------------------------------------------------------------
+
+# Default number of statements a registry keeps prepared per connection;
+# the server allows max_prepared_stmt_count (16382) over all connections
+DEFAULT_MAX_PREPARED_STATEMENTS = 256
+
+# Per-connection statement registries, see enable_prepared_statements()
+_statements = weakref.WeakKeyDictionary()
+
+_PREPARABLE = re.compile(r"\s*(?:SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", re.I)
+
+
+@lru_cache(maxsize=1024)
+def _preparable(sql: str) -> bool:
+    """Whether sql is worth preparing once and executing many times."""
+    return (
+        _PREPARABLE.match(sql) is not None
+        and "@@" not in sql
+        # Prepared statements do not unescape %% like the text protocol
+        and "%%" not in sql
+        and _PLACEHOLDER_LIST.search(sql) is None
+    )
+
+
+class StatementRegistry:
+    """
+    The server-side prepared statements of one connection.
+
+    mysql.connector keeps a prepared cursor's statement for as long as it
+    executes the same SQL, so the registry holds one prepared cursor per
+    statement, evicting (and closing) the least recently used beyond
+    max_statements. The server forgets a connection's statements when it
+    reconnects; the registry notices the new connection_id and prepares
+    them again. close() deallocates them, e.g. before the connection is
+    closed.
+    """
+
+    def __init__(self, max_statements: int = DEFAULT_MAX_PREPARED_STATEMENTS):
+        if max_statements < 1:
+            raise ValueError("max_statements must be at least 1")
+        self.max_statements = max_statements
+        self._cursors = OrderedDict()  # sql -> prepared cursor
+        self._connection_id = None
+        self._stats = {"prepared": 0, "executed": 0, "evicted": 0, "reprepared": 0}
+
+    def cursor(self, mydb, sql: str):
+        """The prepared cursor of mydb for sql, preparing it if needed."""
+        connection_id = getattr(mydb, "connection_id", None)
+        if connection_id != self._connection_id:
+            # Statements of the old session are gone; closing their cursors
+            # could deallocate a new statement with the same id
+            self._stats["reprepared"] += len(self._cursors)
+            self._cursors.clear()
+            self._connection_id = connection_id
+        self._stats["executed"] += 1
+        cursor = self._cursors.get(sql)
+        if cursor is not None:
+            self._cursors.move_to_end(sql)
+            return cursor
+        cursor = mydb.cursor(prepared=True)
+        self._cursors[sql] = cursor
+        self._stats["prepared"] += 1
+        if len(self._cursors) > self.max_statements:
+            _, evicted = self._cursors.popitem(last=False)
+            self._stats["evicted"] += 1
+            evicted.close()
+        return cursor
+
+    def close(self):
+        """Deallocate all statements; errors of a dead connection are ignored."""
+        cursors, self._cursors = self._cursors, OrderedDict()
+        for cursor in cursors.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        """Return the registry counters and the number of statements prepared."""
+        stats = dict(self._stats)
+        stats["statements"] = len(self._cursors)
+        return stats
+
+    def __len__(self) -> int:
+        return len(self._cursors)
+
+
+class _PreparedCursor:
+    """Cursor proxy sending preparable statements through a StatementRegistry."""
+
+    def __init__(self, mydb, registry: StatementRegistry, cursor):
+        self._mydb = mydb
+        self._registry = registry
+        self._cursor = cursor
+        self._active = cursor  # the cursor holding the last result
+
+    def execute(self, sql, *args, **kwargs):
+        if len(args) <= 1 and not kwargs and _preparable(sql):
+            self._active = self._registry.cursor(self._mydb, sql)
+        else:
+            self._active = self._cursor
+        return self._active.execute(sql, *args, **kwargs)
+
+    def executemany(self, sql, rows):
+        self._active = self._cursor
+        return self._cursor.executemany(sql, rows)
+
+    def fetchone(self):
+        return self._active.fetchone()
+
+    def fetchmany(self, *args, **kwargs):
+        return self._active.fetchmany(*args, **kwargs)
+
+    def fetchall(self):
+        return self._active.fetchall()
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        # The prepared cursors belong to the registry
+        self._active = self._cursor
+        return self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._active, name)
+
+
+class _PreparedConnection:
+    """Connection proxy whose cursors use prepared statements."""
+
+    def __init__(self, mydb, registry: StatementRegistry):
+        self._mydb = mydb
+        self._registry = registry
+
+    def cursor(self, *args, **kwargs):
+        return _PreparedCursor(
+            self._mydb, self._registry, self._mydb.cursor(*args, **kwargs)
+        )
+
+    def __getattr__(self, name):
+        return getattr(self._mydb, name)
+
+
+_PROXIES = (_TracedConnection, _PreparedConnection)
+
+
+def _underlying(mydb):
+    """The connection behind the tracing and prepared statement proxies."""
+    while type(mydb) in _PROXIES:
+        mydb = mydb._mydb
+    return mydb
+
+
+def enable_prepared_statements(
+    mydb, max_statements: int = DEFAULT_MAX_PREPARED_STATEMENTS
+) -> StatementRegistry:
+    """
+    Attach a new StatementRegistry to a connection; every public function
+    called with it then prepares its statements once and reuses them.
+    Unlike the caches, a registry belongs to a single connection.
+
+    Args:
+        mydb: database connection
+        max_statements: statements kept prepared at most
+
+    Returns:
+        StatementRegistry: the attached registry
+    """
+    disable_prepared_statements(mydb)
+    registry = StatementRegistry(max_statements)
+    _statements[_underlying(mydb)] = registry
+    return registry
+
+
+def disable_prepared_statements(mydb):
+    """Detach the StatementRegistry of a connection, if any, and close it."""
+    registry = _statements.pop(_underlying(mydb), None)
+    if registry is not None:
+        registry.close()
+
+
+def get_statement_registry(mydb) -> Optional[StatementRegistry]:
+    """Return the StatementRegistry attached to a connection, or None."""
+    return _statements.get(_underlying(mydb))
+
+
+def _close_connection(mydb):
+    """Deallocate the prepared statements of a connection, then close it."""
+    disable_prepared_statements(mydb)
+    mydb.close()
+
+
+def _instrumented(func):
+    """
+    Run every call of a public function with the prepared statements and
+    the Span of its connection, if enabled. Public functions called by an
+    instrumented one share its statements and span.
+    """
+
+    @wraps(func)
+    def wrapper(mydb, *args, **kwargs):
+        # Not _underlying(mydb): the proxies handed to nested calls find
+        # nothing here, so those calls are not wrapped a second time
+        registry = _statements.get(mydb)
+        tracer = _tracers.get(mydb)
+        if registry is not None:
+            mydb = _PreparedConnection(mydb, registry)
+        if tracer is None:
+            return func(mydb, *args, **kwargs)
+        span = Span(func.__name__)
+        start = time.perf_counter()
+        try:
+            return func(_TracedConnection(mydb, span), *args, **kwargs)
+        except BaseException as e:
+            span.error = e
+            raise
+        finally:
+            span.elapsed = time.perf_counter() - start
+            tracer.emit(span)
+
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# Leaderboards
+#
+# Leaderboards keeps the all-time and current-year rankings of songs by
+# ratings received and of users by ratings given in memory, so the app's
+# leaderboards are read without a GROUP BY over the database. It is opt-in:
+# enable_leaderboards() loads it from the database once, and from then on
+# the ratings pipeline adds every committed chunk to it. clear_database()
+# empties it when it clears Ratings. Ratings written by other means (other
+# connections, parallel loaders) are not seen: call add_ratings() with them,
+# or load() again.
+# ---------------------------------------------------------------------------
+
+# Upper bound of the levels of a skip list, enough for 2**32 entries
+_SKIPLIST_MAX_LEVEL = 32
+
+_leaderboards = weakref.WeakKeyDictionary()
+
+
+class _SkipNode:
+    __slots__ = ("key", "next", "span")
+
+    def __init__(self, key, level: int):
+        self.key = key
+        self.next = [None] * level
+        # Number of level-0 steps each link skips
+        self.span = [0] * level
+
+
+class _SkipList:
+    """
+    Sorted set of distinct keys with insert, remove and rank in O(log n)
+    expected time, and in-order iteration. Every link records the number of
+    entries it skips, so the rank of a key is the sum of the spans of the
+    links followed to reach it.
+    """
+
+    def __init__(self, seed=None):
+        self._head = _SkipNode(None, _SKIPLIST_MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def _random_level(self) -> int:
+        level = 1
+        while level < _SKIPLIST_MAX_LEVEL and self._random.random() < 0.5:
+            level += 1
+        return level
+
+    def _path(self, key):
+        """Last node before key on every level, and its rank."""
+        update = [self._head] * _SKIPLIST_MAX_LEVEL
+        ranks = [0] * _SKIPLIST_MAX_LEVEL
+        node = self._head
+        rank = 0
+        for level in reversed(range(self._level)):
+            following = node.next[level]
+            while following is not None and following.key < key:
+                rank += node.span[level]
+                node = following
+                following = node.next[level]
+            update[level] = node
+            ranks[level] = rank
+        return update, ranks
+
+    def insert(self, key):
+        """Add a key that is not in the list."""
+        update, ranks = self._path(key)
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                self._head.span[i] = self._size
+            self._level = level
+
+        node = _SkipNode(key, level)
+        for i in range(level):
+            node.next[i] = update[i].next[i]
+            update[i].next[i] = node
+            node.span[i] = update[i].span[i] - (ranks[0] - ranks[i])
+            update[i].span[i] = ranks[0] - ranks[i] + 1
+        for i in range(level, self._level):
+            update[i].span[i] += 1
+        self._size += 1
+
+    def remove(self, key):
+        """Remove a key; KeyError if it is not in the list."""
+        update, _ = self._path(key)
+        node = update[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for i in range(self._level):
+            if update[i].next[i] is node:
+                update[i].span[i] += node.span[i] - 1
+                update[i].next[i] = node.next[i]
+            else:
+                update[i].span[i] -= 1
+        while self._level > 1 and self._head.next[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+
+    def rank(self, key) -> Optional[int]:
+        """1-based position of a key, or None if it is not in the list."""
+        node = self._head
+        rank = 0
+        for level in reversed(range(self._level)):
+            while node.next[level] is not None and node.next[level].key <= key:
+                rank += node.span[level]
+                node = node.next[level]
+            if node is not self._head and node.key == key:
+                return rank
+        return None
+
+
+class Leaderboard:
+    """
+    Items ranked by count, highest first, with ties broken by the ascending
+    WEIGHT_STRING() of their name, the sort key of the column's collation,
+    and then by ascending id: the ORDER BY of get_most_rated_songs and
+    get_most_engaged_users, as the server sorts it.
+
+    Items are identified by their database id and carry a value, the name
+    columns the queries return. Items whose count drops to 0 leave the
+    board. Changing a count costs O(log n), top(n) walks the first n items
+    and rank() is O(log n).
+    """
+
+    def __init__(self, seed=None):
+        self._seed = seed
+        self._ranking = _SkipList(seed)
+        # id -> (count, weight string, value)
+        self._items = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item_id: int, weight: bytes, value, delta: int = 1):
+        """
+        Add delta to the count of an item, entering it if it is new. weight
+        is the WEIGHT_STRING() of the item's name.
+        """
+        entry = self._items.get(item_id)
+        if entry is None:
+            count, key = 0, bytes(weight)
+        else:
+            count, key, _ = entry
+            self._ranking.remove((-count, key, item_id))
+
+        count += delta
+        if count > 0:
+            self._ranking.insert((-count, key, item_id))
+            self._items[item_id] = (count, key, value)
+        else:
+            self._items.pop(item_id, None)
+
+    def top(self, n: int) -> List[Tuple[object, int]]:
+        """(value, count) of the first n items."""
+        return [
+            (self._items[item_id][2], -count)
+            for count, _, item_id in islice(self._ranking, max(n, 0))
+        ]
+
+    def rank(self, item_id: int) -> Optional[int]:
+        """1-based position of an item, or None if it is not on the board."""
+        entry = self._items.get(item_id)
+        if entry is None:
+            return None
+        count, key, _ = entry
+        return self._ranking.rank((-count, key, item_id))
+
+    def count(self, item_id: int) -> int:
+        """Count of an item, 0 if it is not on the board."""
+        entry = self._items.get(item_id)
+        return 0 if entry is None else entry[0]
+
+    def clear(self):
+        self._ranking = _SkipList(self._seed)
+        self._items.clear()
+
+
+class Leaderboards:
+    """
+    The song and user leaderboards of all time and of the current year.
+
+    most_rated_songs(n) returns what get_most_rated_songs(mydb,
+    (MINYEAR, MAXYEAR), n) returns, most_rated_songs(n, this_year=True) what
+    it returns for (year, year); most_engaged_users likewise. song_rank and
+    user_rank give the position of a song or user in those lists. Ties are
+    ordered by the WEIGHT_STRING() of the names, which the server computes
+    with the columns' collation, so they follow its ORDER BY exactly.
+
+    Without a fixed year the current year follows clock: when it reaches a
+    new year, the next call starts the current-year boards over with the
+    ratings already counted for that year. Those are kept from the ratings
+    dated after the current year, so no reload is needed. The year never
+    moves back.
+
+    Args:
+        year: a fixed current year; clock's year at load() time if None
+        seed: seed of the skip lists' level choices
+        clock: returns today's date
+    """
+
+    def __init__(
+        self,
+        year: Optional[int] = None,
+        seed=None,
+        clock: Callable[[], date] = date.today,
+    ):
+        self.year = year
+        self.loaded = False
+        self._fixed_year = year is not None
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (kind, this_year) -> Leaderboard
+        self._boards = {
+            (kind, this_year): Leaderboard(seed)
+            for kind in ("songs", "users")
+            for this_year in (False, True)
+        }
+        # Names as stored -> ids, for the rank lookups
+        self._song_ids = {}
+        self._user_ids = {}
+        # (kind, year) -> Counter of (id, weight, value) for years after
+        # self.year, the current-year boards of those years
+        self._later = {}
+
+    def load(self, mydb):
+        """
+        Fill the leaderboards from the database (a cold start), replacing
+        their contents: songs from SongRatingCounts, users from Ratings.
+        """
+        cursor = mydb.cursor()
+        cursor.execute(
+            """
+            SELECT c.song_id, s.song_title, a.artist_name,
+                   WEIGHT_STRING(s.song_title), c.rating_year, c.num_ratings
+            FROM SongRatingCounts c
+            JOIN Songs s ON c.song_id = s.song_id
+            JOIN Artists a ON s.artist_id = a.artist_id
+            WHERE c.num_ratings > 0
+        """
+        )
+        songs = cursor.fetchall()
+        cursor.execute(
+            """
+            SELECT r.user_id, u.user_name, WEIGHT_STRING(u.user_name),
+                   YEAR(r.rating_date), COUNT(*)
+            FROM Ratings r
+            JOIN Users u ON r.user_id = u.user_id
+            GROUP BY r.user_id, u.user_name, YEAR(r.rating_date)
+        """
+        )
+        users = cursor.fetchall()
+        cursor.close()
+
+        with self._lock:
+            if not self._fixed_year:
+                self.year = self._clock().year
+            self._clear()
+            self._add_songs(songs)
+            self._add_users(users)
+            self.loaded = True
+
+    def add_ratings(self, ratings: Iterable[Sequence]):
+        """
+        Add committed ratings to the leaderboards.
+
+        Args:
+            ratings: rows of (song_id, song_title, artist_name, title_weight,
+                user_id, user_name, name_weight, rating_year), one per
+                rating; the weights are the WEIGHT_STRING() of the song
+                title and of the user name
+        """
+        songs = Counter()
+        users = Counter()
+        for row in ratings:
+            song_id, title, artist, title_weight, user_id, user, weight, year = row
+            songs[song_id, title, artist, bytes(title_weight), year] += 1
+            users[user_id, user, bytes(weight), year] += 1
+        with self._lock:
+            self._roll_over()
+            self._add_songs(key + (count,) for key, count in songs.items())
+            self._add_users(key + (count,) for key, count in users.items())
+
+    def _add_songs(self, rows):
+        """Add rows of (song_id, song_title, artist_name, weight, year, count)."""
+        all_time = self._boards["songs", False]
+        for song_id, song_title, artist_name, weight, year, count in rows:
+            if not all_time.count(song_id):
+                self._song_ids[artist_name, song_title] = song_id
+            value = (song_title, artist_name)
+            weight = bytes(weight)
+            all_time.add(song_id, weight, value, int(count))
+            # YEAR() comes back as a string on SQLite
+            self._add_dated("songs", int(year), song_id, weight, value, int(count))
+
+    def _add_users(self, rows):
+        """Add rows of (user_id, user_name, weight, year, count)."""
+        all_time = self._boards["users", False]
+        for user_id, user_name, weight, year, count in rows:
+            if not all_time.count(user_id):
+                self._user_ids[user_name] = user_id
+            weight = bytes(weight)
+            all_time.add(user_id, weight, user_name, int(count))
+            self._add_dated("users", int(year), user_id, weight, user_name, int(count))
+
+    def _add_dated(
+        self, kind: str, year: int, item_id: int, weight: bytes, value, count
+    ):
+        """Count an item for the current year, or keep it for a later one."""
+        if year == self.year:
+            self._boards[kind, True].add(item_id, weight, value, count)
+        elif year > self.year and not self._fixed_year:
+            self._later.setdefault((kind, year), Counter())[
+                item_id, weight, value
+            ] += count
+
+    def _roll_over(self):
+        """Start the current-year boards over if the clock is in a later year."""
+        if self._fixed_year or not self.loaded:
+            return
+        year = self._clock().year
+        if year <= self.year:
+            return
+        self.year = year
+        for kind in ("songs", "users"):
+            board = self._boards[kind, True]
+            board.clear()
+            counted = self._later.pop((kind, year), Counter())
+            for (item_id, weight, value), count in counted.items():
+                board.add(item_id, weight, value, count)
+        self._later = {key: c for key, c in self._later.items() if key[1] > year}
+
+    def clear(self):
+        """Empty the leaderboards, as after the ratings are deleted."""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        for board in self._boards.values():
+            board.clear()
+        self._song_ids.clear()
+        self._user_ids.clear()
+        self._later.clear()
+
+    def most_rated_songs(
+        self, n: int, this_year: bool = False
+    ) -> List[Tuple[str, str, int]]:
+        """Top n (song title, artist name, number of ratings), like get_most_rated_songs."""
+        with self._lock:
+            self._roll_over()
+            top = self._boards["songs", this_year].top(n)
+        return [(title, artist, count) for (title, artist), count in top]
+
+    def most_engaged_users(
+        self, n: int, this_year: bool = False
+    ) -> List[Tuple[str, int]]:
+        """Top n (username, number of ratings), like get_most_engaged_users."""
+        with self._lock:
+            self._roll_over()
+            return self._boards["users", this_year].top(n)
+
+    def song_rank(
+        self, artist_name: str, song_title: str, this_year: bool = False, mydb=None
+    ) -> Optional[int]:
+        """
+        1-based position of a song in most_rated_songs, None if unrated.
+        Names are matched as the database stores them; with mydb, other
+        spellings are looked up in the database, which decides if they name
+        the same song.
+        """
+        with self._lock:
+            song_id = self._song_ids.get((artist_name, song_title))
+        if song_id is None and mydb is not None:
+            song_id = _lookup_id(
+                mydb,
+                """
+                SELECT s.song_id FROM Songs s
+                JOIN Artists a ON s.artist_id = a.artist_id
+                WHERE a.artist_name = %s AND s.song_title = %s
+            """,
+                (artist_name, song_title),
+            )
+        with self._lock:
+            self._roll_over()
+            if song_id is None:
+                return None
+            return self._boards["songs", this_year].rank(song_id)
+
+    def user_rank(
+        self, user_name: str, this_year: bool = False, mydb=None
+    ) -> Optional[int]:
+        """
+        1-based position of a user in most_engaged_users, None if inactive.
+        Names are matched like in song_rank.
+        """
+        with self._lock:
+            user_id = self._user_ids.get(user_name)
+        if user_id is None and mydb is not None:
+            user_id = _lookup_id(
+                mydb, "SELECT user_id FROM Users WHERE user_name = %s", (user_name,)
+            )
+        with self._lock:
+            self._roll_over()
+            if user_id is None:
+                return None
+            return self._boards["users", this_year].rank(user_id)
+
+
+def _lookup_id(mydb, sql: str, params: tuple) -> Optional[int]:
+    """First column of the first row of a query, None if there is none."""
+    cursor = mydb.cursor()
+    try:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    return None if row is None else row[0]
+
+
+def enable_leaderboards(
+    mydb, leaderboards: Optional[Leaderboards] = None
+) -> Leaderboards:
+    """
+    Attach Leaderboards to a connection; the ratings pipeline then keeps them
+    current. They are loaded from the database if they are not loaded yet.
+    The same Leaderboards can be shared by several connections.
+
+    Args:
+        mydb: database connection
+        leaderboards: leaderboards to attach, new ones if None
+
+    Returns:
+        Leaderboards: the attached leaderboards
+    """
+    if leaderboards is None:
+        leaderboards = Leaderboards()
+    if not leaderboards.loaded:
+        leaderboards.load(mydb)
+    _leaderboards[_underlying(mydb)] = leaderboards
+    return leaderboards
+
+
+def disable_leaderboards(mydb):
+    """Detach the Leaderboards of a connection, if any."""
+    _leaderboards.pop(_underlying(mydb), None)
+
+
+def get_leaderboards(mydb) -> Optional[Leaderboards]:
+    """Return the Leaderboards attached to a connection, or None."""
+    return _leaderboards.get(_underlying(mydb))
+
+
+def _table_name(value) -> str:
+    """Table names from SHOW TABLES and information_schema may be bytes."""
+    return value.decode() if isinstance(value, (bytes, bytearray)) else str(value)
+
+
+def _foreign_key_graph(cursor) -> dict:
+    """
+    Map every table of the database to the set of tables it references.
+    Tables whose name starts with an underscore (e.g. the shadow tables of
+    music_db_migrate) are left out.
+    """
+    cursor.execute("SHOW TABLES")
+    graph = {_table_name(row[0]): set() for row in cursor.fetchall()}
+    cursor.execute(
+        """
+        SELECT TABLE_NAME, REFERENCED_TABLE_NAME
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL
+    """
+    )
+    for table, referenced in cursor.fetchall():
+        table, referenced = _table_name(table), _table_name(referenced)
+        if table in graph and referenced != table:
+            graph[table].add(referenced)
+    return {table: refs for table, refs in graph.items() if not table.startswith("_")}
+
+
+def _clear_order(graph: dict, tables: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    The tables to clear, each before the tables it references: tables and
+    every table that references one of them, directly or not, or all the
+    tables of graph if tables is None.
+
+    Raises:
+        ValueError: for an unknown table or a cycle of foreign keys
+    """
+    if tables is None:
+        selected = set(graph)
+    else:
+        selected = set(tables)
+        unknown = selected - set(graph)
+        if unknown:
+            raise ValueError(f"Unknown tables: {', '.join(sorted(unknown))}")
+        dependents = selected
+        while dependents:
+            dependents = {t for t, refs in graph.items() if refs & selected} - selected
+            selected |= dependents
+
+    order = []
+    while selected:
+        # Tables no other remaining table references
+        leaves = sorted(
+            t for t in selected if not any(t in graph[o] for o in selected - {t})
+        )
+        if not leaves:
+            raise ValueError(f"Foreign key cycle between {', '.join(sorted(selected))}")
+        order.extend(leaves)
+        selected.difference_update(leaves)
+    return order
+
+
+def _stale_rollups(cleared: Set[str], graph: dict) -> List[Callable]:
+    """The rebuild functions of the rollups computed from cleared tables."""
+    rollups = [
+        (("SongRatingCounts",), ("Ratings",), rebuild_song_rating_counts),
+        # Its triggers do not fire on TRUNCATE
+        (("GenreStats",), ("SongGenres",), rebuild_genre_stats),
+        (
+            ("ArtistSinglesSummary", "ArtistSingleCounts"),
+            ("Songs",),
+            rebuild_artist_singles,
+        ),
+    ]
+    return [
+        rebuild
+        for targets, sources, rebuild in rollups
+        if cleared.intersection(sources)
+        and not cleared.issuperset(targets)
+        and all(target in graph for target in targets)
+    ]
+
+
+@_instrumented
+def clear_database(
+    mydb, tables: Optional[Iterable[str]] = None, truncate: bool = False
+):
+    """
+    Deletes all the rows from all the tables of the database, or from some
+    tables and the tables that depend on them.
+
+    The order comes from the foreign keys of the database: a table is
+    emptied before the tables it references. By default the rows are
+    deleted in one transaction. truncate=True is much faster on large
+    tables: it turns the foreign key checks off for the session, runs
+    TRUNCATE TABLE on every table (which also restarts AUTO_INCREMENT) and
+    turns them back on. TRUNCATE is not transactional and commits any open
+    transaction; its tables are emptied even if a later one fails.
+
+    When only some tables are cleared, rollup tables computed from them
+    (SongRatingCounts, GenreStats, ArtistSinglesSummary and
+    ArtistSingleCounts) are rebuilt afterwards.
+
+    Args:
+        mydb: database connection
+        tables: names of the tables to clear, together with every table
+            referencing them through a foreign key; all tables if None
+        truncate: use TRUNCATE TABLE instead of DELETE
+
+    Raises:
+        ValueError: if one of tables does not exist
+    """
+    cursor = mydb.cursor()
+    graph = _foreign_key_graph(cursor)
+    order = _clear_order(graph, tables)
+
+    if truncate:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            for table in order:
+                cursor.execute(f"TRUNCATE TABLE {table}")
+        finally:
+            # Restored even if the commit fails, or the pooled session
+            # keeps running without foreign key checks
+            try:
+                mydb.commit()
+            finally:
+                cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    else:
+        for table in order:
+            cursor.execute(f"DELETE FROM {table}")
+        mydb.commit()
+    cursor.close()
+
+    for rebuild in _stale_rollups(set(order), graph):
+        rebuild(mydb)
+
+    cache = get_id_cache(mydb)
+    if cache is not None:
+        cache.clear()
+    results = get_result_cache(mydb)
+    if results is not None:
+        if tables is None:
+            results.clear()
+        else:
+            results.bump(order)
+    leaderboards = get_leaderboards(mydb)
+    if leaderboards is not None and "ratings" in {t.lower() for t in order}:
+        leaderboards.clear()
+
+
+@_instrumented
+def load_single_songs(
+    mydb,
+    single_songs: Iterable[Tuple[str, Tuple[str, ...], str, str]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[Tuple[str, str]]], None]] = None,
+) -> Set[Tuple[str, str]]:
+    """
+    Add single songs to the database.
+
+    The input is staged chunk_size songs at a time in temporary tables and
+    applied with a fixed number of set-based statements, so the number of
+    round trips does not grow with the number of songs. Every chunk is
+    committed on its own.
+
+    Args:
+        mydb: database connection
+
+        single_songs: List of single songs to add. Each single song is a tuple of the form:
+              (song title, genre names, artist name, release date)
+        Genre names is a tuple since a song could belong to multiple genres
+        Release date is of the form yyyy-dd-mm
+        Example 1 single song: ('S1',('Pop',),'A1','2008-10-01') => here song is of genre Pop
+        Example 2 single song: ('S2',('Rock', 'Pop),'A2','2000-02-15') => here song is of genre Rock and Pop
+        Any iterable works, including generators.
+
+        chunk_size: number of songs staged and committed at a time
+
+        on_rejects: optional callback called with the rejects of every chunk
+        once the chunk is committed
+
+    Returns:
+        Set[Tuple[str,str]]: set of (song,artist) for combinations that already exist
+        in the database and were not added (rejected).
+        Set is empty if there are no rejects.
+    """
+    return _load_in_chunks(
+        mydb, _SINGLES_PIPELINE, _chunks(single_songs, chunk_size), on_rejects
+    )
+
+
+def _fill_singles_staging(
+    cursor,
+    single_songs: List[Tuple[str, Tuple[str, ...], str, str]],
+    cache: Optional[IdCache],
+    max_packet: int,
+):
+    """Write a chunk of load_single_songs input to the staging tables."""
+    songs = []
+    song_genres = []
+    for seq, (song_title, genres, artist_name, release_date) in enumerate(single_songs):
+        artist_id = _cached_id(cache, "artist", artist_name)
+        songs.append((seq, song_title, artist_name, release_date, artist_id))
+        for pos, genre_name in enumerate(genres):
+            song_genres.append((seq, pos, genre_name))
+
+    _executemany_chunked(
+        cursor,
+        """
+        INSERT INTO _stage_singles
+            (seq, song_title, artist_name, release_date, artist_id)
+        VALUES (%s, %s, %s, %s, %s)
+    """,
+        songs,
+        max_packet,
+    )
+    _executemany_chunked(
+        cursor,
+        """
+        INSERT INTO _stage_single_genres (seq, pos, genre_name)
+        VALUES (%s, %s, %s)
+    """,
+        song_genres,
+        max_packet,
+    )
+
+
+def _apply_staged_singles(cursor) -> Set[Tuple[str, str]]:
+    """
+    Move the rows of _stage_singles/_stage_single_genres into the real tables.
+
+    A staged song is rejected if the artist already has a song with that title,
+    or if an earlier row of the same batch used the same (title, artist) pair,
+    which is what inserting the rows one by one would do.
+    Comparisons happen in SQL so they follow the column collations.
+    """
+    # Every artist of the batch ends up in the database: a song can only be
+    # rejected if its artist already exists or was created earlier in the batch
+    _resolve_staged_artists(cursor, "_stage_singles")
+
+    cursor.execute(
+        """
+        SELECT seq, song_title, artist_name
+        FROM (
+            SELECT seq, song_title, artist_name, artist_id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY artist_id, song_title ORDER BY seq
+                   ) AS rn
+            FROM _stage_singles
+        ) AS st
+        WHERE st.rn > 1
+           OR EXISTS (
+               SELECT 1 FROM Songs s
+               WHERE s.artist_id = st.artist_id AND s.song_title = st.song_title
+           )
+    """
+    )
+    rejected_rows = cursor.fetchall()
+    _mark_staged_rejects(cursor, "_stage_singles", [row[0] for row in rejected_rows])
+
+    # Genres are only created for songs that are actually added
+    cursor.execute(
+        """
+        INSERT INTO Genres (genre_name)
+        SELECT genre_name
+        FROM (
+            SELECT g.genre_name, g.seq, g.pos,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY g.genre_name ORDER BY g.seq, g.pos
+                   ) AS rn
+            FROM _stage_single_genres g
+            JOIN _stage_singles st ON st.seq = g.seq
+            WHERE st.rejected = 0
+        ) AS sg
+        WHERE sg.rn = 1
+          AND NOT EXISTS (
+              SELECT 1 FROM Genres gn WHERE gn.genre_name = sg.genre_name
+          )
+        ORDER BY sg.seq, sg.pos
+    """
+    )
+
+    # Insert songs (album_id is NULL for singles)
+    cursor.execute(
+        """
+        INSERT INTO Songs (song_title, artist_id, album_id, release_date)
+        SELECT song_title, artist_id, NULL, release_date
+        FROM _stage_singles
+        WHERE rejected = 0
+        ORDER BY seq
+    """
+    )
+
+    # Link songs to genres
+    cursor.execute(
+        """
+        INSERT INTO SongGenres (song_id, genre_id)
+        SELECT s.song_id, gn.genre_id
+        FROM _stage_single_genres g
+        JOIN _stage_singles st ON st.seq = g.seq
+        JOIN Songs s ON s.artist_id = st.artist_id AND s.song_title = st.song_title
+        JOIN Genres gn ON gn.genre_name = g.genre_name
+        WHERE st.rejected = 0
+    """
+    )
+    _add_staged_artist_singles(cursor)
+
+    return {(row[1], row[2]) for row in rejected_rows}
+
+
+def _remember_singles(cursor, cache: IdCache):
+    """Copy the artist, genre and song ids of the applied chunk into the cache."""
+    cursor.execute("SELECT DISTINCT artist_name, artist_id FROM _stage_singles")
+    for artist_name, artist_id in cursor.fetchall():
+        cache.put("artist", artist_name, artist_id)
+
+    cursor.execute(
+        """
+        SELECT DISTINCT g.genre_name, gn.genre_id
+        FROM _stage_single_genres g
+        JOIN Genres gn ON gn.genre_name = g.genre_name
+    """
+    )
+    for genre_name, genre_id in cursor.fetchall():
+        cache.put("genre", genre_name, genre_id)
+
+    cache.forget_missing("song")
+    cursor.execute(
+        """
+        SELECT st.artist_name, st.song_title, s.song_id
+        FROM _stage_singles st
+        JOIN Songs s ON s.artist_id = st.artist_id AND s.song_title = st.song_title
+        WHERE st.rejected = 0
+    """
+    )
+    for artist_name, song_title, song_id in cursor.fetchall():
+        cache.put("song", (artist_name, song_title), song_id)
+
+
+_SINGLES_PIPELINE = {
+    "staging": _SINGLES_STAGING,
+    "fill": _fill_singles_staging,
+    "apply": _apply_staged_singles,
+    "remember": _remember_singles,
+    "tables": (
+        "Artists",
+        "Genres",
+        "GenreStats",
+        "Songs",
+        "SongGenres",
+        "ArtistSinglesSummary",
+        "ArtistSingleCounts",
+    ),
+}
+
+
+# ---------------------------------------------------------------------------
+# Date ranges
+#
+# Range filters compare the date columns with half-open [start, end) bounds
+# instead of wrapping them in YEAR(), so the optimizer can use the date
+# indexes from db_files/migrations/001_date_range_indexes.sql.
+# ---------------------------------------------------------------------------
+
+DateLike = Union[date, str]
+
+
+def _year_bounds(first_year: int, last_year: int) -> Tuple[date, date]:
+    """Half-open date bounds covering the years first_year..last_year."""
+    start = date(min(max(first_year, MINYEAR), MAXYEAR), 1, 1)
+    end = date(min(max(last_year + 1, MINYEAR), MAXYEAR), 1, 1)
+    return start, end
+
+
+def _date_bounds(start_date: DateLike, end_date: DateLike) -> Tuple[date, date]:
+    """Half-open date bounds covering start_date..end_date, both inclusive."""
+    start = _as_date(start_date)
+    end = _as_date(end_date)
+    return start, (end + timedelta(days=1) if end < date.max else end)
+
+
+def _as_date(value: DateLike) -> date:
+    """Accept a date or a 'YYYY-MM-DD' string."""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+
+@_instrumented
+@_cached_result("Artists", "ArtistSingleCounts")
+def get_most_prolific_individual_artists(
+    mydb, n: int, year_range: Tuple[int, int]
+) -> List[Tuple[str, int]]:
+    """
+    Get the top n most prolific individual artists by number of singles released in a year range.
+    Break ties by alphabetical order of artist name.
+
+    Args:
+        mydb: database connection
+        n: how many to get
+        year_range: tuple, e.g. (2015,2020)
+
+    Returns:
+        List[Tuple[str,int]]: list of (artist name, number of songs) tuples.
+        If there are fewer than n artists, all of them are returned.
+        If there are no artists, an empty list is returned.
+
+    The counts are read from the ArtistSingleCounts summary, one row per
+    artist and year, instead of from the Songs table.
+    """
+    cursor = mydb.cursor()
+
+    cursor.execute(
+        """
+        SELECT a.artist_name, c.num_singles
+        FROM (
+            SELECT artist_id, SUM(num_singles) AS num_singles
+            FROM ArtistSingleCounts
+            WHERE release_year BETWEEN %s AND %s
+            GROUP BY artist_id
+        ) AS c
+        JOIN Artists a ON c.artist_id = a.artist_id
+        WHERE c.num_singles > 0
+        ORDER BY c.num_singles DESC, a.artist_name ASC
+        LIMIT %s
+    """,
+        (year_range[0], year_range[1], n),
+    )
+
+    results = [(row[0], int(row[1])) for row in cursor.fetchall()]
+    cursor.close()
+    return results
+
+
+@_instrumented
+@_cached_result("Artists", "Songs")
+def get_most_prolific_individual_artists_between(
+    mydb, n: int, start_date: DateLike, end_date: DateLike
+) -> List[Tuple[str, int]]:
+    """
+    Same as get_most_prolific_individual_artists, for singles released between
+    two dates instead of a range of whole years.
+
+    Args:
+        mydb: database connection
+        n: how many to get
+        start_date: first release date counted, date or 'YYYY-MM-DD'
+        end_date: last release date counted (inclusive), date or 'YYYY-MM-DD'
+
+    Returns:
+        List[Tuple[str,int]]: list of (artist name, number of songs) tuples.
+    """
+    return _most_prolific_individual_artists(
+        mydb, n, *_date_bounds(start_date, end_date)
+    )
+
+
+def _most_prolific_individual_artists(
+    mydb, n: int, start: date, end: date
+) -> List[Tuple[str, int]]:
+    """Top n artists by singles released in [start, end)."""
+    cursor = mydb.cursor()
+
+    # Singles are songs with album_id NULL
+    cursor.execute(
+        """
+        SELECT a.artist_name, COUNT(*) as num_singles
+        FROM Songs s
+        JOIN Artists a ON s.artist_id = a.artist_id
+        WHERE s.album_id IS NULL
+          AND s.release_date >= %s AND s.release_date < %s
+        GROUP BY a.artist_id, a.artist_name
+        ORDER BY num_singles DESC, a.artist_name ASC
+        LIMIT %s
+    """,
+        (start, end, n),
+    )
+
+    results = [(row[0], row[1]) for row in cursor.fetchall()]
+    cursor.close()
+    return results
+
+
+@_instrumented
+@_cached_result("Artists", "ArtistSinglesSummary")
+def get_artists_last_single_in_year(mydb, year: int) -> Set[str]:
+    """
+    Get all artists who released their last single in the given year.
+
+    Args:
+        mydb: database connection
+        year: year of last release
+
+    Returns:
+        Set[str]: set of artist names
+        If there is no artist with a single released in the given year, an empty set is returned.
+
+    Answered from the ArtistSinglesSummary table by an index lookup on the
+    year of each artist's last single.
+    """
+    cursor = mydb.cursor()
+
+    cursor.execute(
+        """
+        SELECT a.artist_name
+        FROM ArtistSinglesSummary ss
+        JOIN Artists a ON ss.artist_id = a.artist_id
+        WHERE ss.last_single_year = %s
+    """,
+        (year,),
+    )
+
+    results = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return results
+
+
+@_instrumented
+def load_albums(
+    mydb,
+    albums: Iterable[Tuple[str, str, str, str, Iterable[str]]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[Tuple[str, str]]], None]] = None,
+) -> Set[Tuple[str, str]]:
+    """
+    Add albums to the database.
+
+    The album headers and the flattened (album, track) list are staged in
+    temporary tables chunk_size albums at a time; Albums, Songs and SongGenres
+    are then filled with one set-based statement each and the chunk is
+    committed.
+
+    Args:
+        mydb: database connection
+
+        albums: List of albums to add. Each album is a tuple of the form:
+              (album title, genre, artist name, release date, list of song titles)
+        Release date is of the form yyyy-dd-mm
+        Example album: ('Album1','Jazz','A1','2008-10-01',['s1','s2','s3','s4','s5','s6'])
+        Any iterable works for the albums as well as for the song titles of an
+        album; song titles are streamed to the server as they are read.
+
+        chunk_size: number of albums staged and committed at a time
+
+        on_rejects: optional callback called with the rejects of every chunk
+        once the chunk is committed
+
+    Returns:
+        Set[Tuple[str,str]: set of (album, artist) combinations that were not added (rejected)
+        because the artist already has an album of the same title.
+        Set is empty if there are no rejects.
+    """
+    return _load_in_chunks(
+        mydb, _ALBUMS_PIPELINE, _chunks(albums, chunk_size), on_rejects
+    )
+
+
+def _fill_albums_staging(
+    cursor,
+    albums: List[Tuple[str, str, str, str, Iterable[str]]],
+    cache: Optional[IdCache],
+    max_packet: int,
+):
+    """Write a chunk of load_albums input to the staging tables."""
+    _executemany_chunked(
+        cursor,
+        """
+        INSERT INTO _stage_albums
+            (seq, album_name, genre_name, artist_name, release_date,
+             artist_id, genre_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """,
+        (
+            (
+                seq,
+                album_name,
+                genre_name,
+                artist_name,
+                release_date,
+                _cached_id(cache, "artist", artist_name),
+                _cached_id(cache, "genre", genre_name),
+            )
+            for seq, (
+                album_name,
+                genre_name,
+                artist_name,
+                release_date,
+                _,
+            ) in enumerate(albums)
+        ),
+        max_packet,
+    )
+    # Track lists may be lazy, so they are only read here, one album at a time
+    _executemany_chunked(
+        cursor,
+        """
+        INSERT INTO _stage_album_tracks (seq, pos, song_title)
+        VALUES (%s, %s, %s)
+    """,
+        (
+            (seq, pos, song_title)
+            for seq, album in enumerate(albums)
+            for pos, song_title in enumerate(album[4])
+        ),
+        max_packet,
+    )
+
+
+def _apply_staged_albums(cursor) -> Set[Tuple[str, str]]:
+    """
+    Move the rows of _stage_albums/_stage_album_tracks into the real tables.
+
+    An album is rejected if its artist already has an album with that name,
+    or if an earlier album of the batch has the same (album, artist) pair.
+    Albums, their songs and the song genres are each created by one
+    INSERT ... SELECT, with the tracks fanned out in SQL.
+    """
+    # The artist is created even for rejected albums, as before
+    _resolve_staged_artists(cursor, "_stage_albums")
+
+    cursor.execute(
+        """
+        SELECT seq, album_name, artist_name
+        FROM (
+            SELECT seq, album_name, artist_name, artist_id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY artist_id, album_name ORDER BY seq
+                   ) AS rn
+            FROM _stage_albums
+        ) AS st
+        WHERE st.rn > 1
+           OR EXISTS (
+               SELECT 1 FROM Albums al
+               WHERE al.artist_id = st.artist_id AND al.album_name = st.album_name
+           )
+    """
+    )
+    rejected_rows = cursor.fetchall()
+    _mark_staged_rejects(cursor, "_stage_albums", [row[0] for row in rejected_rows])
+
+    # Insert or get the genre of every album that is added
+    cursor.execute(
+        """
+        INSERT INTO Genres (genre_name)
+        SELECT genre_name
+        FROM (
+            SELECT genre_name, seq,
+                   ROW_NUMBER() OVER (PARTITION BY genre_name ORDER BY seq) AS rn
+            FROM _stage_albums
+            WHERE rejected = 0
+        ) AS st
+        WHERE st.rn = 1
+          AND NOT EXISTS (
+              SELECT 1 FROM Genres g WHERE g.genre_name = st.genre_name
+          )
+        ORDER BY st.seq
+    """
+    )
+    cursor.execute(
+        """
+        UPDATE _stage_albums
+        SET genre_id = (
+            SELECT g.genre_id FROM Genres g
+            WHERE g.genre_name = _stage_albums.genre_name
+        )
+        WHERE rejected = 0 AND genre_id IS NULL
+    """
+    )
+
+    # Insert albums
+    cursor.execute(
+        """
+        INSERT INTO Albums (album_name, artist_id, release_date, genre_id)
+        SELECT album_name, artist_id, release_date, genre_id
+        FROM _stage_albums
+        WHERE rejected = 0
+        ORDER BY seq
+    """
+    )
+
+    # Insert the songs of every album
+    cursor.execute(
+        """
+        INSERT INTO Songs (song_title, artist_id, album_id, release_date)
+        SELECT t.song_title, st.artist_id, al.album_id, st.release_date
+        FROM _stage_album_tracks t
+        JOIN _stage_albums st ON st.seq = t.seq
+        JOIN Albums al ON al.artist_id = st.artist_id AND al.album_name = st.album_name
+        WHERE st.rejected = 0
+        ORDER BY t.seq, t.pos
+    """
+    )
+
+    # Link songs to their album's genre
+    cursor.execute(
+        """
+        INSERT INTO SongGenres (song_id, genre_id)
+        SELECT s.song_id, st.genre_id
+        FROM _stage_album_tracks t
+        JOIN _stage_albums st ON st.seq = t.seq
+        JOIN Songs s ON s.artist_id = st.artist_id AND s.song_title = t.song_title
+        WHERE st.rejected = 0
+    """
+    )
+
+    return {(row[1], row[2]) for row in rejected_rows}
+
+
+def _remember_albums(cursor, cache: IdCache):
+    """Copy the artist, genre and song ids of the applied chunk into the cache."""
+    cursor.execute(
+        """
+        SELECT DISTINCT artist_name, artist_id, genre_name, genre_id
+        FROM _stage_albums
+    """
+    )
+    for artist_name, artist_id, genre_name, genre_id in cursor.fetchall():
+        cache.put("artist", artist_name, artist_id)
+        if genre_id is not None:
+            cache.put("genre", genre_name, genre_id)
+
+    cache.forget_missing("song")
+    cursor.execute(
+        """
+        SELECT st.artist_name, t.song_title, s.song_id
+        FROM _stage_album_tracks t
+        JOIN _stage_albums st ON st.seq = t.seq
+        JOIN Songs s ON s.artist_id = st.artist_id AND s.song_title = t.song_title
+        WHERE st.rejected = 0
+    """
+    )
+    for artist_name, song_title, song_id in cursor.fetchall():
+        cache.put("song", (artist_name, song_title), song_id)
+
+
+_ALBUMS_PIPELINE = {
+    "staging": _ALBUMS_STAGING,
+    "fill": _fill_albums_staging,
+    "apply": _apply_staged_albums,
+    "remember": _remember_albums,
+    "tables": ("Artists", "Genres", "GenreStats", "Albums", "Songs", "SongGenres"),
+}
+
+
+@_instrumented
+@_cached_result("GenreStats")
+def get_top_song_genres(mydb, n: int) -> List[Tuple[str, int]]:
+    """
+    Get n genres that are most represented in terms of number of songs in that genre.
+    Songs include singles as well as songs in albums.
+
+    Args:
+        mydb: database connection
+        n: number of genres
+
+    Returns:
+        List[Tuple[str,int]]: list of tuples (genre,number_of_songs), from most represented to
+        least represented genre. If number of genres is less than n, returns all.
+        Ties broken by alphabetical order of genre names.
+
+    The counts are read from GenreStats, which triggers keep current, along
+    its (num_songs DESC, genre_name) index, so at most n rows are read.
+    """
+    cursor = mydb.cursor()
+
+    cursor.execute(
+        """
+        SELECT genre_name, num_songs
+        FROM GenreStats
+        WHERE num_songs > 0
+        ORDER BY num_songs DESC, genre_name ASC
+        LIMIT %s
+    """,
+        (n,),
+    )
+
+    results = [(row[0], row[1]) for row in cursor.fetchall()]
+    cursor.close()
+    return results
+
+
+@_instrumented
+@_cached_result("Artists", "Songs")
+def get_album_and_single_artists(mydb) -> Set[str]:
+    """
+    Get artists who have released albums as well as singles.
+
+    Args:
+        mydb; database connection
+
+    Returns:
+        Set[str]: set of artist names
+    """
+    cursor = mydb.cursor()
+
+    cursor.execute(
+        """
+        SELECT DISTINCT a.artist_name
+        FROM Artists a
+        WHERE EXISTS (
+            SELECT 1 FROM Songs s
+            WHERE s.artist_id = a.artist_id AND s.album_id IS NULL
+        )
+        AND EXISTS (
+            SELECT 1 FROM Songs s2
+            WHERE s2.artist_id = a.artist_id AND s2.album_id IS NOT NULL
+        )
+    """
+    )
+
+    results = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return results
+
+
+@_instrumented
+def load_users(
+    mydb,
+    users: Iterable[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[str]], None]] = None,
+) -> Set[str]:
+    """
+    Add users to the database.
+
+    Usernames are staged chunk_size at a time and every chunk is committed
+    on its own.
+
+    Args:
+        mydb: database connection
+        users: list (or any iterable) of usernames
+        chunk_size: number of usernames staged and committed at a time
+        on_rejects: optional callback called with the rejects of every chunk
+            once the chunk is committed
+
+    Returns:
+        Set[str]: set of all usernames that were not added (rejected) because
+        they are duplicates of existing users.
+        Set is empty if there are no rejects.
+    """
+    return _load_in_chunks(
+        mydb, _USERS_PIPELINE, _chunks(users, chunk_size), on_rejects
+    )
+
+
+def _fill_users_staging(
+    cursor, users: List[str], cache: Optional[IdCache], max_packet: int
+):
+    """Write a chunk of load_users input to the staging table."""
+    _executemany_chunked(
+        cursor,
+        "INSERT INTO _stage_users (seq, user_name) VALUES (%s, %s)",
+        enumerate(users),
+        max_packet,
+    )
+
+
+def _apply_staged_users(cursor) -> Set[str]:
+    """
+    Insert the staged usernames that are not taken yet.
+    A username repeated inside the batch is only added once.
+    """
+    cursor.execute(
+        """
+        SELECT seq, user_name
+        FROM (
+            SELECT seq, user_name,
+                   ROW_NUMBER() OVER (PARTITION BY user_name ORDER BY seq) AS rn
+            FROM _stage_users
+        ) AS st
+        WHERE st.rn > 1
+           OR EXISTS (SELECT 1 FROM Users u WHERE u.user_name = st.user_name)
+    """
+    )
+    rejected_rows = cursor.fetchall()
+    _mark_staged_rejects(cursor, "_stage_users", [row[0] for row in rejected_rows])
+
+    cursor.execute(
+        """
+        INSERT INTO Users (user_name)
+        SELECT user_name FROM _stage_users
+        WHERE rejected = 0
+        ORDER BY seq
+    """
+    )
+
+    return {row[1] for row in rejected_rows}
+
+
+def _remember_users(cursor, cache: IdCache):
+    """Copy the ids of the users added by the applied chunk into the cache."""
+    cache.forget_missing("user")
+    cursor.execute(
+        """
+        SELECT st.user_name, u.user_id
+        FROM _stage_users st
+        JOIN Users u ON u.user_name = st.user_name
+        WHERE st.rejected = 0
+    """
+    )
+    for user_name, user_id in cursor.fetchall():
+        cache.put("user", user_name, user_id)
+
+
+_USERS_PIPELINE = {
+    "staging": _USERS_STAGING,
+    "fill": _fill_users_staging,
+    "apply": _apply_staged_users,
+    "remember": _remember_users,
+    "tables": ("Users",),
+}
+
+
+@_instrumented
+def load_song_ratings(
+    mydb,
+    song_ratings: Iterable[Tuple[str, Tuple[str, str], int, str]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[Tuple[str, str, str]]], None]] = None,
+) -> Set[Tuple[str, str, str]]:
+    """
+    Load ratings for songs, which are either singles or songs in albums.
+
+    Ratings are staged chunk_size at a time in a temporary table, validated
+    in SQL and the valid ones are added with a single INSERT ... SELECT per
+    chunk. Every chunk is committed on its own.
+
+    Args:
+        mydb: database connection
+        song_ratings: list of rating tuples of the form:
+            (rater, (artist, song), rating, date)
+
+        The rater is a username, the (artist,song) tuple refers to the uniquely identifiable song to be rated.
+        e.g. ('u1',('a1','song1'),4,'2021-11-18') => u1 is giving a rating of 4 to the (a1,song1) song.
+        Any iterable works, including generators.
+
+        chunk_size: number of ratings staged and committed at a time
+
+        on_rejects: optional callback called with the rejects of every chunk
+        once the chunk is committed
+
+    Returns:
+        Set[Tuple[str,str,str]]: set of (username,artist,song) tuples that are rejected, for any of the following
+        reasongs:
+        (a) username (rater) is not in the database, or
+        (b) username is in database but (artist,song) combination is not in the database, or
+        (c) username has already rated (artist,song) combination, or
+        (d) everything else is legit, but rating is not in range 1..5
+
+        An empty set is returned if there are no rejects.
+    """
+    return _load_in_chunks(
+        mydb, _RATINGS_PIPELINE, _chunks(song_ratings, chunk_size), on_rejects
+    )
+
+
+def _fill_ratings_staging(
+    cursor,
+    song_ratings: List[Tuple[str, Tuple[str, str], int, str]],
+    cache: Optional[IdCache],
+    max_packet: int,
+):
+    """
+    Write a chunk of load_song_ratings input to the staging table.
+    Users and songs known to the cache are staged with their ids, or with
+    their reject reason if the cache knows they do not exist.
+    """
+    rows = []
+    for seq, (username, (artist_name, song_title), rating, rating_date) in enumerate(
+        song_ratings
+    ):
+        user_id = song_id = reason = None
+        if cache is not None:
+            user_id = cache.get("user", username)
+            song_id = cache.get("song", (artist_name, song_title))
+            if user_id is IdCache.MISSING:
+                reason = "a"
+            elif song_id is IdCache.MISSING:
+                reason = "b"
+            if reason is not None:
+                user_id = song_id = None
+        rows.append(
+            (
+                seq,
+                username,
+                artist_name,
+                song_title,
+                rating,
+                rating_date,
+                user_id,
+                song_id,
+                reason,
+            )
+        )
+
+    _executemany_chunked(
+        cursor,
+        """
+        INSERT INTO _stage_ratings
+            (seq, user_name, artist_name, song_title, rating, rating_date,
+             user_id, song_id, reason)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """,
+        rows,
+        max_packet,
+    )
+
+
+def _apply_staged_ratings(cursor) -> Set[Tuple[str, str, str]]:
+    """
+    Validate the rows of _stage_ratings and insert the valid ones into Ratings.
+
+    Every staged row gets the letter of its reject reason from the
+    load_song_ratings docstring in the reason column, or NULL if it is valid.
+    Only a row that passes (a), (b) and (d) counts as the first rating of a
+    (user, song) pair, so later ratings of the same pair are rejected with (c),
+    exactly like inserting the rows one by one.
+    """
+    # Resolve the user and the (artist, song) of every rating
+    cursor.execute(
+        """
+        UPDATE _stage_ratings
+        SET user_id = (
+            SELECT u.user_id FROM Users u
+            WHERE u.user_name = _stage_ratings.user_name
+        )
+        WHERE user_id IS NULL AND reason IS NULL
+    """
+    )
+    cursor.execute(
+        """
+        UPDATE _stage_ratings
+        SET song_id = (
+            SELECT s.song_id FROM Songs s
+            JOIN Artists a ON s.artist_id = a.artist_id
+            WHERE a.artist_name = _stage_ratings.artist_name
+              AND s.song_title = _stage_ratings.song_title
+        )
+        WHERE song_id IS NULL AND user_id IS NOT NULL AND reason IS NULL
+    """
+    )
+    cursor.execute(
+        """
+        UPDATE _stage_ratings
+        SET reason = CASE
+            WHEN user_id IS NULL THEN 'a'
+            WHEN song_id IS NULL THEN 'b'
+            WHEN rating < 1 OR rating > 5 THEN 'd'
+        END
+        WHERE reason IS NULL
+    """
+    )
+
+    # Ratings of a pair that is already rated, or rated earlier in the batch
+    cursor.execute(
+        """
+        SELECT seq
+        FROM (
+            SELECT seq, user_id, song_id,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY user_id, song_id ORDER BY seq
+                   ) AS rn
+            FROM _stage_ratings
+            WHERE reason IS NULL
+        ) AS st
+        WHERE st.rn > 1
+           OR EXISTS (
+               SELECT 1 FROM Ratings r
+               WHERE r.user_id = st.user_id AND r.song_id = st.song_id
+           )
+    """
+    )
+    _mark_staged_rejects(
+        cursor, "_stage_ratings", [row[0] for row in cursor.fetchall()], "reason = 'c'"
+    )
+
+    cursor.execute(
+        """
+        SELECT user_name, artist_name, song_title
+        FROM _stage_ratings
+        WHERE reason IS NOT NULL
+    """
+    )
+    rejected = {(row[0], row[1], row[2]) for row in cursor.fetchall()}
+
+    # Insert all valid ratings at once
+    cursor.execute(
+        """
+        INSERT INTO Ratings (user_id, song_id, rating, rating_date)
+        SELECT user_id, song_id, rating, rating_date
+        FROM _stage_ratings
+        WHERE reason IS NULL
+        ORDER BY seq
+    """
+    )
+    _add_staged_rating_counts(cursor)
+
+    return rejected
+
+
+def _remember_ratings(cursor, cache: IdCache):
+    """Copy the user and song ids resolved for the applied chunk into the cache."""
+    cursor.execute(
+        """
+        SELECT DISTINCT user_name, user_id, artist_name, song_title, song_id, reason
+        FROM _stage_ratings
+    """
+    )
+    for user_name, user_id, artist_name, song_title, song_id, reason in cursor:
+        if reason == "a":
+            cache.put_missing("user", user_name)
+            continue
+        if user_id is not None:
+            cache.put("user", user_name, user_id)
+        if reason == "b":
+            cache.put_missing("song", (artist_name, song_title))
+        elif song_id is not None:
+            cache.put("song", (artist_name, song_title), song_id)
+
+
+def _rank_staged_ratings(cursor, leaderboards: Leaderboards):
+    """Add the valid ratings of the committed chunk to the leaderboards."""
+    cursor.execute(
+        """
+        SELECT st.song_id, s.song_title, a.artist_name,
+               WEIGHT_STRING(s.song_title), st.user_id, u.user_name,
+               WEIGHT_STRING(u.user_name), YEAR(st.rating_date)
+        FROM _stage_ratings st
+        JOIN Songs s ON st.song_id = s.song_id
+        JOIN Artists a ON s.artist_id = a.artist_id
+        JOIN Users u ON st.user_id = u.user_id
+        WHERE st.reason IS NULL
+    """
+    )
+    leaderboards.add_ratings(cursor.fetchall())
+
+
+_RATINGS_PIPELINE = {
+    "staging": _RATINGS_STAGING,
+    "fill": _fill_ratings_staging,
+    "apply": _apply_staged_ratings,
+    "remember": _remember_ratings,
+    "rank": _rank_staged_ratings,
+    "tables": ("Ratings", "SongRatingCounts"),
+}
+
+
+@_instrumented
+@_cached_result("Artists", "Songs", "SongRatingCounts")
+def get_most_rated_songs(
+    mydb, year_range: Tuple[int, int], n: int
+) -> List[Tuple[str, str, int]]:
     """
-    Deletes all the rows from all the tables of the database.
-    If a table has a foreign key to a parent table, it is deleted before
-    deleting the parent table, otherwise the database system will throw an error.
+    Get the top n most rated songs in the given year range (both inclusive),
+    ranked from most rated to least rated.
+    "Most rated" refers to number of ratings, not actual rating scores.
+    Ties are broken in alphabetical order of song title. If the number of rated songs is less
+    than n, all rates songs are returned. Songs with equal titles (by different artists)
+    are ordered by song id.
 
     Args:
         mydb: database connection
+        year_range: range of years, e.g. (2018-2021), during which ratings were given
+        n: number of most rated songs
+
+    Returns:
+        List[Tuple[str,str,int]: list of (song title, artist name, number of ratings for song)
+
+    The counts are read from the SongRatingCounts rollup, one row per song and
+    year, instead of from the Ratings table.
     """
     cursor = mydb.cursor()
 
-    # Delete in order respecting foreign key constraints
-    # Child tables first, then parent tables
-    cursor.execute("DELETE FROM Ratings")
-    cursor.execute("DELETE FROM SongGenres")
-    cursor.execute("DELETE FROM Songs")
-    cursor.execute("DELETE FROM Albums")
-    cursor.execute("DELETE FROM Users")
-    cursor.execute("DELETE FROM Genres")
-    cursor.execute("DELETE FROM Artists")
+    cursor.execute(
+        """
+        SELECT s.song_title, a.artist_name, c.num_ratings
+        FROM (
+            SELECT song_id, SUM(num_ratings) AS num_ratings
+            FROM SongRatingCounts
+            WHERE rating_year BETWEEN %s AND %s
+            GROUP BY song_id
+        ) AS c
+        JOIN Songs s ON c.song_id = s.song_id
+        JOIN Artists a ON s.artist_id = a.artist_id
+        WHERE c.num_ratings > 0
+        ORDER BY c.num_ratings DESC, s.song_title ASC, s.song_id ASC
+        LIMIT %s
+    """,
+        (year_range[0], year_range[1], n),
+    )
 
-    mydb.commit()
+    results = [(row[0], row[1], int(row[2])) for row in cursor.fetchall()]
     cursor.close()
+    return results
 
 
-def load_single_songs(
-    mydb, single_songs: List[Tuple[str, Tuple[str, ...], str, str]]
-) -> Set[Tuple[str, str]]:
+@_instrumented
+@_cached_result("Artists", "Songs", "Ratings")
+def get_most_rated_songs_between(
+    mydb, start_date: DateLike, end_date: DateLike, n: int
+) -> List[Tuple[str, str, int]]:
     """
-    Add single songs to the database.
+    Same as get_most_rated_songs, for ratings given between two dates
+    instead of a range of whole years.
 
     Args:
         mydb: database connection
-
-        single_songs: List of single songs to add. Each single song is a tuple of the form:
-              (song title, genre names, artist name, release date)
-        Genre names is a tuple since a song could belong to multiple genres
-        Release date is of the form yyyy-dd-mm
-        Example 1 single song: ('S1',('Pop',),'A1','2008-10-01') => here song is of genre Pop
-        Example 2 single song: ('S2',('Rock', 'Pop),'A2','2000-02-15') => here song is of genre Rock and Pop
+        start_date: first rating date counted, date or 'YYYY-MM-DD'
+        end_date: last rating date counted (inclusive), date or 'YYYY-MM-DD'
+        n: number of most rated songs
 
     Returns:
-        Set[Tuple[str,str]]: set of (song,artist) for combinations that already exist
-        in the database and were not added (rejected).
-        Set is empty if there are no rejects.
+        List[Tuple[str,str,int]: list of (song title, artist name, number of ratings for song)
     """
-    cursor = mydb.cursor()
-    rejected = set()
+    return _most_rated_songs(mydb, *_date_bounds(start_date, end_date), n)
 
-    for song_title, genres, artist_name, release_date in single_songs:
-        # Check if (song_title, artist) already exists
-        cursor.execute(
-            """
-            SELECT s.song_id FROM Songs s
-            JOIN Artists a ON s.artist_id = a.artist_id
-            WHERE s.song_title = %s AND a.artist_name = %s
-        """,
-            (song_title, artist_name),
-        )
 
-        if cursor.fetchone():
-            rejected.add((song_title, artist_name))
-            continue
+def _most_rated_songs(
+    mydb, start: date, end: date, n: int
+) -> List[Tuple[str, str, int]]:
+    """Top n songs by ratings given in [start, end)."""
+    cursor = mydb.cursor()
 
-        # Insert or get artist
-        cursor.execute(
-            "SELECT artist_id FROM Artists WHERE artist_name = %s", (artist_name,)
-        )
-        result = cursor.fetchone()
-        if result:
-            artist_id = result[0]
-        else:
-            cursor.execute(
-                "INSERT INTO Artists (artist_name) VALUES (%s)", (artist_name,)
-            )
-            artist_id = cursor.lastrowid
+    cursor.execute(
+        """
+        SELECT s.song_title, a.artist_name, COUNT(*) as num_ratings
+        FROM Ratings r
+        JOIN Songs s ON r.song_id = s.song_id
+        JOIN Artists a ON s.artist_id = a.artist_id
+        WHERE r.rating_date >= %s AND r.rating_date < %s
+        GROUP BY s.song_id, s.song_title, a.artist_name
+        ORDER BY num_ratings DESC, s.song_title ASC, s.song_id ASC
+        LIMIT %s
+    """,
+        (start, end, n),
+    )
 
-        # Insert song (album_id is NULL for singles)
-        cursor.execute(
-            """
-            INSERT INTO Songs (song_title, artist_id, album_id, release_date)
-            VALUES (%s, %s, NULL, %s)
-        """,
-            (song_title, artist_id, release_date),
-        )
-        song_id = cursor.lastrowid
+    results = [(row[0], row[1], row[2]) for row in cursor.fetchall()]
+    cursor.close()
+    return results
 
-        # Insert genres and link to song
-        for genre_name in genres:
-            # Insert or get genre
-            cursor.execute(
-                "SELECT genre_id FROM Genres WHERE genre_name = %s", (genre_name,)
-            )
-            result = cursor.fetchone()
-            if result:
-                genre_id = result[0]
-            else:
-                cursor.execute(
-                    "INSERT INTO Genres (genre_name) VALUES (%s)", (genre_name,)
-                )
-                genre_id = cursor.lastrowid
 
-            # Link song to genre
-            cursor.execute(
-                """
-                INSERT INTO SongGenres (song_id, genre_id)
-                VALUES (%s, %s)
-            """,
-                (song_id, genre_id),
-            )
+@_instrumented
+@_cached_result("Users", "Ratings")
+def get_most_engaged_users(
+    mydb, year_range: Tuple[int, int], n: int
+) -> List[Tuple[str, int]]:
+    """
+    Get the top n most engaged users, in terms of number of songs they have rated.
+    Break ties by alphabetical order of usernames.
 
-    mydb.commit()
-    cursor.close()
-    return rejected
+    Args:
+        mydb: database connection
+        year_range: range of years, e.g. (2018-2021), during which ratings were given
+        n: number of users
+
+    Returns:
+        List[Tuple[str, int]]: list of (username,number_of_songs_rated) tuples
+    """
+    return _most_engaged_users(mydb, *_year_bounds(*year_range), n)
 
 
-def get_most_prolific_individual_artists(
-    mydb, n: int, year_range: Tuple[int, int]
+@_instrumented
+@_cached_result("Users", "Ratings")
+def get_most_engaged_users_between(
+    mydb, start_date: DateLike, end_date: DateLike, n: int
 ) -> List[Tuple[str, int]]:
     """
-    Get the top n most prolific individual artists by number of singles released in a year range.
-    Break ties by alphabetical order of artist name.
+    Same as get_most_engaged_users, for ratings given between two dates
+    instead of a range of whole years.
 
     Args:
         mydb: database connection
-        n: how many to get
-        year_range: tuple, e.g. (2015,2020)
+        start_date: first rating date counted, date or 'YYYY-MM-DD'
+        end_date: last rating date counted (inclusive), date or 'YYYY-MM-DD'
+        n: number of users
 
     Returns:
-        List[Tuple[str,int]]: list of (artist name, number of songs) tuples.
-        If there are fewer than n artists, all of them are returned.
-        If there are no artists, an empty list is returned.
+        List[Tuple[str, int]]: list of (username,number_of_songs_rated) tuples
     """
+    return _most_engaged_users(mydb, *_date_bounds(start_date, end_date), n)
+
+
+def _most_engaged_users(mydb, start: date, end: date, n: int) -> List[Tuple[str, int]]:
+    """Top n users by ratings given in [start, end)."""
     cursor = mydb.cursor()
 
-    # Singles are songs with album_id NULL
     cursor.execute(
         """
-        SELECT a.artist_name, COUNT(*) as num_singles
-        FROM Songs s
-        JOIN Artists a ON s.artist_id = a.artist_id
-        WHERE s.album_id IS NULL
-          AND YEAR(s.release_date) BETWEEN %s AND %s
-        GROUP BY a.artist_id, a.artist_name
-        ORDER BY num_singles DESC, a.artist_name ASC
+        SELECT u.user_name, COUNT(*) as num_ratings
+        FROM Ratings r
+        JOIN Users u ON r.user_id = u.user_id
+        WHERE r.rating_date >= %s AND r.rating_date < %s
+        GROUP BY u.user_id, u.user_name
+        ORDER BY num_ratings DESC, u.user_name ASC
         LIMIT %s
     """,
-        (year_range[0], year_range[1], n),
+        (start, end, n),
     )
 
     results = [(row[0], row[1]) for row in cursor.fetchall()]
@@ -156,389 +2988,1100 @@ def get_most_prolific_individual_artists(
     return results
 
 
-def get_artists_last_single_in_year(mydb, year: int) -> Set[str]:
+# ---------------------------------------------------------------------------
+# Rating count rollup
+#
+# SongRatingCounts holds the number of ratings of every song per rating year.
+# The ratings pipeline (load_song_ratings and import_song_ratings) adds the
+# counts of every chunk in the same transaction as the ratings themselves, so
+# get_most_rated_songs reads one row per song and year instead of every
+# rating. Ratings changed by other means need rebuild_song_rating_counts.
+# ---------------------------------------------------------------------------
+
+
+def _add_staged_rating_counts(cursor):
+    """Add the valid ratings of _stage_ratings to SongRatingCounts."""
+    # The derived table lets ON DUPLICATE KEY UPDATE refer to the grouped counts
+    cursor.execute(
+        """
+        INSERT INTO SongRatingCounts (song_id, rating_year, num_ratings)
+        SELECT * FROM (
+            SELECT song_id, YEAR(rating_date) AS rating_year, COUNT(*) AS added
+            FROM _stage_ratings
+            WHERE reason IS NULL
+            GROUP BY song_id, YEAR(rating_date)
+        ) AS st
+        ON DUPLICATE KEY UPDATE num_ratings = num_ratings + st.added
     """
-    Get all artists who released their last single in the given year.
+    )
+
+
+@_instrumented
+def rebuild_song_rating_counts(mydb):
+    """
+    Recompute SongRatingCounts from the Ratings table in one transaction.
+    Readers keep seeing the old counts until it commits.
+
+    Args:
+        mydb: database connection
+    """
+    cursor = mydb.cursor()
+
+    cursor.execute("DELETE FROM SongRatingCounts")
+    cursor.execute(
+        """
+        INSERT INTO SongRatingCounts (song_id, rating_year, num_ratings)
+        SELECT song_id, YEAR(rating_date), COUNT(*)
+        FROM Ratings
+        GROUP BY song_id, YEAR(rating_date)
+    """
+    )
+
+    mydb.commit()
+    cursor.close()
+
+    results = get_result_cache(mydb)
+    if results is not None:
+        results.bump(("SongRatingCounts",))
+
+
+@_instrumented
+def check_song_rating_counts(mydb) -> List[Tuple[int, int, int, int]]:
+    """
+    Compare SongRatingCounts with the counts in the Ratings table.
 
     Args:
         mydb: database connection
-        year: year of last release
 
     Returns:
-        Set[str]: set of artist names
-        If there is no artist with a single released in the given year, an empty set is returned.
+        List[Tuple[int,int,int,int]]: (song_id, rating_year, ratings counted
+        in Ratings, count stored in the rollup) for every song and year that
+        differ, ordered by song and year. An empty list means the rollup is
+        consistent.
     """
     cursor = mydb.cursor()
 
-    # Find artists whose last single was in the given year
     cursor.execute(
         """
-        SELECT a.artist_name
-        FROM Artists a
-        WHERE EXISTS (
-            SELECT 1 FROM Songs s
-            WHERE s.artist_id = a.artist_id
-              AND s.album_id IS NULL
-              AND YEAR(s.release_date) = %s
-        )
-        AND NOT EXISTS (
-            SELECT 1 FROM Songs s2
-            WHERE s2.artist_id = a.artist_id
-              AND s2.album_id IS NULL
-              AND YEAR(s2.release_date) > %s
-        )
-    """,
-        (year, year),
+        SELECT song_id, rating_year, SUM(expected), SUM(stored)
+        FROM (
+            SELECT song_id, YEAR(rating_date) AS rating_year,
+                   COUNT(*) AS expected, 0 AS stored
+            FROM Ratings
+            GROUP BY song_id, YEAR(rating_date)
+            UNION ALL
+            SELECT song_id, rating_year, 0, num_ratings
+            FROM SongRatingCounts
+        ) AS t
+        GROUP BY song_id, rating_year
+        HAVING SUM(expected) <> SUM(stored)
+        ORDER BY song_id, rating_year
+    """
     )
 
-    results = {row[0] for row in cursor.fetchall()}
+    results = [(row[0], row[1], int(row[2]), int(row[3])) for row in cursor.fetchall()]
     cursor.close()
     return results
 
 
-def load_albums(
-    mydb, albums: List[Tuple[str, str, str, str, List[str]]]
-) -> Set[Tuple[str, str]]:
+# ---------------------------------------------------------------------------
+# Genre song counts
+#
+# GenreStats holds the number of songs of every genre. Unlike the rating
+# counts it is maintained by triggers on Genres and SongGenres (see
+# schema.sql), so writes that bypass this module keep it current too. Only a
+# gap in the triggers (e.g. a restored dump) needs rebuild_genre_stats.
+# ---------------------------------------------------------------------------
+
+
+@_instrumented
+def rebuild_genre_stats(mydb, genre_ids: Optional[Iterable[int]] = None):
     """
-    Add albums to the database.
+    Recompute GenreStats from Genres and SongGenres in one transaction.
 
     Args:
         mydb: database connection
-
-        albums: List of albums to add. Each album is a tuple of the form:
-              (album title, genre, artist name, release date, list of song titles)
-        Release date is of the form yyyy-dd-mm
-        Example album: ('Album1','Jazz','A1','2008-10-01',['s1','s2','s3','s4','s5','s6'])
-
-    Returns:
-        Set[Tuple[str,str]: set of (album, artist) combinations that were not added (rejected)
-        because the artist already has an album of the same title.
-        Set is empty if there are no rejects.
+        genre_ids: recompute only these genres, e.g. the ones a load with
+            deferred triggers (see music_db_parallel) wrote; all if None
     """
     cursor = mydb.cursor()
-    rejected = set()
 
-    for album_name, genre_name, artist_name, release_date, song_titles in albums:
-        # Insert or get artist
+    if genre_ids is None:
+        cursor.execute("DELETE FROM GenreStats")
         cursor.execute(
-            "SELECT artist_id FROM Artists WHERE artist_name = %s", (artist_name,)
+            """
+            INSERT INTO GenreStats (genre_id, genre_name, num_songs)
+            SELECT g.genre_id, g.genre_name, COUNT(sg.song_id)
+            FROM Genres g
+            LEFT JOIN SongGenres sg ON sg.genre_id = g.genre_id
+            GROUP BY g.genre_id, g.genre_name
+        """
         )
-        result = cursor.fetchone()
-        if result:
-            artist_id = result[0]
-        else:
+    else:
+        genre_ids = list(genre_ids)
+        for i in range(0, len(genre_ids), _SEQ_LIST_SIZE):
+            chunk = genre_ids[i : i + _SEQ_LIST_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
             cursor.execute(
-                "INSERT INTO Artists (artist_name) VALUES (%s)", (artist_name,)
+                f"""
+                INSERT INTO GenreStats (genre_id, genre_name, num_songs)
+                SELECT * FROM (
+                    SELECT g.genre_id, g.genre_name, COUNT(sg.song_id) AS counted
+                    FROM Genres g
+                    LEFT JOIN SongGenres sg ON sg.genre_id = g.genre_id
+                    WHERE g.genre_id IN ({placeholders})
+                    GROUP BY g.genre_id, g.genre_name
+                ) AS c
+                ON DUPLICATE KEY UPDATE num_songs = c.counted
+            """,
+                tuple(chunk),
             )
-            artist_id = cursor.lastrowid
 
-        # Check if (album_name, artist) already exists
-        cursor.execute(
-            """
-            SELECT album_id FROM Albums
-            WHERE album_name = %s AND artist_id = %s
-        """,
-            (album_name, artist_id),
-        )
+    mydb.commit()
+    cursor.close()
 
-        if cursor.fetchone():
-            rejected.add((album_name, artist_name))
-            continue
+    results = get_result_cache(mydb)
+    if results is not None:
+        results.bump(("GenreStats",))
 
-        # Insert or get genre
-        cursor.execute(
-            "SELECT genre_id FROM Genres WHERE genre_name = %s", (genre_name,)
-        )
-        result = cursor.fetchone()
-        if result:
-            genre_id = result[0]
-        else:
-            cursor.execute("INSERT INTO Genres (genre_name) VALUES (%s)", (genre_name,))
-            genre_id = cursor.lastrowid
 
-        # Insert album
-        cursor.execute(
-            """
-            INSERT INTO Albums (album_name, artist_id, release_date, genre_id)
-            VALUES (%s, %s, %s, %s)
-        """,
-            (album_name, artist_id, release_date, genre_id),
-        )
-        album_id = cursor.lastrowid
+@_instrumented
+def check_genre_stats(mydb) -> List[Tuple[int, int, int]]:
+    """
+    Compare GenreStats with the songs counted in SongGenres.
+
+    Args:
+        mydb: database connection
+
+    Returns:
+        List[Tuple[int,int,int]]: (genre_id, songs counted in SongGenres,
+        count stored in GenreStats) for every genre that differs, including
+        genres missing from GenreStats, ordered by genre. An empty list means
+        the counts are consistent.
+    """
+    cursor = mydb.cursor()
+
+    cursor.execute(
+        """
+        SELECT g.genre_id, COUNT(sg.song_id), gs.num_songs
+        FROM Genres g
+        LEFT JOIN SongGenres sg ON sg.genre_id = g.genre_id
+        LEFT JOIN GenreStats gs ON gs.genre_id = g.genre_id
+        GROUP BY g.genre_id, gs.num_songs
+        HAVING NOT (COUNT(sg.song_id) <=> gs.num_songs)
+        ORDER BY g.genre_id
+    """
+    )
+
+    results = [(row[0], row[1], row[2]) for row in cursor.fetchall()]
+    cursor.close()
+    return results
 
-        # Insert songs in the album
-        for song_title in song_titles:
-            cursor.execute(
-                """
-                INSERT INTO Songs (song_title, artist_id, album_id, release_date)
-                VALUES (%s, %s, %s, %s)
-            """,
-                (song_title, artist_id, album_id, release_date),
-            )
-            song_id = cursor.lastrowid
 
-            # Link song to album's genre
-            cursor.execute(
-                """
-                INSERT INTO SongGenres (song_id, genre_id)
-                VALUES (%s, %s)
-            """,
-                (song_id, genre_id),
-            )
+# ---------------------------------------------------------------------------
+# Artist singles summary
+#
+# ArtistSinglesSummary holds the date (and year) of every artist's last
+# single and ArtistSingleCounts the number of singles per artist and release
+# year. The singles pipeline (load_single_songs and import_single_songs)
+# updates both in the same transaction as the songs, so
+# get_artists_last_single_in_year and get_most_prolific_individual_artists
+# do not scan Songs. Singles changed by other means need
+# rebuild_artist_singles.
+# ---------------------------------------------------------------------------
 
-    mydb.commit()
-    cursor.close()
-    return rejected
+
+def _add_staged_artist_singles(cursor):
+    """Add the accepted singles of _stage_singles to the artist summaries."""
+    cursor.execute(
+        """
+        INSERT INTO ArtistSingleCounts (artist_id, release_year, num_singles)
+        SELECT * FROM (
+            SELECT artist_id, YEAR(release_date) AS release_year, COUNT(*) AS added
+            FROM _stage_singles
+            WHERE rejected = 0
+            GROUP BY artist_id, YEAR(release_date)
+        ) AS st
+        ON DUPLICATE KEY UPDATE num_singles = num_singles + st.added
+    """
+    )
+    # The year is assigned first, while last_single_date still holds the old date
+    cursor.execute(
+        """
+        INSERT INTO ArtistSinglesSummary
+            (artist_id, last_single_date, last_single_year)
+        SELECT * FROM (
+            SELECT artist_id, MAX(release_date) AS last_date,
+                   YEAR(MAX(release_date)) AS last_year
+            FROM _stage_singles
+            WHERE rejected = 0
+            GROUP BY artist_id
+        ) AS st
+        ON DUPLICATE KEY UPDATE
+            last_single_year = IF(
+                st.last_date > last_single_date, st.last_year, last_single_year
+            ),
+            last_single_date = GREATEST(last_single_date, st.last_date)
+    """
+    )
 
 
-def get_top_song_genres(mydb, n: int) -> List[Tuple[str, int]]:
+@_instrumented
+def rebuild_artist_singles(mydb):
     """
-    Get n genres that are most represented in terms of number of songs in that genre.
-    Songs include singles as well as songs in albums.
+    Recompute ArtistSinglesSummary and ArtistSingleCounts from the singles
+    in Songs in one transaction.
 
     Args:
         mydb: database connection
-        n: number of genres
-
-    Returns:
-        List[Tuple[str,int]]: list of tuples (genre,number_of_songs), from most represented to
-        least represented genre. If number of genres is less than n, returns all.
-        Ties broken by alphabetical order of genre names.
     """
     cursor = mydb.cursor()
 
+    cursor.execute("DELETE FROM ArtistSingleCounts")
+    cursor.execute("DELETE FROM ArtistSinglesSummary")
     cursor.execute(
         """
-        SELECT g.genre_name, COUNT(DISTINCT sg.song_id) as num_songs
-        FROM Genres g
-        JOIN SongGenres sg ON g.genre_id = sg.genre_id
-        GROUP BY g.genre_id, g.genre_name
-        ORDER BY num_songs DESC, g.genre_name ASC
-        LIMIT %s
-    """,
-        (n,),
+        INSERT INTO ArtistSingleCounts (artist_id, release_year, num_singles)
+        SELECT artist_id, YEAR(release_date), COUNT(*)
+        FROM Songs
+        WHERE album_id IS NULL
+        GROUP BY artist_id, YEAR(release_date)
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO ArtistSinglesSummary
+            (artist_id, last_single_date, last_single_year)
+        SELECT artist_id, MAX(release_date), YEAR(MAX(release_date))
+        FROM Songs
+        WHERE album_id IS NULL
+        GROUP BY artist_id
+    """
     )
 
-    results = [(row[0], row[1]) for row in cursor.fetchall()]
+    mydb.commit()
     cursor.close()
-    return results
 
+    results = get_result_cache(mydb)
+    if results is not None:
+        results.bump(("ArtistSinglesSummary", "ArtistSingleCounts"))
 
-def get_album_and_single_artists(mydb) -> Set[str]:
+
+@_instrumented
+def check_artist_singles(mydb) -> List[Tuple[int, str, object, object]]:
     """
-    Get artists who have released albums as well as singles.
+    Compare the artist singles summaries with the singles in Songs.
 
     Args:
-        mydb; database connection
+        mydb: database connection
 
     Returns:
-        Set[str]: set of artist names
+        List[Tuple[int,str,object,object]]: (artist_id, field, value from
+        Songs, stored value) for every difference, where field is
+        'last_single_date', 'last_single_year' or 'num_singles YYYY'. Missing
+        values are None (or 0 for counts). An empty list means the summaries
+        are consistent.
     """
     cursor = mydb.cursor()
 
     cursor.execute(
         """
-        SELECT DISTINCT a.artist_name
+        SELECT artist_id, release_year, SUM(expected), SUM(stored)
+        FROM (
+            SELECT artist_id, YEAR(release_date) AS release_year,
+                   COUNT(*) AS expected, 0 AS stored
+            FROM Songs
+            WHERE album_id IS NULL
+            GROUP BY artist_id, YEAR(release_date)
+            UNION ALL
+            SELECT artist_id, release_year, 0, num_singles
+            FROM ArtistSingleCounts
+        ) AS t
+        GROUP BY artist_id, release_year
+        HAVING SUM(expected) <> SUM(stored)
+    """
+    )
+    results = [
+        (row[0], f"num_singles {row[1]}", int(row[2]), int(row[3]))
+        for row in cursor.fetchall()
+    ]
+
+    cursor.execute(
+        """
+        SELECT a.artist_id, t.last_date, ss.last_single_date, ss.last_single_year
         FROM Artists a
-        WHERE EXISTS (
-            SELECT 1 FROM Songs s
-            WHERE s.artist_id = a.artist_id AND s.album_id IS NULL
-        )
-        AND EXISTS (
-            SELECT 1 FROM Songs s2
-            WHERE s2.artist_id = a.artist_id AND s2.album_id IS NOT NULL
-        )
+        LEFT JOIN (
+            SELECT artist_id, MAX(release_date) AS last_date
+            FROM Songs
+            WHERE album_id IS NULL
+            GROUP BY artist_id
+        ) AS t ON t.artist_id = a.artist_id
+        LEFT JOIN ArtistSinglesSummary ss ON ss.artist_id = a.artist_id
+        WHERE NOT (t.last_date <=> ss.last_single_date)
+           OR NOT (YEAR(t.last_date) <=> ss.last_single_year)
     """
     )
+    for artist_id, last_date, stored_date, stored_year in cursor.fetchall():
+        if last_date != stored_date:
+            results.append((artist_id, "last_single_date", last_date, stored_date))
+        expected_year = last_date.year if last_date is not None else None
+        if expected_year != stored_year:
+            results.append((artist_id, "last_single_year", expected_year, stored_year))
 
-    results = {row[0] for row in cursor.fetchall()}
     cursor.close()
-    return results
+    return sorted(results, key=lambda row: (row[0], row[1]))
+
 
+# ---------------------------------------------------------------------------
+# Bulk file import
+#
+# The import_* functions are the LOAD DATA LOCAL INFILE counterparts of the
+# load_* functions. A CSV/TSV file (or a buffer written from the usual input
+# tuples) is loaded into a temporary import table by the server's bulk loader,
+# then copied chunk by chunk into the loaders' staging tables and applied with
+# the same rules, so they return exactly what the load_* functions return.
+#
+# File columns follow the fields of the loader tuples. List fields (the genres
+# of a single, the song titles of an album) are JSON arrays:
+#   singles: song title, genres (JSON), artist name, release date
+#   albums:  album title, genre, artist name, release date, song titles (JSON)
+#   users:   username
+#   ratings: username, artist name, song title, rating, date
+#
+# The connection must be opened with allow_local_infile=True.
+# ---------------------------------------------------------------------------
 
-def load_users(mydb, users: List[str]) -> Set[str]:
+_SINGLES_IMPORT = {
+    "table": "_import_singles",
+    "ddl": """
+        CREATE TEMPORARY TABLE _import_singles (
+            seq INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            song_title VARCHAR(100) NOT NULL,
+            genres TEXT NOT NULL,
+            artist_name VARCHAR(120) NOT NULL,
+            release_date DATE NOT NULL
+        )
+    """,
+    "columns": "(song_title, genres, artist_name, release_date)",
+    "copy": [
+        """
+        INSERT INTO _stage_singles (seq, song_title, artist_name, release_date)
+        SELECT seq, song_title, artist_name, release_date
+        FROM _import_singles
+        WHERE seq BETWEEN %s AND %s
+    """,
+        """
+        INSERT INTO _stage_single_genres (seq, pos, genre_name)
+        SELECT i.seq, jt.pos - 1, jt.genre_name
+        FROM _import_singles i,
+             JSON_TABLE(
+                 i.genres, '$[*]'
+                 COLUMNS (pos FOR ORDINALITY, genre_name VARCHAR(60) PATH '$')
+             ) AS jt
+        WHERE i.seq BETWEEN %s AND %s
+    """,
+    ],
+    "pipeline": _SINGLES_PIPELINE,
+    "to_csv": lambda song: (song[0], json.dumps(list(song[1])), song[2], song[3]),
+}
+
+_ALBUMS_IMPORT = {
+    "table": "_import_albums",
+    "ddl": """
+        CREATE TEMPORARY TABLE _import_albums (
+            seq INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            album_name VARCHAR(100) NOT NULL,
+            genre_name VARCHAR(60) NOT NULL,
+            artist_name VARCHAR(120) NOT NULL,
+            release_date DATE NOT NULL,
+            song_titles MEDIUMTEXT NOT NULL
+        )
+    """,
+    "columns": "(album_name, genre_name, artist_name, release_date, song_titles)",
+    "copy": [
+        """
+        INSERT INTO _stage_albums
+            (seq, album_name, genre_name, artist_name, release_date)
+        SELECT seq, album_name, genre_name, artist_name, release_date
+        FROM _import_albums
+        WHERE seq BETWEEN %s AND %s
+    """,
+        """
+        INSERT INTO _stage_album_tracks (seq, pos, song_title)
+        SELECT i.seq, jt.pos - 1, jt.song_title
+        FROM _import_albums i,
+             JSON_TABLE(
+                 i.song_titles, '$[*]'
+                 COLUMNS (pos FOR ORDINALITY, song_title VARCHAR(100) PATH '$')
+             ) AS jt
+        WHERE i.seq BETWEEN %s AND %s
+    """,
+    ],
+    "pipeline": _ALBUMS_PIPELINE,
+    "to_csv": lambda album: (
+        album[0],
+        album[1],
+        album[2],
+        album[3],
+        json.dumps(list(album[4])),
+    ),
+}
+
+_USERS_IMPORT = {
+    "table": "_import_users",
+    "ddl": """
+        CREATE TEMPORARY TABLE _import_users (
+            seq INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_name VARCHAR(255) NOT NULL
+        )
+    """,
+    "columns": "(user_name)",
+    "copy": [
+        """
+        INSERT INTO _stage_users (seq, user_name)
+        SELECT seq, user_name
+        FROM _import_users
+        WHERE seq BETWEEN %s AND %s
+    """,
+    ],
+    "pipeline": _USERS_PIPELINE,
+    "to_csv": lambda username: (username,),
+}
+
+_RATINGS_IMPORT = {
+    "table": "_import_ratings",
+    "ddl": """
+        CREATE TEMPORARY TABLE _import_ratings (
+            seq INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_name VARCHAR(255) NOT NULL,
+            artist_name VARCHAR(255) NOT NULL,
+            song_title VARCHAR(255) NOT NULL,
+            rating INT NOT NULL,
+            rating_date DATE NOT NULL
+        )
+    """,
+    "columns": "(user_name, artist_name, song_title, rating, rating_date)",
+    "copy": [
+        """
+        INSERT INTO _stage_ratings
+            (seq, user_name, artist_name, song_title, rating, rating_date)
+        SELECT seq, user_name, artist_name, song_title, rating, rating_date
+        FROM _import_ratings
+        WHERE seq BETWEEN %s AND %s
+    """,
+    ],
+    "pipeline": _RATINGS_PIPELINE,
+    "to_csv": lambda rating: (
+        rating[0],
+        rating[1][0],
+        rating[1][1],
+        rating[2],
+        rating[3],
+    ),
+}
+
+# FIELDS TERMINATED BY clause for each supported delimiter
+_IMPORT_DELIMITERS = {",": "','", "\t": "'\\t'"}
+
+ImportSource = Union[str, os.PathLike, Iterable]
+
+
+@_instrumented
+def import_single_songs(
+    mydb,
+    source: ImportSource,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[Tuple[str, str]]], None]] = None,
+    delimiter: str = ",",
+    header: bool = False,
+) -> Set[Tuple[str, str]]:
     """
-    Add users to the database.
+    Bulk version of load_single_songs using LOAD DATA LOCAL INFILE.
 
     Args:
-        mydb: database connection
-        users: list of usernames
+        mydb: database connection opened with allow_local_infile=True
+        source: path of a CSV/TSV file, or an iterable of load_single_songs tuples
+        chunk_size: number of songs applied and committed at a time
+        on_rejects: optional callback called with the rejects of every chunk
+        delimiter: "," for CSV or "\\t" for TSV files
+        header: True if the file starts with a header line to skip
 
     Returns:
-        Set[str]: set of all usernames that were not added (rejected) because
-        they are duplicates of existing users.
-        Set is empty if there are no rejects.
+        Set[Tuple[str,str]]: same as load_single_songs
     """
-    cursor = mydb.cursor()
-    rejected = set()
+    return _import(
+        mydb, _SINGLES_IMPORT, source, chunk_size, on_rejects, delimiter, header
+    )
 
-    for username in users:
-        # Check if user already exists
-        cursor.execute("SELECT user_id FROM Users WHERE user_name = %s", (username,))
-        if cursor.fetchone():
-            rejected.add(username)
-        else:
-            cursor.execute("INSERT INTO Users (user_name) VALUES (%s)", (username,))
 
-    mydb.commit()
-    cursor.close()
-    return rejected
+@_instrumented
+def import_albums(
+    mydb,
+    source: ImportSource,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[Tuple[str, str]]], None]] = None,
+    delimiter: str = ",",
+    header: bool = False,
+) -> Set[Tuple[str, str]]:
+    """
+    Bulk version of load_albums using LOAD DATA LOCAL INFILE.
 
+    Args:
+        mydb: database connection opened with allow_local_infile=True
+        source: path of a CSV/TSV file, or an iterable of load_albums tuples
+        chunk_size: number of albums applied and committed at a time
+        on_rejects: optional callback called with the rejects of every chunk
+        delimiter: "," for CSV or "\\t" for TSV files
+        header: True if the file starts with a header line to skip
 
-def load_song_ratings(
-    mydb, song_ratings: List[Tuple[str, Tuple[str, str], int, str]]
-) -> Set[Tuple[str, str, str]]:
+    Returns:
+        Set[Tuple[str,str]]: same as load_albums
     """
-    Load ratings for songs, which are either singles or songs in albums.
+    return _import(
+        mydb, _ALBUMS_IMPORT, source, chunk_size, on_rejects, delimiter, header
+    )
+
+
+@_instrumented
+def import_users(
+    mydb,
+    source: ImportSource,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[str]], None]] = None,
+    delimiter: str = ",",
+    header: bool = False,
+) -> Set[str]:
+    """
+    Bulk version of load_users using LOAD DATA LOCAL INFILE.
 
     Args:
-        mydb: database connection
-        song_ratings: list of rating tuples of the form:
-            (rater, (artist, song), rating, date)
+        mydb: database connection opened with allow_local_infile=True
+        source: path of a file with one username per line, or an iterable of usernames
+        chunk_size: number of usernames applied and committed at a time
+        on_rejects: optional callback called with the rejects of every chunk
+        delimiter: "," for CSV or "\\t" for TSV files
+        header: True if the file starts with a header line to skip
 
-        The rater is a username, the (artist,song) tuple refers to the uniquely identifiable song to be rated.
-        e.g. ('u1',('a1','song1'),4,'2021-11-18') => u1 is giving a rating of 4 to the (a1,song1) song.
+    Returns:
+        Set[str]: same as load_users
+    """
+    return _import(
+        mydb, _USERS_IMPORT, source, chunk_size, on_rejects, delimiter, header
+    )
+
+
+@_instrumented
+def import_song_ratings(
+    mydb,
+    source: ImportSource,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[Tuple[str, str, str]]], None]] = None,
+    delimiter: str = ",",
+    header: bool = False,
+) -> Set[Tuple[str, str, str]]:
+    """
+    Bulk version of load_song_ratings using LOAD DATA LOCAL INFILE.
+
+    Args:
+        mydb: database connection opened with allow_local_infile=True
+        source: path of a CSV/TSV file, or an iterable of load_song_ratings tuples
+        chunk_size: number of ratings applied and committed at a time
+        on_rejects: optional callback called with the rejects of every chunk
+        delimiter: "," for CSV or "\\t" for TSV files
+        header: True if the file starts with a header line to skip
 
     Returns:
-        Set[Tuple[str,str,str]]: set of (username,artist,song) tuples that are rejected, for any of the following
-        reasongs:
-        (a) username (rater) is not in the database, or
-        (b) username is in database but (artist,song) combination is not in the database, or
-        (c) username has already rated (artist,song) combination, or
-        (d) everything else is legit, but rating is not in range 1..5
+        Set[Tuple[str,str,str]]: same as load_song_ratings
+    """
+    return _import(
+        mydb, _RATINGS_IMPORT, source, chunk_size, on_rejects, delimiter, header
+    )
 
-        An empty set is returned if there are no rejects.
+
+def write_import_file(path: str, kind: str, rows: Iterable, delimiter: str = ","):
     """
-    cursor = mydb.cursor()
-    rejected = set()
+    Write loader input tuples to a file in the format read by the import_* functions.
 
-    for username, (artist_name, song_title), rating, rating_date in song_ratings:
-        # Check rating is in valid range
-        if rating < 1 or rating > 5:
-            rejected.add((username, artist_name, song_title))
-            continue
+    Args:
+        path: file to write
+        kind: one of "singles", "albums", "users", "ratings"
+        rows: loader input tuples of that kind
+        delimiter: "," for CSV or "\\t" for TSV
+    """
+    spec = _IMPORT_SPECS[kind]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=delimiter, lineterminator="\n")
+        writer.writerows(spec["to_csv"](row) for row in rows)
 
-        # Check if user exists
-        cursor.execute("SELECT user_id FROM Users WHERE user_name = %s", (username,))
-        user_result = cursor.fetchone()
-        if not user_result:
-            rejected.add((username, artist_name, song_title))
-            continue
-        user_id = user_result[0]
 
-        # Check if (artist, song) exists
-        cursor.execute(
-            """
-            SELECT s.song_id FROM Songs s
-            JOIN Artists a ON s.artist_id = a.artist_id
-            WHERE a.artist_name = %s AND s.song_title = %s
-        """,
-            (artist_name, song_title),
-        )
-        song_result = cursor.fetchone()
-        if not song_result:
-            rejected.add((username, artist_name, song_title))
-            continue
-        song_id = song_result[0]
+def _import(
+    mydb,
+    spec: dict,
+    source: ImportSource,
+    chunk_size: int,
+    on_rejects: Optional[Callable[[Set], None]],
+    delimiter: str,
+    header: bool,
+) -> Set:
+    """Bulk load a file (or input tuples) through LOAD DATA, then apply it in chunks."""
+    if delimiter not in _IMPORT_DELIMITERS:
+        raise ValueError("delimiter must be ',' or '\\t'")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    buffer_path = None
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+    else:
+        # Input tuples go through a temporary file, the only thing the
+        # client library can stream with LOAD DATA LOCAL INFILE
+        with tempfile.NamedTemporaryFile(
+            "w", newline="", encoding="utf-8", suffix=".csv", delete=False
+        ) as f:
+            writer = csv.writer(f, delimiter=delimiter, lineterminator="\n")
+            writer.writerows(spec["to_csv"](row) for row in source)
+            buffer_path = f.name
+        path = buffer_path
+        header = False
+
+    try:
+        return _import_file(mydb, spec, path, chunk_size, on_rejects, delimiter, header)
+    finally:
+        if buffer_path is not None:
+            os.remove(buffer_path)
 
-        # Check if user has already rated this song
+
+def _import_file(
+    mydb,
+    spec: dict,
+    path: str,
+    chunk_size: int,
+    on_rejects: Optional[Callable[[Set], None]],
+    delimiter: str,
+    header: bool,
+) -> Set:
+    """
+    LOAD DATA a file into the import table of spec and apply it in chunks.
+    On failure the pending chunk is rolled back; the import table is
+    dropped either way.
+    """
+    table = spec["table"]
+    cursor = mydb.cursor()
+    try:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table}")
+        cursor.execute(spec["ddl"])
         cursor.execute(
-            """
-            SELECT rating_id FROM Ratings
-            WHERE user_id = %s AND song_id = %s
+            f"""
+            LOAD DATA LOCAL INFILE %s
+            INTO TABLE {table}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY {_IMPORT_DELIMITERS[delimiter]}
+                OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n'
+            IGNORE {1 if header else 0} LINES
+            {spec["columns"]}
         """,
-            (user_id, song_id),
+            (path,),
         )
-        if cursor.fetchone():
-            rejected.add((username, artist_name, song_title))
-            continue
+        cursor.execute(f"SELECT MIN(seq), MAX(seq) FROM {table}")
+        first, last = cursor.fetchone()
 
-        # Insert the rating
-        cursor.execute(
-            """
-            INSERT INTO Ratings (user_id, song_id, rating, rating_date)
-            VALUES (%s, %s, %s, %s)
-        """,
-            (user_id, song_id, rating, rating_date),
+        # Ranges of seq values, each applied and committed like a loader chunk
+        chunks = []
+        if first is not None:
+            chunks = [
+                (start, min(start + chunk_size - 1, last))
+                for start in range(first, last + 1, chunk_size)
+            ]
+
+        def copy_chunk(stage_cursor, bounds, cache, max_packet):
+            for sql in spec["copy"]:
+                stage_cursor.execute(sql, bounds)
+
+        return _load_in_chunks(
+            mydb, spec["pipeline"], chunks, on_rejects, fill=copy_chunk
         )
+    except BaseException:
+        mydb.rollback()
+        raise
+    finally:
+        try:
+            cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table}")
+        finally:
+            cursor.close()
 
-    mydb.commit()
-    cursor.close()
-    return rejected
 
+_IMPORT_SPECS = {
+    "singles": _SINGLES_IMPORT,
+    "albums": _ALBUMS_IMPORT,
+    "users": _USERS_IMPORT,
+    "ratings": _RATINGS_IMPORT,
+}
 
-def get_most_rated_songs(
-    mydb, year_range: Tuple[int, int], n: int
-) -> List[Tuple[str, str, int]]:
+
+# ---------------------------------------------------------------------------
+# Session object
+#
+# MusicDB bundles a bounded connection pool with every function of this
+# module as a method, for multi-threaded callers. Each call checks a pooled
+# connection out for the calling thread and returns it afterwards, so a
+# connection is never used by two threads at once and is not reopened per
+# call. The module-level functions keep taking a connection as before.
+# ---------------------------------------------------------------------------
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_POOL_TIMEOUT = 30.0
+DEFAULT_HEALTH_CHECK_INTERVAL = 30.0
+
+
+class PoolTimeout(RuntimeError):
+    """No pooled connection became free within the timeout."""
+
+
+class ConnectionPool:
     """
-    Get the top n most rated songs in the given year range (both inclusive),
-    ranked from most rated to least rated.
-    "Most rated" refers to number of ratings, not actual rating scores.
-    Ties are broken in alphabetical order of song title. If the number of rated songs is less
-    than n, all rates songs are returned.
+    Bounded, thread-safe pool of database connections.
 
-    Args:
-        mydb: database connection
-        year_range: range of years, e.g. (2018-2021), during which ratings were given
-        n: number of most rated songs
+    At most size connections are open at once; acquire() waits for one to be
+    released when all are in use. A connection that has been idle for longer
+    than health_check_interval seconds is pinged before it is handed out and
+    replaced if the ping fails. Released connections are rolled back, so
+    an uncommitted transaction never leaks to the next user. Connections the
+    pool closes have their prepared statements deallocated first.
 
-    Returns:
-        List[Tuple[str,str,int]: list of (song title, artist name, number of ratings for song)
+    connect is called with the remaining keyword arguments to open a
+    connection; it defaults to mysql.connector.connect.
     """
-    cursor = mydb.cursor()
 
-    cursor.execute(
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_POOL_TIMEOUT,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+        connect: Optional[Callable] = None,
+        **config,
+    ):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        if connect is None:
+            import mysql.connector
+
+            connect = mysql.connector.connect
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+        self._config = config
+        self._idle = deque()  # (connection, time it was released)
+        self._open = 0
+        self._closed = False
+        self._lock = threading.Condition()
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "timeouts": 0,
+            "health_checks": 0,
+            "health_check_failures": 0,
+        }
+
+    def acquire(self, timeout: Optional[float] = None):
         """
-        SELECT s.song_title, a.artist_name, COUNT(*) as num_ratings
-        FROM Ratings r
-        JOIN Songs s ON r.song_id = s.song_id
-        JOIN Artists a ON s.artist_id = a.artist_id
-        WHERE YEAR(r.rating_date) BETWEEN %s AND %s
-        GROUP BY s.song_id, s.song_title, a.artist_name
-        ORDER BY num_ratings DESC, s.song_title ASC
-        LIMIT %s
-    """,
-        (year_range[0], year_range[1], n),
-    )
+        Check a connection out of the pool, waiting up to timeout seconds
+        (the pool's timeout if None) for one to be released.
 
-    results = [(row[0], row[1], row[2]) for row in cursor.fetchall()]
-    cursor.close()
-    return results
+        Raises:
+            PoolTimeout: if no connection became free in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError("The pool is closed")
+                if self._idle:
+                    mydb, released = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    self._open += 1
+                    mydb, released = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No connection free after {timeout} s " f"({self.size} in use)"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+            if waited:
+                wait = time.monotonic() - started
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += wait
+                self._stats["max_wait_seconds"] = max(
+                    self._stats["max_wait_seconds"], wait
+                )
+            self._stats["acquired"] += 1
 
+        # Connecting and pinging happen outside the lock
+        try:
+            if mydb is not None and not self._healthy(mydb, released):
+                mydb = None
+            if mydb is None:
+                mydb = self._connect(**self._config)
+                with self._lock:
+                    self._stats["created"] += 1
+        except BaseException:
+            with self._lock:
+                self._open -= 1
+                self._lock.notify()
+            raise
+        return mydb
 
-def get_most_engaged_users(
-    mydb, year_range: Tuple[int, int], n: int
-) -> List[Tuple[str, int]]:
+    def release(self, mydb):
+        """Return a connection to the pool, rolling back any open transaction."""
+        try:
+            mydb.rollback()
+        except Exception:
+            self.discard(mydb)
+            return
+        with self._lock:
+            if self._closed:
+                self._open -= 1
+                _close_connection(mydb)
+                return
+            self._idle.append((mydb, time.monotonic()))
+            self._lock.notify()
+
+    def discard(self, mydb):
+        """Close a broken connection and free its slot in the pool."""
+        try:
+            _close_connection(mydb)
+        except Exception:
+            pass
+        with self._lock:
+            self._open -= 1
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Check a connection out for the duration of a with block."""
+        mydb = self.acquire(timeout)
+        try:
+            yield mydb
+        finally:
+            self.release(mydb)
+
+    def close(self):
+        """Close the idle connections; busy ones are closed when released."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, deque()
+            self._open -= len(idle)
+            self._lock.notify_all()
+        for mydb, _ in idle:
+            _close_connection(mydb)
+
+    def stats(self) -> dict:
+        """Return the pool counters, including how long callers waited."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open"] = self._open
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._open - len(self._idle)
+        return stats
+
+    def _healthy(self, mydb, released: float) -> bool:
+        """Ping a connection that has been idle for a while; close it if dead."""
+        if time.monotonic() - released < self.health_check_interval:
+            return True
+        with self._lock:
+            self._stats["health_checks"] += 1
+        try:
+            mydb.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._lock:
+                self._stats["health_check_failures"] += 1
+            try:
+                _close_connection(mydb)
+            except Exception:
+                pass
+            return False
+
+
+def _session_method(func):
+    """Turn a module function taking mydb into a MusicDB method."""
+
+    @wraps(func)
+    def method(self, *args, **kwargs):
+        with self.connection() as mydb:
+            return func(mydb, *args, **kwargs)
+
+    return method
+
+
+def _session_cache(cache, factory: Callable):
+    """A new cache for True, none for None or False, else the given cache."""
+    # Compared by identity: the caches define __len__, so empty ones are falsy
+    if cache is True:
+        return factory()
+    if cache is None or cache is False:
+        return None
+    return cache
+
+
+class MusicDB:
     """
-    Get the top n most engaged users, in terms of number of songs they have rated.
-    Break ties by alphabetical order of usernames.
+    Thread-safe entry point to the music database.
+
+    Every function of this module that takes a connection is available as a
+    method without it, e.g. db.load_users(["alice"]) or
+    db.get_top_song_genres(5). A method checks a connection out of the pool
+    for the calling thread, or uses the one the thread holds through
+    connection().
 
     Args:
-        mydb: database connection
-        year_range: range of years, e.g. (2018-2021), during which ratings were given
-        n: number of users
+        pool_size: maximum number of open connections
+        pool_timeout: seconds a call waits for a free connection
+        health_check_interval: idle seconds after which a connection is
+            pinged before use
+        id_cache: an IdCache, or True for a new one, shared by all pooled
+            connections
+        result_cache: a ResultCache, or True for a new one, shared by all
+            pooled connections
+        tracer: a Tracer recording the calls of all pooled connections
+        prepared_statements: give every pooled connection a
+            StatementRegistry (see enable_prepared_statements)
+        leaderboards: Leaderboards, or True for new ones, kept current by
+            all pooled connections and loaded by the first one
+        **config: connection arguments for mysql.connector.connect
 
-    Returns:
-        List[Tuple[str, int]]: list of (username,number_of_songs_rated) tuples
+    Example:
+        db = MusicDB(host="localhost", user="root", password="root",
+                     database="musicdb", pool_size=4)
+        db.get_most_rated_songs((2020, 2021), 10)
+        with db.connection() as mydb:  # several calls on one connection
+            ...
+        db.close()
     """
-    cursor = mydb.cursor()
 
-    cursor.execute(
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        pool_timeout: float = DEFAULT_POOL_TIMEOUT,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+        id_cache: Union[IdCache, bool, None] = None,
+        result_cache: Union[ResultCache, bool, None] = None,
+        connect: Optional[Callable] = None,
+        tracer: Optional[Tracer] = None,
+        prepared_statements: bool = False,
+        leaderboards: Union[Leaderboards, bool, None] = None,
+        **config,
+    ):
+        self.id_cache = _session_cache(id_cache, IdCache)
+        self.result_cache = _session_cache(result_cache, ResultCache)
+        self.leaderboards = _session_cache(leaderboards, Leaderboards)
+        self.tracer = tracer
+        self.prepared_statements = prepared_statements
+        self.pool = ConnectionPool(
+            pool_size,
+            pool_timeout,
+            health_check_interval,
+            connect=self._connector(connect),
+            **config,
+        )
+        self._local = threading.local()
+
+    def _connector(self, connect: Optional[Callable]) -> Callable:
         """
-        SELECT u.user_name, COUNT(*) as num_ratings
-        FROM Ratings r
-        JOIN Users u ON r.user_id = u.user_id
-        WHERE YEAR(r.rating_date) BETWEEN %s AND %s
-        GROUP BY u.user_id, u.user_name
-        ORDER BY num_ratings DESC, u.user_name ASC
-        LIMIT %s
-    """,
-        (year_range[0], year_range[1], n),
-    )
+        Wrap connect so that new connections get the shared caches and
+        leaderboards, the tracer and their prepared statement registry.
+        """
+        if connect is None:
+            import mysql.connector
 
-    results = [(row[0], row[1]) for row in cursor.fetchall()]
-    cursor.close()
-    return results
+            connect = mysql.connector.connect
+
+        def open_connection(**config):
+            mydb = connect(**config)
+            if self.id_cache is not None:
+                enable_id_cache(mydb, self.id_cache)
+            if self.result_cache is not None:
+                enable_result_cache(mydb, self.result_cache)
+            if self.leaderboards is not None:
+                enable_leaderboards(mydb, self.leaderboards)
+            if self.tracer is not None:
+                enable_tracing(mydb, self.tracer)
+            if self.prepared_statements:
+                enable_prepared_statements(mydb)
+            return mydb
+
+        return open_connection
+
+    @contextmanager
+    def connection(self):
+        """
+        Give the calling thread a connection for the duration of a with
+        block. Nested blocks and method calls inside it use the same one.
+        """
+        mydb = getattr(self._local, "mydb", None)
+        if mydb is not None:
+            yield mydb
+            return
+        with self.pool.connection() as mydb:
+            self._local.mydb = mydb
+            try:
+                yield mydb
+            finally:
+                self._local.mydb = None
+
+    def stats(self) -> dict:
+        """Return the pool counters (see ConnectionPool.stats)."""
+        return self.pool.stats()
+
+    def close(self):
+        """Close the pool's connections."""
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    clear_database = _session_method(clear_database)
+    load_single_songs = _session_method(load_single_songs)
+    load_albums = _session_method(load_albums)
+    load_users = _session_method(load_users)
+    load_song_ratings = _session_method(load_song_ratings)
+    import_single_songs = _session_method(import_single_songs)
+    import_albums = _session_method(import_albums)
+    import_users = _session_method(import_users)
+    import_song_ratings = _session_method(import_song_ratings)
+    get_most_prolific_individual_artists = _session_method(
+        get_most_prolific_individual_artists
+    )
+    get_most_prolific_individual_artists_between = _session_method(
+        get_most_prolific_individual_artists_between
+    )
+    get_artists_last_single_in_year = _session_method(get_artists_last_single_in_year)
+    get_top_song_genres = _session_method(get_top_song_genres)
+    get_album_and_single_artists = _session_method(get_album_and_single_artists)
+    get_most_rated_songs = _session_method(get_most_rated_songs)
+    get_most_rated_songs_between = _session_method(get_most_rated_songs_between)
+    get_most_engaged_users = _session_method(get_most_engaged_users)
+    get_most_engaged_users_between = _session_method(get_most_engaged_users_between)
+    rebuild_song_rating_counts = _session_method(rebuild_song_rating_counts)
+    check_song_rating_counts = _session_method(check_song_rating_counts)
+    rebuild_genre_stats = _session_method(rebuild_genre_stats)
+    check_genre_stats = _session_method(check_genre_stats)
+    rebuild_artist_singles = _session_method(rebuild_artist_singles)
+    check_artist_singles = _session_method(check_artist_singles)
 
 
 def main():
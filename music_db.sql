@@ -23,11 +23,11 @@ DROP TABLE IF EXISTS `Albums`;
 /*!40101 SET @saved_cs_client     = @@character_set_client */;
 /*!50503 SET character_set_client = utf8mb4 */;
 CREATE TABLE `Albums` (
-  `album_id` smallint NOT NULL AUTO_INCREMENT,
+  `album_id` int unsigned NOT NULL AUTO_INCREMENT,
   `album_name` varchar(100) NOT NULL,
-  `artist_id` smallint NOT NULL,
+  `artist_id` int unsigned NOT NULL,
   `release_date` date NOT NULL,
-  `genre_id` smallint NOT NULL,
+  `genre_id` int unsigned NOT NULL,
   PRIMARY KEY (`album_id`),
   UNIQUE KEY `album_name` (`album_name`,`artist_id`),
   KEY `artist_id` (`artist_id`),
@@ -55,7 +55,7 @@ DROP TABLE IF EXISTS `Artists`;
 /*!40101 SET @saved_cs_client     = @@character_set_client */;
 /*!50503 SET character_set_client = utf8mb4 */;
 CREATE TABLE `Artists` (
-  `artist_id` smallint NOT NULL AUTO_INCREMENT,
+  `artist_id` int unsigned NOT NULL AUTO_INCREMENT,
   `artist_name` varchar(120) NOT NULL,
   PRIMARY KEY (`artist_id`),
   UNIQUE KEY `artist_name` (`artist_name`)
@@ -80,7 +80,7 @@ DROP TABLE IF EXISTS `Genres`;
 /*!40101 SET @saved_cs_client     = @@character_set_client */;
 /*!50503 SET character_set_client = utf8mb4 */;
 CREATE TABLE `Genres` (
-  `genre_id` smallint NOT NULL AUTO_INCREMENT,
+  `genre_id` int unsigned NOT NULL AUTO_INCREMENT,
   `genre_name` varchar(60) NOT NULL,
   PRIMARY KEY (`genre_id`),
   UNIQUE KEY `genre_name` (`genre_name`)
@@ -105,9 +105,9 @@ DROP TABLE IF EXISTS `Ratings`;
 /*!40101 SET @saved_cs_client     = @@character_set_client */;
 /*!50503 SET character_set_client = utf8mb4 */;
 CREATE TABLE `Ratings` (
-  `rating_id` smallint NOT NULL AUTO_INCREMENT,
-  `user_id` smallint NOT NULL,
-  `song_id` smallint NOT NULL,
+  `rating_id` bigint unsigned NOT NULL AUTO_INCREMENT,
+  `user_id` int unsigned NOT NULL,
+  `song_id` int unsigned NOT NULL,
   `rating` tinyint NOT NULL,
   `rating_date` date NOT NULL,
   PRIMARY KEY (`rating_id`),
@@ -136,8 +136,8 @@ DROP TABLE IF EXISTS `SongGenres`;
 /*!40101 SET @saved_cs_client     = @@character_set_client */;
 /*!50503 SET character_set_client = utf8mb4 */;
 CREATE TABLE `SongGenres` (
-  `song_id` smallint NOT NULL,
-  `genre_id` smallint NOT NULL,
+  `song_id` int unsigned NOT NULL,
+  `genre_id` int unsigned NOT NULL,
   UNIQUE KEY `song_id` (`song_id`,`genre_id`),
   KEY `genre_id` (`genre_id`),
   CONSTRAINT `SongGenres_ibfk_1` FOREIGN KEY (`song_id`) REFERENCES `Songs` (`song_id`),
@@ -163,10 +163,10 @@ DROP TABLE IF EXISTS `Songs`;
 /*!40101 SET @saved_cs_client     = @@character_set_client */;
 /*!50503 SET character_set_client = utf8mb4 */;
 CREATE TABLE `Songs` (
-  `song_id` smallint NOT NULL AUTO_INCREMENT,
+  `song_id` int unsigned NOT NULL AUTO_INCREMENT,
   `song_title` varchar(100) NOT NULL,
-  `artist_id` smallint NOT NULL,
-  `album_id` smallint DEFAULT NULL,
+  `artist_id` int unsigned NOT NULL,
+  `album_id` int unsigned DEFAULT NULL,
   `release_date` date NOT NULL,
   PRIMARY KEY (`song_id`),
   UNIQUE KEY `song_title` (`song_title`,`artist_id`),
@@ -195,7 +195,7 @@ DROP TABLE IF EXISTS `Users`;
 /*!40101 SET @saved_cs_client     = @@character_set_client */;
 /*!50503 SET character_set_client = utf8mb4 */;
 CREATE TABLE `Users` (
-  `user_id` smallint NOT NULL AUTO_INCREMENT,
+  `user_id` int unsigned NOT NULL AUTO_INCREMENT,
   `user_name` varchar(255) NOT NULL,
   PRIMARY KEY (`user_id`),
   UNIQUE KEY `user_name` (`user_name`)
@@ -0,0 +1,233 @@
+"""
+asyncio API for the music database.
+
+AsyncMusicDB offers every function of music_db.py that takes a connection as
+a coroutine method, e.g. ``await adb.get_most_rated_songs((2020, 2021), 10)``.
+The calls run on a MusicDB connection pool through an executor with one
+thread per pooled connection, so any number of concurrent coroutines share a
+fixed number of threads and connections; the rest wait in the event loop
+without holding a thread.
+
+Cancelling a call that is still waiting for a connection simply drops it. A
+call that is already running has its statement stopped with KILL QUERY,
+repeated until the call returns, and is awaited until its connection is
+back in the pool. A call gives up its connection id before the connection
+goes back to the pool, under a lock the KILL QUERY also holds, so a late
+KILL never reaches the next call on that connection. KILL QUERY only stops the statement running at that
+moment, so loaders also check for the cancellation after every chunk they
+commit and stop there; they keep the chunks committed before.
+
+(An async MySQL driver would avoid the threads altogether, but would mean a
+second implementation of every query; the pool size bounds the threads
+instead.)
+"""
+
+import asyncio
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Callable, Optional
+
+import music_db
+from music_db import DEFAULT_POOL_SIZE, DEFAULT_POOL_TIMEOUT, MusicDB
+
+# Seconds between the KILL QUERY statements sent to a cancelled call
+_KILL_INTERVAL = 0.2
+
+
+class _Call:
+    """State shared between a coroutine and the thread running its call."""
+
+    def __init__(self):
+        # Id of the connection while the call holds it, guarded by lock
+        self.connection_id = None
+        self.lock = threading.Lock()
+        self.cancelled = False
+
+
+def _stop_between_chunks(call: _Call, func: Callable, args: tuple, kwargs: dict):
+    """
+    Arguments for func that make a loader raise CancelledError after the
+    first chunk committed once call is cancelled. The check is chained to
+    on_rejects, which the loaders call after every commit; functions
+    without on_rejects get their arguments back unchanged.
+    """
+    signature = inspect.signature(func)
+    if "on_rejects" not in signature.parameters:
+        return args, kwargs
+    bound = signature.bind(None, *args, **kwargs)
+    on_rejects = bound.arguments.get("on_rejects")
+
+    def check(rejects):
+        if on_rejects is not None:
+            on_rejects(rejects)
+        if call.cancelled:
+            raise asyncio.CancelledError()
+
+    bound.arguments["on_rejects"] = check
+    return bound.args[1:], bound.kwargs
+
+
+def _async_method(func):
+    """Turn a module function taking mydb into an AsyncMusicDB coroutine method."""
+
+    @wraps(func)
+    async def method(self, *args, **kwargs):
+        return await self.run(func, *args, **kwargs)
+
+    return method
+
+
+class AsyncMusicDB:
+    """
+    asyncio entry point to the music database.
+
+    Args:
+        pool_size: maximum number of connections, and of calls running at once
+        pool_timeout: seconds a running call waits for a free connection
+        connect: function opening a connection, mysql.connector.connect by default
+        **kwargs: MusicDB arguments (id_cache, result_cache, ...) and
+            connection arguments for connect
+
+    Example:
+        async with AsyncMusicDB(host="localhost", user="root",
+                                password="root", database="musicdb") as adb:
+            top = await adb.get_most_rated_songs((2020, 2021), 10)
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        pool_timeout: float = DEFAULT_POOL_TIMEOUT,
+        connect: Optional[Callable] = None,
+        **kwargs,
+    ):
+        if connect is None:
+            import mysql.connector
+
+            connect = mysql.connector.connect
+        self.db = MusicDB(pool_size, pool_timeout, connect=connect, **kwargs)
+        self.pool_size = pool_size
+        self._connect = connect
+        self._config = self.db.pool._config
+        self._executor = ThreadPoolExecutor(pool_size, thread_name_prefix="music_db")
+        self._slots = None
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """
+        Run func(mydb, *args, **kwargs) on a pooled connection and return
+        its result. At most pool_size calls run at once; the others wait
+        here, in the event loop.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        async with self._slots:
+            call = _Call()
+            args, kwargs = _stop_between_chunks(call, func, args, kwargs)
+            work = self._executor.submit(self._run, call, func, args, kwargs)
+            future = asyncio.wrap_future(work)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                call.cancelled = True
+                if not work.cancel():
+                    await self._stop(call, future)
+                raise
+
+    def _run(self, call: _Call, func: Callable, args: tuple, kwargs: dict):
+        """Executor side of run()."""
+        with self.db.connection() as mydb:
+            # Set before the check so that a cancellation either stops the
+            # call here or finds the connection to kill.
+            with call.lock:
+                call.connection_id = getattr(mydb, "connection_id", None)
+            try:
+                if call.cancelled:
+                    raise asyncio.CancelledError()
+                return func(mydb, *args, **kwargs)
+            finally:
+                # Before the connection can be handed to another call
+                with call.lock:
+                    call.connection_id = None
+
+    async def _stop(self, call: _Call, future: asyncio.Future):
+        """
+        Kill the statements of a running call until it returns. A call
+        between statements is not interrupted by one KILL QUERY, but by the
+        next one, or by its own check of call.cancelled.
+        """
+        while not future.done():
+            if call.connection_id is not None:
+                try:
+                    await asyncio.to_thread(self._kill_query, call)
+                except Exception:
+                    pass
+            await asyncio.wait({future}, timeout=_KILL_INTERVAL)
+        try:
+            await future
+        except BaseException:
+            pass
+
+    def _kill_query(self, call: _Call):
+        """
+        Stop the current statement of a call from a separate connection, if
+        the call still holds its connection.
+        """
+        mydb = self._connect(**self._config)
+        try:
+            cursor = mydb.cursor()
+            with call.lock:
+                if call.connection_id is not None:
+                    cursor.execute(f"KILL QUERY {int(call.connection_id)}")
+            cursor.close()
+        finally:
+            mydb.close()
+
+    def stats(self) -> dict:
+        """Return the pool counters (see music_db.ConnectionPool.stats)."""
+        return self.db.stats()
+
+    async def close(self):
+        """Wait for running calls to finish and close the pool."""
+        await asyncio.to_thread(self._executor.shutdown, True)
+        self.db.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    clear_database = _async_method(music_db.clear_database)
+    load_single_songs = _async_method(music_db.load_single_songs)
+    load_albums = _async_method(music_db.load_albums)
+    load_users = _async_method(music_db.load_users)
+    load_song_ratings = _async_method(music_db.load_song_ratings)
+    import_single_songs = _async_method(music_db.import_single_songs)
+    import_albums = _async_method(music_db.import_albums)
+    import_users = _async_method(music_db.import_users)
+    import_song_ratings = _async_method(music_db.import_song_ratings)
+    get_most_prolific_individual_artists = _async_method(
+        music_db.get_most_prolific_individual_artists
+    )
+    get_most_prolific_individual_artists_between = _async_method(
+        music_db.get_most_prolific_individual_artists_between
+    )
+    get_artists_last_single_in_year = _async_method(
+        music_db.get_artists_last_single_in_year
+    )
+    get_top_song_genres = _async_method(music_db.get_top_song_genres)
+    get_album_and_single_artists = _async_method(music_db.get_album_and_single_artists)
+    get_most_rated_songs = _async_method(music_db.get_most_rated_songs)
+    get_most_rated_songs_between = _async_method(music_db.get_most_rated_songs_between)
+    get_most_engaged_users = _async_method(music_db.get_most_engaged_users)
+    get_most_engaged_users_between = _async_method(
+        music_db.get_most_engaged_users_between
+    )
+    rebuild_song_rating_counts = _async_method(music_db.rebuild_song_rating_counts)
+    check_song_rating_counts = _async_method(music_db.check_song_rating_counts)
+    rebuild_genre_stats = _async_method(music_db.rebuild_genre_stats)
+    check_genre_stats = _async_method(music_db.check_genre_stats)
+    rebuild_artist_singles = _async_method(music_db.rebuild_artist_singles)
+    check_artist_singles = _async_method(music_db.check_artist_singles)
@@ -0,0 +1,462 @@
+"""
+In-memory columnar copy of the music database for the get_* queries.
+
+ColumnarEngine loads Artists, Genres, Users, Songs, SongGenres and Ratings
+into NumPy arrays and answers the get_* queries of music_db.py with
+vectorized counting (bincount), top-n selection (argpartition) and sorting
+(lexsort), with the same results as the SQL versions:
+
+    engine = ColumnarEngine(mydb)
+    engine.get_most_rated_songs((2020, 2021), 10)
+    ...
+    engine.refresh(mydb)    # pull rows added since the last refresh
+
+Names are dictionary-encoded: rows refer to artists, genres, users and songs
+by their position in the engine, and the names are kept once per entity.
+Ties are broken by the rank of every name in the server's ORDER BY, so the
+order follows the column collation exactly; rows with equal names are
+ordered by id.
+
+Ratings and singles are kept sorted by date. Counts over whole years come
+from per-year counts that are computed once and kept until new rows of that
+year arrive, so a query over a range of years costs a few vector additions
+over the entities plus the top-n selection, whatever the number of ratings.
+
+refresh() pulls rows with ids above the highest id already loaded, in one
+consistent snapshot. It starts and commits a transaction of its own, so it
+refuses to run while the connection has one open: commit or roll back
+first. It assumes the tables only grow and that rows are
+committed in id order, which holds for the loaders of music_db.py run from
+one connection. After deletes, updates or parallel loads call
+refresh(mydb, full=True).
+
+Requires NumPy.
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from music_db import DateLike, _date_bounds, _year_bounds
+
+# Rows fetched from the server at a time during a refresh
+_FETCH_SIZE = 100000
+
+_EPOCH = date(1970, 1, 1)
+
+# Day number before any date, for artists without singles
+_NO_DAY = np.iinfo(np.int64).min
+
+
+def _day(value: date) -> int:
+    """Days since 1970-01-01."""
+    return (value - _EPOCH).days
+
+
+def _jan1(year: int) -> int:
+    """Day number of January 1st of a year."""
+    return int(np.datetime64(year - 1970, "Y").astype("datetime64[D]").astype(np.int64))
+
+
+def _years(days: np.ndarray) -> np.ndarray:
+    """Calendar year of every day number."""
+    return days.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64) + 1970
+
+
+def _grow(array: np.ndarray, size: int, fill) -> np.ndarray:
+    """Pad a per-entity array with fill up to size entries."""
+    return np.concatenate([array, np.full(size - array.size, fill, array.dtype)])
+
+
+def _fetch(cursor, sql: str, params: Sequence = ()) -> Iterable[list]:
+    """Yield the rows of a query in batches of _FETCH_SIZE."""
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(_FETCH_SIZE)
+        if not rows:
+            return
+        yield rows
+
+
+def _top(counts: np.ndarray, rank: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions and counts of the n largest non-zero counts, largest first,
+    ties broken by ascending rank.
+    """
+    positions = np.flatnonzero(counts)
+    if n <= 0 or positions.size == 0:
+        return positions[:0], counts[:0]
+    values = counts[positions]
+    if n < positions.size:
+        # Keep everything that ties with the n-th largest count
+        nth = values[np.argpartition(-values, n - 1)[n - 1]]
+        keep = values >= nth
+        positions, values = positions[keep], values[keep]
+    order = np.lexsort((rank[positions], -values))[:n]
+    return positions[order], values[order]
+
+
+class _Dimension:
+    """Ids, names and collation ranks of the rows of a named table."""
+
+    def __init__(self):
+        self.ids = np.zeros(0, np.int64)
+        self.names: List[str] = []
+        self.rank = np.zeros(0, np.int64)
+
+    def __len__(self) -> int:
+        return self.ids.size
+
+    @property
+    def last_id(self) -> int:
+        return int(self.ids[-1]) if self.ids.size else 0
+
+    def append(self, ids: np.ndarray, names: List[str]):
+        self.ids = np.concatenate([self.ids, ids])
+        self.names.extend(names)
+
+    def index(self, ids: np.ndarray) -> np.ndarray:
+        """Positions of ids; ids grow with every refresh, so they stay sorted."""
+        return np.searchsorted(self.ids, ids)
+
+    def set_order(self, ordered_ids: np.ndarray):
+        """Set the ranks from all ids in the server's name order."""
+        self.rank = np.empty(len(self), np.int64)
+        self.rank[self.index(ordered_ids)] = np.arange(ordered_ids.size)
+
+
+class _Events:
+    """
+    Dated rows (ratings, singles) sorted by day, with one or more key
+    columns holding entity positions, and their per-year counts.
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.days = np.zeros(0, np.int64)
+        self.columns = {column: np.zeros(0, np.int64) for column in columns}
+        self._year_counts: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def add(self, days: np.ndarray, columns: Dict[str, np.ndarray]):
+        """Merge new rows in, keeping the days sorted."""
+        if days.size == 0:
+            return
+        order = np.argsort(days, kind="stable")
+        days = days[order]
+        at = np.searchsorted(self.days, days, side="right")
+        self.days = np.insert(self.days, at, days)
+        for column, keys in columns.items():
+            self.columns[column] = np.insert(self.columns[column], at, keys[order])
+        touched = set(np.unique(_years(days)).tolist())
+        for key in [key for key in self._year_counts if key[1] in touched]:
+            del self._year_counts[key]
+
+    def _slice_counts(self, column: str, start: int, end: int) -> np.ndarray:
+        lo, hi = np.searchsorted(self.days, [start, end])
+        return np.bincount(self.columns[column][lo:hi])
+
+    def _year(self, column: str, year: int) -> np.ndarray:
+        key = (column, year)
+        if key not in self._year_counts:
+            self._year_counts[key] = self._slice_counts(
+                column, _jan1(year), _jan1(year + 1)
+            )
+        return self._year_counts[key]
+
+    def counts(self, column: str, start: int, end: int, size: int) -> np.ndarray:
+        """Number of rows per entity position with a day in [start, end)."""
+        total = np.zeros(size, np.int64)
+        if self.days.size == 0 or start >= end:
+            return total
+
+        # Whole years inside the range that hold data come from the cache,
+        # the partial years at both ends are counted from the sorted days
+        first_year = int(_years(np.array([start]))[0])
+        if _jan1(first_year) < start:
+            first_year += 1
+        last_year = int(_years(np.array([end]))[0]) - 1
+        first_year = max(first_year, int(_years(self.days[:1])[0]))
+        last_year = min(last_year, int(_years(self.days[-1:])[0]))
+
+        if first_year > last_year:
+            parts = [self._slice_counts(column, start, end)]
+        else:
+            parts = [
+                self._slice_counts(column, start, _jan1(first_year)),
+                self._slice_counts(column, _jan1(last_year + 1), end),
+            ]
+            parts += [self._year(column, y) for y in range(first_year, last_year + 1)]
+        for part in parts:
+            total[: part.size] += part
+        return total
+
+
+class ColumnarEngine:
+    """
+    NumPy copy of the music database answering the get_* queries.
+
+    Args:
+        mydb: connection to load from; without it the engine starts empty
+            and is filled by refresh()
+
+    The methods take the arguments of the music_db.py functions of the same
+    name, without the connection.
+    """
+
+    def __init__(self, mydb=None):
+        self._reset()
+        if mydb is not None:
+            self.refresh(mydb)
+
+    def _reset(self):
+        self.artists = _Dimension()
+        self.genres = _Dimension()
+        self.users = _Dimension()
+        self.songs = _Dimension()
+        self.song_artist = np.zeros(0, np.int64)
+        self.genre_songs = np.zeros(0, np.int64)
+        self.artist_last_single = np.zeros(0, np.int64)
+        self.artist_has_single = np.zeros(0, bool)
+        self.artist_has_album = np.zeros(0, bool)
+        self.singles = _Events(["artist"])
+        self.ratings = _Events(["song", "user"])
+        self._last_song_genre = 0
+        self._last_rating = 0
+
+    def refresh(self, mydb, full: bool = False) -> Dict[str, int]:
+        """
+        Load the rows added since the last refresh (all rows if full).
+
+        The rows are read in a transaction of its own, which would commit
+        the caller's, so the connection must not have one open (after a
+        read, MySQL has one until commit or rollback).
+
+        Returns:
+            Dict[str, int]: number of new rows per table
+
+        Raises:
+            RuntimeError: if the connection has a transaction open
+        """
+        if mydb.in_transaction:
+            raise RuntimeError(
+                "refresh() needs a connection without an open transaction; "
+                "commit or roll back first"
+            )
+        if full:
+            self._reset()
+        cursor = mydb.cursor()
+        try:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+            added = {
+                "Artists": self._refresh_dimension(
+                    cursor, self.artists, "Artists", "artist_id", "artist_name"
+                ),
+                "Genres": self._refresh_dimension(
+                    cursor, self.genres, "Genres", "genre_id", "genre_name"
+                ),
+                "Users": self._refresh_dimension(
+                    cursor, self.users, "Users", "user_id", "user_name"
+                ),
+            }
+            added["Songs"] = self._refresh_songs(cursor)
+            added["SongGenres"] = self._refresh_song_genres(cursor)
+            added["Ratings"] = self._refresh_ratings(cursor)
+            mydb.commit()
+        finally:
+            cursor.close()
+        return added
+
+    def _refresh_dimension(
+        self, cursor, dimension: _Dimension, table: str, id_column: str, name: str
+    ) -> int:
+        before = len(dimension)
+        for rows in _fetch(
+            cursor,
+            f"SELECT {id_column}, {name} FROM {table} "
+            f"WHERE {id_column} > %s ORDER BY {id_column}",
+            (dimension.last_id,),
+        ):
+            dimension.append(
+                np.array([row[0] for row in rows], np.int64), [row[1] for row in rows]
+            )
+        if len(dimension) > before:
+            self._refresh_order(cursor, dimension, table, id_column, name)
+        return len(dimension) - before
+
+    @staticmethod
+    def _refresh_order(
+        cursor, dimension: _Dimension, table: str, id_column: str, name: str
+    ):
+        """Rank all names of a table in the server's collation order."""
+        ordered = [
+            np.array([row[0] for row in rows], np.int64)
+            for rows in _fetch(
+                cursor, f"SELECT {id_column} FROM {table} ORDER BY {name}, {id_column}"
+            )
+        ]
+        dimension.set_order(np.concatenate(ordered))
+
+    def _refresh_songs(self, cursor) -> int:
+        before = len(self.songs)
+        size = len(self.artists)
+        self.artist_last_single = _grow(self.artist_last_single, size, _NO_DAY)
+        self.artist_has_single = _grow(self.artist_has_single, size, False)
+        self.artist_has_album = _grow(self.artist_has_album, size, False)
+
+        for rows in _fetch(
+            cursor,
+            """
+            SELECT song_id, song_title, artist_id, album_id IS NULL,
+                   DATEDIFF(release_date, '1970-01-01')
+            FROM Songs WHERE song_id > %s ORDER BY song_id
+        """,
+            (self.songs.last_id,),
+        ):
+            ids = np.array([row[0] for row in rows], np.int64)
+            artist = self.artists.index(np.array([row[2] for row in rows], np.int64))
+            single = np.array([bool(row[3]) for row in rows])
+            day = np.array([row[4] for row in rows], np.int64)
+
+            self.songs.append(ids, [row[1] for row in rows])
+            self.song_artist = np.concatenate([self.song_artist, artist])
+
+            np.maximum.at(self.artist_last_single, artist[single], day[single])
+            self.artist_has_single[artist[single]] = True
+            self.artist_has_album[artist[~single]] = True
+            self.singles.add(day[single], {"artist": artist[single]})
+
+        if len(self.songs) > before:
+            self._refresh_order(cursor, self.songs, "Songs", "song_id", "song_title")
+        return len(self.songs) - before
+
+    def _refresh_song_genres(self, cursor) -> int:
+        added = 0
+        self.genre_songs = _grow(self.genre_songs, len(self.genres), 0)
+        # The loaders add the genres of a song together with the song
+        for rows in _fetch(
+            cursor,
+            """
+            SELECT song_id, genre_id FROM SongGenres
+            WHERE song_id > %s ORDER BY song_id
+        """,
+            (self._last_song_genre,),
+        ):
+            genre = self.genres.index(np.array([row[1] for row in rows], np.int64))
+            self.genre_songs += np.bincount(genre, minlength=self.genre_songs.size)
+            self._last_song_genre = rows[-1][0]
+            added += len(rows)
+        return added
+
+    def _refresh_ratings(self, cursor) -> int:
+        added = 0
+        for rows in _fetch(
+            cursor,
+            """
+            SELECT rating_id, song_id, user_id,
+                   DATEDIFF(rating_date, '1970-01-01')
+            FROM Ratings WHERE rating_id > %s ORDER BY rating_id
+        """,
+            (self._last_rating,),
+        ):
+            self.ratings.add(
+                np.array([row[3] for row in rows], np.int64),
+                {
+                    "song": self.songs.index(
+                        np.array([row[1] for row in rows], np.int64)
+                    ),
+                    "user": self.users.index(
+                        np.array([row[2] for row in rows], np.int64)
+                    ),
+                },
+            )
+            self._last_rating = rows[-1][0]
+            added += len(rows)
+        return added
+
+    # Queries
+
+    def _prolific(self, start: int, end: int, n: int) -> List[Tuple[str, int]]:
+        counts = self.singles.counts("artist", start, end, len(self.artists))
+        positions, values = _top(counts, self.artists.rank, n)
+        return [
+            (self.artists.names[p], int(v))
+            for p, v in zip(positions.tolist(), values.tolist())
+        ]
+
+    def get_most_prolific_individual_artists(
+        self, n: int, year_range: Tuple[int, int]
+    ) -> List[Tuple[str, int]]:
+        """See music_db.get_most_prolific_individual_artists."""
+        return self._prolific(_jan1(year_range[0]), _jan1(year_range[1] + 1), n)
+
+    def get_most_prolific_individual_artists_between(
+        self, n: int, start_date: DateLike, end_date: DateLike
+    ) -> List[Tuple[str, int]]:
+        """See music_db.get_most_prolific_individual_artists_between."""
+        start, end = _date_bounds(start_date, end_date)
+        return self._prolific(_day(start), _day(end), n)
+
+    def get_artists_last_single_in_year(self, year: int) -> Set[str]:
+        """See music_db.get_artists_last_single_in_year."""
+        has_single = self.artist_last_single != _NO_DAY
+        match = np.zeros(has_single.size, bool)
+        match[has_single] = _years(self.artist_last_single[has_single]) == year
+        return {self.artists.names[p] for p in np.flatnonzero(match).tolist()}
+
+    def get_top_song_genres(self, n: int) -> List[Tuple[str, int]]:
+        """See music_db.get_top_song_genres."""
+        positions, values = _top(self.genre_songs, self.genres.rank, n)
+        return [
+            (self.genres.names[p], int(v))
+            for p, v in zip(positions.tolist(), values.tolist())
+        ]
+
+    def get_album_and_single_artists(self) -> Set[str]:
+        """See music_db.get_album_and_single_artists."""
+        both = self.artist_has_single & self.artist_has_album
+        return {self.artists.names[p] for p in np.flatnonzero(both).tolist()}
+
+    def _rated(self, start: int, end: int, n: int) -> List[Tuple[str, str, int]]:
+        counts = self.ratings.counts("song", start, end, len(self.songs))
+        positions, values = _top(counts, self.songs.rank, n)
+        return [
+            (
+                self.songs.names[p],
+                self.artists.names[self.song_artist[p]],
+                int(v),
+            )
+            for p, v in zip(positions.tolist(), values.tolist())
+        ]
+
+    def get_most_rated_songs(
+        self, year_range: Tuple[int, int], n: int
+    ) -> List[Tuple[str, str, int]]:
+        """See music_db.get_most_rated_songs."""
+        return self._rated(_jan1(year_range[0]), _jan1(year_range[1] + 1), n)
+
+    def get_most_rated_songs_between(
+        self, start_date: DateLike, end_date: DateLike, n: int
+    ) -> List[Tuple[str, str, int]]:
+        """See music_db.get_most_rated_songs_between."""
+        start, end = _date_bounds(start_date, end_date)
+        return self._rated(_day(start), _day(end), n)
+
+    def _engaged(self, start: date, end: date, n: int) -> List[Tuple[str, int]]:
+        counts = self.ratings.counts("user", _day(start), _day(end), len(self.users))
+        positions, values = _top(counts, self.users.rank, n)
+        return [
+            (self.users.names[p], int(v))
+            for p, v in zip(positions.tolist(), values.tolist())
+        ]
+
+    def get_most_engaged_users(
+        self, year_range: Tuple[int, int], n: int
+    ) -> List[Tuple[str, int]]:
+        """See music_db.get_most_engaged_users."""
+        return self._engaged(*_year_bounds(*year_range), n)
+
+    def get_most_engaged_users_between(
+        self, start_date: DateLike, end_date: DateLike, n: int
+    ) -> List[Tuple[str, int]]:
+        """See music_db.get_most_engaged_users_between."""
+        return self._engaged(*_date_bounds(start_date, end_date), n)
@@ -0,0 +1,508 @@
+"""
+Capture the query plans of the statements of music_db.py and check them
+against a baseline.
+
+capture loads a generated workload (see music_db_workload.py) with the
+loaders and calls every get_*, check_* and rebuild_* function with
+representative parameters. Every SELECT, UPDATE, DELETE and INSERT ...
+SELECT they send is explained on their own connection just before it runs,
+so the loaders' staging tables hold the rows of the chunk being applied:
+
+    MySQL   EXPLAIN FORMAT=JSON, EXPLAIN ANALYZE for SELECTs (MySQL 8.0.18
+            and later), and per-statement counters: rows examined, sent and
+            affected, scans, sorts and temporary tables from
+            performance_schema.events_statements_history, and the Handler_*
+            status counters of the connection's thread, approximately (the
+            cost of reading them is measured once and subtracted)
+    SQLite  EXPLAIN QUERY PLAN; no row estimates or counters
+
+Plans are keyed by function and normalized SQL and summarized as the
+tables read with a full scan, whether a filesort or a temporary table is
+used and the estimated rows examined; statements run several times (once
+per chunk) keep the union of their full scans and flags and their largest
+estimate. check and compare report every statement with a new full scan,
+filesort or temporary table, or an estimate more than --rows-factor times
+its baseline's, and exit with status 1 if there is one.
+
+Usage:
+    python music_db_explain.py capture --output plans.json
+    python music_db_explain.py check plans.json --output current.json
+    python music_db_explain.py compare plans.json current.json
+    python music_db_explain.py capture --backend sqlite --output sqlite.json
+
+check rebuilds the workload the baseline was captured with.
+"""
+
+import argparse
+import json
+import platform
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from music_db import *
+from music_db import _normalize_sql
+import music_db_sqlite
+from music_db_workload import Workload
+
+DEFAULT_RATINGS = 20_000
+DEFAULT_ROWS_FACTOR = 10.0
+
+# Estimates below this many rows never count as a jump
+DEFAULT_MIN_ROWS = 1_000
+
+# Statements with a plan: reads, and writes that read other tables
+_EXPLAINABLE = re.compile(
+    r"\s*(?:SELECT|WITH|UPDATE|DELETE|(?:INSERT|REPLACE)\b.*\bSELECT)\b",
+    re.IGNORECASE | re.DOTALL,
+)
+# SELECT @@max_allowed_packet and the like read no table
+_READS_TABLE = re.compile(r"\b(?:FROM|UPDATE)\b", re.IGNORECASE)
+
+# Plan details that vary between runs without the plan changing
+_VOLATILE_KEYS = {
+    "cost_info",
+    "rows_examined_per_scan",
+    "rows_produced_per_join",
+    "filtered",
+    "data_read_per_join",
+    "query_cost",
+}
+
+_STATEMENT_COUNTERS = """
+    SELECT ROWS_EXAMINED, ROWS_SENT, ROWS_AFFECTED, SELECT_SCAN,
+           SELECT_FULL_JOIN, SORT_ROWS, SORT_MERGE_PASSES, CREATED_TMP_TABLES,
+           CREATED_TMP_DISK_TABLES, NO_INDEX_USED
+    FROM performance_schema.events_statements_history
+    WHERE THREAD_ID = PS_CURRENT_THREAD_ID()
+    ORDER BY EVENT_ID DESC
+    LIMIT 1
+"""
+_HANDLER_COUNTERS = """
+    SELECT VARIABLE_NAME, VARIABLE_VALUE
+    FROM performance_schema.status_by_thread
+    WHERE THREAD_ID = PS_CURRENT_THREAD_ID() AND VARIABLE_NAME LIKE 'Handler%'
+"""
+
+# SQLite plan details: "SCAN t", "SEARCH t USING INDEX i (...)", ...
+_SQLITE_ACCESS = re.compile(r"^(SCAN|SEARCH) (\S+)(?: USING (.*))?$")
+
+
+def explainable(sql: str) -> bool:
+    """Whether sql is a statement with a plan worth checking."""
+    return bool(_EXPLAINABLE.match(sql)) and bool(_READS_TABLE.search(sql))
+
+
+def mysql_plan_summary(plan: dict) -> dict:
+    """
+    Summary of an EXPLAIN FORMAT=JSON plan: tables with access type ALL,
+    filesort, temporary table and the rows examined per scan of all tables.
+    """
+    summary = {"full_scans": set(), "filesort": False, "temporary": False, "rows": 0}
+
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        if node.get("using_filesort"):
+            summary["filesort"] = True
+        if node.get("using_temporary_table"):
+            summary["temporary"] = True
+        table = node.get("table")
+        if isinstance(table, dict):
+            if table.get("access_type") == "ALL":
+                summary["full_scans"].add(table.get("table_name", "?"))
+            summary["rows"] += int(table.get("rows_examined_per_scan", 0))
+        for value in node.values():
+            walk(value)
+
+    walk(plan)
+    summary["full_scans"] = sorted(summary["full_scans"])
+    return summary
+
+
+def sqlite_plan_summary(rows: List[tuple]) -> dict:
+    """Summary of EXPLAIN QUERY PLAN rows, like mysql_plan_summary."""
+    summary = {"full_scans": set(), "filesort": False, "temporary": False, "rows": 0}
+    for row in rows:
+        detail = row[3]
+        if detail.startswith("USE TEMP B-TREE FOR"):
+            if "ORDER BY" in detail:
+                summary["filesort"] = True
+            else:
+                summary["temporary"] = True
+            continue
+        match = _SQLITE_ACCESS.match(detail)
+        if match is None:
+            continue
+        kind, table, using = match.groups()
+        if using and "AUTOMATIC" in using:
+            # An index built for this statement only, from a full scan
+            summary["temporary"] = True
+        if kind == "SCAN" and not using and table != "CONSTANT":
+            summary["full_scans"].add(table)
+    summary["full_scans"] = sorted(summary["full_scans"])
+    return summary
+
+
+def _stable_plan(node):
+    """A plan without the estimates and costs that vary between runs."""
+    if isinstance(node, dict):
+        return {k: _stable_plan(v) for k, v in node.items() if k not in _VOLATILE_KEYS}
+    if isinstance(node, list):
+        return [_stable_plan(item) for item in node]
+    return node
+
+
+class PlanRecorder:
+    """
+    Connection proxy explaining every explainable statement sent through it
+    before running it, and recording the plans under the function being
+    called (set function before every call).
+    """
+
+    def __init__(self, mydb):
+        self._mydb = mydb
+        self.sqlite = isinstance(mydb, music_db_sqlite.SQLiteConnection)
+        self.function = None
+        self.statements: Dict[str, dict] = {}
+        self._analyze = not self.sqlite
+        self._counters = not self.sqlite
+        self._pending: Optional[Tuple[dict, dict]] = None
+        self._handler_overhead = {}
+        if self._counters:
+            self._calibrate()
+
+    def cursor(self, *args, **kwargs):
+        return _RecordingCursor(self, self._mydb.cursor(*args, **kwargs))
+
+    def commit(self):
+        self.collect()
+        self._mydb.commit()
+
+    def rollback(self):
+        self.collect()
+        self._mydb.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._mydb, name)
+
+    def record(self, cursor, sql: str, params):
+        """Explain a statement about to run on cursor."""
+        self.collect()
+        if not explainable(sql):
+            return
+        key = f"{self.function}: {_normalize_sql(sql)}"
+        if self.sqlite:
+            rows = cursor.explain(sql, params or ())
+            summary = sqlite_plan_summary(rows)
+            plan = [row[3] for row in rows]
+            analyze = None
+        else:
+            plan = json.loads(self._query("EXPLAIN FORMAT=JSON " + sql, params)[0][0])
+            summary = mysql_plan_summary(plan)
+            plan = _stable_plan(plan)
+            analyze = self._explain_analyze(sql, params)
+
+        entry = self.statements.get(key)
+        if entry is None:
+            entry = self.statements[key] = {
+                "function": self.function,
+                "sql": _normalize_sql(sql),
+                "executions": 0,
+                "full_scans": [],
+                "filesort": False,
+                "temporary": False,
+                "rows": 0,
+                "plan": plan,
+                "analyze": analyze,
+                "counters": {},
+            }
+        entry["executions"] += 1
+        entry["full_scans"] = sorted(
+            set(entry["full_scans"]) | set(summary["full_scans"])
+        )
+        entry["filesort"] = entry["filesort"] or summary["filesort"]
+        entry["temporary"] = entry["temporary"] or summary["temporary"]
+        entry["rows"] = max(entry["rows"], summary["rows"])
+        if self._counters:
+            self._pending = (entry, self._handlers())
+
+    def collect(self):
+        """
+        Add the counters of the statement run after the last record(). They
+        are read before the next statement, once its rows have been fetched.
+        """
+        if self._pending is None:
+            return
+        entry, before = self._pending
+        self._pending = None
+        counters = entry["counters"]
+        # The statement is the thread's latest until this query ends
+        cursor = self._mydb.cursor()
+        cursor.execute(_STATEMENT_COUNTERS)
+        row = cursor.fetchone()
+        names = [column[0].lower() for column in cursor.description]
+        cursor.close()
+        for name, value in zip(names, row or ()):
+            counters[name] = counters.get(name, 0) + int(value or 0)
+        after = self._handlers()
+        for name, value in after.items():
+            delta = value - before.get(name, 0) - self._handler_overhead.get(name, 0)
+            counters[name] = counters.get(name, 0) + max(delta, 0)
+
+    def _query(self, sql: str, params=None) -> List[tuple]:
+        cursor = self._mydb.cursor()
+        try:
+            cursor.execute(sql, params or ())
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _explain_analyze(self, sql: str, params) -> Optional[str]:
+        """EXPLAIN ANALYZE output of a SELECT, None where unavailable."""
+        if not self._analyze or not sql.lstrip()[:6].upper() == "SELECT":
+            return None
+        try:
+            return self._query("EXPLAIN ANALYZE " + sql, params)[0][0]
+        except Exception:
+            # Needs MySQL 8.0.18
+            self._analyze = False
+            return None
+
+    def _handlers(self) -> Dict[str, int]:
+        return {name: int(value) for name, value in self._query(_HANDLER_COUNTERS)}
+
+    def _calibrate(self):
+        """
+        Measure the Handler_* counts of reading the counters, as collect()
+        does, or give up counters.
+        """
+        try:
+            first = self._handlers()
+            self._query(_STATEMENT_COUNTERS)
+            second = self._handlers()
+        except Exception:
+            # performance_schema is off or PS_CURRENT_THREAD_ID() is missing
+            self._counters = False
+            return
+        self._handler_overhead = {
+            name: second[name] - first.get(name, 0) for name in second
+        }
+
+
+class _RecordingCursor:
+    """Cursor proxy handing statements to a PlanRecorder before running them."""
+
+    def __init__(self, recorder: PlanRecorder, cursor):
+        self._recorder = recorder
+        self._cursor = cursor
+
+    def execute(self, sql, params=None, *args, **kwargs):
+        self._recorder.record(self._cursor, sql, params)
+        if params is None:
+            return self._cursor.execute(sql, *args, **kwargs)
+        return self._cursor.execute(sql, params, *args, **kwargs)
+
+    def executemany(self, sql, rows):
+        self._recorder.collect()
+        return self._cursor.executemany(sql, rows)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def workload_calls(workload: Workload, chunk_size: int) -> List[Tuple[str, Callable]]:
+    """(function name, call(mydb)) for every function, in a sensible order."""
+    first_year, last_year = workload.rating_years
+    years = (max(first_year, last_year - 1), last_year)
+    start, end = f"{years[0]}-03-01", f"{years[1]}-02-28"
+    release_year = workload.release_years[1]
+
+    def load(loader, rows):
+        return lambda mydb: loader(mydb, rows(), chunk_size=chunk_size)
+
+    return [
+        ("clear_database", clear_database),
+        ("load_single_songs", load(load_single_songs, workload.singles)),
+        ("load_albums", load(load_albums, workload.albums)),
+        ("load_users", load(load_users, workload.users)),
+        ("load_song_ratings", load(load_song_ratings, workload.ratings)),
+        (
+            "get_most_prolific_individual_artists",
+            lambda mydb: get_most_prolific_individual_artists(mydb, 10, years),
+        ),
+        (
+            "get_most_prolific_individual_artists_between",
+            lambda mydb: get_most_prolific_individual_artists_between(
+                mydb, 10, start, end
+            ),
+        ),
+        (
+            "get_artists_last_single_in_year",
+            lambda mydb: get_artists_last_single_in_year(mydb, release_year),
+        ),
+        ("get_top_song_genres", lambda mydb: get_top_song_genres(mydb, 10)),
+        ("get_album_and_single_artists", get_album_and_single_artists),
+        ("get_most_rated_songs", lambda mydb: get_most_rated_songs(mydb, years, 10)),
+        (
+            "get_most_rated_songs_between",
+            lambda mydb: get_most_rated_songs_between(mydb, start, end, 10),
+        ),
+        (
+            "get_most_engaged_users",
+            lambda mydb: get_most_engaged_users(mydb, years, 10),
+        ),
+        (
+            "get_most_engaged_users_between",
+            lambda mydb: get_most_engaged_users_between(mydb, start, end, 10),
+        ),
+        ("check_song_rating_counts", check_song_rating_counts),
+        ("check_genre_stats", check_genre_stats),
+        ("check_artist_singles", check_artist_singles),
+        ("rebuild_song_rating_counts", rebuild_song_rating_counts),
+        ("rebuild_genre_stats", rebuild_genre_stats),
+        ("rebuild_artist_singles", rebuild_artist_singles),
+    ]
+
+
+def capture_plans(
+    mydb, ratings: int = DEFAULT_RATINGS, seed: int = 0, chunk_size: int = 1_000
+) -> dict:
+    """
+    Load a generated workload into the (emptied) database, call every
+    function and return the plans of their statements, as a JSON document.
+    """
+    workload = Workload(num_ratings=ratings, seed=seed)
+    recorder = PlanRecorder(mydb)
+    for name, call in workload_calls(workload, chunk_size):
+        recorder.function = name
+        call(recorder)
+        recorder.collect()
+
+    return {
+        "meta": {
+            "backend": "sqlite" if recorder.sqlite else "mysql",
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "ratings": ratings,
+            "seed": seed,
+            "chunk_size": chunk_size,
+        },
+        "statements": dict(sorted(recorder.statements.items())),
+    }
+
+
+def compare_plans(
+    baseline: dict,
+    current: dict,
+    rows_factor: float = DEFAULT_ROWS_FACTOR,
+    min_rows: int = DEFAULT_MIN_ROWS,
+) -> List[Tuple[str, str]]:
+    """
+    Plan regressions of current against baseline, as (statement key,
+    description) pairs. Statements missing from either document are skipped.
+    """
+    regressions = []
+    for key, entry in current["statements"].items():
+        base = baseline["statements"].get(key)
+        if base is None:
+            continue
+        new_scans = sorted(set(entry["full_scans"]) - set(base["full_scans"]))
+        if new_scans:
+            regressions.append((key, f"new full scan of {', '.join(new_scans)}"))
+        if entry["filesort"] and not base["filesort"]:
+            regressions.append((key, "new filesort"))
+        if entry["temporary"] and not base["temporary"]:
+            regressions.append((key, "new temporary table"))
+        if entry["rows"] >= min_rows and entry["rows"] > base["rows"] * rows_factor:
+            regressions.append(
+                (key, f"estimated rows {base['rows']:,} -> {entry['rows']:,}")
+            )
+    return regressions
+
+
+def _report(baseline: dict, current: dict, args) -> int:
+    """Print the differences of two documents; the exit status."""
+    added = sorted(set(current["statements"]) - set(baseline["statements"]))
+    removed = sorted(set(baseline["statements"]) - set(current["statements"]))
+    for key in added:
+        print(f"new statement (not checked): {key[:160]}")
+    for key in removed:
+        print(f"statement no longer run: {key[:160]}")
+    regressions = compare_plans(baseline, current, args.rows_factor, args.min_rows)
+    for key, problem in regressions:
+        print(f"REGRESSION {problem}: {key[:160]}")
+    if regressions:
+        return 1
+    print(f"{len(current['statements'])} statements, no plan regressions")
+    return 0
+
+
+def main():
+    """Capture, check or compare plans."""
+    # Database configuration - UPDATE THESE VALUES
+    DB_CONFIG = {
+        "host": "localhost",
+        "user": "root",
+        "password": "root",  # Change this
+        "database": "musicdb",  # Change this
+    }
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=("capture", "check", "compare"))
+    parser.add_argument("documents", nargs="*", metavar="PLANS")
+    parser.add_argument("--output", help="write the captured plans to this file")
+    parser.add_argument("--backend", choices=("mysql", "sqlite"), default="mysql")
+    parser.add_argument(
+        "--database", default=":memory:", help="SQLite database (--backend sqlite)"
+    )
+    parser.add_argument("--ratings", type=int, default=DEFAULT_RATINGS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=1_000)
+    parser.add_argument("--rows-factor", type=float, default=DEFAULT_ROWS_FACTOR)
+    parser.add_argument("--min-rows", type=int, default=DEFAULT_MIN_ROWS)
+    args = parser.parse_args()
+    expected = {"capture": 0, "check": 1, "compare": 2}[args.command]
+    if len(args.documents) != expected:
+        parser.error(f"{args.command} takes {expected} plan files")
+
+    documents = []
+    for path in args.documents:
+        with open(path, encoding="utf-8") as f:
+            documents.append(json.load(f))
+    if args.command == "compare":
+        sys.exit(_report(documents[0], documents[1], args))
+
+    if args.command == "check":
+        meta = documents[0]["meta"]
+        args.backend = meta["backend"]
+        args.ratings, args.seed = meta["ratings"], meta["seed"]
+        args.chunk_size = meta["chunk_size"]
+    if args.backend == "sqlite":
+        mydb = music_db_sqlite.connect(args.database)
+    else:
+        import mysql.connector
+
+        mydb = mysql.connector.connect(**DB_CONFIG)
+    try:
+        current = capture_plans(mydb, args.ratings, args.seed, args.chunk_size)
+    finally:
+        mydb.close()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    print(f"captured the plans of {len(current['statements'])} statements")
+    if args.command == "check":
+        sys.exit(_report(documents[0], current, args))
+
+
+if __name__ == "__main__":
+    main()
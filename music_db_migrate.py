@@ -0,0 +1,519 @@
+"""
+Online migration that widens the SMALLINT id columns of the music database.
+
+Older copies of schema.sql declared every *_id column as SMALLINT, which caps
+each table at 32,767 rows. This tool moves those columns to INT UNSIGNED
+(BIGINT UNSIGNED for Ratings.rating_id) without holding a long table lock:
+
+1. A shadow table ``_<Table>_new`` with the wide column types is created for
+   every table that needs it, without foreign keys.
+2. Triggers on the original tables mirror every INSERT, UPDATE and DELETE
+   into the shadow tables, so writes can continue during the copy.
+3. Existing rows are copied in key-range chunks, one short transaction each.
+4. Row counts are compared in a single consistent snapshot.
+5. One RENAME TABLE statement swaps all the tables at once. The tables' own
+   triggers (e.g. the GenreStats ones) are moved to the new tables, the old
+   tables and the copy triggers are dropped and the foreign keys are added
+   to the new tables.
+
+Usage:
+    python music_db_migrate.py [--chunk-size N] [--sleep SECONDS] [--dry-run]
+    python music_db_migrate.py --cleanup
+
+--cleanup removes the shadow tables and triggers left by an interrupted run.
+"""
+
+import argparse
+import re
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Tables of the music database, parents before children
+TABLES = (
+    "Artists",
+    "Genres",
+    "Users",
+    "Albums",
+    "Songs",
+    "ArtistSinglesSummary",
+    "ArtistSingleCounts",
+    "GenreStats",
+    "SongGenres",
+    "Ratings",
+    "SongRatingCounts",
+)
+
+# Target type of the widened id columns
+WIDE_ID_TYPE = "INT UNSIGNED"
+WIDE_ID_TYPES = {("Ratings", "rating_id"): "BIGINT UNSIGNED"}
+
+DEFAULT_COPY_CHUNK_SIZE = 5000
+DEFAULT_CUTOVER_RETRIES = 10
+
+# Seconds the cut-over RENAME waits for its metadata locks before retrying
+_CUTOVER_LOCK_WAIT = 2
+
+_ER_LOCK_WAIT_TIMEOUT = 1205
+_ER_LOCK_DEADLOCK = 1213
+
+_FOREIGN_KEY_LINE = re.compile(r"^\s*(CONSTRAINT `[^`]+` )?FOREIGN KEY ")
+
+
+def _shadow_name(table: str) -> str:
+    return f"_{table}_new"
+
+
+def _old_name(table: str) -> str:
+    return f"_{table}_old"
+
+
+def _trigger_name(table: str, event: str) -> str:
+    return f"_{table}_widen_{event}"
+
+
+def _text(value) -> str:
+    """information_schema text columns may come back as bytes."""
+    return value.decode() if isinstance(value, (bytes, bytearray)) else str(value)
+
+
+def _columns(cursor, table: str) -> List[Tuple[str, str]]:
+    """Return (name, type) of every column of a table, in table order."""
+    cursor.execute(
+        """
+        SELECT COLUMN_NAME, COLUMN_TYPE
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY ORDINAL_POSITION
+        """,
+        (table,),
+    )
+    return [
+        (_text(name), _text(column_type)) for name, column_type in cursor.fetchall()
+    ]
+
+
+def _narrow_columns(cursor, table: str) -> List[str]:
+    """Return the id columns of a table that are still SMALLINT."""
+    return [
+        name
+        for name, column_type in _columns(cursor, table)
+        if name.endswith("_id") and column_type.lower().startswith("smallint")
+    ]
+
+
+def _key_columns(cursor, table: str) -> List[str]:
+    """
+    Return the columns that identify a row: the primary key, or the first
+    unique index for tables without one (SongGenres).
+    """
+    cursor.execute(
+        """
+        SELECT INDEX_NAME, COLUMN_NAME
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0
+        ORDER BY INDEX_NAME <> 'PRIMARY', INDEX_NAME, SEQ_IN_INDEX
+        """,
+        (table,),
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        raise ValueError(f"Table {table} has no primary key or unique index")
+    first_index = rows[0][0]
+    return [_text(column) for index, column in rows if index == first_index]
+
+
+def _related_tables(cursor, table: str) -> List[str]:
+    """Return the tables that table references or is referenced by."""
+    cursor.execute(
+        """
+        SELECT REFERENCED_TABLE_NAME FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+          AND REFERENCED_TABLE_NAME IS NOT NULL
+        UNION
+        SELECT TABLE_NAME FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME = %s
+        """,
+        (table, table),
+    )
+    return [_text(row[0]) for row in cursor.fetchall()]
+
+
+def plan_migration(mydb, tables: Sequence[str] = TABLES) -> List[str]:
+    """
+    Return the tables the migration rebuilds, parents first.
+
+    A table is rebuilt if it has a SMALLINT id column or shares a foreign key
+    with a rebuilt table, since both sides of a foreign key must have the
+    same type. An empty list means the database is already migrated.
+    """
+    cursor = mydb.cursor()
+    try:
+        planned = {table for table in tables if _narrow_columns(cursor, table)}
+        pending = list(planned)
+        while pending:
+            for related in _related_tables(cursor, pending.pop()):
+                if related in tables and related not in planned:
+                    planned.add(related)
+                    pending.append(related)
+    finally:
+        cursor.close()
+    return [table for table in tables if table in planned]
+
+
+def _wide_type(table: str, column: str) -> str:
+    return WIDE_ID_TYPES.get((table, column), WIDE_ID_TYPE)
+
+
+def _shadow_ddl(cursor, table: str) -> Tuple[str, List[str]]:
+    """
+    Build the CREATE TABLE statement of a table's shadow from SHOW CREATE
+    TABLE, with wide id columns and without foreign keys.
+
+    Returns the statement and the foreign key definitions that are added to
+    the table after the cut-over.
+    """
+    cursor.execute(f"SHOW CREATE TABLE `{table}`")
+    lines = _text(cursor.fetchone()[1]).splitlines()
+    definitions, foreign_keys = [], []
+    for line in lines[1:-1]:
+        line = line.strip().rstrip(",")
+        if _FOREIGN_KEY_LINE.match(line):
+            foreign_keys.append(line)
+            continue
+        match = re.match(r"`(\w+_id)` (smallint( unsigned)?)\b", line, re.IGNORECASE)
+        if match:
+            column = match.group(1)
+            line = line.replace(match.group(2), _wide_type(table, column), 1)
+        definitions.append(line)
+    options = re.sub(r"\s*AUTO_INCREMENT=\d+", "", lines[-1].lstrip(")"))
+    ddl = (
+        f"CREATE TABLE `{_shadow_name(table)}` (\n  "
+        + ",\n  ".join(definitions)
+        + f"\n){options}"
+    )
+    return ddl, foreign_keys
+
+
+def _create_triggers(cursor, table: str, columns: List[str], key: List[str]):
+    """Mirror every write to table into its shadow, pt-online-schema-change style."""
+    shadow = _shadow_name(table)
+    column_list = ", ".join(f"`{c}`" for c in columns)
+    new_values = ", ".join(f"NEW.`{c}`" for c in columns)
+    old_row = " AND ".join(f"`{shadow}`.`{c}` <=> OLD.`{c}`" for c in key)
+    key_changed = " OR ".join(f"NOT (OLD.`{c}` <=> NEW.`{c}`)" for c in key)
+
+    cursor.execute(
+        f"""
+        CREATE TRIGGER `{_trigger_name(table, 'ins')}`
+        AFTER INSERT ON `{table}` FOR EACH ROW
+        REPLACE INTO `{shadow}` ({column_list}) VALUES ({new_values})
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER `{_trigger_name(table, 'upd')}`
+        AFTER UPDATE ON `{table}` FOR EACH ROW
+        BEGIN
+            DELETE IGNORE FROM `{shadow}` WHERE ({key_changed}) AND {old_row};
+            REPLACE INTO `{shadow}` ({column_list}) VALUES ({new_values});
+        END
+        """
+    )
+    cursor.execute(
+        f"""
+        CREATE TRIGGER `{_trigger_name(table, 'del')}`
+        AFTER DELETE ON `{table}` FOR EACH ROW
+        DELETE IGNORE FROM `{shadow}` WHERE {old_row}
+        """
+    )
+
+
+def _table_triggers(cursor, table: str) -> List[Tuple[str, str]]:
+    """Return (name, CREATE TRIGGER statement) of the table's own triggers."""
+    cursor.execute(
+        """
+        SELECT TRIGGER_NAME FROM information_schema.TRIGGERS
+        WHERE EVENT_OBJECT_SCHEMA = DATABASE() AND EVENT_OBJECT_TABLE = %s
+        ORDER BY ACTION_TIMING, EVENT_MANIPULATION, ACTION_ORDER
+        """,
+        (table,),
+    )
+    ours = {_trigger_name(table, event) for event in ("ins", "upd", "del")}
+    names = [_text(row[0]) for row in cursor.fetchall()]
+    triggers = []
+    for name in names:
+        if name in ours:
+            continue
+        cursor.execute(f"SHOW CREATE TRIGGER `{name}`")
+        triggers.append((name, _text(cursor.fetchone()[2])))
+    return triggers
+
+
+def _drop_triggers(cursor, table: str):
+    for event in ("ins", "upd", "del"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS `{_trigger_name(table, event)}`")
+
+
+def _copy_rows(
+    mydb,
+    table: str,
+    columns: List[str],
+    key: List[str],
+    chunk_size: int,
+    sleep: float,
+    on_progress: Optional[Callable[[str, int, int], None]],
+):
+    """
+    Copy the existing rows of table into its shadow in ranges of the first
+    key column, committing after every range.
+
+    INSERT IGNORE keeps rows the triggers already wrote, which are at least as
+    new as the copied ones; LOCK IN SHARE MODE makes a write to a row being
+    copied wait for the chunk to commit.
+    """
+    cursor = mydb.cursor()
+    try:
+        first = key[0]
+        cursor.execute(f"SELECT MIN(`{first}`), MAX(`{first}`) FROM `{table}`")
+        low, high = cursor.fetchone()
+        mydb.commit()
+        if low is None:
+            return
+        column_list = ", ".join(f"`{c}`" for c in columns)
+        sql = f"""
+            INSERT IGNORE INTO `{_shadow_name(table)}` ({column_list})
+            SELECT {column_list} FROM `{table}`
+            WHERE `{first}` BETWEEN %s AND %s
+            LOCK IN SHARE MODE
+            """
+        for start in range(low, high + 1, chunk_size):
+            stop = min(start + chunk_size - 1, high)
+            cursor.execute(sql, (start, stop))
+            mydb.commit()
+            if on_progress is not None:
+                on_progress(table, stop, high)
+            if sleep:
+                time.sleep(sleep)
+    finally:
+        cursor.close()
+
+
+def _verify_counts(mydb, tables: List[str]):
+    """Compare row counts of every table and its shadow in one snapshot."""
+    cursor = mydb.cursor()
+    try:
+        mydb.commit()
+        cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        for table in tables:
+            cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
+            expected = cursor.fetchone()[0]
+            cursor.execute(f"SELECT COUNT(*) FROM `{_shadow_name(table)}`")
+            copied = cursor.fetchone()[0]
+            if copied != expected:
+                raise RuntimeError(
+                    f"Shadow of {table} has {copied} rows, expected {expected}"
+                )
+        mydb.commit()
+    finally:
+        cursor.close()
+
+
+def _cut_over(mydb, tables: List[str], retries: int):
+    """
+    Swap every table with its shadow in one RENAME TABLE statement.
+
+    RENAME waits for in-flight transactions on the tables; a short lock wait
+    timeout keeps new writes from queueing behind it for long, and the rename
+    is retried instead.
+    """
+    renames = ", ".join(
+        f"`{t}` TO `{_old_name(t)}`, `{_shadow_name(t)}` TO `{t}`" for t in tables
+    )
+    cursor = mydb.cursor()
+    try:
+        cursor.execute("SET SESSION lock_wait_timeout = %s", (_CUTOVER_LOCK_WAIT,))
+        for attempt in range(retries):
+            try:
+                cursor.execute(f"RENAME TABLE {renames}")
+                break
+            except Exception as error:
+                errno = getattr(error, "errno", None)
+                if errno not in (_ER_LOCK_WAIT_TIMEOUT, _ER_LOCK_DEADLOCK):
+                    raise
+                if attempt == retries - 1:
+                    raise
+        cursor.execute("SET SESSION lock_wait_timeout = DEFAULT")
+    finally:
+        cursor.close()
+
+
+def _finish(
+    mydb,
+    tables: List[str],
+    foreign_keys: Dict[str, List[str]],
+    triggers: Dict[str, List[Tuple[str, str]]],
+):
+    """
+    Move the tables' own triggers to the new tables, drop the old tables and
+    the copy triggers and add the foreign keys back.
+
+    The triggers are recreated first, but writes between the swap and their
+    re-creation do not fire them; rollups they maintain should be checked
+    afterwards (music_db_rollups.py check).
+    """
+    cursor = mydb.cursor()
+    try:
+        for table in tables:
+            for name, statement in triggers[table]:
+                cursor.execute(f"DROP TRIGGER IF EXISTS `{name}`")
+                cursor.execute(statement)
+        for table in tables:
+            _drop_triggers(cursor, table)
+        cursor.execute("SET SESSION foreign_key_checks = 0")
+        try:
+            for table in reversed(tables):
+                cursor.execute(f"DROP TABLE IF EXISTS `{_old_name(table)}`")
+            for table in tables:
+                if foreign_keys[table]:
+                    additions = ", ".join(f"ADD {fk}" for fk in foreign_keys[table])
+                    cursor.execute(
+                        f"ALTER TABLE `{table}` {additions}, ALGORITHM=INPLACE"
+                    )
+        finally:
+            cursor.execute("SET SESSION foreign_key_checks = 1")
+        mydb.commit()
+    finally:
+        cursor.close()
+
+
+def cleanup(mydb, tables: Sequence[str] = TABLES):
+    """Remove the triggers and shadow tables of an interrupted migration."""
+    cursor = mydb.cursor()
+    try:
+        for table in tables:
+            _drop_triggers(cursor, table)
+        for table in reversed(tables):
+            cursor.execute(f"DROP TABLE IF EXISTS `{_shadow_name(table)}`")
+        mydb.commit()
+    finally:
+        cursor.close()
+
+
+def widen_id_columns(
+    mydb,
+    tables: Sequence[str] = TABLES,
+    chunk_size: int = DEFAULT_COPY_CHUNK_SIZE,
+    sleep: float = 0.0,
+    cutover_retries: int = DEFAULT_CUTOVER_RETRIES,
+    on_progress: Optional[Callable[[str, int, int], None]] = None,
+) -> List[str]:
+    """
+    Move the SMALLINT id columns of the database to wide types while the
+    tables stay writable.
+
+    Args:
+        mydb: database connection; other connections may keep writing
+        tables: tables to consider, parents before children
+        chunk_size: key range copied per transaction
+        sleep: seconds to pause between chunks, to throttle the copy
+        cutover_retries: attempts at the final RENAME before giving up
+        on_progress: called as on_progress(table, copied_up_to, max_key)
+
+    Returns:
+        The tables that were rebuilt; empty if there was nothing to do.
+
+    On failure before the cut-over the shadow tables and triggers are removed
+    and the original tables are left untouched.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    planned = plan_migration(mydb, tables)
+    if not planned:
+        return []
+
+    cursor = mydb.cursor()
+    layouts = {}
+    foreign_keys = {}
+    triggers = {}
+    try:
+        for table in planned:
+            triggers[table] = _table_triggers(cursor, table)
+            ddl, foreign_keys[table] = _shadow_ddl(cursor, table)
+            cursor.execute(f"DROP TABLE IF EXISTS `{_shadow_name(table)}`")
+            cursor.execute(ddl)
+            columns = [name for name, _ in _columns(cursor, table)]
+            layouts[table] = (columns, _key_columns(cursor, table))
+        for table in planned:
+            _create_triggers(cursor, table, *layouts[table])
+        mydb.commit()
+
+        for table in planned:
+            columns, key = layouts[table]
+            _copy_rows(mydb, table, columns, key, chunk_size, sleep, on_progress)
+        _verify_counts(mydb, planned)
+        _cut_over(mydb, planned, cutover_retries)
+    except Exception:
+        mydb.rollback()
+        cleanup(mydb, planned)
+        raise
+    finally:
+        cursor.close()
+
+    _finish(mydb, planned, foreign_keys, triggers)
+    return planned
+
+
+def main():
+    """Run the migration against DB_CONFIG."""
+    import mysql.connector
+
+    # Database configuration - UPDATE THESE VALUES
+    DB_CONFIG = {
+        "host": "localhost",
+        "user": "root",
+        "password": "root",  # Change this
+        "database": "musicdb",  # Change this
+    }
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_COPY_CHUNK_SIZE)
+    parser.add_argument("--sleep", type=float, default=0.0)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--cleanup", action="store_true")
+    args = parser.parse_args()
+
+    mydb = mysql.connector.connect(**DB_CONFIG)
+    try:
+        if args.cleanup:
+            cleanup(mydb)
+            print("Removed leftover shadow tables and triggers.")
+            return
+
+        planned = plan_migration(mydb)
+        if not planned:
+            print("All id columns are already wide; nothing to do.")
+            return
+        if args.dry_run:
+            cursor = mydb.cursor()
+            for table in planned:
+                ddl, fks = _shadow_ddl(cursor, table)
+                print(ddl + ";")
+                for fk in fks:
+                    print(f"-- after cut-over: ALTER TABLE `{table}` ADD {fk};")
+            cursor.close()
+            return
+
+        def report(table, done, total):
+            print(f"\r{table}: {done}/{total}", end="", flush=True)
+
+        widen_id_columns(
+            mydb, chunk_size=args.chunk_size, sleep=args.sleep, on_progress=report
+        )
+        print(f"\nWidened id columns of {', '.join(planned)}.")
+        print("Run music_db_rollups.py check to verify the rollup tables.")
+    finally:
+        mydb.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+"""
+Multi-process loaders for the music database.
+
+parallel_load_single_songs and parallel_load_albums spread their input over
+a pool of worker processes, each with its own connection, and return the
+same rejects as load_single_songs and load_albums.
+
+Rows are partitioned by artist id. The parent process creates the artists
+and genres of every chunk, set-based, before handing it to the workers, and
+the database decides which names are equal, so every artist is checked for
+duplicate songs or albums by exactly one worker, the rows of an artist
+keep their input order and workers never race on the artist_name or
+genre_name UNIQUE keys.
+
+The workers set @music_db_defer_genre_stats, so the SongGenres triggers
+(schema.sql) skip the few, hot GenreStats rows that every worker would
+otherwise update and hold locked until its chunk commits. GenreStats is
+therefore behind while the workers run. When they are done, or one of
+them failed, the parent deletes the artists and genres it created that no
+song or album uses (the serial loaders only create them for rows that are
+added) and recounts the other genres of the input with rebuild_genre_stats. If a
+worker failed, its error is raised even if this cleanup fails too; the
+cleanup error is logged. A chunk that still loses a deadlock or a lock
+wait is rolled back and retried.
+
+Artist, genre, album and song ids are not assigned in input order. Result
+caches of other connections are not told about the new rows.
+"""
+
+import logging
+import multiprocessing
+import queue
+import traceback
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from music_db import (
+    DEFAULT_CHUNK_SIZE,
+    _SEQ_LIST_SIZE,
+    _chunks,
+    enable_id_cache,
+    load_albums,
+    load_single_songs,
+    rebuild_genre_stats,
+)
+
+DEFAULT_WORKERS = 4
+DEFAULT_CHUNK_RETRIES = 5
+
+# Chunks waiting in every worker's queue
+_QUEUE_DEPTH = 2
+
+# Seconds the parent waits for a worker before checking on the others
+_POLL_INTERVAL = 0.1
+
+_log = logging.getLogger("music_db")
+
+_ER_LOCK_WAIT_TIMEOUT = 1205
+_ER_LOCK_DEADLOCK = 1213
+
+# Makes the SongGenres triggers skip GenreStats for the worker's session
+_DEFER_GENRE_STATS = "SET @music_db_defer_genre_stats = 1"
+
+
+def partition_of(artist_id: Optional[int], workers: int) -> int:
+    """
+    Worker that loads the rows of an artist. Rows whose artist could not be
+    created (None) go to the first worker, whose loader reports the error.
+    """
+    return 0 if artist_id is None else artist_id % workers
+
+
+# kind -> (loader, artist name of a row, genre names of a row, picklable row)
+_KINDS = {
+    "singles": (
+        load_single_songs,
+        lambda row: row[2],
+        lambda row: row[1],
+        lambda row: (row[0], tuple(row[1]), row[2], row[3]),
+    ),
+    "albums": (
+        load_albums,
+        lambda row: row[2],
+        lambda row: (row[1],),
+        lambda row: (row[0], row[1], row[2], row[3], list(row[4])),
+    ),
+}
+
+
+def _load_chunk(mydb, loader: Callable, chunk: list, retries: int) -> Set:
+    """Load one chunk in its own transaction, retrying it after a deadlock."""
+    for attempt in range(retries):
+        try:
+            return loader(mydb, chunk, chunk_size=len(chunk))
+        except Exception as error:
+            mydb.rollback()
+            errno = getattr(error, "errno", None)
+            if errno not in (_ER_LOCK_WAIT_TIMEOUT, _ER_LOCK_DEADLOCK):
+                raise
+            if attempt == retries - 1:
+                raise
+
+
+def _worker(
+    kind: str,
+    connect: Callable,
+    config: dict,
+    rows: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    chunk_size: int,
+    retries: int,
+    id_cache: bool,
+):
+    """Load the chunks of one partition until the parent sends None."""
+    loader = _KINDS[kind][0]
+    mydb = None
+    try:
+        mydb = connect(**config)
+        cursor = mydb.cursor()
+        cursor.execute(_DEFER_GENRE_STATS)
+        cursor.close()
+        if id_cache:
+            enable_id_cache(mydb)
+
+        def partition_rows():
+            while True:
+                batch = rows.get()
+                if batch is None:
+                    return
+                yield from batch
+
+        for chunk in _chunks(partition_rows(), chunk_size):
+            results.put(("rejects", _load_chunk(mydb, loader, chunk, retries)))
+    except BaseException:
+        results.put(("error", traceback.format_exc()))
+    finally:
+        if mydb is not None:
+            mydb.close()
+        results.put(("done", None))
+
+
+def _ensure_genres(cursor, genres: Iterable[str], seen: Set[str]) -> Set[int]:
+    """
+    Create the genres of a chunk not seen yet, with one INSERT IGNORE per
+    _SEQ_LIST_SIZE names, and return the ids of all of them. The database
+    decides which names are equal.
+    """
+    names = list(dict.fromkeys(g for g in genres if g not in seen))
+    seen.update(names)
+    genre_ids = set()
+    for i in range(0, len(names), _SEQ_LIST_SIZE):
+        chunk = names[i : i + _SEQ_LIST_SIZE]
+        values = ", ".join(["(%s)"] * len(chunk))
+        cursor.execute(f"INSERT IGNORE INTO Genres (genre_name) VALUES {values}", chunk)
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(
+            f"SELECT genre_id FROM Genres WHERE genre_name IN ({placeholders})",
+            tuple(chunk),
+        )
+        genre_ids.update(genre_id for (genre_id,) in cursor.fetchall())
+    return genre_ids
+
+
+def _artist_ids(cursor, artists: Iterable[str]) -> Dict[str, Optional[int]]:
+    """
+    Create the artists of a chunk, with one INSERT IGNORE per _SEQ_LIST_SIZE
+    names, and return their ids by name as given. Names the database stores
+    under another spelling are looked up one by one, so the database, not
+    collation_key, decides which names are equal.
+    """
+    names = list(dict.fromkeys(artists))
+    artist_ids = {}
+    for i in range(0, len(names), _SEQ_LIST_SIZE):
+        chunk = names[i : i + _SEQ_LIST_SIZE]
+        values = ", ".join(["(%s)"] * len(chunk))
+        cursor.execute(
+            f"INSERT IGNORE INTO Artists (artist_name) VALUES {values}", chunk
+        )
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(
+            f"""
+            SELECT artist_name, artist_id FROM Artists
+            WHERE artist_name IN ({placeholders})
+        """,
+            tuple(chunk),
+        )
+        stored = dict(cursor.fetchall())
+        for name in chunk:
+            if name not in stored:
+                cursor.execute(
+                    "SELECT artist_id FROM Artists WHERE artist_name = %s", (name,)
+                )
+                row = cursor.fetchone()
+                stored[name] = None if row is None else row[0]
+            artist_ids[name] = stored[name]
+    return artist_ids
+
+
+def _drop_unused_artists(cursor, last_artist_id: int):
+    """Delete the artists above last_artist_id that no song or album uses."""
+    cursor.execute(
+        """
+        DELETE FROM Artists
+        WHERE artist_id > %s
+          AND NOT EXISTS (
+              SELECT 1 FROM Songs s WHERE s.artist_id = Artists.artist_id
+          )
+          AND NOT EXISTS (
+              SELECT 1 FROM Albums al WHERE al.artist_id = Artists.artist_id
+          )
+    """,
+        (last_artist_id,),
+    )
+
+
+def _max_id(cursor, table: str, column: str) -> int:
+    """Largest id of a table, 0 if it is empty."""
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def _drop_unused_genres(cursor, genre_ids: List[int]):
+    """Delete the given genres if no song or album uses them."""
+    for i in range(0, len(genre_ids), _SEQ_LIST_SIZE):
+        chunk = genre_ids[i : i + _SEQ_LIST_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(
+            f"""
+            DELETE FROM Genres
+            WHERE genre_id IN ({placeholders})
+              AND NOT EXISTS (
+                  SELECT 1 FROM SongGenres sg WHERE sg.genre_id = Genres.genre_id
+              )
+              AND NOT EXISTS (
+                  SELECT 1 FROM Albums al WHERE al.genre_id = Genres.genre_id
+              )
+        """,
+            tuple(chunk),
+        )
+
+
+def _parallel_load(
+    kind: str,
+    connect: Optional[Callable],
+    config: dict,
+    rows: Iterable,
+    workers: int,
+    chunk_size: int,
+    on_rejects: Optional[Callable[[Set], None]],
+    id_cache: bool,
+    retries: int,
+) -> Set:
+    """Partition rows by artist over worker processes; see the module docstring."""
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    if connect is None:
+        import mysql.connector
+
+        connect = mysql.connector.connect
+    _, artist_of, genres_of, picklable = _KINDS[kind]
+
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    queues = [context.Queue(_QUEUE_DEPTH) for _ in range(workers)]
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(kind, connect, config, q, results, chunk_size, retries, id_cache),
+            daemon=True,
+        )
+        for q in queues
+    ]
+    for process in processes:
+        process.start()
+
+    rejected = set()
+    running = workers
+
+    def drain(block: bool):
+        """Handle the messages of the workers; raise if one of them failed."""
+        nonlocal running
+        while True:
+            try:
+                message, value = results.get(block, _POLL_INTERVAL)
+            except queue.Empty:
+                if any(p.exitcode not in (None, 0) for p in processes):
+                    raise RuntimeError(f"{kind} loader worker died")
+                return
+            if message == "error":
+                raise RuntimeError(f"{kind} loader worker failed:\n{value}")
+            if message == "done":
+                running -= 1
+            else:
+                rejected.update(value)
+                if on_rejects is not None:
+                    on_rejects(value)
+            block = False
+
+    def send(worker: int, batch):
+        while True:
+            try:
+                queues[worker].put(batch, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                drain(False)
+
+    mydb = None
+    failure = None
+    seen_genres = set()
+    genre_ids = set()
+    last_artist_id = last_genre_id = None
+    try:
+        mydb = connect(**config)
+        cursor = mydb.cursor()
+        # Artists and genres above them are created by this load
+        last_artist_id = _max_id(cursor, "Artists", "artist_id")
+        last_genre_id = _max_id(cursor, "Genres", "genre_id")
+        for chunk in _chunks(rows, chunk_size):
+            artist_ids = _artist_ids(cursor, (artist_of(row) for row in chunk))
+            genre_ids |= _ensure_genres(
+                cursor, (g for row in chunk for g in genres_of(row)), seen_genres
+            )
+            mydb.commit()
+
+            batches: Dict[int, list] = {}
+            for row in chunk:
+                worker = partition_of(artist_ids[artist_of(row)], workers)
+                batches.setdefault(worker, []).append(picklable(row))
+            for worker, batch in batches.items():
+                send(worker, batch)
+            drain(False)
+
+        for worker in range(workers):
+            send(worker, None)
+        while running:
+            drain(True)
+    except BaseException as error:
+        failure = error
+        raise
+    finally:
+        # Workers still running here are waiting for rows that will not come
+        for process in processes:
+            if running:
+                process.terminate()
+            process.join()
+        if mydb is not None:
+            # The chunks the workers committed stay, failed or not: drop the
+            # artists and genres only rejected or lost rows needed and count
+            # the other genres
+            try:
+                mydb.rollback()
+                cursor = mydb.cursor()
+                if last_artist_id is not None:
+                    _drop_unused_artists(cursor, last_artist_id)
+                if last_genre_id is not None:
+                    _drop_unused_genres(
+                        cursor, sorted(i for i in genre_ids if i > last_genre_id)
+                    )
+                mydb.commit()
+                cursor.close()
+                rebuild_genre_stats(mydb, genre_ids)
+            except Exception:
+                # The error that stopped the load is the one to raise
+                if failure is None:
+                    raise
+                _log.exception("cleanup after the failed %s load failed", kind)
+            finally:
+                mydb.close()
+    return rejected
+
+
+def parallel_load_single_songs(
+    config: dict,
+    single_songs: Iterable[Tuple[str, Tuple[str, ...], str, str]],
+    workers: int = DEFAULT_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[Tuple[str, str]]], None]] = None,
+    id_cache: bool = False,
+    retries: int = DEFAULT_CHUNK_RETRIES,
+    connect: Optional[Callable] = None,
+) -> Set[Tuple[str, str]]:
+    """
+    load_single_songs over several worker processes.
+
+    Args:
+        config: connection arguments for connect; the parent and every
+            worker open their own connection
+        single_songs: same input as load_single_songs
+        workers: number of worker processes
+        chunk_size: songs read at a time, and staged at a time by a worker
+        on_rejects: called in this process with the rejects of every
+            committed worker chunk
+        id_cache: give every worker connection its own IdCache
+        retries: attempts per worker chunk on deadlocks or lock wait timeouts
+        connect: module-level function opening a connection, so that it can
+            be sent to the workers; mysql.connector.connect by default
+
+    Returns:
+        Set[Tuple[str,str]]: (song, artist) pairs that were rejected, as
+        load_single_songs returns them
+    """
+    return _parallel_load(
+        "singles",
+        connect,
+        config,
+        single_songs,
+        workers,
+        chunk_size,
+        on_rejects,
+        id_cache,
+        retries,
+    )
+
+
+def parallel_load_albums(
+    config: dict,
+    albums: Iterable[Tuple[str, str, str, str, Iterable[str]]],
+    workers: int = DEFAULT_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_rejects: Optional[Callable[[Set[Tuple[str, str]]], None]] = None,
+    id_cache: bool = False,
+    retries: int = DEFAULT_CHUNK_RETRIES,
+    connect: Optional[Callable] = None,
+) -> Set[Tuple[str, str]]:
+    """
+    load_albums over several worker processes.
+
+    The arguments are those of parallel_load_single_songs. Track lists are
+    read into lists before they are sent to a worker.
+
+    Returns:
+        Set[Tuple[str,str]]: (album, artist) pairs that were rejected, as
+        load_albums returns them
+    """
+    return _parallel_load(
+        "albums",
+        connect,
+        config,
+        albums,
+        workers,
+        chunk_size,
+        on_rejects,
+        id_cache,
+        retries,
+    )
@@ -0,0 +1,77 @@
+"""
+Rebuild or check the rollup tables of the music database.
+
+The rollups are kept in step with the tables they summarise, by the loaders
+(artist_singles, song_rating_counts) or by triggers (genre_stats). Rows
+changed around them, e.g. by manual SQL or a restored dump, leave a rollup
+stale until it is rebuilt.
+
+Usage:
+    python music_db_rollups.py check [ROLLUP ...]
+    python music_db_rollups.py rebuild [ROLLUP ...]
+
+Without ROLLUP names every rollup is processed. check exits with status 1 if
+any rollup differs from its source table.
+"""
+
+import argparse
+import sys
+
+from music_db import (
+    check_artist_singles,
+    check_genre_stats,
+    check_song_rating_counts,
+    rebuild_artist_singles,
+    rebuild_genre_stats,
+    rebuild_song_rating_counts,
+)
+
+# name -> (rebuild(mydb), check(mydb) -> list of differing rows)
+ROLLUPS = {
+    "artist_singles": (rebuild_artist_singles, check_artist_singles),
+    "genre_stats": (rebuild_genre_stats, check_genre_stats),
+    "song_rating_counts": (rebuild_song_rating_counts, check_song_rating_counts),
+}
+
+
+def main():
+    """Run check or rebuild against DB_CONFIG."""
+    import mysql.connector
+
+    # Database configuration - UPDATE THESE VALUES
+    DB_CONFIG = {
+        "host": "localhost",
+        "user": "root",
+        "password": "root",  # Change this
+        "database": "musicdb",  # Change this
+    }
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=("check", "rebuild"))
+    parser.add_argument("rollups", nargs="*", metavar="ROLLUP")
+    args = parser.parse_args()
+    unknown = set(args.rollups) - set(ROLLUPS)
+    if unknown:
+        parser.error(f"unknown rollups {sorted(unknown)}; known: {sorted(ROLLUPS)}")
+
+    mydb = mysql.connector.connect(**DB_CONFIG)
+    consistent = True
+    try:
+        for name in args.rollups or sorted(ROLLUPS):
+            rebuild, check = ROLLUPS[name]
+            if args.command == "rebuild":
+                rebuild(mydb)
+                print(f"{name}: rebuilt")
+                continue
+            differences = check(mydb)
+            consistent = consistent and not differences
+            print(f"{name}: {len(differences)} differing rows")
+            for row in differences[:20]:
+                print(f"    {row}")
+    finally:
+        mydb.close()
+    sys.exit(0 if consistent else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,847 @@
+"""
+SQLite backend for the music database.
+
+connect() opens a sqlite3 database that behaves like a mysql.connector
+connection to the MySQL schema, so every loader, query and rollup function
+of music_db (and MusicDB, AsyncMusicDB and ColumnarEngine) runs unchanged on
+an embedded database, e.g. in CI or on machines without a MySQL server:
+
+    mydb = music_db_sqlite.connect("music.sqlite")
+    load_users(mydb, ["alice"])
+    db = MusicDB(connect=music_db_sqlite.connect, database="music.sqlite")
+
+The tables come from db_files/schema_sqlite.sql, which is created on first
+use. The cursors translate the MySQL statements the module sends into
+SQLite's dialect, once per distinct statement:
+
+  - %s placeholders, temporary staging tables with inline indexes,
+    INSERT ... ON DUPLICATE KEY UPDATE, multi-table DELETE, YEAR(), IF(),
+    GREATEST(), DATEDIFF(), <=>, JSON_TABLE and SHOW TABLES have direct
+    equivalents;
+  - TRUNCATE TABLE deletes the rows and restarts the table's sequence,
+    SET FOREIGN_KEY_CHECKS becomes PRAGMA foreign_keys (inside a
+    transaction, run when it commits or rolls back), and the foreign
+    keys of information_schema.KEY_COLUMN_USAGE are read with
+    pragma_foreign_key_list;
+  - SET @name = value stores a session variable of the connection, which
+    the triggers of schema_sqlite.sql read with user_variable('name');
+  - LOAD DATA LOCAL INFILE is run in Python: the file is read with the csv
+    module and inserted with executemany, so import_* works without a
+    server-side bulk loader.
+
+String literals are never rewritten. A statement that still holds a MySQL
+construct after translation (a function, operator or clause without a rule,
+or one in a shape its rule does not handle, such as ON DUPLICATE KEY UPDATE
+without a derived table) raises UntranslatableStatement instead of running
+with another meaning.
+
+Names are compared with the MUSIC collation, an approximation of
+utf8mb4_0900_ai_ci: names equal under collation_key are equal, and the
+order puts spaces, punctuation, symbols, currency signs and digits before
+letters, as MySQL does. It is not MySQL's collation, so duplicates, the
+UNIQUE name keys and ORDER BY can still differ from MySQL for:
+
+  - the order of punctuation and symbols among themselves (code point
+    order here, e.g. '!' before '_', which MySQL sorts the other way);
+  - letters of non-Latin scripts, which sort by code point and are equal
+    only if collation_key makes them so;
+  - characters MySQL weighs but NFKD and the letter table of
+    collation_key do not handle, such as þ, ŋ or ı.
+
+WEIGHT_STRING(name) returns bytes that sort like the name does under
+MUSIC, as MySQL's returns the collation's sort key. Databases created with
+an older MUSIC collation are reindexed when they are opened. Dates are stored as 'YYYY-MM-DD' text and returned as
+datetime.date from columns whose name ends in "date", as MySQL returns them.
+
+SQLite allows one writer at a time: write transactions of other connections
+wait up to timeout seconds. ":memory:" gives every connection its own
+database; share one between connections with a URI such as
+"file:music?mode=memory&cache=shared".
+"""
+
+import codecs
+import csv
+import os
+import re
+import sqlite3
+import unicodedata
+from datetime import date
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from music_db import collation_key
+
+SCHEMA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "db_files", "schema_sqlite.sql"
+)
+
+# Seconds a statement waits for another connection's write lock
+DEFAULT_TIMEOUT = 30.0
+
+# Answer to SELECT @@max_allowed_packet: sqlite3 has no packet limit
+_MAX_ALLOWED_PACKET = 1 << 30
+
+# Rows inserted per executemany call by LOAD DATA
+_LOAD_BATCH = 10000
+
+# Compiled statements sqlite3 keeps per connection; its default of 128 is
+# fewer than the distinct statements of music_db
+_CACHED_STATEMENTS = 512
+
+# Version of the MUSIC collation, kept in PRAGMA user_version: the indexes
+# of names are rebuilt when a database was created with another one
+_COLLATION_VERSION = 1
+
+
+class UntranslatableStatement(sqlite3.NotSupportedError):
+    """
+    A MySQL statement uses a construct the SQLite backend has no rule for,
+    or the construct of a rule in a shape the rule does not handle.
+
+    Attributes:
+        construct: the MySQL construct, e.g. "ON DUPLICATE KEY UPDATE"
+        reason: why its rule does not handle it, if a rule matched
+        statement: the MySQL statement, on one line
+    """
+
+    def __init__(self, construct: str, reason: str = "", statement: str = ""):
+        self.construct = construct
+        self.reason = reason
+        self.statement = " ".join(statement.split())
+        message = f"no SQLite translation for {construct!r}"
+        if reason:
+            message += f" ({reason})"
+        if statement:
+            message += f" in: {self.statement}"
+        super().__init__(message)
+
+
+def connect(
+    database: str = ":memory:",
+    journal_mode: Optional[str] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+    create_schema: bool = True,
+    **kwargs,
+) -> "SQLiteConnection":
+    """
+    Open a SQLite database for the music_db functions.
+
+    Args:
+        database: database file, ":memory:" or a "file:" URI
+        journal_mode: e.g. "WAL" to let readers run next to a writer;
+            the database's current mode if None
+        timeout: seconds to wait for another connection's write lock
+        create_schema: create the tables of schema_sqlite.sql if missing
+        **kwargs: mysql.connector.connect arguments without a SQLite
+            meaning (host, user, password, allow_local_infile...) are
+            accepted and ignored, so configurations can be shared
+
+    Returns:
+        SQLiteConnection: connection with the mysql.connector interface
+        used by music_db
+    """
+    # IMMEDIATE takes the write lock when a transaction starts, so writers
+    # wait for each other instead of failing to upgrade a read snapshot
+    db = sqlite3.connect(
+        database,
+        timeout=timeout,
+        isolation_level="IMMEDIATE",
+        check_same_thread=False,
+        uri=database.startswith("file:"),
+        cached_statements=_CACHED_STATEMENTS,
+    )
+    db.create_collation("MUSIC", _compare_names)
+    db.create_function("weight_string", 1, _weight_string, deterministic=True)
+    # Session variables: SET @name = value, read by the schema's triggers
+    variables = {}
+    db.create_function("set_user_variable", 2, variables.__setitem__)
+    db.create_function("user_variable", 1, variables.get)
+    db.execute("PRAGMA foreign_keys = ON")
+    if journal_mode is not None:
+        db.execute(f"PRAGMA journal_mode = {journal_mode}")
+    found = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Artists'"
+    ).fetchone()
+    if found is None and create_schema:
+        with open(SCHEMA_PATH, encoding="utf-8") as f:
+            db.executescript(f.read())
+        db.execute(f"PRAGMA user_version = {_COLLATION_VERSION}")
+    elif found is not None:
+        _check_collation_version(db)
+    return SQLiteConnection(db)
+
+
+def _check_collation_version(db: sqlite3.Connection):
+    """
+    Rebuild the indexes of a database created with another MUSIC collation.
+    Raises sqlite3.IntegrityError if two names of a UNIQUE key are now equal.
+    """
+    (version,) = db.execute("PRAGMA user_version").fetchone()
+    if version != _COLLATION_VERSION:
+        db.execute("REINDEX MUSIC")
+        db.execute(f"PRAGMA user_version = {_COLLATION_VERSION}")
+
+
+# Rank of a character's general category in the MUSIC order; letters and
+# everything else come last
+_CATEGORY_RANKS = {"Z": 0, "P": 1, "S": 2, "Sc": 3, "N": 4}
+
+
+def _rank(c: str) -> int:
+    if c in "\t\n\x0b\x0c\r":
+        return 0
+    category = unicodedata.category(c)
+    return _CATEGORY_RANKS.get(category, _CATEGORY_RANKS.get(category[0], 5))
+
+
+@lru_cache(maxsize=1 << 16)
+def _name_key(name: str) -> Tuple[Tuple[int, str], ...]:
+    return tuple((_rank(c), c) for c in collation_key(name))
+
+
+def _compare_names(a: str, b: str) -> int:
+    """The MUSIC collation, an approximation of utf8mb4_0900_ai_ci."""
+    key_a, key_b = _name_key(a), _name_key(b)
+    return (key_a > key_b) - (key_a < key_b)
+
+
+def _weight_string(name: Optional[str]) -> Optional[bytes]:
+    """
+    WEIGHT_STRING(): bytes that compare like the names do under MUSIC. Each
+    character takes five bytes, its rank and its UTF-32 code point.
+    """
+    if name is None:
+        return None
+    return b"".join(
+        bytes((rank,)) + c.encode("utf-32-be") for rank, c in _name_key(name)
+    )
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the parts of the mysql.connector API music_db uses."""
+
+    def __init__(self, db: sqlite3.Connection):
+        self._db = db
+        # (MySQL statement, has parameters) -> list of SQLite statements
+        self._statements = {}
+        self._conflict_targets = {}
+        # PRAGMA foreign_keys sent inside a transaction, which SQLite ignores
+        self._pending_foreign_keys = None
+
+    def cursor(self, prepared: bool = False) -> "SQLiteCursor":
+        # sqlite3 reuses compiled statements from its cache on every cursor,
+        # so prepared cursors need nothing else
+        return SQLiteCursor(self)
+
+    def commit(self):
+        self._db.commit()
+        self._apply_foreign_keys()
+
+    def rollback(self):
+        self._db.rollback()
+        self._apply_foreign_keys()
+
+    def _apply_foreign_keys(self):
+        if self._pending_foreign_keys is not None:
+            self._db.execute(self._pending_foreign_keys)
+            self._pending_foreign_keys = None
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._db.in_transaction
+
+    def close(self):
+        self._db.close()
+
+    def ping(self, reconnect: bool = False):
+        """Raise if the connection is closed; reconnect is not supported."""
+        self._db.execute("SELECT 1")
+
+    def _translate(self, operation: str, has_params: bool) -> List[str]:
+        key = (operation, has_params)
+        statements = self._statements.get(key)
+        if statements is None:
+            statements = _translate(operation, has_params, self._conflict_target)
+            self._statements[key] = statements
+        return statements
+
+    def _conflict_target(self, table: str) -> List[str]:
+        """
+        Primary key columns of a table, for ON CONFLICT targets. ON DUPLICATE
+        KEY UPDATE fires on any unique key, ON CONFLICT on the one named, so
+        tables with other unique keys are refused.
+        """
+        if table not in self._conflict_targets:
+            columns = self._db.execute(f"PRAGMA table_info({table})").fetchall()
+            pk = sorted((c[5], c[1]) for c in columns if c[5] > 0)
+            indexes = self._db.execute(f"PRAGMA index_list({table})").fetchall()
+            if not pk or any(index[2] and index[3] == "u" for index in indexes):
+                raise UntranslatableStatement(
+                    "ON DUPLICATE KEY UPDATE",
+                    f"{table} has no primary key or more than one unique key",
+                )
+            self._conflict_targets[table] = [name for _, name in pk]
+        return self._conflict_targets[table]
+
+
+class SQLiteCursor:
+    """Cursor translating the MySQL statements of music_db for sqlite3."""
+
+    def __init__(self, connection: SQLiteConnection):
+        self._connection = connection
+        self._cursor = connection._db.cursor()
+        self._date_columns = ()
+        self._rowcount = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self) -> int:
+        if self._rowcount is not None:
+            return self._rowcount
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, operation: str, params=()):
+        self._rowcount = None
+        if _LOAD_DATA.match(operation):
+            self._load_data(operation, params)
+            return
+        statements = self._connection._translate(operation, bool(params))
+        for sql in statements[:-1]:
+            self._run(sql, ())
+        self._run(statements[-1], _params(params))
+
+    def executemany(self, operation: str, seq_params):
+        self._rowcount = None
+        (sql,) = self._connection._translate(operation, True)
+        self._cursor.executemany(sql, (_params(p) for p in seq_params))
+        self._date_columns = ()
+
+    def fetchone(self):
+        return self._convert(self._cursor.fetchone())
+
+    def fetchmany(self, size: int = 1):
+        return [self._convert(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convert(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._convert(row)
+
+    def close(self):
+        self._cursor.close()
+
+    def explain(self, operation: str, params=()) -> List[tuple]:
+        """EXPLAIN QUERY PLAN rows (id, parent, notused, detail) of a statement."""
+        statements = self._connection._translate(operation, bool(params))
+        plan = self._connection._db.execute(
+            "EXPLAIN QUERY PLAN " + statements[-1], _params(params)
+        )
+        return plan.fetchall()
+
+    def _run(self, sql: str, params: tuple):
+        db = self._connection._db
+        # START TRANSACTION commits the open transaction in MySQL
+        if sql == "BEGIN" and db.in_transaction:
+            self._connection.commit()
+        if sql.startswith("PRAGMA foreign_keys"):
+            # SET FOREIGN_KEY_CHECKS takes effect at once in MySQL; SQLite
+            # ignores the pragma inside a transaction, so it waits for the end
+            self._connection._pending_foreign_keys = None
+            if db.in_transaction:
+                self._connection._pending_foreign_keys = sql
+                self._date_columns = ()
+                return
+        self._cursor.execute(sql, params)
+        description = self._cursor.description or ()
+        self._date_columns = tuple(
+            i for i, column in enumerate(description) if column[0].endswith("date")
+        )
+
+    def _convert(self, row):
+        if row is None or not self._date_columns:
+            return row
+        row = list(row)
+        for i in self._date_columns:
+            if isinstance(row[i], str):
+                try:
+                    row[i] = date.fromisoformat(row[i])
+                except ValueError:
+                    pass
+        return tuple(row)
+
+    def _load_data(self, operation: str, params):
+        """Run LOAD DATA LOCAL INFILE by reading the file with csv."""
+        match = _LOAD_DATA.match(operation)
+        table = match.group("table")
+        columns = [c.strip() for c in match.group("columns").split(",")]
+        delimiter = codecs.decode(match.group("delimiter"), "unicode_escape")
+        ignore = int(match.group("ignore") or 0)
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['?'] * len(columns))})"
+        )
+
+        width = len(columns)
+        loaded = 0
+        with open(params[0], newline="", encoding="utf-8") as f:
+            reader = csv.reader(f, delimiter=delimiter, quotechar='"')
+            for _ in range(ignore):
+                next(reader, None)
+            batch = []
+            for fields in reader:
+                # Missing fields are loaded as empty strings, extra ones dropped
+                batch.append((fields + [""] * width)[:width])
+                if len(batch) == _LOAD_BATCH:
+                    self._cursor.executemany(sql, batch)
+                    loaded += len(batch)
+                    batch = []
+            if batch:
+                self._cursor.executemany(sql, batch)
+                loaded += len(batch)
+        self._rowcount = loaded
+        self._date_columns = ()
+
+
+def _params(params) -> tuple:
+    """sqlite3 parameters; dates are stored as 'YYYY-MM-DD'."""
+    return tuple(p.isoformat() if isinstance(p, date) else p for p in params)
+
+
+# ---------------------------------------------------------------------------
+# Statement translation
+#
+# _translate masks the string literals of a statement, replaces it with the
+# first statement rule whose pattern matches all of it, applies every
+# expression rule and raises UntranslatableStatement if a MySQL construct
+# is left: sqlite3 would reject it or, worse, read it another way (e.g. "x" as a
+# column name). A statement shape the rules do not recognise therefore fails
+# on its first use instead of being mistranslated.
+# ---------------------------------------------------------------------------
+
+_LOAD_DATA = re.compile(
+    r"\s*LOAD\s+DATA\s+LOCAL\s+INFILE\s+%s\s+INTO\s+TABLE\s+(?P<table>\w+)"
+    r".*?FIELDS\s+TERMINATED\s+BY\s+'(?P<delimiter>(?:[^'\\]|\\.)*)'"
+    r".*?(?:IGNORE\s+(?P<ignore>\d+)\s+LINES)?"
+    r"\s*\((?P<columns>[^)]*)\)\s*$",
+    re.S | re.I,
+)
+
+# Single-quoted literals, with MySQL's backslash and doubled-quote escapes
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'", re.S)
+
+# A masked literal: NUL, its index in the statement's literals, NUL
+_MASKED = re.compile(r"\x00(\d+)\x00")
+
+# MySQL constructs without a rule, or left by a rule that did not recognise
+# the shape of the statement
+_MYSQL_ONLY = re.compile(
+    r"ON\s+DUPLICATE\s+KEY|<=>|\|\||[@`\"#]"
+    r"|\b(?:IF|GREATEST|LEAST|YEAR|MONTH|DAY|DATEDIFF|DATE_ADD|DATE_SUB"
+    r"|DATE_FORMAT|STR_TO_DATE|NOW|CURDATE|UNIX_TIMESTAMP|CONCAT|CONCAT_WS"
+    r"|FIND_IN_SET|FIELD|JSON_TABLE|JSON_EXTRACT|DATABASE|CONNECTION_ID"
+    r"|LAST_INSERT_ID)\s*\("
+    r"|\b(?:DUAL|AUTO_INCREMENT|UNSIGNED|SIGNED|SHOW|TRUNCATE|DIV|INTERVAL"
+    r"|SEPARATOR|STRAIGHT_JOIN|ENGINE|CHARSET|SQL_\w+|information_schema"
+    r"|performance_schema)\b"
+    r"|\bLOAD\s+DATA\b|\bINSERT\s+IGNORE\b|\bLOCK\s+IN\s+SHARE\s+MODE\b"
+    r"|\bFOR\s+UPDATE\b|\b(?:USE|FORCE|IGNORE)\s+(?:INDEX|KEY)\b"
+    r"|\bCOLLATE\s+utf8\w*|\bSTART\s+TRANSACTION\b|^\s*SET\b"
+    r"|\bDELETE\s+\w+(?:\s*,\s*\w+)*\s+FROM\b",
+    re.I,
+)
+
+_SHOW_TABLES = (
+    "SELECT name FROM sqlite_master "
+    "WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\' "
+    "ORDER BY name"
+)
+
+# (table, referenced table) of every foreign key, like KEY_COLUMN_USAGE
+_FOREIGN_KEYS = (
+    'SELECT m.name, f."table" '
+    "FROM sqlite_master m, pragma_foreign_key_list(m.name) f "
+    "WHERE m.type = 'table'"
+)
+
+# Statements replaced as a whole, by their text with whitespace collapsed
+_FIXED = {
+    "SHOW TABLES": [_SHOW_TABLES],
+    "SELECT @@max_allowed_packet": [f"SELECT {_MAX_ALLOWED_PACKET}"],
+    "START TRANSACTION": ["BEGIN"],
+    # A SQLite transaction reads one snapshot from its first read on
+    "START TRANSACTION WITH CONSISTENT SNAPSHOT": ["BEGIN"],
+    # Only takes effect outside of a transaction
+    "SET FOREIGN_KEY_CHECKS = 0": ["PRAGMA foreign_keys = OFF"],
+    "SET FOREIGN_KEY_CHECKS = 1": ["PRAGMA foreign_keys = ON"],
+    "SELECT TABLE_NAME, REFERENCED_TABLE_NAME "
+    "FROM information_schema.KEY_COLUMN_USAGE "
+    "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL": [
+        _FOREIGN_KEYS
+    ],
+}
+
+
+def _translate(operation: str, has_params: bool, conflict_target) -> List[str]:
+    """
+    SQLite statements equivalent to a MySQL statement of music_db. Only the
+    last one takes the parameters.
+
+    Raises:
+        UntranslatableStatement: the statement uses a MySQL construct that
+        has no rule, or a rule's construct in a shape the rule does not handle
+    """
+    sql = operation
+    if has_params:
+        # mysql.connector only interprets % when there are parameters
+        sql = sql.replace("%s", "?").replace("%%", "%")
+
+    fixed = _FIXED.get(" ".join(sql.split()))
+    if fixed is not None:
+        return fixed
+
+    sql, literals = _mask_literals(sql)
+    for pattern, rewrite in _STATEMENT_RULES:
+        match = pattern.match(sql)
+        if match:
+            try:
+                statements = rewrite(match, conflict_target)
+            except UntranslatableStatement as error:
+                raise UntranslatableStatement(
+                    error.construct, error.reason, operation
+                ) from None
+            break
+    else:
+        statements = [sql]
+
+    translated = []
+    for statement in statements:
+        for rewrite in _EXPRESSION_RULES:
+            statement = rewrite(statement, literals)
+        _check(statement, literals, operation)
+        translated.append(_unmask_literals(statement, literals))
+    return translated
+
+
+def _mask_literals(sql: str) -> Tuple[str, List[str]]:
+    """sql with its string literals masked, and the literals."""
+    literals = []
+
+    def mask(match):
+        literals.append(match.group())
+        return f"\x00{len(literals) - 1}\x00"
+
+    return _LITERAL.sub(mask, sql), literals
+
+
+def _unmask_literals(sql: str, literals: List[str]) -> str:
+    return _MASKED.sub(lambda match: literals[int(match.group(1))], sql)
+
+
+def _check(sql: str, literals: List[str], operation: str):
+    """Raise if a masked, translated statement still needs MySQL."""
+    found = _MYSQL_ONLY.search(sql)
+    if found is not None:
+        construct = found.group()
+    else:
+        # Only LIKE patterns keep MySQL's meaning of backslashes (ESCAPE '\')
+        escaped = _MASKED.finditer(sql)
+        construct = next(
+            (
+                literals[int(m.group(1))]
+                for m in escaped
+                if "\\" in literals[int(m.group(1))]
+                and not sql.startswith(" ESCAPE '\\'", m.end())
+            ),
+            None,
+        )
+        if construct is None:
+            return
+    raise UntranslatableStatement(construct, statement=operation)
+
+
+def _top_level(text: str, keyword: str) -> Optional[int]:
+    """Index of the first keyword of text outside of parentheses, or None."""
+    depth = 0
+    for match in re.finditer(rf"[()]|\b{keyword}\b", text, re.I):
+        token = match.group()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            return match.start()
+    return None
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a comma separated list, ignoring commas inside parentheses."""
+    parts = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(text):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts]
+
+
+def _replace_calls(sql: str, function: str, template: str) -> str:
+    """Replace every function(argument) call, nested parentheses included."""
+    pattern = re.compile(rf"\b{function}\(", re.I)
+    while True:
+        match = pattern.search(sql)
+        if match is None:
+            return sql
+        depth = 1
+        i = match.end()
+        while depth:
+            depth += {"(": 1, ")": -1}.get(sql[i], 0)
+            i += 1
+        argument = sql[match.end() : i - 1]
+        sql = sql[: match.start()] + template.format(argument) + sql[i:]
+
+
+# ---- Statement rules: (pattern, rewrite(match, conflict_target)) ----------
+
+_TRUNCATE = re.compile(r"\s*TRUNCATE\s+TABLE\s+(\w+)\s*$", re.I)
+
+_DROP_TEMPORARY = re.compile(
+    r"\s*DROP\s+TEMPORARY\s+TABLE\s+IF\s+EXISTS\s+(\w+(?:\s*,\s*\w+)*)\s*$", re.I
+)
+
+_CREATE_TEMPORARY = re.compile(
+    r"\s*CREATE\s+TEMPORARY\s+TABLE\s+(\w+)\s*\((.*)\)\s*$", re.S | re.I
+)
+
+_SET_AUTO_INCREMENT = re.compile(
+    r"\s*ALTER\s+TABLE\s+(\w+)\s+AUTO_INCREMENT\s*=\s*(\d+)\s*$", re.I
+)
+
+_UPSERT = re.compile(
+    r"\s*INSERT\s+INTO\s+(?P<table>\w+)\s*\((?P<columns>[^)]*)\)"
+    r"\s*SELECT\s+\*\s+FROM\s*\((?P<select>.*)\)\s*AS\s+(?P<alias>\w+)"
+    r"\s+ON\s+DUPLICATE\s+KEY\s+UPDATE\s+(?P<update>.*?)\s*$",
+    re.S | re.I,
+)
+
+_SET_VARIABLE = re.compile(
+    r"\s*SET\s+@(\w+)\s*=\s*(\?|NULL|-?\d+|\x00\d+\x00)\s*$", re.I
+)
+
+_MULTI_TABLE_DELETE = re.compile(
+    r"\s*DELETE\s+(?P<alias>\w+)\s+FROM\s+(?P<table>\w+)\s+(?P=alias)\s+(?P<rest>.*)$",
+    re.S | re.I,
+)
+
+
+def _truncate(match, conflict_target) -> List[str]:
+    """Like TRUNCATE, restart the AUTO_INCREMENT counter."""
+    table = match.group(1)
+    return [
+        f"DELETE FROM {table}",
+        f"DELETE FROM sqlite_sequence WHERE name = '{table}'",
+    ]
+
+
+def _drop_temporary(match, conflict_target) -> List[str]:
+    tables = [t.strip() for t in match.group(1).split(",")]
+    return [f"DROP TABLE IF EXISTS temp.{table}" for table in tables]
+
+
+def _create_temporary(match, conflict_target) -> List[str]:
+    """A temporary table with its inline INDEX definitions as CREATE INDEX."""
+    table, body = match.group(1), match.group(2)
+    columns = []
+    indexes = []
+    for definition in _split_top_level(body):
+        index = re.match(r"(?:INDEX|KEY)\s*\w*\s*\((.*)\)$", definition, re.S | re.I)
+        if index:
+            indexes.append(index.group(1))
+            continue
+        definition = re.sub(r"\s+UNSIGNED\b", "", definition, flags=re.I)
+        definition = re.sub(
+            r"\bINT\s+NOT\s+NULL\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b",
+            "INTEGER PRIMARY KEY",
+            definition,
+            flags=re.I,
+        )
+        definition = re.sub(
+            r"\b(VARCHAR\(\d+\))", r"\1 COLLATE MUSIC", definition, flags=re.I
+        )
+        columns.append(definition)
+
+    statements = [f"CREATE TEMPORARY TABLE {table} ({', '.join(columns)})"]
+    statements += [
+        f"CREATE INDEX temp.{table}_{i} ON {table} ({index})"
+        for i, index in enumerate(indexes, 1)
+    ]
+    return statements
+
+
+def _set_auto_increment(match, conflict_target) -> List[str]:
+    """Like MySQL, a value below the largest id is ignored."""
+    table, value = match.group(1), int(match.group(2))
+    return [
+        "INSERT INTO sqlite_sequence (name, seq) "
+        f"SELECT '{table}', 0 WHERE NOT EXISTS "
+        f"(SELECT 1 FROM sqlite_sequence WHERE name = '{table}')",
+        f"UPDATE sqlite_sequence SET seq = MAX(seq, {value - 1}) "
+        f"WHERE name = '{table}'",
+    ]
+
+
+def _set_variable(match, conflict_target) -> List[str]:
+    """A session variable, for the triggers that read it with user_variable."""
+    name, value = match.groups()
+    return [f"SELECT set_user_variable('{name}', {value})"]
+
+
+def _upsert(match, conflict_target) -> List[str]:
+    """
+    INSERT ... SELECT * FROM (...) AS st ON DUPLICATE KEY UPDATE as an
+    upsert on the table's unique key. st.x becomes excluded.<column>, the
+    column the derived table's x is inserted into, so every item of the
+    derived table's select list must be a column or have an alias.
+    """
+    table, alias, select = match.group("table", "alias", "select")
+    columns = [c.strip() for c in match.group("columns").split(",")]
+    head = re.match(r"\s*SELECT\s+", select, re.I)
+    end = _top_level(select, "FROM") if head else None
+    if end is None:
+        raise UntranslatableStatement(
+            "ON DUPLICATE KEY UPDATE", f"no select list in derived table {alias}"
+        )
+    names = []
+    for item in _split_top_level(select[head.end() : end]):
+        named = re.search(r"\sAS\s+(\w+)$", item, re.I) or re.fullmatch(
+            r"(?:\w+\.)?(\w+)", item
+        )
+        if named is None:
+            raise UntranslatableStatement(
+                "ON DUPLICATE KEY UPDATE",
+                f"unnamed item {item!r} in derived table {alias}",
+            )
+        names.append(named.group(1))
+    if len(names) != len(columns):
+        raise UntranslatableStatement(
+            "ON DUPLICATE KEY UPDATE", f"{len(columns)} columns from {len(names)} items"
+        )
+
+    def excluded(reference):
+        if reference.group(1) not in names:
+            raise UntranslatableStatement(
+                "ON DUPLICATE KEY UPDATE",
+                f"{reference.group()} is not in the select list",
+            )
+        return f"excluded.{columns[names.index(reference.group(1))]}"
+
+    update = re.sub(rf"\b{alias}\.(\w+)\b", excluded, match.group("update"))
+    if re.search(r"\bVALUES\s*\(", update, re.I):
+        raise UntranslatableStatement("VALUES()", "in ON DUPLICATE KEY UPDATE")
+
+    # WHERE true keeps the ON of ON CONFLICT from being parsed as a join
+    return [
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"SELECT * FROM ({select}) AS {alias} WHERE true "
+        f"ON CONFLICT ({', '.join(conflict_target(table))}) DO UPDATE SET {update}"
+    ]
+
+
+def _multi_table_delete(match, conflict_target) -> List[str]:
+    alias, table, rest = match.group("alias", "table", "rest")
+    return [
+        f"DELETE FROM {table} WHERE rowid IN "
+        f"(SELECT {alias}.rowid FROM {table} {alias} {rest})"
+    ]
+
+
+_STATEMENT_RULES = (
+    (_TRUNCATE, _truncate),
+    (_DROP_TEMPORARY, _drop_temporary),
+    (_CREATE_TEMPORARY, _create_temporary),
+    (_SET_AUTO_INCREMENT, _set_auto_increment),
+    (_SET_VARIABLE, _set_variable),
+    (_UPSERT, _upsert),
+    (_MULTI_TABLE_DELETE, _multi_table_delete),
+)
+
+
+# ---- Expression rules: rewrite(sql, literals) -----------------------------
+
+_JSON_TABLE = re.compile(
+    r"JSON_TABLE\(\s*(?P<doc>[\w.]+)\s*,\s*\x00(?P<rows>\d+)\x00\s*"
+    r"COLUMNS\s*\(\s*(?P<ordinal>\w+)\s+FOR\s+ORDINALITY\s*,\s*"
+    r"(?P<value>\w+)\s+\w+(?:\(\d+\))?\s+PATH\s+\x00(?P<path>\d+)\x00\s*\)\s*\)"
+    r"\s*AS\s+(?P<alias>\w+)",
+    re.S | re.I,
+)
+
+
+def _json_table(sql: str, literals: List[str]) -> str:
+    """The elements of a JSON array, numbered, as json_each."""
+    match = _JSON_TABLE.search(sql)
+    if (
+        match is None
+        or literals[int(match.group("rows"))] != "'$[*]'"
+        or literals[int(match.group("path"))] != "'$'"
+    ):
+        return sql
+    alias = match.group("alias")
+    sql = f"{sql[:match.start()]}json_each({match.group('doc')}) AS {alias}" + (
+        sql[match.end() :]
+    )
+    # FOR ORDINALITY counts from 1, json_each keys from 0
+    sql = re.sub(rf"\b{alias}\.{match.group('ordinal')}\b", f"({alias}.key + 1)", sql)
+    return re.sub(rf"\b{alias}\.{match.group('value')}\b", f"{alias}.value", sql)
+
+
+def _year(sql: str, literals: List[str]) -> str:
+    """YEAR() of a 'YYYY-MM-DD' date."""
+    return _replace_calls(sql, "YEAR", "CAST(substr({}, 1, 4) AS INTEGER)")
+
+
+def _like_escape(sql: str, literals: List[str]) -> str:
+    """Backslash escapes in LIKE patterns, e.g. 'user\\_%'."""
+
+    def escape(match):
+        if "\\" not in literals[int(match.group(1))]:
+            return match.group()
+        return match.group() + " ESCAPE '\\'"
+
+    return re.sub(r"\bLIKE\s+\x00(\d+)\x00", escape, sql, flags=re.I)
+
+
+def _substitute(pattern: str, replacement: str):
+    """An expression rule replacing every match of pattern."""
+    compiled = re.compile(pattern, re.I)
+    return lambda sql, literals: compiled.sub(replacement, sql)
+
+
+_EXPRESSION_RULES = (
+    _json_table,
+    _year,
+    _substitute(
+        r"\bDATEDIFF\(\s*([^(),]+?)\s*,\s*([^(),]+?)\s*\)",
+        r"CAST(julianday(\1) - julianday(\2) AS INTEGER)",
+    ),
+    _substitute(r"\bIF\(", "iif("),
+    _substitute(r"\bGREATEST\(", "MAX("),
+    _substitute(r"<=>", " IS "),
+    _substitute(r"\bINSERT\s+IGNORE\b", "INSERT OR IGNORE"),
+    _substitute(r"\s+FROM\s+DUAL\b", ""),
+    _like_escape,
+)
@@ -0,0 +1,526 @@
+"""
+Deterministic synthetic workloads for load-testing the music database.
+
+Workload generates input for load_single_songs, load_albums, load_users and
+load_song_ratings, in exactly their shapes, with the skew of real data:
+
+    song popularity    ratings pick songs from a Zipf distribution
+    user activity      rating counts per user follow a Zipf distribution
+    prolific artists   singles and albums pick artists from a Zipf
+                       distribution, so a few artists have most of them
+    overlapping genres a single has one to three genres, usually neighbours
+                       in the genre list
+    clustered ratings  every user rates around a date of their own
+
+    workload = Workload(num_ratings=100_000_000, seed=7)
+    load_single_songs(mydb, workload.singles())
+    load_albums(mydb, workload.albums())
+    load_users(mydb, workload.users())
+    load_song_ratings(mydb, workload.ratings())
+
+Every method returns a new generator, so the rows are streamed and never
+held in memory; the same seed gives the same rows on every run. Every row
+is a function of the seed and its position, except that ratings keep the
+songs each user rated, so that memory is bounded by the most active user's
+rating count, not by the number of ratings. Ratings are emitted user by
+user, most active user first.
+
+reject_fractions adds rows the loaders reject, as a fraction of the rows of
+their kind (see REJECT_CATEGORIES). Every injected row is rejected for
+exactly its own reason and has its own reject tuple, so the rejects of a
+load equal the rows labelled() reports for that kind.
+
+Usage:
+    python music_db_workload.py --ratings 1000000 --directory data/
+    python music_db_workload.py --ratings 1000000 --reject unknown_user=0.01
+
+writes singles.csv, albums.csv, users.csv and ratings.csv in the format
+read by the import_* functions.
+"""
+
+import argparse
+import itertools
+import math
+import os
+import random
+from array import array
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+from music_db import write_import_file
+
+GENRES = [
+    "Pop",
+    "Rock",
+    "Indie",
+    "Folk",
+    "Country",
+    "Blues",
+    "Jazz",
+    "Soul",
+    "Funk",
+    "Hip Hop",
+    "Electronic",
+    "Metal",
+]
+
+# kind -> reject category -> why the loader rejects the injected row
+REJECT_CATEGORIES = {
+    "singles": {
+        "duplicate_single": "same title and artist as the single before it",
+    },
+    "albums": {
+        "duplicate_album": "same name and artist as the album before it",
+    },
+    "users": {
+        "duplicate_user": "same name as the user before it, in capitals",
+    },
+    "ratings": {
+        "unknown_user": "(a) the user does not exist",
+        "unknown_song": "(b) the (artist, song) does not exist",
+        "already_rated": "(c) repeats the rating before it",
+        "out_of_range": "(d) rating outside 1..5, before a valid rating "
+        "of the same song",
+    },
+}
+
+KINDS = tuple(REJECT_CATEGORIES)
+
+# Relative frequency of the ratings 1..5
+RATING_WEIGHTS = (1, 1, 2, 4, 3)
+
+# Share of a user's ratings within CLUSTER_DAYS of their own date
+CLUSTERED_SHARE = 0.8
+CLUSTER_DAYS = 45
+
+_MASK = (1 << 64) - 1
+
+# Streams of per-row values; every stream is independent of the others
+_SINGLE_ARTIST = 1
+_SINGLE_GENRES = 2
+_SINGLE_DATE = 3
+_ALBUM_ARTIST = 4
+_ALBUM_GENRE = 5
+_ALBUM_DATE = 6
+_ALBUM_TRACKS = 7
+_USER_DATE = 8
+_INJECT = 9
+_PERMUTATION = 10
+_RATINGS = 11
+
+
+def _mix(x: int) -> int:
+    """splitmix64 finalizer: a well-spread 64-bit hash of x."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+def zipf_rank(n: int, skew: float, u: float) -> int:
+    """
+    Rank in [0, n) for a uniform u in [0, 1), with the probability of rank r
+    roughly proportional to 1 / (r + 1) ** skew (continuous approximation,
+    constant time and memory). skew 0 is uniform.
+    """
+    if skew == 0:
+        rank = int(u * n)
+    elif skew == 1:
+        rank = int((n + 1) ** u) - 1
+    else:
+        a = 1 - skew
+        rank = int((1 + u * ((n + 1) ** a - 1)) ** (1 / a)) - 1
+    return min(max(rank, 0), n - 1)
+
+
+class _Permutation:
+    """Bijection of range(n), so that popular ranks are spread over the names."""
+
+    def __init__(self, n: int, key: int):
+        self.n = n
+        self.offset = key % n
+        step = (key >> 20) % n | 1
+        while math.gcd(step, n) != 1:
+            step += 2
+        self.step = step
+
+    def __call__(self, rank: int) -> int:
+        return (rank * self.step + self.offset) % self.n
+
+
+class Workload:
+    """
+    Seeded generator of loader input with realistic skew.
+
+    Sizes default to fractions of num_ratings: a user rates 50 songs and an
+    artist has 20 singles on average, and there is one album per 10 singles.
+    The skews are Zipf exponents; 0 is uniform.
+    """
+
+    def __init__(
+        self,
+        num_ratings: int = 100_000,
+        num_users: Optional[int] = None,
+        num_singles: Optional[int] = None,
+        num_albums: Optional[int] = None,
+        num_artists: Optional[int] = None,
+        seed: int = 0,
+        genres: Sequence[str] = GENRES,
+        song_skew: float = 1.0,
+        user_skew: float = 1.0,
+        artist_skew: float = 1.0,
+        tracks_per_album: Tuple[int, int] = (8, 14),
+        release_years: Tuple[int, int] = (1990, 2021),
+        rating_years: Tuple[int, int] = (2015, 2021),
+        reject_fractions: Optional[Dict[str, float]] = None,
+    ):
+        self.num_ratings = num_ratings
+        self.num_singles = num_singles or max(1, num_ratings // 20)
+        self.num_albums = (
+            num_albums if num_albums is not None else max(1, self.num_singles // 10)
+        )
+        self.num_users = num_users or max(1, num_ratings // 50)
+        self.num_artists = num_artists or max(1, self.num_singles // 20)
+        self.seed = seed
+        self.genres = list(genres)
+        self.song_skew = song_skew
+        self.user_skew = user_skew
+        self.artist_skew = artist_skew
+        self.tracks_per_album = tracks_per_album
+        self.release_years = release_years
+        self.rating_years = rating_years
+
+        if not 1 <= tracks_per_album[0] <= tracks_per_album[1]:
+            raise ValueError("tracks_per_album must be (min, max) with 1 <= min <= max")
+        if not self.genres:
+            raise ValueError("genres must not be empty")
+
+        # First song of every album after the singles; the last entry is
+        # the number of songs
+        offsets = array("q", [self.num_singles])
+        low, high = tracks_per_album
+        for a in range(self.num_albums):
+            tracks = low + self._hash(_ALBUM_TRACKS, a) % (high - low + 1)
+            offsets.append(offsets[-1] + tracks)
+        self._album_offsets = offsets
+        self.num_songs = offsets[-1]
+        if num_ratings > self.num_users * self.num_songs:
+            raise ValueError(
+                f"{num_ratings} ratings do not fit {self.num_users} users "
+                f"rating {self.num_songs} songs once each"
+            )
+
+        self._injections = self._parse_rejects(reject_fractions or {})
+        self._song_of_rank = _Permutation(self.num_songs, self._hash(_PERMUTATION, 0))
+        self._user_of_rank = _Permutation(self.num_users, self._hash(_PERMUTATION, 1))
+        self._artist_of_rank = _Permutation(
+            self.num_artists, self._hash(_PERMUTATION, 2)
+        )
+
+    @staticmethod
+    def _parse_rejects(reject_fractions: Dict[str, float]) -> Dict[str, list]:
+        """
+        kind -> [(category, cumulative probability)] of injecting a reject
+        after a valid row, so that category makes its fraction of the rows.
+        """
+        category_kind = {
+            category: kind
+            for kind, categories in REJECT_CATEGORIES.items()
+            for category in categories
+        }
+        unknown = set(reject_fractions) - set(category_kind)
+        if unknown:
+            raise ValueError(
+                f"unknown reject categories {sorted(unknown)}; "
+                f"known: {sorted(category_kind)}"
+            )
+        injections = {}
+        for kind, categories in REJECT_CATEGORIES.items():
+            fractions = [(c, reject_fractions.get(c, 0.0)) for c in categories]
+            total = sum(f for _, f in fractions)
+            if any(f < 0 for _, f in fractions) or total > 0.5:
+                raise ValueError(
+                    f"reject fractions of {kind} must be >= 0 and add up to "
+                    f"at most 0.5"
+                )
+            cumulative = 0.0
+            injections[kind] = []
+            for category, fraction in fractions:
+                if fraction:
+                    # p per valid row gives p / (1 + sum p) of all rows
+                    cumulative += fraction / (1 - total)
+                    injections[kind].append((category, cumulative))
+        return injections
+
+    def _hash(self, stream: int, i: int) -> int:
+        return _mix(_mix(self.seed * 64 + stream) ^ i)
+
+    def _uniform(self, stream: int, i: int, draw: int = 0) -> float:
+        """Uniform in [0, 1), a pure function of the seed, stream, row and draw."""
+        return (self._hash(stream, i * 8 + draw) >> 11) / (1 << 53)
+
+    def _injected(self, kind: str, i: int) -> Optional[str]:
+        """Reject category injected after valid row i of kind, if any."""
+        u = self._uniform(_INJECT, i, KINDS.index(kind))
+        for category, cumulative in self._injections[kind]:
+            if u < cumulative:
+                return category
+        return None
+
+    def _date(self, stream: int, i: int, years: Tuple[int, int], draw: int = 0) -> date:
+        first = date(years[0], 1, 1)
+        days = (date(years[1], 12, 31) - first).days + 1
+        return first + timedelta(days=int(self._uniform(stream, i, draw) * days))
+
+    def _artist(self, stream: int, i: int) -> str:
+        rank = zipf_rank(self.num_artists, self.artist_skew, self._uniform(stream, i))
+        return f"Artist {self._artist_of_rank(rank)}"
+
+    # Rows by position
+
+    def single(self, i: int) -> Tuple[str, Tuple[str, ...], str, str]:
+        """Single i, 0 <= i < num_singles."""
+        n = len(self.genres)
+        primary = zipf_rank(n, 1.0, self._uniform(_SINGLE_GENRES, i))
+        genres = [primary]
+        # Neighbouring genres overlap most, e.g. Pop and Rock
+        if self._uniform(_SINGLE_GENRES, i, 1) < 0.35:
+            side = 1 if self._uniform(_SINGLE_GENRES, i, 2) < 0.5 else -1
+            genres.append((primary + side) % n)
+        if self._uniform(_SINGLE_GENRES, i, 3) < 0.1:
+            genres.append(int(self._uniform(_SINGLE_GENRES, i, 4) * n))
+        return (
+            f"Song {i}",
+            tuple(self.genres[g] for g in dict.fromkeys(genres)),
+            self._artist(_SINGLE_ARTIST, i),
+            self._date(_SINGLE_DATE, i, self.release_years).isoformat(),
+        )
+
+    def album(self, a: int) -> Tuple[str, str, str, str, list]:
+        """Album a, 0 <= a < num_albums."""
+        genre = zipf_rank(len(self.genres), 1.0, self._uniform(_ALBUM_GENRE, a))
+        tracks = self._album_offsets[a + 1] - self._album_offsets[a]
+        return (
+            f"Album {a}",
+            self.genres[genre],
+            self._artist(_ALBUM_ARTIST, a),
+            self._date(_ALBUM_DATE, a, self.release_years).isoformat(),
+            [f"Album {a} Track {t}" for t in range(tracks)],
+        )
+
+    def user(self, u: int) -> str:
+        """User u, 0 <= u < num_users."""
+        return f"user_{u}"
+
+    def song(self, s: int) -> Tuple[str, str]:
+        """(artist, title) of song s: singles first, then album tracks."""
+        if s < self.num_singles:
+            return self._artist(_SINGLE_ARTIST, s), f"Song {s}"
+        a = bisect_right(self._album_offsets, s) - 1
+        track = s - self._album_offsets[a]
+        return self._artist(_ALBUM_ARTIST, a), f"Album {a} Track {track}"
+
+    # Streams
+
+    def singles(self) -> Iterator[Tuple[str, Tuple[str, ...], str, str]]:
+        """Input for load_single_songs."""
+        return (row for _, row in self.labelled("singles"))
+
+    def albums(self) -> Iterator[Tuple[str, str, str, str, list]]:
+        """Input for load_albums."""
+        return (row for _, row in self.labelled("albums"))
+
+    def users(self) -> Iterator[str]:
+        """Input for load_users."""
+        return (row for _, row in self.labelled("users"))
+
+    def ratings(self) -> Iterator[Tuple[str, Tuple[str, str], int, str]]:
+        """Input for load_song_ratings; load singles, albums and users first."""
+        return (row for _, row in self.labelled("ratings"))
+
+    def labelled(self, kind: str) -> Iterator[Tuple[Optional[str], tuple]]:
+        """
+        (category, row) for every row of kind, with the reject category of
+        injected rows and None for valid ones.
+        """
+        if kind == "singles":
+            return self._singles()
+        if kind == "albums":
+            return self._albums()
+        if kind == "users":
+            return self._users()
+        if kind == "ratings":
+            return self._ratings()
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+
+    def _singles(self):
+        for i in range(self.num_singles):
+            row = self.single(i)
+            yield None, row
+            if self._injected("singles", i):
+                title, genres, artist, _ = row
+                day = self._date(_SINGLE_DATE, i, self.release_years, 1)
+                day = day.isoformat()
+                yield "duplicate_single", (title.upper(), genres, artist, day)
+
+    def _albums(self):
+        for a in range(self.num_albums):
+            row = self.album(a)
+            yield None, row
+            if self._injected("albums", a):
+                name, genre, artist, day, tracks = row
+                yield "duplicate_album", (name.upper(), genre, artist, day, tracks)
+
+    def _users(self):
+        for u in range(self.num_users):
+            yield None, self.user(u)
+            if self._injected("users", u):
+                yield "duplicate_user", self.user(u).upper()
+
+    def _user_counts(self) -> Iterator[int]:
+        """
+        Number of ratings of the users in order of activity: num_ratings
+        split in proportion to 1 / (rank + 1) ** user_skew, no user rating
+        more than every song.
+        """
+
+        def weights():
+            return (1 / (r + 1) ** self.user_skew for r in range(self.num_users))
+
+        total = sum(weights())
+        shares = (self.num_ratings * w / total for w in weights())
+        # The most active users get the rounding remainder
+        remainder = self.num_ratings - sum(int(s) for s in shares)
+        carry = 0
+        for rank, weight in enumerate(weights()):
+            count = int(self.num_ratings * weight / total) + carry
+            count += rank < remainder
+            carry = max(0, count - self.num_songs)
+            yield count - carry
+
+    def _ratings(self):
+        rng = random.Random(self._hash(_RATINGS, 0))
+        first = date(self.rating_years[0], 1, 1)
+        days = (date(self.rating_years[1], 12, 31) - first).days + 1
+        dates = [(first + timedelta(days=d)).isoformat() for d in range(days)]
+        ratings = range(1, 6)
+        rating_weights = list(itertools.accumulate(RATING_WEIGHTS))
+        ghosts = 0
+
+        for rank, count in enumerate(self._user_counts()):
+            if not count:
+                break
+            user = self.user(self._user_of_rank(rank))
+            center = int(self._uniform(_USER_DATE, rank) * days)
+            # song rank -> next song rank to try; the user's rated songs
+            # are the keys
+            rated = {}
+            for _ in range(count):
+                song_rank = zipf_rank(self.num_songs, self.song_skew, rng.random())
+                path = []
+                while song_rank in rated:
+                    path.append(song_rank)
+                    song_rank = rated[song_rank]
+                for p in path:
+                    rated[p] = song_rank
+                rated[song_rank] = (song_rank + 1) % self.num_songs
+
+                if rng.random() < CLUSTERED_SHARE:
+                    day = center + round(rng.triangular(-CLUSTER_DAYS, CLUSTER_DAYS))
+                    day = min(max(day, 0), days - 1)
+                else:
+                    day = rng.randrange(days)
+                song = self.song(self._song_of_rank(song_rank))
+                row = (
+                    user,
+                    song,
+                    rng.choices(ratings, cum_weights=rating_weights)[0],
+                    dates[day],
+                )
+
+                category = None
+                u = rng.random()
+                for name, cumulative in self._injections["ratings"]:
+                    if u < cumulative:
+                        category = name
+                        break
+                if category == "out_of_range":
+                    yield category, (user, song, rng.choice((0, 6, 10)), row[3])
+                yield None, row
+                if category == "unknown_user":
+                    ghosts += 1
+                    yield category, (f"ghost_{ghosts}",) + row[1:]
+                elif category == "unknown_song":
+                    ghosts += 1
+                    missing = (song[0], f"Missing Song {ghosts}")
+                    yield category, (user, missing) + row[2:]
+                elif category == "already_rated":
+                    yield category, row
+
+    def write_files(self, directory: str, delimiter: str = ",") -> Dict[str, str]:
+        """
+        Write the four kinds as import files (see write_import_file) to
+        directory; returns kind -> path.
+        """
+        extension = "tsv" if delimiter == "\t" else "csv"
+        paths = {}
+        for kind in KINDS:
+            path = os.path.join(directory, f"{kind}.{extension}")
+            rows = (row for _, row in self.labelled(kind))
+            write_import_file(path, kind, rows, delimiter=delimiter)
+            paths[kind] = path
+        return paths
+
+
+def main():
+    """Write a workload to import files."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--ratings", type=int, default=100_000)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--singles", type=int)
+    parser.add_argument("--albums", type=int)
+    parser.add_argument("--artists", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--song-skew", type=float, default=1.0)
+    parser.add_argument("--user-skew", type=float, default=1.0)
+    parser.add_argument("--artist-skew", type=float, default=1.0)
+    parser.add_argument(
+        "--reject",
+        action="append",
+        default=[],
+        metavar="CATEGORY=FRACTION",
+        help="e.g. unknown_song=0.01; may be repeated",
+    )
+    parser.add_argument("--directory", default=".")
+    parser.add_argument("--tsv", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        rejects = {
+            category: float(fraction)
+            for category, fraction in (r.split("=", 1) for r in args.reject)
+        }
+        workload = Workload(
+            num_ratings=args.ratings,
+            num_users=args.users,
+            num_singles=args.singles,
+            num_albums=args.albums,
+            num_artists=args.artists,
+            seed=args.seed,
+            song_skew=args.song_skew,
+            user_skew=args.user_skew,
+            artist_skew=args.artist_skew,
+            reject_fractions=rejects,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    os.makedirs(args.directory, exist_ok=True)
+    paths = workload.write_files(args.directory, "\t" if args.tsv else ",")
+    for kind, path in paths.items():
+        print(f"{kind}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,10 @@ echo "================================================"
 echo "Music Database - Complete Test Suite"
 echo "================================================"
 echo ""
-echo "This will run all tests in sequence:"
-echo "  1. Populate database (test_music_db.py)"
-echo "  2. Quick assertions (test_quick.py)"
-echo "  3. Comprehensive assertions (test_assertions.py)"
+echo "This will run all tests in one process:"
+echo "  1. Quick assertions (test_quick.py)"
+echo "  2. Comprehensive assertions (test_assertions.py)"
+echo "The data of test_music_db.py is loaded once and every test is rolled back."
 echo ""
 echo "Press Enter to continue or Ctrl+C to cancel..."
 read
@@ -31,36 +31,18 @@ TEST_DIR="$PROJECT_ROOT/test_files"
 
 echo ""
 echo "================================================"
-echo "Step 1: Populating Database"
+echo "Running Assertion Tests"
 echo "================================================"
-if python3 "$TEST_DIR/test_music_db.py"; then
-    echo -e "${GREEN}✓ Database populated successfully${NC}"
+START_NS=$(date +%s%N)
+if (cd "$TEST_DIR" && python3 -m unittest -v test_quick test_assertions); then
+    echo -e "${GREEN}✓ Assertion tests passed${NC}"
 else
-    echo -e "${RED}✗ Failed to populate database${NC}"
-    exit 1
-fi
-
-echo ""
-echo "================================================"
-echo "Step 2: Quick Assertion Tests"
-echo "================================================"
-if python3 "$TEST_DIR/test_quick.py"; then
-    echo -e "${GREEN}✓ Quick tests passed${NC}"
-else
-    echo -e "${YELLOW}⚠ Some quick tests failed${NC}"
-    ALL_PASSED=false
-fi
-
-echo ""
-echo "================================================"
-echo "Step 3: Comprehensive Assertion Tests"
-echo "================================================"
-if python3 "$TEST_DIR/test_assertions.py"; then
-    echo -e "${GREEN}✓ Comprehensive tests passed${NC}"
-else
-    echo -e "${YELLOW}⚠ Some comprehensive tests failed${NC}"
+    echo -e "${YELLOW}⚠ Some assertion tests failed${NC}"
     ALL_PASSED=false
 fi
+END_NS=$(date +%s%N)
+ELAPSED_MS=$(( (END_NS - START_NS) / 1000000 ))
+echo "Wall-clock time: $((ELAPSED_MS / 1000)).$(printf '%03d' $((ELAPSED_MS % 1000))) s"
 
 echo ""
 echo "================================================"
@@ -0,0 +1,138 @@
+"""
+Shared database fixture for the assertion tests.
+
+The dataset of test_music_db.py is loaded once per process, on the backend
+configured there (MUSIC_DB_BACKEND). Every test then runs on the one shared
+connection, inside a transaction that is rolled back when the test ends, so
+the tests are isolated and can run in any order and any subset:
+
+    class TestSomething(RollbackTestCase):
+        def test_new_user(self):
+            load_users(self.mydb, ["zoe"])  # gone again after the test
+
+The loaders commit every chunk; RollbackConnection turns those commits into
+savepoints inside the test's transaction and their rollbacks into rollbacks
+to the last savepoint. Tests that need real commits (a second connection,
+other processes, statements that commit implicitly in MySQL such as ALTER
+TABLE or START TRANSACTION) are marked with @commits: they get a connection
+of their own, and the dataset is loaded again before the next test.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import clear_database
+import test_music_db
+from test_music_db import CONNECT, DB_CONFIG
+
+# The steps of test_music_db.run_all_tests() after clearing the database
+FIXTURE_STEPS = [
+    test_music_db.test_load_single_songs,
+    test_music_db.test_get_most_prolific_individual_artists,
+    test_music_db.test_get_artists_last_single_in_year,
+    test_music_db.test_load_albums,
+    test_music_db.test_get_top_song_genres,
+    test_music_db.test_get_album_and_single_artists,
+    test_music_db.test_load_users,
+    test_music_db.test_load_song_ratings,
+    test_music_db.test_get_most_rated_songs,
+    test_music_db.test_get_most_engaged_users,
+]
+
+SAVEPOINT = "music_db_test"
+
+_connection = None
+_loaded = False
+
+
+def load_fixture_dataset(mydb):
+    """Empty the database and load the dataset of test_music_db.py into it."""
+    clear_database(mydb, truncate=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for step in FIXTURE_STEPS:
+            step()
+
+
+def shared_connection():
+    """The connection of the test session, with the fixture dataset loaded."""
+    global _connection, _loaded
+    if _connection is None:
+        _connection = CONNECT(**DB_CONFIG)
+    if not _loaded:
+        load_fixture_dataset(_connection)
+        _loaded = True
+    return _connection
+
+
+def commits(test):
+    """Mark a test that needs real commits (see the module docstring)."""
+    test.commits = True
+    return test
+
+
+class RollbackConnection:
+    """
+    Connection proxy keeping everything in one transaction: commit()
+    moves a savepoint forward, rollback() returns to it, and close() rolls
+    the whole transaction back.
+    """
+
+    def __init__(self, mydb):
+        self._mydb = mydb
+        self._execute("START TRANSACTION")
+        self._execute(f"SAVEPOINT {SAVEPOINT}")
+
+    def _execute(self, sql: str):
+        cursor = self._mydb.cursor()
+        cursor.execute(sql)
+        cursor.close()
+
+    def commit(self):
+        self._execute(f"RELEASE SAVEPOINT {SAVEPOINT}")
+        self._execute(f"SAVEPOINT {SAVEPOINT}")
+
+    def rollback(self):
+        self._execute(f"ROLLBACK TO SAVEPOINT {SAVEPOINT}")
+
+    def close(self):
+        """Undo everything written since the connection was wrapped."""
+        self._mydb.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self._mydb, name)
+
+
+class RollbackTestCase(unittest.TestCase):
+    """
+    TestCase giving every test self.mydb: the shared connection inside a
+    transaction rolled back after the test, or a connection of its own
+    for tests marked with @commits.
+    """
+
+    db_config = DB_CONFIG
+
+    def setUp(self):
+        mydb = shared_connection()
+        if getattr(getattr(self, self._testMethodName), "commits", False):
+            self.mydb = CONNECT(**DB_CONFIG)
+            self.addCleanup(_reload)
+        else:
+            self.mydb = RollbackConnection(mydb)
+
+    def tearDown(self):
+        self.mydb.close()
+
+
+def _reload():
+    """Load the dataset again before the next test, after one that committed."""
+    global _loaded
+    _loaded = False
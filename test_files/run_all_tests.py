@@ -1,28 +1,15 @@
 #!/usr/bin/env python3
 """
-Run all tests in sequence: populate database, then run assertions.
-This is a convenience script to run the full test suite.
+Run all tests: the quick and the comprehensive assertions, in one process.
+The dataset is loaded once and every test is rolled back (see fixtures.py),
+so no separate population step is needed. This is a convenience script to
+run the full test suite; it reports its wall-clock time.
 """
 
-import subprocess
+import os
 import sys
-
-
-def run_command(command, description):
-    """Run a command and print status"""
-    print("\n" + "=" * 70)
-    print(f"{description}")
-    print("=" * 70)
-
-    try:
-        result = subprocess.run(
-            command, shell=True, check=True, capture_output=False, text=True
-        )
-        print(f"✓ {description} completed successfully")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"✗ {description} failed with exit code {e.returncode}")
-        return False
+import time
+import unittest
 
 
 def main():
@@ -30,52 +17,36 @@ def main():
     print("\n" + "=" * 70)
     print("MUSIC DATABASE - COMPLETE TEST SUITE")
     print("=" * 70)
-    print("\nThis will run:")
-    print("1. test_music_db.py - Populate database with test data")
-    print("2. test_quick.py - Quick assertion tests")
-    print("3. test_assertions.py - Comprehensive assertion tests")
+    print("\nThis will run, in one process on one shared connection:")
+    print("1. test_quick.py - Quick assertion tests")
+    print("2. test_assertions.py - Comprehensive assertion tests")
+    print("The data of test_music_db.py is loaded once, and every test is")
+    print("rolled back afterwards (see fixtures.py).")
     print("\nMake sure:")
-    print("- MySQL is running")
+    print("- MySQL is running (or MUSIC_DB_BACKEND=sqlite is set)")
     print("- Database credentials are configured in DB_CONFIG")
     print("- Database schema has been created (schema.sql)")
 
     response = input("\nPress Enter to continue or Ctrl+C to cancel... ")
 
-    all_passed = True
-
     # Get the directory where this script is located (test_files/)
-    import os
-
     script_dir = os.path.dirname(os.path.abspath(__file__))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
 
-    # Step 1: Populate database
-    if not run_command(
-        f"{sys.executable} {os.path.join(script_dir, 'test_music_db.py')}",
-        "Step 1: Populating database",
-    ):
-        print("\n✗ Failed to populate database. Please check your configuration.")
-        return False
-
-    # Step 2: Quick tests
-    if not run_command(
-        f"{sys.executable} {os.path.join(script_dir, 'test_quick.py')}",
-        "Step 2: Quick assertion tests",
-    ):
-        print("\n⚠ Quick tests had failures")
-        all_passed = False
-
-    # Step 3: Comprehensive tests
-    if not run_command(
-        f"{sys.executable} {os.path.join(script_dir, 'test_assertions.py')}",
-        "Step 3: Comprehensive assertion tests",
-    ):
-        print("\n⚠ Comprehensive tests had failures")
-        all_passed = False
+    start = time.perf_counter()
+    suite = unittest.defaultTestLoader.loadTestsFromNames(
+        ["test_quick", "test_assertions"]
+    )
+    result = unittest.TextTestRunner(verbosity=2).run(suite)
+    elapsed = time.perf_counter() - start
+    all_passed = result.wasSuccessful()
 
     # Summary
     print("\n" + "=" * 70)
     print("COMPLETE TEST SUITE SUMMARY")
     print("=" * 70)
+    print(f"Tests run: {result.testsRun} in {elapsed:.2f} s (wall clock)")
 
     if all_passed:
         print("✓ ALL TEST SUITES PASSED!")
@@ -0,0 +1,265 @@
+"""
+Unit tests for AsyncMusicDB.
+These tests use stand-in connections or in-memory SQLite databases; they
+do not need a MySQL server.
+"""
+
+import asyncio
+import itertools
+import os
+import sys
+import threading
+import time
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import music_db_sqlite
+from music_db_aio import AsyncMusicDB
+
+
+class FakeCursor:
+    """Hands executed statements to its connection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, sql, params=None):
+        self.connection.statements.append(sql)
+        if sql.startswith("KILL QUERY"):
+            FakeConnection.killed.set()
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Records statements; KILL QUERY releases a blocked call"""
+
+    ids = itertools.count(1)
+    killed = threading.Event()
+
+    def __init__(self, **config):
+        self.config = config
+        self.connection_id = next(self.ids)
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    def ping(self, reconnect=False):
+        pass
+
+
+class ReleaseFirstConnection(FakeConnection):
+    """Connections after the first open only once the first was released"""
+
+    opened = []
+    released = threading.Event()
+    connecting = threading.Event()
+
+    def __init__(self, **config):
+        super().__init__(**config)
+        self.opened.append(self)
+        if len(self.opened) > 1:
+            self.connecting.set()
+            self.released.wait(5)
+
+    def rollback(self):
+        self.released.set()
+
+
+class TestAsyncMusicDB(unittest.TestCase):
+    """Test suite for AsyncMusicDB"""
+
+    def setUp(self):
+        FakeConnection.killed.clear()
+
+    def test_concurrency_bounded_by_pool(self):
+        """Many coroutines share pool_size connections and threads"""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def query(mydb, value):
+            with lock:
+                running.append(mydb)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(mydb)
+            return value * 2
+
+        async def main():
+            async with AsyncMusicDB(pool_size=3, connect=FakeConnection) as adb:
+                results = await asyncio.gather(*(adb.run(query, i) for i in range(30)))
+                return results, adb.stats()
+
+        results, stats = asyncio.run(main())
+
+        self.assertEqual(results, [i * 2 for i in range(30)])
+        self.assertEqual(max(peak), 3)
+        self.assertEqual(stats["created"], 3)
+        self.assertEqual(stats["timeouts"], 0)
+
+    def test_cancel_waiting_call(self):
+        """A call cancelled before it gets a connection never runs"""
+        calls = []
+        release = threading.Event()
+
+        def block(mydb):
+            release.wait(5)
+
+        async def main():
+            async with AsyncMusicDB(pool_size=1, connect=FakeConnection) as adb:
+                running = asyncio.create_task(adb.run(block))
+                waiting = asyncio.create_task(adb.run(calls.append))
+                await asyncio.sleep(0.05)
+                waiting.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await waiting
+                release.set()
+                await running
+
+        asyncio.run(main())
+
+        self.assertEqual(calls, [])
+        self.assertFalse(FakeConnection.killed.is_set())
+
+    def test_cancel_running_call(self):
+        """A running call has its statement killed and returns its connection"""
+        used = []
+
+        def slow_query(mydb):
+            used.append(mydb)
+            if not FakeConnection.killed.wait(5):
+                return "finished"
+            raise RuntimeError("Query execution was interrupted")
+
+        async def main():
+            async with AsyncMusicDB(pool_size=1, connect=FakeConnection) as adb:
+                task = asyncio.create_task(adb.run(slow_query))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                stats = adb.stats()
+                # The pool is usable again
+                await adb.run(lambda mydb: None)
+                return stats
+
+        stats = asyncio.run(main())
+
+        self.assertTrue(FakeConnection.killed.is_set())
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(len(used), 1)
+
+    def test_kill_repeated_until_return(self):
+        """KILL QUERY is sent again while the call has not returned"""
+        kills = []
+
+        def between_statements(mydb):
+            # Misses the first KILL QUERY, as if no statement was running
+            for _ in range(2):
+                if not FakeConnection.killed.wait(5):
+                    return "finished"
+                FakeConnection.killed.clear()
+                kills.append(True)
+            raise RuntimeError("Query execution was interrupted")
+
+        async def main():
+            async with AsyncMusicDB(pool_size=1, connect=FakeConnection) as adb:
+                task = asyncio.create_task(adb.run(between_statements))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        asyncio.run(main())
+
+        self.assertEqual(kills, [True, True])
+
+    def test_no_kill_after_release(self):
+        """No KILL QUERY is sent once the call has released its connection"""
+
+        def finish_late(mydb):
+            # Returns while the KILL QUERY connection is being opened
+            ReleaseFirstConnection.connecting.wait(5)
+            return "finished"
+
+        async def main():
+            async with AsyncMusicDB(pool_size=1, connect=ReleaseFirstConnection) as adb:
+                task = asyncio.create_task(adb.run(finish_late))
+                await asyncio.sleep(0.05)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+        asyncio.run(main())
+
+        self.assertGreater(len(ReleaseFirstConnection.opened), 1)
+        statements = [
+            sql for mydb in ReleaseFirstConnection.opened for sql in mydb.statements
+        ]
+        self.assertFalse(any(sql.startswith("KILL QUERY") for sql in statements))
+
+    def test_cancel_loader_between_chunks(self):
+        """A cancelled loader stops after the chunk it is committing"""
+        users = [f"user{i}" for i in range(10)]
+        ratings = [(user, ("Artist", "Song"), 3, "2020-01-01") for user in users]
+        first_chunk = threading.Event()
+        resume = threading.Event()
+        chunks = []
+
+        def on_rejects(rejects):
+            chunks.append(rejects)
+            first_chunk.set()
+            resume.wait(5)
+
+        def count_ratings(mydb):
+            cursor = mydb.cursor()
+            cursor.execute("SELECT COUNT(*) FROM Ratings")
+            (count,) = cursor.fetchone()
+            cursor.close()
+            return count
+
+        async def main():
+            async with AsyncMusicDB(
+                pool_size=1, connect=music_db_sqlite.connect
+            ) as adb:
+                await adb.load_single_songs(
+                    [("Song", ("Pop",), "Artist", "2020-01-01")]
+                )
+                await adb.load_users(users)
+                task = asyncio.create_task(
+                    adb.load_song_ratings(ratings, 2, on_rejects=on_rejects)
+                )
+                await asyncio.to_thread(first_chunk.wait, 5)
+                task.cancel()
+                await asyncio.sleep(0.05)
+                resume.set()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                return await adb.run(count_ratings)
+
+        self.assertEqual(asyncio.run(main()), 2)
+        self.assertEqual(len(chunks), 1)
+
+    def test_methods_wrap_module_functions(self):
+        """Query methods are coroutines named after the module functions"""
+        self.assertTrue(asyncio.iscoroutinefunction(AsyncMusicDB.get_most_rated_songs))
+        self.assertEqual(AsyncMusicDB.load_song_ratings.__name__, "load_song_ratings")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,13 @@
 Unit tests with assertions for music database functions.
 This file contains comprehensive tests with assertions to validate all functionality.
 
+The dataset of test_music_db.py is loaded once per run and every test is
+rolled back afterwards (see fixtures.py), so the tests need no prior
+population and can run in any order.
+
 Prerequisites:
-1. Run test_music_db.py first to populate the database
-2. Make sure MySQL is running and DB_CONFIG matches your setup
+1. Make sure MySQL is running and DB_CONFIG in test_music_db.py matches
+   your setup (or set MUSIC_DB_BACKEND=sqlite to use SQLite)
 """
 
 import os
@@ -19,36 +23,19 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from music_db import *
-
-# Database configuration - UPDATE THESE VALUES
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "password": "root",  # Change this to your MySQL password
-    "database": "musicdb",  # Change this to your database name
-}
+from fixtures import RollbackTestCase, commits
+from test_music_db import BACKEND, CONNECT
 
 
-class TestMusicDatabase(unittest.TestCase):
+class TestMusicDatabase(RollbackTestCase):
     """Test suite for music database functions"""
 
     @classmethod
     def setUpClass(cls):
-        """Set up test database connection"""
-        cls.db_config = DB_CONFIG
+        """Print the suite banner"""
         print("\n" + "=" * 70)
         print("MUSIC DATABASE ASSERTION TEST SUITE")
         print("=" * 70)
-        print("Note: Make sure you've run test_music_db.py first to populate data")
-        print("=" * 70)
-
-    def setUp(self):
-        """Connect to database before each test"""
-        self.mydb = mysql.connector.connect(**self.db_config)
-
-    def tearDown(self):
-        """Close database connection after each test"""
-        self.mydb.close()
 
     def test_01_database_tables_exist(self):
         """Test that all required tables exist"""
@@ -452,28 +439,8 @@ class TestMusicDatabase(unittest.TestCase):
         )
         print(f"✓ Duplicate rejection working: {len(rejected)} duplicates rejected")
 
-        # Clean up the new song (delete genre relationships first, then song)
-        cursor = self.mydb.cursor()
-        
-        # First, delete from SongGenres
-        cursor.execute(
-            """
-            DELETE sg FROM SongGenres sg
-            JOIN Songs s ON sg.song_id = s.song_id
-            WHERE s.song_title = 'New Unique Song'
-        """
-        )
-        
-        # Then delete the song
-        cursor.execute(
-            """
-            DELETE FROM Songs 
-            WHERE song_title = 'New Unique Song'
-        """
-        )
-        
-        self.mydb.commit()
-        cursor.close()
+        # Clean up the new song, its artist and the artist's summaries
+        self._delete_artist("Test Artist")
 
     def test_14_duplicate_rejection_users(self):
         """Test that duplicate users are properly rejected"""
@@ -579,6 +546,695 @@ class TestMusicDatabase(unittest.TestCase):
 
         print("✓ Empty result handling works correctly")
 
+    def _delete_artist(self, artist_name):
+        """Remove an artist created by a test, together with its songs"""
+        cursor = self.mydb.cursor()
+        cursor.execute(
+            """
+            DELETE c FROM SongRatingCounts c
+            JOIN Songs s ON c.song_id = s.song_id
+            JOIN Artists a ON s.artist_id = a.artist_id
+            WHERE a.artist_name = %s
+        """,
+            (artist_name,),
+        )
+        cursor.execute(
+            """
+            DELETE sg FROM SongGenres sg
+            JOIN Songs s ON sg.song_id = s.song_id
+            JOIN Artists a ON s.artist_id = a.artist_id
+            WHERE a.artist_name = %s
+        """,
+            (artist_name,),
+        )
+        cursor.execute(
+            """
+            DELETE s FROM Songs s
+            JOIN Artists a ON s.artist_id = a.artist_id
+            WHERE a.artist_name = %s
+        """,
+            (artist_name,),
+        )
+        cursor.execute(
+            """
+            DELETE al FROM Albums al
+            JOIN Artists a ON al.artist_id = a.artist_id
+            WHERE a.artist_name = %s
+        """,
+            (artist_name,),
+        )
+        for table in ("ArtistSingleCounts", "ArtistSinglesSummary"):
+            cursor.execute(
+                f"""
+                DELETE t FROM {table} t
+                JOIN Artists a ON t.artist_id = a.artist_id
+                WHERE a.artist_name = %s
+            """,
+                (artist_name,),
+            )
+        cursor.execute("DELETE FROM Artists WHERE artist_name = %s", (artist_name,))
+        self.mydb.commit()
+        cursor.close()
+
+    def test_18_singles_batch_duplicates(self):
+        """Test that duplicates inside one batch are rejected like existing ones"""
+        print("\n[TEST 18] Testing duplicate singles within one batch...")
+
+        batch = [
+            ("Batch Song", ("Pop",), "Batch Test Artist", "2020-01-01"),
+            ("batch song", ("Batch Only Genre",), "Batch Test Artist", "2020-02-01"),
+            ("Blinding Lights", ("Pop",), "The Weeknd", "2019-11-29"),
+            ("Second Batch Song", ("Rock", "Pop"), "Batch Test Artist", "2020-03-01"),
+        ]
+
+        try:
+            rejected = load_single_songs(self.mydb, batch)
+
+            # The collation is case-insensitive, so the second row is a duplicate
+            self.assertEqual(
+                rejected,
+                {("batch song", "Batch Test Artist"), ("Blinding Lights", "The Weeknd")},
+                "Later duplicates in the batch should be rejected",
+            )
+
+            cursor = self.mydb.cursor()
+            cursor.execute(
+                """
+                SELECT s.song_title, COUNT(sg.genre_id)
+                FROM Songs s
+                JOIN Artists a ON s.artist_id = a.artist_id
+                JOIN SongGenres sg ON sg.song_id = s.song_id
+                WHERE a.artist_name = 'Batch Test Artist'
+                GROUP BY s.song_id, s.song_title
+                ORDER BY s.song_title
+            """
+            )
+            self.assertEqual(
+                cursor.fetchall(), [("Batch Song", 1), ("Second Batch Song", 2)]
+            )
+
+            # Genres of rejected songs are not created
+            cursor.execute(
+                "SELECT COUNT(*) FROM Genres WHERE genre_name = 'Batch Only Genre'"
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.close()
+        finally:
+            self._delete_artist("Batch Test Artist")
+
+        print(f"✓ Batch duplicate rejection working: {rejected}")
+
+    def test_19_rating_batch_duplicates(self):
+        """Test that a pair rated twice in one batch keeps only the first valid rating"""
+        print("\n[TEST 19] Testing duplicate ratings within one batch...")
+
+        batch = [
+            ("jack_tunes", ("Queen", "Bohemian Rhapsody"), 0, "2021-08-01"),  # Invalid: rating < 1
+            ("jack_tunes", ("Queen", "Bohemian Rhapsody"), 4, "2021-08-02"),  # Valid
+            ("JACK_TUNES", ("queen", "bohemian rhapsody"), 5, "2021-08-03"),  # Duplicate of the valid one
+        ]
+
+        cursor = self.mydb.cursor()
+        try:
+            rejected = load_song_ratings(self.mydb, batch)
+
+            self.assertEqual(
+                rejected,
+                {
+                    ("jack_tunes", "Queen", "Bohemian Rhapsody"),
+                    ("JACK_TUNES", "queen", "bohemian rhapsody"),
+                },
+            )
+
+            cursor.execute(
+                """
+                SELECT r.rating, r.rating_date FROM Ratings r
+                JOIN Users u ON r.user_id = u.user_id
+                JOIN Songs s ON r.song_id = s.song_id
+                WHERE u.user_name = 'jack_tunes' AND s.song_title = 'Bohemian Rhapsody'
+            """
+            )
+            rows = cursor.fetchall()
+            self.assertEqual(len(rows), 1, "Only one rating should be inserted")
+            self.assertEqual(rows[0][0], 4, "The first valid rating should be kept")
+        finally:
+            cursor.execute(
+                """
+                DELETE r FROM Ratings r
+                JOIN Users u ON r.user_id = u.user_id
+                JOIN Songs s ON r.song_id = s.song_id
+                WHERE u.user_name = 'jack_tunes' AND s.song_title = 'Bohemian Rhapsody'
+            """
+            )
+            self.mydb.commit()
+            cursor.close()
+            rebuild_song_rating_counts(self.mydb)
+
+        print(f"✓ Batch rating duplicates rejected: {rejected}")
+
+    def test_20_album_batch_duplicates(self):
+        """Test album rejection and track fan-out for a batch of albums"""
+        print("\n[TEST 20] Testing album batch loading...")
+
+        batch = [
+            ("Batch Album", "Pop", "Album Batch Artist", "2020-01-01", ["Track A", "Track B"]),
+            ("BATCH ALBUM", "Rock", "Album Batch Artist", "2020-02-01", ["Track C"]),
+            ("25", "Soul", "Adele", "2015-11-20", ["Duplicate Song"]),
+        ]
+
+        try:
+            rejected = load_albums(self.mydb, batch)
+
+            self.assertEqual(
+                rejected,
+                {("BATCH ALBUM", "Album Batch Artist"), ("25", "Adele")},
+            )
+
+            cursor = self.mydb.cursor()
+            cursor.execute(
+                """
+                SELECT s.song_title, g.genre_name
+                FROM Songs s
+                JOIN Albums al ON s.album_id = al.album_id
+                JOIN Artists a ON s.artist_id = a.artist_id
+                JOIN SongGenres sg ON sg.song_id = s.song_id
+                JOIN Genres g ON g.genre_id = sg.genre_id
+                WHERE a.artist_name = 'Album Batch Artist'
+                ORDER BY s.song_title
+            """
+            )
+            self.assertEqual(
+                cursor.fetchall(), [("Track A", "Pop"), ("Track B", "Pop")]
+            )
+            cursor.close()
+        finally:
+            self._delete_artist("Album Batch Artist")
+
+        print(f"✓ Album batch rejection working: {rejected}")
+
+    def test_21_streaming_loader_chunks(self):
+        """Test that loaders accept generators and report rejects per chunk"""
+        print("\n[TEST 21] Testing chunked loading from a generator...")
+
+        def usernames():
+            yield from ["alice_music", "stream_user_1", "stream_user_2", "stream_user_1"]
+
+        chunk_rejects = []
+        try:
+            rejected = load_users(
+                self.mydb, usernames(), chunk_size=2, on_rejects=chunk_rejects.append
+            )
+
+            # The second chunk sees the user committed by the first one
+            self.assertEqual(chunk_rejects, [{"alice_music"}, {"stream_user_1"}])
+            self.assertEqual(rejected, {"alice_music", "stream_user_1"})
+        finally:
+            cursor = self.mydb.cursor()
+            cursor.execute("DELETE FROM Users WHERE user_name LIKE 'stream_user_%'")
+            self.mydb.commit()
+            cursor.close()
+
+        print(f"✓ Chunked loading working: {chunk_rejects}")
+
+    @commits
+    def test_22_import_matches_loaders(self):
+        """Test that the LOAD DATA import path rejects the same rows as the loaders"""
+        print("\n[TEST 22] Testing LOAD DATA import path...")
+
+        try:
+            import_db = CONNECT(**self.db_config, allow_local_infile=True)
+        except mysql.connector.Error as e:
+            self.skipTest(f"local_infile not available: {e}")
+
+        test_ratings = [
+            ("alice_music", ("The Weeknd", "Blinding Lights"), 6, "2021-01-01"),  # Invalid: rating > 5
+            ("alice_music", ("The Weeknd", "Blinding Lights"), 5, "2021-01-01"),  # Invalid: already rated
+            ("nonexistent_user_xyz123", ("Queen", "Bohemian Rhapsody"), 5, "2021-01-03"),  # Invalid: user doesn't exist
+            ("alice_music", ("Fake Artist", "Fake Song"), 5, "2021-01-04"),  # Invalid: song doesn't exist
+        ]
+
+        try:
+            rejected = import_song_ratings(import_db, test_ratings)
+            self.assertEqual(rejected, load_song_ratings(self.mydb, test_ratings))
+            self.assertEqual(len(rejected), 3)
+
+            self.assertEqual(import_users(import_db, ["alice_music"]), {"alice_music"})
+        finally:
+            import_db.close()
+
+        print(f"✓ Import path rejected {len(rejected)} invalid ratings")
+
+    def test_23_id_cache_same_results(self):
+        """Test that loaders give the same results with the id cache enabled"""
+        print("\n[TEST 23] Testing loaders with the id cache...")
+
+        test_ratings = [
+            ("nonexistent_user_xyz123", ("Queen", "Bohemian Rhapsody"), 5, "2021-01-03"),  # Invalid: user doesn't exist
+            ("alice_music", ("Fake Artist", "Fake Song"), 5, "2021-01-04"),  # Invalid: song doesn't exist
+            ("alice_music", ("The Weeknd", "Blinding Lights"), 5, "2021-01-05"),  # Invalid: already rated
+        ]
+        expected = load_song_ratings(self.mydb, test_ratings)
+
+        cache = enable_id_cache(self.mydb)
+        try:
+            # First call fills the cache, second call is answered from it
+            self.assertEqual(load_song_ratings(self.mydb, test_ratings), expected)
+            self.assertEqual(load_song_ratings(self.mydb, test_ratings), expected)
+            self.assertIs(
+                cache.get("user", "nonexistent_user_xyz123"), IdCache.MISSING
+            )
+            self.assertIsInstance(cache.get("user", "alice_music"), int)
+        finally:
+            disable_id_cache(self.mydb)
+
+        print(f"✓ Id cache gives the same rejects, {cache.hits} hits")
+
+    def test_24_date_range_variants(self):
+        """Test the date-granular variants of the year range queries"""
+        print("\n[TEST 24] Testing date range query variants...")
+
+        # Whole years give the same results as the year range functions
+        self.assertEqual(
+            get_most_rated_songs_between(self.mydb, "2020-01-01", "2021-12-31", 10),
+            get_most_rated_songs(self.mydb, (2020, 2021), 10),
+        )
+        self.assertEqual(
+            get_most_engaged_users_between(self.mydb, "2020-01-01", "2021-12-31", 10),
+            get_most_engaged_users(self.mydb, (2020, 2021), 10),
+        )
+        self.assertEqual(
+            get_most_prolific_individual_artists_between(
+                self.mydb, 5, "2015-01-01", "2021-12-31"
+            ),
+            get_most_prolific_individual_artists(self.mydb, 5, (2015, 2021)),
+        )
+
+        # Both ends of a date range are inclusive
+        results = get_most_rated_songs_between(self.mydb, "2020-01-15", "2020-01-25", 10)
+        self.assertEqual(
+            results,
+            [("Blinding Lights", "The Weeknd", 2), ("Bohemian Rhapsody", "Queen", 1)],
+        )
+
+        print(f"✓ Date range variants working: {results}")
+
+    @commits
+    def test_25_ids_past_smallint_range(self):
+        """Test that loaders and queries work with ids past the old SMALLINT limit"""
+        print("\n[TEST 25] Testing ids past the SMALLINT range...")
+
+        cursor = self.mydb.cursor()
+        for table in ("Artists", "Songs", "Users", "Ratings"):
+            cursor.execute(f"ALTER TABLE {table} AUTO_INCREMENT = 70000")
+
+        try:
+            rejected = load_single_songs(
+                self.mydb, [("Wide Key Song", ("Pop",), "Wide Key Artist", "2020-06-01")]
+            )
+            self.assertEqual(rejected, set())
+            self.assertEqual(load_users(self.mydb, ["wide_key_user"]), set())
+            rejected = load_song_ratings(
+                self.mydb,
+                [("wide_key_user", ("Wide Key Artist", "Wide Key Song"), 5, "2020-06-02")],
+            )
+            self.assertEqual(rejected, set())
+
+            cursor.execute(
+                """
+                SELECT r.rating_id, u.user_id, s.song_id, s.artist_id FROM Ratings r
+                JOIN Users u ON r.user_id = u.user_id
+                JOIN Songs s ON r.song_id = s.song_id
+                WHERE u.user_name = 'wide_key_user'
+            """
+            )
+            ids = cursor.fetchone()
+            self.assertTrue(all(i >= 70000 for i in ids), f"Unexpected ids {ids}")
+
+            self.assertIn(
+                ("Wide Key Song", "Wide Key Artist", 1),
+                get_most_rated_songs_between(self.mydb, "2020-06-02", "2020-06-02", 10),
+            )
+            self.assertIn(
+                ("wide_key_user", 1),
+                get_most_engaged_users_between(self.mydb, "2020-06-02", "2020-06-02", 10),
+            )
+            self.assertIn("Wide Key Artist", get_artists_last_single_in_year(self.mydb, 2020))
+        finally:
+            cursor.execute(
+                """
+                DELETE r FROM Ratings r
+                JOIN Users u ON r.user_id = u.user_id
+                WHERE u.user_name = 'wide_key_user'
+            """
+            )
+            cursor.execute("DELETE FROM Users WHERE user_name = 'wide_key_user'")
+            self.mydb.commit()
+            cursor.close()
+            rebuild_song_rating_counts(self.mydb)
+            self._delete_artist("Wide Key Artist")
+
+        print(f"✓ Ids past the SMALLINT range working: {ids}")
+
+    def test_26_rating_count_rollup(self):
+        """Test that the rating count rollup follows the loaded ratings"""
+        print("\n[TEST 26] Testing the rating count rollup...")
+
+        self.assertEqual(check_song_rating_counts(self.mydb), [])
+
+        cursor = self.mydb.cursor()
+        try:
+            load_single_songs(
+                self.mydb, [("Rollup Song", ("Pop",), "Rollup Artist", "2019-01-01")]
+            )
+            load_users(self.mydb, ["rollup_user_1", "rollup_user_2"])
+            rejected = load_song_ratings(
+                self.mydb,
+                [
+                    ("rollup_user_1", ("Rollup Artist", "Rollup Song"), 4, "2019-03-01"),
+                    ("rollup_user_2", ("Rollup Artist", "Rollup Song"), 5, "2020-03-01"),
+                    ("rollup_user_2", ("Rollup Artist", "Rollup Song"), 3, "2020-04-01"),
+                ],
+            )
+            self.assertEqual(
+                rejected, {("rollup_user_2", "Rollup Artist", "Rollup Song")}
+            )
+
+            cursor.execute(
+                """
+                SELECT c.rating_year, c.num_ratings FROM SongRatingCounts c
+                JOIN Songs s ON c.song_id = s.song_id
+                WHERE s.song_title = 'Rollup Song'
+                ORDER BY c.rating_year
+            """
+            )
+            self.assertEqual(cursor.fetchall(), [(2019, 1), (2020, 1)])
+            self.assertEqual(check_song_rating_counts(self.mydb), [])
+            self.assertIn(
+                ("Rollup Song", "Rollup Artist", 2),
+                get_most_rated_songs(self.mydb, (2019, 2020), 100),
+            )
+
+            # Ratings deleted behind the loaders' back are found by the checker
+            cursor.execute(
+                """
+                DELETE r FROM Ratings r
+                JOIN Users u ON r.user_id = u.user_id
+                WHERE u.user_name LIKE 'rollup\\_user\\_%'
+            """
+            )
+            self.mydb.commit()
+            differences = check_song_rating_counts(self.mydb)
+            self.assertEqual([(d[1], d[2], d[3]) for d in differences], [(2019, 0, 1), (2020, 0, 1)])
+
+            rebuild_song_rating_counts(self.mydb)
+            self.assertEqual(check_song_rating_counts(self.mydb), [])
+        finally:
+            cursor.execute(
+                """
+                DELETE r FROM Ratings r
+                JOIN Users u ON r.user_id = u.user_id
+                WHERE u.user_name LIKE 'rollup\\_user\\_%'
+            """
+            )
+            cursor.execute("DELETE FROM Users WHERE user_name LIKE 'rollup\\_user\\_%'")
+            self.mydb.commit()
+            cursor.close()
+            rebuild_song_rating_counts(self.mydb)
+            self._delete_artist("Rollup Artist")
+
+        print("✓ Rating count rollup consistent with Ratings")
+
+    def test_27_genre_stats_triggers(self):
+        """Test that GenreStats follows SongGenres, whoever writes it"""
+        print("\n[TEST 27] Testing trigger-maintained genre counts...")
+
+        self.assertEqual(check_genre_stats(self.mydb), [])
+        before = dict(get_top_song_genres(self.mydb, 1000))
+
+        cursor = self.mydb.cursor()
+        try:
+            load_single_songs(
+                self.mydb,
+                [("Stats Song", ("Pop", "Stats Genre"), "Stats Artist", "2020-01-01")],
+            )
+            after = dict(get_top_song_genres(self.mydb, 1000))
+            self.assertEqual(after["Pop"], before["Pop"] + 1)
+            self.assertEqual(after["Stats Genre"], 1)
+
+            # Writes that bypass the loaders are counted too
+            cursor.execute(
+                """
+                DELETE sg FROM SongGenres sg
+                JOIN Songs s ON sg.song_id = s.song_id
+                WHERE s.song_title = 'Stats Song'
+            """
+            )
+            self.mydb.commit()
+            after = dict(get_top_song_genres(self.mydb, 1000))
+            self.assertEqual(after["Pop"], before["Pop"])
+            # Genres without songs are not listed
+            self.assertNotIn("Stats Genre", after)
+            self.assertEqual(check_genre_stats(self.mydb), [])
+        finally:
+            cursor.close()
+            self._delete_artist("Stats Artist")
+            cursor = self.mydb.cursor()
+            cursor.execute("DELETE FROM Genres WHERE genre_name = 'Stats Genre'")
+            self.mydb.commit()
+            cursor.close()
+
+        self.assertEqual(check_genre_stats(self.mydb), [])
+        print("✓ GenreStats consistent with SongGenres")
+
+    def test_28_artist_singles_summary(self):
+        """Test that the artist singles summary follows load_single_songs"""
+        print("\n[TEST 28] Testing the artist singles summary...")
+
+        self.assertEqual(check_artist_singles(self.mydb), [])
+
+        try:
+            load_single_songs(
+                self.mydb,
+                [
+                    ("Timeline One", ("Pop",), "Timeline Artist", "2097-05-01"),
+                    ("Timeline Two", ("Pop",), "Timeline Artist", "2098-02-01"),
+                    ("Timeline Three", ("Pop",), "Timeline Artist", "2098-09-01"),
+                ],
+            )
+            self.assertIn("Timeline Artist", get_artists_last_single_in_year(self.mydb, 2098))
+            self.assertEqual(
+                get_most_prolific_individual_artists(self.mydb, 1, (2097, 2098)),
+                [("Timeline Artist", 3)],
+            )
+
+            # An older single does not move the last single
+            load_single_songs(
+                self.mydb, [("Timeline Zero", ("Pop",), "Timeline Artist", "2096-01-01")]
+            )
+            self.assertIn("Timeline Artist", get_artists_last_single_in_year(self.mydb, 2098))
+
+            # A newer one does
+            load_single_songs(
+                self.mydb, [("Timeline Four", ("Pop",), "Timeline Artist", "2099-01-01")]
+            )
+            self.assertNotIn("Timeline Artist", get_artists_last_single_in_year(self.mydb, 2098))
+            self.assertIn("Timeline Artist", get_artists_last_single_in_year(self.mydb, 2099))
+            self.assertEqual(
+                get_most_prolific_individual_artists(self.mydb, 1, (2096, 2099)),
+                [("Timeline Artist", 5)],
+            )
+            self.assertEqual(
+                get_most_prolific_individual_artists(self.mydb, 1, (2096, 2099)),
+                get_most_prolific_individual_artists_between(
+                    self.mydb, 1, "2096-01-01", "2099-12-31"
+                ),
+            )
+            self.assertEqual(check_artist_singles(self.mydb), [])
+        finally:
+            self._delete_artist("Timeline Artist")
+
+        print("✓ Artist singles summary consistent with Songs")
+
+    def test_29_result_cache(self):
+        """Test that cached results are invalidated by the loaders"""
+        print("\n[TEST 29] Testing the result cache...")
+
+        cache = enable_result_cache(self.mydb)
+        try:
+            first = get_top_song_genres(self.mydb, 1000)
+            self.assertEqual(get_top_song_genres(self.mydb, 1000), first)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+            # A user load does not touch the genre counts
+            load_users(self.mydb, ["result_cache_user"])
+            get_top_song_genres(self.mydb, 1000)
+            self.assertEqual(cache.hits, 2)
+
+            load_single_songs(
+                self.mydb, [("Cache Song", ("Pop",), "Cache Artist", "2020-01-01")]
+            )
+            after = dict(get_top_song_genres(self.mydb, 1000))
+            self.assertEqual(after["Pop"], dict(first)["Pop"] + 1)
+            self.assertEqual(cache.invalidations, 1)
+        finally:
+            disable_result_cache(self.mydb)
+            cursor = self.mydb.cursor()
+            cursor.execute("DELETE FROM Users WHERE user_name = 'result_cache_user'")
+            self.mydb.commit()
+            cursor.close()
+            self._delete_artist("Cache Artist")
+
+        print(f"✓ Result cache working: {cache.stats()}")
+
+    def test_30_music_db_session(self):
+        """Test MusicDB methods from several threads over a small pool"""
+        print("\n[TEST 30] Testing the MusicDB session object...")
+        import threading
+
+        expected = get_top_song_genres(self.mydb, 5)
+        db = MusicDB(pool_size=2, connect=CONNECT, **self.db_config)
+        results = []
+        errors = []
+
+        def work():
+            try:
+                results.append(db.get_top_song_genres(5))
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = db.stats()
+        db.close()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [expected] * 6)
+        self.assertLessEqual(stats["created"], 2, "The pool should stay bounded")
+        self.assertEqual(stats["acquired"], 6)
+
+        print(f"✓ MusicDB working from 6 threads: {stats}")
+
+    @commits
+    def test_31_parallel_loaders(self):
+        """Test that the multi-process loaders reject what the serial ones would"""
+        print("\n[TEST 31] Testing the parallel loaders...")
+        if BACKEND != "mysql":
+            self.skipTest("the parallel loaders open MySQL connections")
+        from music_db_parallel import parallel_load_albums, parallel_load_single_songs
+
+        artists = [f"Parallel Artist {i}" for i in range(5)]
+        singles = [
+            (f"Parallel Song {i}", ("Pop", "Parallel Genre"), artists[i % 5], "2020-01-01")
+            for i in range(20)
+        ]
+        singles += [
+            ("parallel song 3", ("Parallel Reject Genre",), artists[3], "2020-02-01"),
+            ("Blinding Lights", ("Pop",), "The Weeknd", "2019-11-29"),
+        ]
+        albums = [
+            ("Parallel Album", "Parallel Genre", artists[0], "2020-03-01", ["P1", "P2"]),
+            ("Parallel Album", "Parallel Genre", artists[1], "2020-03-01", ["P3"]),
+            ("PARALLEL ALBUM", "Parallel Reject Genre", artists[0], "2020-04-01", ["P4"]),
+        ]
+        streamed = []
+
+        try:
+            rejected = parallel_load_single_songs(
+                self.db_config, singles, workers=3, chunk_size=4, on_rejects=streamed.append
+            )
+            self.assertEqual(
+                rejected,
+                {("parallel song 3", artists[3]), ("Blinding Lights", "The Weeknd")},
+            )
+            self.assertEqual(set().union(*streamed), rejected)
+            self.assertEqual(
+                parallel_load_albums(self.db_config, albums, workers=3, chunk_size=2),
+                {("PARALLEL ALBUM", artists[0])},
+            )
+
+            cursor = self.mydb.cursor()
+            cursor.execute(
+                """
+                SELECT COUNT(*) FROM Songs s
+                JOIN Artists a ON s.artist_id = a.artist_id
+                WHERE a.artist_name LIKE 'Parallel Artist %'
+            """
+            )
+            self.assertEqual(cursor.fetchone()[0], 23)
+            # Genres used only by rejected rows are removed again
+            cursor.execute(
+                "SELECT COUNT(*) FROM Genres WHERE genre_name = 'Parallel Reject Genre'"
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.close()
+            self.assertEqual(check_genre_stats(self.mydb), [])
+            self.assertEqual(check_artist_singles(self.mydb), [])
+        finally:
+            for artist_name in artists:
+                self._delete_artist(artist_name)
+            cursor = self.mydb.cursor()
+            cursor.execute("DELETE FROM Genres WHERE genre_name = 'Parallel Genre'")
+            self.mydb.commit()
+            cursor.close()
+
+        print(f"✓ Parallel loaders working: {rejected}")
+
+    @commits
+    def test_32_columnar_engine(self):
+        """Test that the NumPy engine answers like the SQL queries"""
+        print("\n[TEST 32] Testing the columnar engine...")
+        from music_db_columnar import ColumnarEngine
+
+        engine = ColumnarEngine(self.mydb)
+
+        for years in ((2000, 2030), (2019, 2020), (2021, 2021)):
+            self.assertEqual(
+                engine.get_most_prolific_individual_artists(5, years),
+                get_most_prolific_individual_artists(self.mydb, 5, years),
+            )
+            self.assertEqual(
+                engine.get_most_rated_songs(years, 5),
+                get_most_rated_songs(self.mydb, years, 5),
+            )
+            self.assertEqual(
+                engine.get_most_engaged_users(years, 5),
+                get_most_engaged_users(self.mydb, years, 5),
+            )
+        self.assertEqual(
+            engine.get_most_rated_songs_between("2019-06-01", "2021-06-30", 5),
+            get_most_rated_songs_between(self.mydb, "2019-06-01", "2021-06-30", 5),
+        )
+        self.assertEqual(engine.get_top_song_genres(5), get_top_song_genres(self.mydb, 5))
+        self.assertEqual(
+            engine.get_album_and_single_artists(),
+            get_album_and_single_artists(self.mydb),
+        )
+        for year in (2008, 2019, 2020):
+            self.assertEqual(
+                engine.get_artists_last_single_in_year(year),
+                get_artists_last_single_in_year(self.mydb, year),
+            )
+
+        # New rows are picked up by an incremental refresh
+        try:
+            load_single_songs(
+                self.mydb, [("Columnar Song", ("Pop",), "Columnar Artist", "2099-03-01")]
+            )
+            added = engine.refresh(self.mydb)
+            self.assertEqual((added["Artists"], added["Songs"]), (1, 1))
+            self.assertEqual(
+                engine.get_artists_last_single_in_year(2099),
+                get_artists_last_single_in_year(self.mydb, 2099),
+            )
+            self.assertEqual(engine.get_top_song_genres(5), get_top_song_genres(self.mydb, 5))
+        finally:
+            self._delete_artist("Columnar Artist")
+
+        print("✓ Columnar engine matches the SQL queries")
+
 
 def run_tests():
     """Run all tests with unittest"""
@@ -611,9 +1267,8 @@ def run_tests():
 
 if __name__ == "__main__":
     print("\nBefore running these assertion tests:")
-    print("1. Make sure you've run test_music_db.py first to populate data")
-    print("2. Make sure MySQL is running")
-    print("3. Update DB_CONFIG with your database credentials")
+    print("1. Make sure MySQL is running")
+    print("2. Update DB_CONFIG in test_music_db.py with your database credentials")
     print("\nPress Enter to continue or Ctrl+C to cancel...")
     input()
 
@@ -0,0 +1,159 @@
+"""
+Unit tests for the TRUNCATE and selective modes of clear_database.
+These tests run on in-memory SQLite databases; no MySQL server is needed.
+"""
+
+import os
+import sqlite3
+import sys
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db import _clear_order
+import music_db_sqlite
+from music_db_workload import Workload
+
+TABLES = [
+    "Artists",
+    "Genres",
+    "GenreStats",
+    "Users",
+    "Albums",
+    "Songs",
+    "ArtistSinglesSummary",
+    "ArtistSingleCounts",
+    "SongGenres",
+    "Ratings",
+    "SongRatingCounts",
+]
+
+
+class FailingCommit:
+    """Connection proxy whose commit() raises"""
+
+    def __init__(self, mydb):
+        self._mydb = mydb
+
+    def commit(self):
+        raise sqlite3.OperationalError("injected commit failure")
+
+    def __getattr__(self, name):
+        return getattr(self._mydb, name)
+
+
+class TestClearDatabase(unittest.TestCase):
+    """Test suite for the modes of clear_database"""
+
+    def setUp(self):
+        self.mydb = music_db_sqlite.connect()
+        workload = Workload(1_000, seed=1)
+        load_single_songs(self.mydb, workload.singles())
+        load_albums(self.mydb, workload.albums())
+        load_users(self.mydb, workload.users())
+        load_song_ratings(self.mydb, workload.ratings())
+
+    def tearDown(self):
+        self.mydb.close()
+
+    def counts(self):
+        cursor = self.mydb.cursor()
+        counts = {}
+        for table in TABLES:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            counts[table] = cursor.fetchone()[0]
+        cursor.close()
+        return counts
+
+    def assert_rollups_consistent(self):
+        self.assertEqual(check_song_rating_counts(self.mydb), [])
+        self.assertEqual(check_genre_stats(self.mydb), [])
+        self.assertEqual(check_artist_singles(self.mydb), [])
+
+    def test_delete_all(self):
+        """The default mode empties every table"""
+        clear_database(self.mydb)
+        self.assertEqual(set(self.counts().values()), {0})
+
+    def test_truncate_all(self):
+        """TRUNCATE empties every table, restarts ids and restores the checks"""
+        clear_database(self.mydb, truncate=True)
+        self.assertEqual(set(self.counts().values()), {0})
+
+        load_users(self.mydb, ["alice"])
+        cursor = self.mydb.cursor()
+        cursor.execute("SELECT user_id FROM Users")
+        self.assertEqual(cursor.fetchall(), [(1,)])
+        with self.assertRaises(sqlite3.IntegrityError):
+            cursor.execute(
+                "INSERT INTO Ratings (user_id, song_id, rating, rating_date) "
+                "VALUES (1, 999, 5, '2020-01-01')"
+            )
+        cursor.close()
+
+    def test_truncate_failed_commit_restores_checks(self):
+        """Foreign key checks are back on even if the commit fails"""
+        with self.assertRaises(sqlite3.OperationalError):
+            clear_database(FailingCommit(self.mydb), truncate=True)
+        # As a pool does when the connection comes back
+        self.mydb.rollback()
+        cursor = self.mydb.cursor()
+        cursor.execute("PRAGMA foreign_keys")
+        self.assertEqual(cursor.fetchall(), [(1,)])
+        cursor.close()
+
+    def test_selective(self):
+        """Named tables are cleared with their dependents and rollups rebuilt"""
+        for truncate in (False, True):
+            with self.subTest(truncate=truncate):
+                before = self.counts()
+                clear_database(self.mydb, ["Ratings"], truncate=truncate)
+                after = self.counts()
+                self.assertEqual(after["Ratings"], 0)
+                self.assertEqual(after["SongRatingCounts"], 0)
+                self.assertEqual(after["Songs"], before["Songs"])
+                self.assertEqual(after["Users"], before["Users"])
+                self.assert_rollups_consistent()
+
+    def test_selective_dependents(self):
+        """Clearing Songs clears the tables referencing it, not the others"""
+        before = self.counts()
+        clear_database(self.mydb, ["Songs"], truncate=True)
+        after = self.counts()
+        for table in ("Songs", "SongGenres", "Ratings", "SongRatingCounts"):
+            self.assertEqual(after[table], 0, table)
+        for table in ("Artists", "Genres", "Users", "Albums", "GenreStats"):
+            self.assertEqual(after[table], before[table], table)
+        self.assertEqual(after["ArtistSinglesSummary"], 0)
+        self.assert_rollups_consistent()
+
+    def test_unknown_table(self):
+        """Unknown tables are refused before anything is deleted"""
+        before = self.counts()
+        with self.assertRaises(ValueError):
+            clear_database(self.mydb, ["Ratings", "Playlists"])
+        self.assertEqual(self.counts(), before)
+
+    def test_clear_order(self):
+        """Tables come before the tables they reference; cycles are refused"""
+        graph = {
+            "Artists": set(),
+            "Albums": {"Artists"},
+            "Songs": {"Artists", "Albums"},
+            "Ratings": {"Songs"},
+        }
+        self.assertEqual(_clear_order(graph), ["Ratings", "Songs", "Albums", "Artists"])
+        self.assertEqual(
+            _clear_order(graph, ["Albums"]), ["Ratings", "Songs", "Albums"]
+        )
+        with self.assertRaises(ValueError):
+            _clear_order({"A": {"B"}, "B": {"A"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,326 @@
+"""
+Unit tests for ColumnarEngine.
+These tests answer the engine's refresh queries from in-memory tables and
+compare its results with straightforward Python versions of the SQL
+queries; they do not need a database.
+"""
+
+import os
+import random
+import sys
+import unittest
+from datetime import date, timedelta
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import _date_bounds, _year_bounds
+from music_db_columnar import ColumnarEngine, _top
+
+EPOCH = date(1970, 1, 1)
+
+
+class FakeTables:
+    """Tables as lists of dicts, plus a cursor answering the refresh queries"""
+
+    def __init__(self):
+        self.tables = {
+            "Artists": [],
+            "Genres": [],
+            "Users": [],
+            "Songs": [],
+            "SongGenres": [],
+            "Ratings": [],
+        }
+        self.in_transaction = False
+        self.commits = 0
+
+    def add(self, table, **row):
+        self.tables[table].append(row)
+
+    def cursor(self):
+        return FakeCursor(self.tables)
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeCursor:
+    """Recognises the statements ColumnarEngine.refresh sends"""
+
+    NAMES = {"Artists": "artist", "Genres": "genre", "Users": "user", "Songs": "song"}
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        if sql.startswith("START TRANSACTION"):
+            self.rows = []
+        elif sql.startswith("SELECT song_id, song_title, artist_id"):
+            self.rows = [
+                (
+                    s["song_id"],
+                    s["song_title"],
+                    s["artist_id"],
+                    int(s["album_id"] is None),
+                    (s["release_date"] - EPOCH).days,
+                )
+                for s in self.tables["Songs"]
+                if s["song_id"] > params[0]
+            ]
+        elif sql.startswith("SELECT song_id, genre_id FROM SongGenres"):
+            self.rows = sorted(
+                (g["song_id"], g["genre_id"])
+                for g in self.tables["SongGenres"]
+                if g["song_id"] > params[0]
+            )
+        elif sql.startswith("SELECT rating_id"):
+            self.rows = [
+                (
+                    r["rating_id"],
+                    r["song_id"],
+                    r["user_id"],
+                    (r["rating_date"] - EPOCH).days,
+                )
+                for r in self.tables["Ratings"]
+                if r["rating_id"] > params[0]
+            ]
+        else:
+            table = sql.split(" FROM ")[1].split()[0]
+            prefix = self.NAMES[table]
+            id_column = f"{prefix}_id"
+            name = "song_title" if table == "Songs" else f"{prefix}_name"
+            rows = self.tables[table]
+            if " WHERE " in sql:
+                self.rows = [
+                    (row[id_column], row[name])
+                    for row in rows
+                    if row[id_column] > params[0]
+                ]
+            else:
+                # The collation ignores case
+                ordered = sorted(
+                    rows, key=lambda row: (row[name].casefold(), row[id_column])
+                )
+                self.rows = [(row[id_column],) for row in ordered]
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+def reference_top(counts, names, n):
+    """ORDER BY count DESC, name ASC LIMIT n over non-zero counts"""
+    ranked = sorted(
+        (
+            (-count, names[key].casefold(), key)
+            for key, count in counts.items()
+            if count
+        ),
+    )
+    return [(key, -count) for count, _, key in ranked[:n]]
+
+
+class TestColumnarEngine(unittest.TestCase):
+    """Test suite for ColumnarEngine against Python versions of the queries"""
+
+    def setUp(self):
+        self.db = FakeTables()
+        self.rng = random.Random(7)
+        self.counter = {"artist": 0, "genre": 0, "user": 0, "song": 0, "rating": 0}
+        self.populate(artists=30, users=40, songs=200, ratings=1500)
+
+    def next_id(self, kind):
+        self.counter[kind] += 1
+        return self.counter[kind]
+
+    def random_date(self, first_year, last_year):
+        start = date(first_year, 1, 1)
+        days = (date(last_year, 12, 31) - start).days
+        return start + timedelta(days=self.rng.randint(0, days))
+
+    def populate(self, artists, users, songs, ratings):
+        rng = self.rng
+        for _ in range(artists):
+            i = self.next_id("artist")
+            # Mixed case, so that the name order is not the byte order
+            name = f"artist {i:03d}" if i % 2 else f"Artist {i:03d}"
+            self.db.add("Artists", artist_id=i, artist_name=name)
+        if not self.db.tables["Genres"]:
+            for genre in ("Pop", "rock", "Jazz", "Soul", "funk"):
+                self.db.add("Genres", genre_id=self.next_id("genre"), genre_name=genre)
+        for _ in range(users):
+            i = self.next_id("user")
+            self.db.add("Users", user_id=i, user_name=f"{'uU'[i % 2]}ser {i % 17}")
+        for _ in range(songs):
+            i = self.next_id("song")
+            self.db.add(
+                "Songs",
+                song_id=i,
+                song_title=f"{'sS'[i % 2]}ong {i % 23}",
+                artist_id=rng.randint(1, self.counter["artist"]),
+                album_id=None if rng.random() < 0.6 else 1,
+                release_date=self.random_date(1995, 2024),
+            )
+            for genre_id in rng.sample(range(1, 6), rng.randint(1, 2)):
+                self.db.add("SongGenres", song_id=i, genre_id=genre_id)
+        for _ in range(ratings):
+            self.db.add(
+                "Ratings",
+                rating_id=self.next_id("rating"),
+                song_id=rng.randint(1, self.counter["song"]),
+                user_id=rng.randint(1, self.counter["user"]),
+                rating_date=self.random_date(2010, 2024),
+            )
+
+    def names(self, table, key):
+        name = "song_title" if table == "Songs" else key.replace("_id", "_name")
+        return {row[key]: row[name] for row in self.db.tables[table]}
+
+    def expected_prolific(self, n, start, end):
+        counts = {}
+        for s in self.db.tables["Songs"]:
+            if s["album_id"] is None and start <= s["release_date"] < end:
+                counts[s["artist_id"]] = counts.get(s["artist_id"], 0) + 1
+        artists = self.names("Artists", "artist_id")
+        return [(artists[a], c) for a, c in reference_top(counts, artists, n)]
+
+    def expected_rated(self, n, start, end):
+        counts = {}
+        for r in self.db.tables["Ratings"]:
+            if start <= r["rating_date"] < end:
+                counts[r["song_id"]] = counts.get(r["song_id"], 0) + 1
+        titles = self.names("Songs", "song_id")
+        artist_of = {s["song_id"]: s["artist_id"] for s in self.db.tables["Songs"]}
+        artists = self.names("Artists", "artist_id")
+        return [
+            (titles[s], artists[artist_of[s]], c)
+            for s, c in reference_top(counts, titles, n)
+        ]
+
+    def expected_engaged(self, n, start, end):
+        counts = {}
+        for r in self.db.tables["Ratings"]:
+            if start <= r["rating_date"] < end:
+                counts[r["user_id"]] = counts.get(r["user_id"], 0) + 1
+        users = self.names("Users", "user_id")
+        return [(users[u], c) for u, c in reference_top(counts, users, n)]
+
+    def expected_genres(self, n):
+        counts = {}
+        for g in self.db.tables["SongGenres"]:
+            counts[g["genre_id"]] = counts.get(g["genre_id"], 0) + 1
+        genres = self.names("Genres", "genre_id")
+        return [(genres[g], c) for g, c in reference_top(counts, genres, n)]
+
+    def expected_last_single(self, year):
+        last = {}
+        for s in self.db.tables["Songs"]:
+            if s["album_id"] is None:
+                last[s["artist_id"]] = max(
+                    last.get(s["artist_id"], s["release_date"]), s["release_date"]
+                )
+        artists = self.names("Artists", "artist_id")
+        return {artists[a] for a, d in last.items() if d.year == year}
+
+    def expected_album_and_single(self):
+        kinds = {}
+        for s in self.db.tables["Songs"]:
+            kinds.setdefault(s["artist_id"], set()).add(s["album_id"] is None)
+        artists = self.names("Artists", "artist_id")
+        return {artists[a] for a, k in kinds.items() if k == {True, False}}
+
+    def assert_matches(self, engine):
+        for years in ((2000, 2005), (2012, 2012), (1990, 2030), (2030, 2040)):
+            year_dates = (date(years[0], 1, 1), date(years[1] + 1, 1, 1))
+            for n in (0, 1, 5, 1000):
+                self.assertEqual(
+                    engine.get_most_prolific_individual_artists(n, years),
+                    self.expected_prolific(n, *year_dates),
+                )
+                self.assertEqual(
+                    engine.get_most_rated_songs(years, n),
+                    self.expected_rated(n, *year_dates),
+                )
+                self.assertEqual(
+                    engine.get_most_engaged_users(years, n),
+                    self.expected_engaged(n, *_year_bounds(*years)),
+                )
+        for start, end in (("2013-03-15", "2016-07-01"), ("2020-01-01", "2020-01-31")):
+            bounds = _date_bounds(start, end)
+            self.assertEqual(
+                engine.get_most_prolific_individual_artists_between(5, start, end),
+                self.expected_prolific(5, *bounds),
+            )
+            self.assertEqual(
+                engine.get_most_rated_songs_between(start, end, 5),
+                self.expected_rated(5, *bounds),
+            )
+            self.assertEqual(
+                engine.get_most_engaged_users_between(start, end, 5),
+                self.expected_engaged(5, *bounds),
+            )
+        for n in (1, 3, 10):
+            self.assertEqual(engine.get_top_song_genres(n), self.expected_genres(n))
+        for year in (1999, 2010, 2024):
+            self.assertEqual(
+                engine.get_artists_last_single_in_year(year),
+                self.expected_last_single(year),
+            )
+        self.assertEqual(
+            engine.get_album_and_single_artists(), self.expected_album_and_single()
+        )
+
+    def test_matches_queries(self):
+        """Every query matches the SQL semantics, tie-breaking included"""
+        self.assert_matches(ColumnarEngine(self.db))
+
+    def test_incremental_refresh(self):
+        """refresh() picks up new rows, including new names and years"""
+        engine = ColumnarEngine(self.db)
+        engine.get_most_rated_songs((2010, 2024), 10)  # fill the year cache
+
+        self.populate(artists=5, users=5, songs=50, ratings=400)
+        added = engine.refresh(self.db)
+
+        self.assertEqual(added["Artists"], 5)
+        self.assertEqual(added["Ratings"], 400)
+        self.assert_matches(engine)
+        self.assertEqual(engine.refresh(self.db)["Ratings"], 0)
+
+    def test_refuses_open_transaction(self):
+        """refresh() does not commit a transaction the caller has open"""
+        engine = ColumnarEngine(self.db)
+        self.populate(artists=1, users=1, songs=1, ratings=1)
+        self.db.in_transaction = True
+        commits = self.db.commits
+
+        with self.assertRaises(RuntimeError):
+            engine.refresh(self.db)
+        self.assertEqual(self.db.commits, commits)
+        self.db.in_transaction = False
+        self.assertEqual(engine.refresh(self.db)["Ratings"], 1)
+
+    def test_top_keeps_ties_at_cut(self):
+        """Entries tying with the n-th count compete on rank"""
+        import numpy as np
+
+        counts = np.array([0, 3, 5, 3, 3, 1])
+        rank = np.array([0, 4, 9, 1, 3, 2])
+
+        positions, values = _top(counts, rank, 2)
+
+        self.assertEqual(positions.tolist(), [2, 3])
+        self.assertEqual(values.tolist(), [5, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Unit tests for the query plan capture and regression checks.
+Plans are captured on in-memory SQLite databases; no MySQL server is needed.
+"""
+
+import copy
+import os
+import sys
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import music_db_sqlite
+from music_db_explain import (
+    capture_plans,
+    compare_plans,
+    explainable,
+    mysql_plan_summary,
+    sqlite_plan_summary,
+    workload_calls,
+)
+from music_db_workload import Workload
+
+RATINGS = 2_000
+
+MYSQL_PLAN = {
+    "query_block": {
+        "select_id": 1,
+        "cost_info": {"query_cost": "12.5"},
+        "ordering_operation": {
+            "using_filesort": True,
+            "grouping_operation": {
+                "using_temporary_table": True,
+                "nested_loop": [
+                    {
+                        "table": {
+                            "table_name": "r",
+                            "access_type": "ALL",
+                            "rows_examined_per_scan": 5000,
+                        }
+                    },
+                    {
+                        "table": {
+                            "table_name": "u",
+                            "access_type": "eq_ref",
+                            "key": "PRIMARY",
+                            "rows_examined_per_scan": 1,
+                        }
+                    },
+                ],
+            },
+        },
+    }
+}
+
+
+def capture(drop_indexes=()):
+    mydb = music_db_sqlite.connect()
+    try:
+        cursor = mydb.cursor()
+        for index in drop_indexes:
+            cursor.execute(f"DROP INDEX {index}")
+        cursor.close()
+        return capture_plans(mydb, ratings=RATINGS, chunk_size=500)
+    finally:
+        mydb.close()
+
+
+class TestExplain(unittest.TestCase):
+    """Test suite for music_db_explain"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.baseline = capture()
+
+    def test_every_function_captured(self):
+        """Every function called has its statements explained"""
+        functions = {
+            entry["function"] for entry in self.baseline["statements"].values()
+        }
+        called = {name for name, _ in workload_calls(Workload(RATINGS), 500)}
+        self.assertEqual(functions, called)
+        loads = [
+            entry
+            for entry in self.baseline["statements"].values()
+            if entry["function"] == "load_song_ratings"
+        ]
+        self.assertTrue(all(entry["executions"] == 4 for entry in loads))
+
+    def test_same_plans_pass(self):
+        """A capture of the same schema and data has no regressions"""
+        self.assertEqual(compare_plans(self.baseline, capture()), [])
+
+    def test_dropped_index_flagged(self):
+        """Dropping the rating date indexes makes the range queries scan"""
+        current = capture(["idx_ratings_date_user", "idx_ratings_date_song"])
+        regressions = compare_plans(self.baseline, current)
+        functions = {current["statements"][key]["function"] for key, _ in regressions}
+        self.assertIn("get_most_engaged_users_between", functions)
+        self.assertIn("get_most_rated_songs_between", functions)
+        self.assertTrue(all(p.startswith("new full scan of ") for _, p in regressions))
+
+    def test_flags_and_rows_compared(self):
+        """New filesorts, temporary tables and estimate jumps are reported"""
+        key = next(iter(self.baseline["statements"]))
+        current = copy.deepcopy(self.baseline)
+        entry = current["statements"][key]
+        entry.update(filesort=True, temporary=True, rows=50_000)
+        baseline = copy.deepcopy(self.baseline)
+        baseline["statements"][key].update(filesort=False, temporary=False, rows=100)
+
+        problems = [p for k, p in compare_plans(baseline, current) if k == key]
+        self.assertEqual(
+            problems,
+            ["new filesort", "new temporary table", "estimated rows 100 -> 50,000"],
+        )
+        relaxed = compare_plans(baseline, current, rows_factor=1_000)
+        self.assertEqual(len(relaxed), 2)
+
+    def test_mysql_plan_summary(self):
+        """EXPLAIN FORMAT=JSON plans are summarized from their nested nodes"""
+        self.assertEqual(
+            mysql_plan_summary(MYSQL_PLAN),
+            {"full_scans": ["r"], "filesort": True, "temporary": True, "rows": 5001},
+        )
+
+    def test_sqlite_plan_summary(self):
+        """EXPLAIN QUERY PLAN details map to the same summary"""
+        rows = [
+            (2, 0, 0, "SCAN r"),
+            (5, 0, 0, "SEARCH u USING INTEGER PRIMARY KEY (rowid=?)"),
+            (9, 0, 0, "SCAN s USING COVERING INDEX idx_songs_artist"),
+            (20, 0, 0, "USE TEMP B-TREE FOR GROUP BY"),
+            (30, 0, 0, "USE TEMP B-TREE FOR ORDER BY"),
+        ]
+        self.assertEqual(
+            sqlite_plan_summary(rows),
+            {"full_scans": ["r"], "filesort": True, "temporary": True, "rows": 0},
+        )
+
+    def test_explainable(self):
+        """Reads and writes that read tables are explained"""
+        self.assertTrue(explainable("SELECT 1 FROM Users"))
+        self.assertTrue(explainable("UPDATE _stage SET rejected = 1 WHERE seq = %s"))
+        self.assertTrue(explainable("INSERT INTO Users (user_name) SELECT x FROM t"))
+        self.assertFalse(explainable("SELECT @@max_allowed_packet"))
+        self.assertFalse(explainable("INSERT INTO t (a) VALUES (%s)"))
+        self.assertFalse(explainable("CREATE TEMPORARY TABLE t (a INT)"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Unit tests for the IdCache used by the loaders.
+These tests do not need a database.
+"""
+
+import os
+import sys
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import IdCache, collation_key
+
+
+class TestIdCache(unittest.TestCase):
+    """Test suite for IdCache"""
+
+    def test_collation_key_ignores_case_and_accents(self):
+        """Names utf8mb4_0900_ai_ci considers equal usually share a key"""
+        self.assertEqual(collation_key("Beyoncé"), collation_key("BEYONCE"))
+        self.assertEqual(collation_key("Motörhead"), collation_key("motorhead"))
+        # Letters NFKD does not decompose, and ignorable characters
+        self.assertEqual(collation_key("Røyksopp"), collation_key("ROYKSOPP"))
+        self.assertEqual(collation_key("Łódź"), collation_key("LODZ"))
+        self.assertEqual(collation_key("Æon"), collation_key("aeon"))
+        self.assertEqual(collation_key("Straße"), collation_key("STRASSE"))
+        self.assertEqual(collation_key("soft\u00adhyphen"), collation_key("softhyphen"))
+        # The collation is NO PAD, so trailing spaces matter
+        self.assertNotEqual(collation_key("Adele"), collation_key("Adele "))
+
+    def test_get_and_put(self):
+        """Cached ids are found under the spelling they were cached with"""
+        cache = IdCache()
+        cache.put("artist", "Beyoncé", 7)
+        cache.put("song", ("Adele", "Hello"), 12)
+
+        self.assertEqual(cache.get("artist", "Beyoncé"), 7)
+        self.assertEqual(cache.get("song", ("Adele", "Hello")), 12)
+        self.assertIsNone(cache.get("artist", "Adele"))
+        # Kinds do not share entries
+        self.assertIsNone(cache.get("genre", "Beyoncé"))
+        # Other spellings are left to the database to resolve
+        self.assertIsNone(cache.get("artist", "beyonce"))
+        self.assertIsNone(cache.get("song", ("ADELE", "hello")))
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_negative_entries(self):
+        """Negative entries are dropped when rows of their kind are added"""
+        cache = IdCache()
+        cache.put_missing("user", "ghost")
+        cache.put_missing("song", ("Nobody", "Nothing"))
+
+        self.assertIs(cache.get("user", "ghost"), IdCache.MISSING)
+        self.assertIsNone(cache.get("user", "Ghost"))
+
+        cache.forget_missing("user")
+        self.assertIsNone(cache.get("user", "ghost"))
+        self.assertIs(cache.get("song", ("Nobody", "Nothing")), IdCache.MISSING)
+
+        # A positive entry replaces a negative one
+        cache.put("song", ("Nobody", "Nothing"), 3)
+        cache.forget_missing("song")
+        self.assertEqual(cache.get("song", ("Nobody", "Nothing")), 3)
+
+    def test_lru_eviction(self):
+        """The least recently used entries are evicted to stay in the memory bound"""
+        probe = IdCache()
+        probe.put("user", "user_0", 0)
+        cache = IdCache(max_bytes=3 * probe.size_bytes)
+
+        for i in range(3):
+            cache.put("user", f"user_{i}", i)
+        cache.get("user", "user_0")
+        cache.put("user", "user_3", 3)
+
+        self.assertLessEqual(cache.size_bytes, cache.max_bytes)
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.get("user", "user_0"), 0)
+        self.assertIsNone(cache.get("user", "user_1"))
+
+    def test_clear(self):
+        """clear() drops every entry"""
+        cache = IdCache()
+        cache.put("genre", "Pop", 1)
+        cache.put_missing("user", "ghost")
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size_bytes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,263 @@
+"""
+Unit tests for the in-memory leaderboards.
+These tests run on in-memory SQLite databases; no MySQL server is needed.
+"""
+
+import os
+import random
+import sys
+import unittest
+from datetime import MAXYEAR, MINYEAR, date
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db import _SkipList
+import music_db_sqlite
+from music_db_workload import Workload
+
+ALL_TIME = (MINYEAR, MAXYEAR)
+YEAR = 2019
+EVERYTHING = 1_000_000
+
+# Equal counts everywhere, titles equal under the collation, accents and case
+SINGLES = [
+    ("Hello", ("Pop",), "Beta", "2019-01-01"),
+    ("hello", ("Pop",), "alpha", "2019-01-01"),
+    ("Été", ("Pop",), "alpha", "2019-01-01"),
+    ("ete ", ("Pop",), "Beta", "2019-01-01"),
+    ("apple", ("Rock",), "Gamma", "2019-01-01"),
+    ("Zed", ("Rock",), "Gamma", "2019-01-01"),
+]
+USERS = ["bob", "Alice", "Émile", "carol", "dave"]
+
+# Names the collation puts before letters, or sorts with their base letter
+SYMBOL_TITLES = ["~tilde", "{brace}", "_under"]
+LETTER_TITLES = ["apple", "Łódź", "Lz", "Røyksopp", "Rz"]
+SYMBOL_USERS = ["~tilde", "{brace}", "_under"]
+LETTER_USERS = ["apple", "Łukasz", "Lz", "Ørjan", "Oz"]
+
+
+def tie_ratings():
+    ratings = []
+    for i, user in enumerate(USERS):
+        for title, _, artist, _ in SINGLES[: 2 + i % 3]:
+            year = 2018 + (len(title) + i) % 2
+            ratings.append((user, (artist, title), 3, f"{year}-06-01"))
+    return ratings
+
+
+class TestLeaderboards(unittest.TestCase):
+    """Test suite for Leaderboards and enable_leaderboards"""
+
+    def setUp(self):
+        self.mydb = music_db_sqlite.connect()
+
+    def tearDown(self):
+        self.mydb.close()
+
+    def load_workload(self, seed=1, ratings=True):
+        workload = Workload(2_000, seed=seed)
+        load_single_songs(self.mydb, workload.singles())
+        load_albums(self.mydb, workload.albums())
+        load_users(self.mydb, workload.users())
+        if ratings:
+            load_song_ratings(self.mydb, workload.ratings(), chunk_size=300)
+        return workload
+
+    def assert_matches_sql(self, boards, year=YEAR):
+        """Every prefix and every rank agrees with the SQL functions"""
+        for this_year, years in ((False, ALL_TIME), (True, (year, year))):
+            songs = get_most_rated_songs(self.mydb, years, EVERYTHING)
+            users = get_most_engaged_users(self.mydb, years, EVERYTHING)
+            self.assertTrue(songs and users)
+            for n in (0, 1, 5, len(songs) // 2, EVERYTHING):
+                self.assertEqual(
+                    boards.most_rated_songs(n, this_year), songs[:n], (this_year, n)
+                )
+                self.assertEqual(
+                    boards.most_engaged_users(n, this_year), users[:n], (this_year, n)
+                )
+            for rank, (title, artist, _) in enumerate(songs, 1):
+                self.assertEqual(boards.song_rank(artist, title, this_year), rank)
+            for rank, (user, _) in enumerate(users, 1):
+                self.assertEqual(boards.user_rank(user, this_year), rank)
+
+    def test_cold_start(self):
+        """Leaderboards loaded from the database match the SQL functions"""
+        self.load_workload()
+        self.assert_matches_sql(enable_leaderboards(self.mydb, Leaderboards(YEAR)))
+
+    def test_incremental(self):
+        """load_song_ratings keeps the leaderboards equal to the SQL results"""
+        workload = self.load_workload(ratings=False)
+        boards = enable_leaderboards(self.mydb, Leaderboards(YEAR))
+        self.assertEqual(boards.most_rated_songs(10), [])
+
+        ratings = list(workload.ratings())
+        # Rejected ratings (unknown user, duplicates) must not be counted
+        ratings += [("nobody", ratings[0][1], 3, "2019-01-01")] + ratings[:50]
+        rejected = load_song_ratings(self.mydb, ratings, chunk_size=300)
+        self.assertTrue(rejected)
+        self.assert_matches_sql(boards)
+        self.assertEqual(get_leaderboards(self.mydb), boards)
+
+        cold = Leaderboards(YEAR)
+        cold.load(self.mydb)
+        self.assertEqual(
+            cold.most_rated_songs(EVERYTHING), boards.most_rated_songs(EVERYTHING)
+        )
+
+    def test_ties(self):
+        """Ties follow the collation of the names, then the ids"""
+        load_single_songs(self.mydb, SINGLES)
+        load_users(self.mydb, USERS)
+        boards = enable_leaderboards(self.mydb, Leaderboards(YEAR))
+        load_song_ratings(self.mydb, tie_ratings(), chunk_size=4)
+        self.assert_matches_sql(boards)
+
+        songs = boards.most_rated_songs(EVERYTHING)
+        self.assertEqual(
+            [(title, artist) for title, artist, _ in songs[:2]],
+            [("Hello", "Beta"), ("hello", "alpha")],
+        )
+        # Other spellings are resolved by the database
+        self.assertIsNone(boards.song_rank("ALPHA", "HELLO"))
+        self.assertEqual(boards.song_rank("ALPHA", "HELLO", mydb=self.mydb), 2)
+        self.assertEqual(
+            boards.user_rank("emile", mydb=self.mydb), boards.user_rank("Émile")
+        )
+        self.assertIsNone(boards.song_rank("Gamma", "Nope", mydb=self.mydb))
+        self.assertIsNone(boards.user_rank("nobody", mydb=self.mydb))
+
+    def test_symbols_and_letters(self):
+        """Ties put punctuation first and ø, ł with their base letters, as SQL"""
+        titles = SYMBOL_TITLES + LETTER_TITLES
+        users = SYMBOL_USERS + LETTER_USERS
+        # A different artist for each song, so that no two titles collide
+        load_single_songs(
+            self.mydb,
+            [
+                (title, ("Pop",), f"Artist {i}", "2019-01-01")
+                for i, title in enumerate(titles)
+            ],
+        )
+        load_users(self.mydb, users)
+        boards = enable_leaderboards(self.mydb, Leaderboards(YEAR))
+        load_song_ratings(
+            self.mydb,
+            [
+                (user, (f"Artist {i}", title), 3, "2019-06-01")
+                for user in users
+                for i, title in enumerate(titles)
+            ],
+            chunk_size=7,
+        )
+        self.assert_matches_sql(boards)
+
+        songs = [title for title, _, _ in boards.most_rated_songs(EVERYTHING)]
+        self.assertCountEqual(songs[:3], SYMBOL_TITLES)
+        self.assertEqual(songs[3:], LETTER_TITLES)
+        names = [name for name, _ in boards.most_engaged_users(EVERYTHING)]
+        self.assertCountEqual(names[:3], SYMBOL_USERS)
+        self.assertEqual(names[3:], LETTER_USERS)
+
+        cold = Leaderboards(YEAR)
+        cold.load(self.mydb)
+        self.assertEqual(
+            cold.most_engaged_users(EVERYTHING), boards.most_engaged_users(EVERYTHING)
+        )
+
+    def test_clear_database(self):
+        """Clearing Ratings, directly or through a dependency, empties them"""
+        self.load_workload()
+        boards = enable_leaderboards(self.mydb, Leaderboards(YEAR))
+        clear_database(self.mydb, ["SongGenres"])
+        self.assertTrue(boards.most_rated_songs(1))
+        clear_database(self.mydb, ["Users"])
+        self.assertEqual(boards.most_rated_songs(EVERYTHING), [])
+        self.assertEqual(boards.most_engaged_users(EVERYTHING), [])
+
+    def test_session(self):
+        """MusicDB(leaderboards=True) loads them once and keeps them current"""
+        db = MusicDB(pool_size=1, leaderboards=True, connect=music_db_sqlite.connect)
+        with db.connection():
+            db.load_single_songs(SINGLES)
+            db.load_users(USERS)
+            db.load_song_ratings(tie_ratings())
+            self.assertTrue(db.leaderboards.loaded)
+            self.assertEqual(
+                db.leaderboards.most_engaged_users(3),
+                db.get_most_engaged_users(ALL_TIME, 3),
+            )
+        db.close()
+
+    def test_year_rollover(self):
+        """The current-year boards follow the clock into a new year"""
+        load_single_songs(self.mydb, SINGLES)
+        load_users(self.mydb, USERS)
+        today = [date(2019, 12, 31)]
+        boards = enable_leaderboards(self.mydb, Leaderboards(clock=lambda: today[0]))
+        # Ratings dated next year are counted once the clock gets there
+        early = [("bob", ("Gamma", "apple"), 4, "2020-01-01")]
+        load_song_ratings(self.mydb, tie_ratings() + early)
+        self.assertEqual(boards.year, 2019)
+        self.assert_matches_sql(boards, 2019)
+
+        today[0] = date(2020, 1, 1)
+        self.assertEqual(boards.most_engaged_users(EVERYTHING, True), [("bob", 1)])
+        self.assertEqual(boards.year, 2020)
+        load_song_ratings(
+            self.mydb,
+            [
+                ("Alice", ("Gamma", "apple"), 5, "2020-01-02"),
+                ("carol", ("Gamma", "Zed"), 5, "2020-01-02"),
+                ("dave", ("Gamma", "Zed"), 5, "2019-12-30"),
+            ],
+        )
+        self.assert_matches_sql(boards, 2020)
+
+        cold = Leaderboards(clock=lambda: today[0])
+        cold.load(self.mydb)
+        self.assertEqual(
+            cold.most_rated_songs(EVERYTHING, True),
+            boards.most_rated_songs(EVERYTHING, True),
+        )
+
+        # The clock going back does not bring the last year's boards back
+        today[0] = date(2019, 12, 31)
+        self.assertEqual(
+            boards.most_engaged_users(EVERYTHING, True),
+            get_most_engaged_users(self.mydb, (2020, 2020), EVERYTHING),
+        )
+        self.assertEqual(boards.year, 2020)
+
+    def test_skiplist(self):
+        """Inserts, removes and ranks agree with a sorted Python list"""
+        rng = random.Random(5)
+        skiplist = _SkipList(seed=5)
+        expected = []
+        for _ in range(3_000):
+            key = (rng.randrange(-20, 0), rng.randrange(500))
+            if key in expected:
+                skiplist.remove(key)
+                expected.remove(key)
+            else:
+                skiplist.insert(key)
+                expected.append(key)
+        expected.sort()
+        self.assertEqual(list(skiplist), expected)
+        self.assertEqual(len(skiplist), len(expected))
+        for rank, key in enumerate(expected, 1):
+            self.assertEqual(skiplist.rank(key), rank)
+        self.assertIsNone(skiplist.rank((0, 0)))
+        with self.assertRaises(KeyError):
+            skiplist.remove((0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,287 @@
+"""
+Tests for the online id column migration in music_db_migrate.py.
+
+TestShadowDdl does not need a database. TestWidenIdColumns builds a copy of
+the old SMALLINT schema in a scratch database (created and dropped by the
+test, so the MySQL user needs CREATE and DROP privileges) and migrates it
+while another connection keeps loading rows.
+"""
+
+import os
+import re
+import sys
+import threading
+import unittest
+
+import mysql.connector
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db_migrate import _shadow_ddl, plan_migration, widen_id_columns
+
+# Database configuration - UPDATE THESE VALUES
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "root",  # Change this to your MySQL password
+}
+SCRATCH_DATABASE = "musicdb_migrate_test"
+
+SCHEMA_PATH = os.path.join(PROJECT_ROOT, "db_files", "schema.sql")
+
+
+def narrow_schema_statements():
+    """Return schema.sql as it was before the id columns were widened."""
+    with open(SCHEMA_PATH) as f:
+        schema = re.sub(r"(_id )(BIG)?INT UNSIGNED", r"\1SMALLINT", f.read())
+    # Text between DELIMITER lines, as the mysql client reads it
+    parts = re.split(r"^DELIMITER\s+(\S+)\s*$", schema, flags=re.M)
+    statements = []
+    for delimiter, text in zip([";"] + parts[1::2], parts[0::2]):
+        statements += [s for s in text.split(delimiter) if s.strip()]
+    return statements
+
+
+class FakeCursor:
+    """Answers SHOW CREATE TABLE with a fixed statement"""
+
+    def __init__(self, create_table):
+        self.create_table = create_table
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return ("Ratings", self.create_table)
+
+
+class TestShadowDdl(unittest.TestCase):
+    """Test suite for the shadow table definitions"""
+
+    def test_widens_ids_and_moves_foreign_keys(self):
+        """Id columns are widened and foreign keys are kept for after the cut-over"""
+        create_table = "\n".join(
+            [
+                "CREATE TABLE `Ratings` (",
+                "  `rating_id` smallint NOT NULL AUTO_INCREMENT,",
+                "  `user_id` smallint NOT NULL,",
+                "  `rating` tinyint NOT NULL,",
+                "  PRIMARY KEY (`rating_id`),",
+                "  KEY `user_id` (`user_id`),",
+                "  CONSTRAINT `Ratings_ibfk_1` FOREIGN KEY (`user_id`) "
+                "REFERENCES `Users` (`user_id`)",
+                ") ENGINE=InnoDB AUTO_INCREMENT=73 DEFAULT CHARSET=utf8mb4",
+            ]
+        )
+
+        ddl, foreign_keys = _shadow_ddl(FakeCursor(create_table), "Ratings")
+
+        self.assertEqual(
+            ddl,
+            "\n".join(
+                [
+                    "CREATE TABLE `_Ratings_new` (",
+                    "  `rating_id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,",
+                    "  `user_id` INT UNSIGNED NOT NULL,",
+                    "  `rating` tinyint NOT NULL,",
+                    "  PRIMARY KEY (`rating_id`),",
+                    "  KEY `user_id` (`user_id`)",
+                    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4",
+                ]
+            ),
+        )
+        self.assertEqual(
+            foreign_keys,
+            [
+                "CONSTRAINT `Ratings_ibfk_1` FOREIGN KEY (`user_id`) "
+                "REFERENCES `Users` (`user_id`)"
+            ],
+        )
+
+
+class TestWidenIdColumns(unittest.TestCase):
+    """Test suite for widen_id_columns against a scratch database"""
+
+    def setUp(self):
+        try:
+            server = mysql.connector.connect(**DB_CONFIG)
+            cursor = server.cursor()
+            cursor.execute(f"DROP DATABASE IF EXISTS {SCRATCH_DATABASE}")
+            cursor.execute(f"CREATE DATABASE {SCRATCH_DATABASE}")
+            cursor.close()
+            server.close()
+        except mysql.connector.Error as error:
+            self.skipTest(f"Cannot create a scratch database: {error}")
+
+        self.config = dict(DB_CONFIG, database=SCRATCH_DATABASE)
+        self.mydb = mysql.connector.connect(**self.config)
+        cursor = self.mydb.cursor()
+        for statement in narrow_schema_statements():
+            cursor.execute(statement)
+        cursor.close()
+
+        load_single_songs(
+            self.mydb,
+            [
+                ("Blinding Lights", ("Pop",), "The Weeknd", "2019-11-29"),
+                ("Bohemian Rhapsody", ("Rock",), "Queen", "1975-10-31"),
+            ],
+        )
+        load_albums(
+            self.mydb, [("25", "Soul", "Adele", "2015-11-20", ["Hello", "Water"])]
+        )
+        load_users(self.mydb, ["alice", "bob"])
+        load_song_ratings(
+            self.mydb,
+            [
+                ("alice", ("Queen", "Bohemian Rhapsody"), 5, "2020-01-01"),
+                ("bob", ("Adele", "Hello"), 4, "2020-01-02"),
+            ],
+        )
+
+    def tearDown(self):
+        self.mydb.close()
+        server = mysql.connector.connect(**DB_CONFIG)
+        cursor = server.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {SCRATCH_DATABASE}")
+        cursor.close()
+        server.close()
+
+    def column_types(self):
+        cursor = self.mydb.cursor()
+        cursor.execute(
+            """
+            SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND COLUMN_NAME LIKE '%\\_id'
+            """
+        )
+        types = {(table, column): str(t) for table, column, t in cursor.fetchall()}
+        cursor.close()
+        return types
+
+    def test_migrates_while_writes_continue(self):
+        """Rows written during the copy survive the cut-over"""
+        stop = threading.Event()
+        written = []
+        errors = []
+
+        def writer():
+            mydb = mysql.connector.connect(**self.config)
+            try:
+                while not stop.is_set():
+                    name = f"writer_{len(written)}"
+                    load_users(mydb, [name])
+                    written.append(name)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                mydb.close()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            migrated = widen_id_columns(self.mydb, chunk_size=1, sleep=0.05)
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(migrated), 11)
+        self.assertEqual(plan_migration(self.mydb), [])
+
+        types = self.column_types()
+        self.assertEqual(types[("Ratings", "rating_id")], "bigint unsigned")
+        self.assertEqual(types[("SongGenres", "song_id")], "int unsigned")
+        self.assertNotIn("smallint", types.values())
+
+        cursor = self.mydb.cursor()
+        cursor.execute("SELECT COUNT(*) FROM Users WHERE user_name LIKE 'writer\\_%'")
+        self.assertEqual(cursor.fetchone()[0], len(written))
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.REFERENTIAL_CONSTRAINTS
+            WHERE CONSTRAINT_SCHEMA = DATABASE()
+            """
+        )
+        self.assertEqual(cursor.fetchone()[0], 12, "Foreign keys should be restored")
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.TRIGGERS
+            WHERE TRIGGER_SCHEMA = DATABASE()
+            """
+        )
+        self.assertEqual(cursor.fetchone()[0], 5, "GenreStats triggers should move")
+        cursor.execute("SHOW TABLES")
+        self.assertEqual(
+            sorted(row[0] for row in cursor.fetchall()),
+            sorted(
+                [
+                    "Albums",
+                    "ArtistSingleCounts",
+                    "ArtistSinglesSummary",
+                    "Artists",
+                    "GenreStats",
+                    "Genres",
+                    "Ratings",
+                    "SongGenres",
+                    "SongRatingCounts",
+                    "Songs",
+                    "Users",
+                ]
+            ),
+        )
+        cursor.close()
+
+    def test_loaders_work_past_old_limit(self):
+        """After the migration ids above 32,767 can be assigned"""
+        widen_id_columns(self.mydb)
+
+        cursor = self.mydb.cursor()
+        for table in ("Artists", "Songs", "Users", "Ratings"):
+            cursor.execute(f"ALTER TABLE {table} AUTO_INCREMENT = 40000")
+        cursor.close()
+
+        load_single_songs(
+            self.mydb, [("Levitating", ("Pop",), "Dua Lipa", "2020-10-01")]
+        )
+        load_users(self.mydb, ["carol"])
+        rejected = load_song_ratings(
+            self.mydb,
+            [
+                ("carol", ("Dua Lipa", "Levitating"), 5, "2020-10-02"),
+                ("carol", ("Queen", "Bohemian Rhapsody"), 3, "2020-10-03"),
+            ],
+        )
+
+        self.assertEqual(rejected, set())
+        self.assertEqual(
+            get_most_engaged_users(self.mydb, (2020, 2020), 1), [("carol", 2)]
+        )
+        self.assertIn(
+            ("Levitating", "Dua Lipa", 1),
+            get_most_rated_songs(self.mydb, (2020, 2020), 10),
+        )
+        self.assertEqual(check_song_rating_counts(self.mydb), [])
+        self.assertEqual(check_genre_stats(self.mydb), [])
+        self.assertEqual(check_artist_singles(self.mydb), [])
+        self.assertEqual(get_artists_last_single_in_year(self.mydb, 2020), {"Dua Lipa"})
+
+        # Foreign keys are enforced on the new tables
+        cursor = self.mydb.cursor()
+        with self.assertRaises(mysql.connector.IntegrityError):
+            cursor.execute(
+                "INSERT INTO Ratings (user_id, song_id, rating, rating_date) "
+                "VALUES (99999, 99999, 3, '2020-01-01')"
+            )
+        self.mydb.rollback()
+        cursor.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import os
 import sys
+import tempfile
 import mysql.connector
 
 # Ensure music_db.py (project root) is importable when running from test_files/
@@ -18,10 +19,23 @@ DB_CONFIG = {
     "database": "musicdb",  # Change this to your database name
 }
 
+# Backend under test: MUSIC_DB_BACKEND=sqlite runs on the SQLite database
+# file MUSIC_DB_SQLITE instead of MySQL (see music_db_sqlite.py)
+BACKEND = os.environ.get("MUSIC_DB_BACKEND", "mysql")
+SQLITE_PATH = os.environ.get(
+    "MUSIC_DB_SQLITE", os.path.join(tempfile.gettempdir(), "musicdb.sqlite")
+)
+CONNECT = mysql.connector.connect
+if BACKEND == "sqlite":
+    import music_db_sqlite
+
+    CONNECT = music_db_sqlite.connect
+    DB_CONFIG = {"database": SQLITE_PATH, "journal_mode": "WAL"}
+
 
 def connect_db():
-    """Connect to the MySQL database"""
-    return mysql.connector.connect(**DB_CONFIG)
+    """Connect to the database of the backend under test"""
+    return CONNECT(**DB_CONFIG)
 
 
 def test_clear_database():
@@ -0,0 +1,230 @@
+"""
+Unit tests for the parallel loaders.
+The loaders run on SQLite database files; no MySQL server is needed.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+import music_db_sqlite
+from music_db_parallel import (
+    parallel_load_albums,
+    parallel_load_single_songs,
+    partition_of,
+)
+
+SINGLES = [
+    ("Song A", ("Pop", "Rock"), "Artist One", "2019-05-01"),
+    ("Song B", ("Pop",), "Artist Two", "2020-07-01"),
+    ("song a", ("Jazz",), "ARTIST ONE", "2020-08-01"),  # duplicate of Song A
+    ("Song C", ("Rock",), "Artist Three", "2020-02-01"),
+    ("Song D", ("Jazz", "Pop"), "Artist Four", "2021-02-01"),
+    ("Song E", ("Soul",), "Artist Five", "2021-03-01"),
+]
+ALBUMS = [
+    ("Album X", "Soul", "Artist Two", "2018-01-01", ["Track 1", "Track 2"]),
+    ("ALBUM X", "Funk", "Artist Two", "2018-02-01", ["Track 3"]),  # duplicate
+    ("Album Y", "Pop", "Artist Six", "2019-01-01", ["Track 1"]),
+]
+
+# Connections the connect functions below opened in the test process
+PARENT_CONNECTIONS = []
+
+
+def connect(**config):
+    mydb = music_db_sqlite.connect(**config)
+    if multiprocessing.parent_process() is None:
+        PARENT_CONNECTIONS.append(mydb)
+    return mydb
+
+
+def connect_failing_workers(**config):
+    """Worker connections fail on their second chunk, after committing the first"""
+    mydb = connect(**config)
+    if multiprocessing.parent_process() is None:
+        return mydb
+    return FailingConnection(mydb, "INSERT INTO Songs", 2)
+
+
+def connect_failing_cleanup(**config):
+    """Workers fail as above, and so does the parent's cleanup"""
+    mydb = connect_failing_workers(**config)
+    if multiprocessing.parent_process() is None:
+        return FailingConnection(mydb, "DELETE FROM Genres", 1)
+    return mydb
+
+
+class FailingConnection:
+    """Connection proxy whose cursors raise on the n-th statement containing marker"""
+
+    def __init__(self, mydb, marker, n):
+        self._mydb = mydb
+        self.marker = marker
+        self.remaining = n
+
+    def cursor(self, *args, **kwargs):
+        return FailingCursor(self, self._mydb.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._mydb, name)
+
+
+class FailingCursor:
+    def __init__(self, connection, cursor):
+        self._connection = connection
+        self._cursor = cursor
+
+    def execute(self, sql, *args, **kwargs):
+        if self._connection.marker in sql:
+            self._connection.remaining -= 1
+            if self._connection.remaining == 0:
+                raise RuntimeError("injected failure")
+        return self._cursor.execute(sql, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TestPartitionOf(unittest.TestCase):
+    """Test suite for partition_of"""
+
+    def test_spreads_artists(self):
+        """Every worker gets an equal share of consecutive artist ids"""
+        counts = [0] * 8
+        for artist_id in range(1, 8001):
+            counts[partition_of(artist_id, 8)] += 1
+        self.assertEqual(counts, [1000] * 8)
+
+    def test_unknown_artist(self):
+        """Rows whose artist could not be created go to the first worker"""
+        self.assertEqual(partition_of(None, 8), 0)
+
+
+class TestParallelLoad(unittest.TestCase):
+    """Test suite for parallel_load_single_songs and parallel_load_albums"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = {
+            "database": os.path.join(self.directory.name, "music.sqlite"),
+            "journal_mode": "WAL",
+        }
+        music_db_sqlite.connect(**self.config).close()
+        del PARENT_CONNECTIONS[:]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def query(self, sql):
+        mydb = music_db_sqlite.connect(**self.config)
+        try:
+            cursor = mydb.cursor()
+            cursor.execute(sql)
+            return cursor.fetchall()
+        finally:
+            mydb.close()
+
+    def assert_parent_closed(self):
+        self.assertTrue(PARENT_CONNECTIONS)
+        for mydb in PARENT_CONNECTIONS:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                mydb.ping()
+
+    def test_matches_serial_load(self):
+        """Rejects, songs and genre counts are those of the serial loaders"""
+        serial = music_db_sqlite.connect()
+        expected = (
+            load_single_songs(serial, SINGLES),
+            load_albums(serial, ALBUMS),
+            get_top_song_genres(serial, 10),
+        )
+        serial.close()
+
+        singles = parallel_load_single_songs(
+            self.config, SINGLES, workers=3, chunk_size=2, connect=connect
+        )
+        albums = parallel_load_albums(
+            self.config, ALBUMS, workers=3, chunk_size=2, connect=connect
+        )
+        mydb = music_db_sqlite.connect(**self.config)
+        self.assertEqual((singles, albums, get_top_song_genres(mydb, 10)), expected)
+        self.assertEqual(check_genre_stats(mydb), [])
+        mydb.close()
+        self.assert_parent_closed()
+
+    def test_deferred_genre_stats(self):
+        """Sessions that set the flag leave GenreStats to rebuild_genre_stats"""
+        mydb = music_db_sqlite.connect(**self.config)
+        cursor = mydb.cursor()
+        cursor.execute("SET @music_db_defer_genre_stats = 1")
+        load_single_songs(mydb, SINGLES)
+        self.assertEqual(len(check_genre_stats(mydb)), 4)
+
+        cursor.execute("SELECT genre_id FROM Genres WHERE genre_name = %s", ("Pop",))
+        rebuild_genre_stats(mydb, [cursor.fetchone()[0]])
+        self.assertEqual(len(check_genre_stats(mydb)), 3)
+        cursor.execute("SET @music_db_defer_genre_stats = NULL")
+        load_single_songs(mydb, [("Song F", ("Soul",), "Artist Five", "2022-01-01")])
+        self.assertEqual(len(check_genre_stats(mydb)), 3)
+        cursor.close()
+        mydb.close()
+
+    def test_failed_worker_cleaned_up(self):
+        """A failed worker keeps committed chunks, drops unused genres, counts"""
+        with self.assertRaises(RuntimeError) as failure:
+            parallel_load_single_songs(
+                self.config,
+                SINGLES,
+                workers=1,
+                chunk_size=2,
+                connect=connect_failing_workers,
+            )
+        self.assertIn("injected failure", str(failure.exception))
+
+        self.assertEqual(
+            self.query("SELECT song_title FROM Songs ORDER BY song_title"),
+            [("Song A",), ("Song B",)],
+        )
+        self.assertEqual(
+            self.query("SELECT genre_name, num_songs FROM GenreStats ORDER BY 1"),
+            [("Pop", 2), ("Rock", 1)],
+        )
+        self.assertEqual(
+            self.query("SELECT genre_name FROM Genres ORDER BY genre_name"),
+            [("Pop",), ("Rock",)],
+        )
+        self.assertEqual(
+            self.query("SELECT artist_name FROM Artists ORDER BY artist_name"),
+            [("Artist One",), ("Artist Two",)],
+        )
+        self.assert_parent_closed()
+
+    def test_cleanup_failure_keeps_worker_error(self):
+        """A failing cleanup is logged and does not hide the worker's error"""
+        with self.assertLogs("music_db", level="ERROR") as logs:
+            with self.assertRaises(RuntimeError) as failure:
+                parallel_load_single_songs(
+                    self.config,
+                    SINGLES,
+                    workers=1,
+                    chunk_size=2,
+                    connect=connect_failing_cleanup,
+                )
+        self.assertIn("loader worker failed", str(failure.exception))
+        self.assertIn("injected failure", logs.output[0])
+        self.assert_parent_closed()
+
+
+if __name__ == "__main__":
+    unittest.main()
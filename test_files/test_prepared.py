@@ -0,0 +1,130 @@
+"""
+Unit tests for the per-connection prepared statement registry.
+These tests run on in-memory SQLite databases; no MySQL server is needed.
+"""
+
+import os
+import sys
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db import _preparable
+import music_db_sqlite
+from music_db_workload import Workload
+
+QUERIES = [
+    (get_most_rated_songs, ((2016, 2020), 10)),
+    (get_most_engaged_users, ((2016, 2020), 10)),
+    (get_top_song_genres, (10,)),
+    (get_album_and_single_artists, ()),
+]
+
+
+def load(mydb, workload):
+    load_single_songs(mydb, workload.singles(), chunk_size=500)
+    load_albums(mydb, workload.albums(), chunk_size=500)
+    load_users(mydb, workload.users(), chunk_size=500)
+    return load_song_ratings(mydb, workload.ratings(), chunk_size=500)
+
+
+class TestPreparedStatements(unittest.TestCase):
+    """Test suite for enable_prepared_statements and StatementRegistry"""
+
+    def setUp(self):
+        self.mydb = music_db_sqlite.connect()
+        self.registry = enable_prepared_statements(self.mydb)
+
+    def tearDown(self):
+        self.mydb.close()
+
+    def test_same_results(self):
+        """Loads and queries return what they return without the registry"""
+        workload = Workload(2_000, seed=1)
+        plain = music_db_sqlite.connect()
+        try:
+            self.assertEqual(load(self.mydb, workload), load(plain, workload))
+            for func, args in QUERIES:
+                self.assertEqual(func(self.mydb, *args), func(plain, *args))
+        finally:
+            plain.close()
+        self.assertEqual(check_song_rating_counts(self.mydb), [])
+
+    def test_prepared_once(self):
+        """Repeated calls execute the statements prepared by the first"""
+        load(self.mydb, Workload(1_000, seed=2))
+        for func, args in QUERIES:
+            func(self.mydb, *args)
+        before = self.registry.stats()
+        self.assertGreater(before["prepared"], 0)
+
+        load_song_ratings(self.mydb, Workload(1_000, seed=3).ratings())
+        for func, args in QUERIES:
+            func(self.mydb, *args)
+        after = self.registry.stats()
+        self.assertEqual(after["prepared"], before["prepared"])
+        self.assertGreater(after["executed"], before["executed"])
+        self.assertEqual(get_statement_registry(self.mydb), self.registry)
+
+    def test_preparable(self):
+        """DDL, variable placeholder lists and %% stay on the text protocol"""
+        self.assertTrue(_preparable("SELECT a FROM t WHERE b = %s"))
+        self.assertTrue(_preparable("\n  UPDATE _stage SET reason = 'c'"))
+        self.assertTrue(_preparable("WITH x AS (SELECT 1) SELECT * FROM x"))
+        self.assertFalse(_preparable("CREATE TEMPORARY TABLE t (a INT)"))
+        self.assertFalse(_preparable("DROP TEMPORARY TABLE IF EXISTS t"))
+        self.assertFalse(_preparable("UPDATE t SET r = 1 WHERE seq IN (%s, %s)"))
+        self.assertFalse(_preparable("SELECT @@max_allowed_packet"))
+        self.assertFalse(_preparable("SELECT a FROM t WHERE b LIKE 'x%%'"))
+
+    def test_reprepared_after_reconnect(self):
+        """A new connection_id drops the statements of the old session"""
+        self.mydb.connection_id = 1
+        get_top_song_genres(self.mydb, 5)
+        self.assertEqual(len(self.registry), 1)
+        self.mydb.connection_id = 2
+        get_top_song_genres(self.mydb, 5)
+        stats = self.registry.stats()
+        self.assertEqual(stats["reprepared"], 1)
+        self.assertEqual(stats["prepared"], 2)
+        self.assertEqual(stats["statements"], 1)
+
+    def test_eviction(self):
+        """The least recently used statements are closed beyond the bound"""
+        registry = enable_prepared_statements(self.mydb, max_statements=2)
+        self.assertEqual(self.registry.stats()["statements"], 0)
+        load_users(self.mydb, ["alice", "bob"])
+        self.assertEqual(len(registry), 2)
+        self.assertGreater(registry.stats()["evicted"], 0)
+        with self.assertRaises(ValueError):
+            StatementRegistry(0)
+
+    def test_traced(self):
+        """Tracing records the statements sent through the registry"""
+        spans = []
+        enable_tracing(self.mydb, Tracer(spans.append))
+        get_top_song_genres(self.mydb, 5)
+        (event,) = spans[-1].events
+        self.assertIn("SELECT genre_name", event.sql)
+        self.assertEqual(event.rows, 0)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_pool_closes_registry(self):
+        """Connections closed by the pool lose their registry"""
+        db = MusicDB(
+            pool_size=1, prepared_statements=True, connect=music_db_sqlite.connect
+        )
+        with db.connection() as mydb:
+            db.load_users(["alice"])
+            self.assertGreater(len(get_statement_registry(mydb)), 0)
+        db.close()
+        self.assertIsNone(get_statement_registry(mydb))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,12 +2,12 @@
 Quick assertion tests for music database.
 Simpler version of test_assertions.py for rapid testing.
 
-Run this after test_music_db.py has populated the database.
+The dataset of test_music_db.py is loaded and the tests are rolled back
+afterwards by the shared fixture (see fixtures.py).
 """
 
 import os
 import sys
-import mysql.connector
 
 # Ensure music_db.py (project root) is importable when running from test_files/
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -16,14 +16,7 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from music_db import *
-
-# Database configuration
-DB_CONFIG = {
-    "host": "localhost",
-    "user": "root",
-    "password": "root",
-    "database": "musicdb",
-}
+from fixtures import RollbackConnection, RollbackTestCase, shared_connection
 
 
 def assert_test(condition, test_name, success_msg="✓ Passed", fail_msg="✗ Failed"):
@@ -36,13 +29,12 @@ def assert_test(condition, test_name, success_msg="✓ Passed", fail_msg="✗ Fa
         return False
 
 
-def run_quick_tests():
+def run_quick_tests(mydb):
     """Run quick assertion tests"""
     print("\n" + "=" * 60)
     print("QUICK ASSERTION TESTS")
     print("=" * 60)
 
-    mydb = mysql.connector.connect(**DB_CONFIG)
     cursor = mydb.cursor()
     passed = 0
     total = 0
@@ -278,7 +270,6 @@ def run_quick_tests():
         passed += 1
 
     cursor.close()
-    mydb.close()
 
     # Summary
     print("\n" + "=" * 60)
@@ -293,10 +284,17 @@ def run_quick_tests():
         return False
 
 
-if __name__ == "__main__":
-    print("Make sure you've run test_music_db.py first to populate the database!")
-    print("Press Enter to continue...")
-    input()
+class TestQuick(RollbackTestCase):
+    """Test suite running the quick assertions on the shared fixture"""
+
+    def test_quick_assertions(self):
+        self.assertTrue(run_quick_tests(self.mydb))
 
-    success = run_quick_tests()
+
+if __name__ == "__main__":
+    mydb = RollbackConnection(shared_connection())
+    try:
+        success = run_quick_tests(mydb)
+    finally:
+        mydb.close()
     exit(0 if success else 1)
@@ -0,0 +1,130 @@
+"""
+Unit tests for the ResultCache used by the get_* functions.
+These tests do not need a database.
+"""
+
+import os
+import sys
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import (
+    ResultCache,
+    _cached_result,
+    disable_result_cache,
+    enable_result_cache,
+)
+
+
+class FakeConnection:
+    """Stands in for a connection; only its identity matters to the cache"""
+
+
+class TestResultCache(unittest.TestCase):
+    """Test suite for ResultCache"""
+
+    def setUp(self):
+        self.mydb = FakeConnection()
+        self.cache = enable_result_cache(self.mydb, ResultCache(max_entries=2))
+        self.calls = []
+
+        @_cached_result("Ratings", "Users")
+        def engaged(mydb, n):
+            self.calls.append(n)
+            return [("alice", 3), ("bob", 1)][:n]
+
+        @_cached_result("GenreStats")
+        def genres(mydb):
+            self.calls.append("genres")
+            return {"Pop", "Rock"}
+
+        self.engaged = engaged
+        self.genres = genres
+
+    def tearDown(self):
+        disable_result_cache(self.mydb)
+
+    def test_hits_and_misses(self):
+        """Repeated calls with the same arguments are answered from the cache"""
+        self.assertEqual(self.engaged(self.mydb, 2), [("alice", 3), ("bob", 1)])
+        self.assertEqual(self.engaged(self.mydb, 2), [("alice", 3), ("bob", 1)])
+        self.assertEqual(self.engaged(self.mydb, 1), [("alice", 3)])
+
+        self.assertEqual(self.calls, [2, 1])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_results_are_copies(self):
+        """Callers get their own list or set and cannot change cached results"""
+        first = self.engaged(self.mydb, 2)
+        first.append(("mallory", 99))
+        self.assertEqual(self.engaged(self.mydb, 2), [("alice", 3), ("bob", 1)])
+
+        names = self.genres(self.mydb)
+        self.assertIsInstance(names, set)
+        names.clear()
+        self.assertEqual(self.genres(self.mydb), {"Pop", "Rock"})
+
+    def test_bump_invalidates_dependent_results_only(self):
+        """Bumping a table only invalidates results that read it"""
+        self.engaged(self.mydb, 2)
+        self.genres(self.mydb)
+
+        self.cache.bump(["Users"])
+        self.engaged(self.mydb, 2)
+        self.genres(self.mydb)
+
+        self.assertEqual(self.calls, [2, "genres", 2])
+        self.assertEqual(self.cache.invalidations, 1)
+
+    def test_stale_results_are_not_stored(self):
+        """A result read before a bump is not cached after it"""
+        stamp = self.cache.stamp(["GenreStats"])
+        self.cache.bump(["GenreStats"])
+        self.cache.put(("genres",), stamp, frozenset({"Pop"}))
+        self.assertEqual(len(self.cache), 0)
+
+        self.cache.put(("genres",), self.cache.stamp(["GenreStats"]), frozenset())
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(("genres",), ["GenreStats"]))
+
+    def test_lru_eviction(self):
+        """The least recently used entries are evicted beyond max_entries"""
+        self.engaged(self.mydb, 1)
+        self.engaged(self.mydb, 2)
+        self.engaged(self.mydb, 1)  # 1 is now the most recently used
+        self.genres(self.mydb)  # evicts 2
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.evictions, 1)
+        self.engaged(self.mydb, 1)
+        self.engaged(self.mydb, 2)
+        self.assertEqual(self.calls, [1, 2, "genres", 2])
+
+    def test_unhashable_arguments_bypass_the_cache(self):
+        """Calls with unhashable arguments are not cached"""
+
+        @_cached_result("Ratings")
+        def rated(mydb, year_range):
+            self.calls.append(year_range)
+            return []
+
+        rated(self.mydb, [2020, 2021])
+        rated(self.mydb, [2020, 2021])
+        self.assertEqual(self.calls, [[2020, 2021], [2020, 2021]])
+        self.assertEqual(len(self.cache), 0)
+
+    def test_without_cache(self):
+        """Connections without a cache always run the query"""
+        other = FakeConnection()
+        self.engaged(other, 1)
+        self.engaged(other, 1)
+        self.assertEqual(self.calls, [1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+"""
+Unit tests for ConnectionPool and MusicDB.
+These tests use stand-in connections and do not need a database.
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import (
+    ConnectionPool,
+    IdCache,
+    MusicDB,
+    PoolTimeout,
+    get_id_cache,
+    get_top_song_genres,
+)
+
+
+class FakeConnection:
+    """Records the calls the pool makes on a connection"""
+
+    def __init__(self, **config):
+        self.config = config
+        self.rollbacks = 0
+        self.closed = False
+        self.alive = True
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("gone")
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Test suite for ConnectionPool"""
+
+    def test_bounded(self):
+        """No more than size connections are handed out"""
+        pool = ConnectionPool(size=2, connect=FakeConnection, host="db")
+        first = pool.acquire()
+        second = pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(timeout=0.05)
+        self.assertEqual(first.config, {"host": "db"})
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+        self.assertEqual(pool.stats()["in_use"], 2)
+
+    def test_reuse_and_rollback(self):
+        """Released connections are rolled back and handed out again"""
+        pool = ConnectionPool(size=1, connect=FakeConnection)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(first.rollbacks, 2)
+        self.assertEqual(pool.stats()["created"], 1)
+
+    def test_wait_metrics(self):
+        """Callers wait for a released connection and the wait is recorded"""
+        pool = ConnectionPool(size=1, connect=FakeConnection)
+        held = pool.acquire()
+        releaser = threading.Timer(0.1, pool.release, (held,))
+        releaser.start()
+
+        self.assertIs(pool.acquire(timeout=5), held)
+        releaser.join()
+        stats = pool.stats()
+        self.assertEqual(stats["waits"], 1)
+        self.assertGreaterEqual(stats["max_wait_seconds"], 0.05)
+        self.assertGreaterEqual(stats["wait_seconds"], stats["max_wait_seconds"])
+
+    def test_health_check_replaces_dead_connection(self):
+        """An idle connection that fails its ping is replaced"""
+        pool = ConnectionPool(size=1, connect=FakeConnection, health_check_interval=0)
+        with pool.connection() as first:
+            first.alive = False
+        with pool.connection() as second:
+            pass
+
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        stats = pool.stats()
+        self.assertEqual(
+            (stats["health_checks"], stats["health_check_failures"]), (1, 1)
+        )
+        self.assertEqual(stats["open"], 1)
+
+    def test_failed_connect_frees_slot(self):
+        """A connection that cannot be opened does not use up the pool"""
+        attempts = []
+
+        def connect():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise ConnectionError("refused")
+            return FakeConnection()
+
+        pool = ConnectionPool(size=1, connect=connect)
+        with self.assertRaises(ConnectionError):
+            pool.acquire()
+        pool.release(pool.acquire(timeout=0.05))
+        self.assertEqual(pool.stats()["open"], 1)
+
+    def test_close(self):
+        """Closing the pool closes idle and later released connections"""
+        pool = ConnectionPool(size=2, connect=FakeConnection)
+        busy = pool.acquire()
+        with pool.connection() as idle:
+            pass
+        pool.close()
+        pool.release(busy)
+
+        self.assertTrue(idle.closed and busy.closed)
+        self.assertEqual(pool.stats()["open"], 0)
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+
+
+class TestMusicDB(unittest.TestCase):
+    """Test suite for MusicDB"""
+
+    def test_thread_connections(self):
+        """Each thread gets its own connection; nested use shares it"""
+        db = MusicDB(pool_size=2, connect=FakeConnection)
+        seen = {}
+        barrier = threading.Barrier(2)
+
+        def work(name):
+            with db.connection() as outer:
+                barrier.wait()
+                with db.connection() as inner:
+                    seen[name] = (outer, inner)
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in "ab"]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIs(seen["a"][0], seen["a"][1])
+        self.assertIsNot(seen["a"][0], seen["b"][0])
+        self.assertEqual(db.stats()["idle"], 2)
+        db.close()
+
+    def test_shared_caches(self):
+        """Every pooled connection gets the session's caches"""
+        cache = IdCache()
+        db = MusicDB(pool_size=1, connect=FakeConnection, id_cache=cache)
+        with db.connection() as mydb:
+            self.assertIs(get_id_cache(mydb), cache)
+        db.close()
+
+    def test_methods_mirror_functions(self):
+        """Methods keep the documentation of the module functions"""
+        self.assertEqual(
+            MusicDB.get_top_song_genres.__doc__, get_top_song_genres.__doc__
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
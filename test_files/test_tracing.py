@@ -0,0 +1,209 @@
+"""
+Unit tests for the per-call tracing hooks.
+These tests run on in-memory SQLite databases; no MySQL server is needed.
+"""
+
+import os
+import sys
+import unittest
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+from music_db import _PreparedConnection, _TracedConnection
+import music_db_sqlite
+
+SINGLES = [
+    ("Song A", ("Pop", "Rock"), "Artist One", "2020-05-01"),
+    ("Song B", ("Pop",), "Artist Two", "2020-07-01"),
+]
+
+
+class RecordingOtelSpan:
+    """The parts of an OpenTelemetry span that OpenTelemetryHook uses"""
+
+    def __init__(self, name, start_time, attributes):
+        self.name = name
+        self.start_time = start_time
+        self.attributes = attributes
+        self.events = []
+        self.end_time = None
+
+    def add_event(self, name, attributes, timestamp):
+        self.events.append((name, attributes, timestamp))
+
+    def end(self, end_time):
+        self.end_time = end_time
+
+
+class RecordingOtelTracer:
+    """The parts of an OpenTelemetry tracer that OpenTelemetryHook uses"""
+
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, start_time, attributes):
+        span = RecordingOtelSpan(name, start_time, attributes)
+        self.spans.append(span)
+        return span
+
+
+class TestTracing(unittest.TestCase):
+    """Test suite for enable_tracing and the tracer hooks"""
+
+    def setUp(self):
+        self.mydb = music_db_sqlite.connect()
+        self.spans = []
+        self.tracer = enable_tracing(self.mydb, Tracer(self.spans.append))
+
+    def tearDown(self):
+        self.mydb.close()
+
+    def test_span_per_call(self):
+        """Every public call records its statements and commits"""
+        load_users(self.mydb, ["alice", "bob", "ALICE"])
+        self.assertEqual(get_tracer(self.mydb), self.tracer)
+        self.assertEqual(len(self.spans), 1)
+
+        span = self.spans[0]
+        self.assertEqual(span.name, "load_users")
+        self.assertIsNone(span.error)
+        self.assertGreater(span.elapsed, 0)
+        kinds = [event.kind for event in span.events]
+        self.assertIn("executemany", kinds)
+        self.assertEqual(kinds.count("commit"), 2)
+        self.assertEqual(span.round_trips, len(span.events))
+
+        staged = next(e for e in span.events if e.kind == "executemany")
+        self.assertEqual(staged.binds, 6)
+        self.assertEqual(staged.rows, 3)
+        self.assertNotIn("\n", staged.sql)
+        rejected = next(e for e in span.events if "SET rejected = 1" in (e.sql or ""))
+        self.assertTrue(rejected.sql.endswith("WHERE seq IN (%s)"))
+        inserted = next(e for e in span.events if "INSERT INTO Users" in (e.sql or ""))
+        self.assertEqual(inserted.rows, 2)
+
+    def test_rows_fetched(self):
+        """Statements returning rows count the rows fetched"""
+        load_single_songs(self.mydb, SINGLES)
+        del self.spans[:]
+        result = get_top_song_genres(self.mydb, 5)
+
+        (span,) = self.spans
+        (event,) = span.events
+        self.assertEqual(event.kind, "execute")
+        self.assertEqual(event.binds, 1)
+        self.assertEqual(event.rows, len(result))
+
+    def test_packet_size_read_once(self):
+        """max_allowed_packet is read by the first load of a connection only"""
+        load_users(self.mydb, ["alice"])
+        load_users(self.mydb, ["bob"])
+        load_single_songs(self.mydb, SINGLES)
+        reads = [
+            sum("@@max_allowed_packet" in (e.sql or "") for e in span.events)
+            for span in self.spans
+        ]
+        self.assertEqual(reads, [1, 0, 0])
+
+    def test_caches_behind_tracing(self):
+        """The id and result caches of a traced connection are used"""
+        enable_id_cache(self.mydb)
+        enable_result_cache(self.mydb)
+        load_single_songs(self.mydb, SINGLES)
+        self.assertGreater(len(get_id_cache(self.mydb)), 0)
+
+        get_album_and_single_artists(self.mydb)
+        get_album_and_single_artists(self.mydb)
+        self.assertGreater(self.spans[-2].round_trips, 0)
+        self.assertEqual(self.spans[-1].round_trips, 0)
+
+    def test_error_recorded(self):
+        """A failing call records its exception and still emits its span"""
+        with self.assertRaises(ValueError):
+            load_users(self.mydb, ["alice"], chunk_size=0)
+        self.assertEqual(self.spans[-1].name, "load_users")
+        self.assertIsInstance(self.spans[-1].error, ValueError)
+
+    def test_disable(self):
+        """Untraced connections record nothing"""
+        disable_tracing(self.mydb)
+        load_users(self.mydb, ["alice"])
+        self.assertIsNone(get_tracer(self.mydb))
+        self.assertEqual(self.spans, [])
+
+    def test_logging_hook(self):
+        """LoggingHook logs a line per span and per statement"""
+        self.tracer.add_hook(LoggingHook())
+        with self.assertLogs("music_db", level="DEBUG") as logs:
+            get_top_song_genres(self.mydb, 5)
+        self.assertEqual(len(logs.records), 2)
+        self.assertIn("get_top_song_genres", logs.output[0])
+        self.assertIn("SELECT genre_name", logs.output[1])
+
+    def test_opentelemetry_hook(self):
+        """OpenTelemetryHook exports a span with an event per statement"""
+        otel = RecordingOtelTracer()
+        self.tracer.add_hook(OpenTelemetryHook(otel))
+        load_users(self.mydb, ["alice"])
+
+        (exported,) = otel.spans
+        span = self.spans[-1]
+        self.assertEqual(exported.name, "load_users")
+        self.assertEqual(exported.attributes["music_db.round_trips"], span.round_trips)
+        self.assertEqual(len(exported.events), span.round_trips)
+        self.assertEqual(
+            [name for name, _, _ in exported.events],
+            [event.kind for event in span.events],
+        )
+        self.assertIn("db.statement", exported.events[0][1])
+        self.assertNotIn("db.statement", exported.events[-1][1])
+        self.assertGreaterEqual(exported.end_time, exported.start_time)
+
+    def test_session_tracer(self):
+        """MusicDB traces every pooled connection"""
+        spans = []
+        with MusicDB(
+            pool_size=2, tracer=Tracer(spans.append), connect=music_db_sqlite.connect
+        ) as db:
+            db.load_users(["alice"])
+            db.get_most_engaged_users((2020, 2020), 5)
+        self.assertEqual(
+            [span.name for span in spans], ["load_users", "get_most_engaged_users"]
+        )
+
+    def test_registries_keyed_by_connection(self):
+        """enable, get and disable agree on proxies and the connection itself"""
+        proxy = _PreparedConnection(
+            _TracedConnection(self.mydb, Span("test")), StatementRegistry(8)
+        )
+        registries = [
+            (enable_id_cache, get_id_cache, disable_id_cache),
+            (enable_result_cache, get_result_cache, disable_result_cache),
+            (enable_tracing, get_tracer, disable_tracing),
+            (
+                enable_prepared_statements,
+                get_statement_registry,
+                disable_prepared_statements,
+            ),
+            (enable_leaderboards, get_leaderboards, disable_leaderboards),
+        ]
+        for enable, get, disable in registries:
+            with self.subTest(enable.__name__):
+                attached = enable(proxy)
+                self.assertIs(get(self.mydb), attached)
+                self.assertIs(get(proxy), attached)
+                disable(self.mydb)
+                self.assertIsNone(get(proxy))
+                attached = enable(self.mydb)
+                self.assertIs(get(proxy), attached)
+                disable(proxy)
+                self.assertIsNone(get(self.mydb))
+
+
+if __name__ == "__main__":
+    unittest.main()
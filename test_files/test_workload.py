@@ -0,0 +1,147 @@
+"""
+Unit tests for the synthetic workload generator.
+The loads run on in-memory SQLite databases; no MySQL server is needed.
+"""
+
+import os
+import sys
+import tempfile
+import types
+import unittest
+from collections import Counter
+
+# Make sure the project root (where music_db.py lives) is on sys.path
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from music_db import *
+import music_db_sqlite
+from music_db_workload import KINDS, Workload, zipf_rank
+
+REJECTS = {
+    "duplicate_single": 0.05,
+    "duplicate_album": 0.1,
+    "duplicate_user": 0.05,
+    "unknown_user": 0.02,
+    "unknown_song": 0.02,
+    "already_rated": 0.03,
+    "out_of_range": 0.03,
+}
+
+LOADERS = {
+    "singles": load_single_songs,
+    "albums": load_albums,
+    "users": load_users,
+    "ratings": load_song_ratings,
+}
+
+
+def reject_key(kind, row):
+    """The tuple a loader returns when it rejects row"""
+    if kind in ("singles", "albums"):
+        return (row[0], row[2])
+    if kind == "users":
+        return row
+    return (row[0], row[1][0], row[1][1])
+
+
+class TestWorkload(unittest.TestCase):
+    """Test suite for music_db_workload"""
+
+    def test_deterministic(self):
+        """The same seed gives the same rows, another seed other rows"""
+        for kind in KINDS:
+            first = list(Workload(2_000, seed=3).labelled(kind))
+            self.assertEqual(first, list(Workload(2_000, seed=3).labelled(kind)))
+            # Usernames are only numbered
+            if kind != "users":
+                other = list(Workload(2_000, seed=4).labelled(kind))
+                self.assertNotEqual(first, other)
+
+    def test_streams(self):
+        """Rows are generated lazily"""
+        workload = Workload(100_000_000)
+        ratings = workload.ratings()
+        self.assertIsInstance(ratings, types.GeneratorType)
+        user, (artist, title), rating, day = next(ratings)
+        self.assertIn(rating, range(1, 6))
+        self.assertRegex(day, r"^\d{4}-\d\d-\d\d$")
+
+    def test_skew(self):
+        """Popular songs, active users and prolific artists dominate"""
+        workload = Workload(50_000, seed=1)
+        ratings = list(workload.ratings())
+        self.assertEqual(len(ratings), 50_000)
+        self.assertEqual(len({(r[0], r[1]) for r in ratings}), 50_000)
+
+        songs = Counter(r[1] for r in ratings)
+        top_songs = sum(n for _, n in songs.most_common(workload.num_songs // 100))
+        self.assertGreater(top_songs, 0.2 * len(ratings))
+        users = Counter(r[0] for r in ratings)
+        top_users = sum(n for _, n in users.most_common(workload.num_users // 100))
+        self.assertGreater(top_users, 0.2 * len(ratings))
+        artists = Counter(s[2] for s in workload.singles())
+        self.assertGreater(artists.most_common(1)[0][1], 20 * 10)
+        self.assertTrue(any(len(s[1]) > 1 for s in workload.singles()))
+
+    def test_zipf_rank(self):
+        """Ranks stay in range and rank 0 is the most frequent"""
+        for skew in (0, 0.5, 1, 1.5):
+            ranks = Counter(zipf_rank(50, skew, u / 1000) for u in range(1000))
+            self.assertTrue(set(ranks) <= set(range(50)))
+            if skew:
+                self.assertEqual(ranks.most_common(1)[0][0], 0)
+
+    def test_rejects_match_labels(self):
+        """The loaders reject exactly the injected rows"""
+        workload = Workload(5_000, seed=2, reject_fractions=REJECTS)
+        mydb = music_db_sqlite.connect()
+        try:
+            for kind in KINDS:
+                labelled = list(workload.labelled(kind))
+                injected = Counter(c for c, _ in labelled if c)
+                expected = {reject_key(kind, row) for c, row in labelled if c}
+                self.assertEqual(len(expected), sum(injected.values()))
+                for category, fraction in REJECTS.items():
+                    if category in injected:
+                        share = injected[category] / len(labelled)
+                        self.assertAlmostEqual(share, fraction, delta=fraction / 2)
+
+                rows = (row for _, row in workload.labelled(kind))
+                self.assertEqual(LOADERS[kind](mydb, rows, chunk_size=500), expected)
+            self.assertEqual(check_song_rating_counts(mydb), [])
+        finally:
+            mydb.close()
+
+    def test_write_files(self):
+        """The import files load the same rows as the loaders"""
+        workload = Workload(1_000, seed=5, reject_fractions={"unknown_song": 0.1})
+        mydb = music_db_sqlite.connect()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                paths = workload.write_files(directory)
+                self.assertEqual(import_single_songs(mydb, paths["singles"]), set())
+                self.assertEqual(import_albums(mydb, paths["albums"]), set())
+                self.assertEqual(import_users(mydb, paths["users"]), set())
+                rejected = import_song_ratings(mydb, paths["ratings"])
+        finally:
+            mydb.close()
+        expected = {
+            reject_key("ratings", row) for c, row in workload.labelled("ratings") if c
+        }
+        self.assertEqual(rejected, expected)
+
+    def test_invalid_rejects(self):
+        """Unknown categories and impossible fractions are refused"""
+        with self.assertRaises(ValueError):
+            Workload(100, reject_fractions={"bad_genre": 0.1})
+        with self.assertRaises(ValueError):
+            Workload(100, reject_fractions={"unknown_user": 0.3, "unknown_song": 0.3})
+        with self.assertRaises(ValueError):
+            Workload(1_000, num_users=1, num_singles=10, num_albums=0)
+
+
+if __name__ == "__main__":
+    unittest.main()